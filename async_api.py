@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Asynchronous read API for ASSI Warehouse Management System
+
+Serves the stock and catalog lookups that scanners poll (/api/stock,
+/api/items and /api/items/<id>) from an asyncio ASGI app on a SQLAlchemy
+async engine, so thousands of idle or waiting connections share a small
+connection pool. Identical lookups arriving together run one query, and
+responses are reused for ASYNC_API_CACHE_TTL seconds. Every other path is passed to the Flask app, so the
+combined `application` replaces the Flask server:
+
+    uvicorn async_api:application --host 0.0.0.0 --port 5000 --workers 4
+
+Needs the optional async dependencies (sqlalchemy[asyncio], asgiref,
+uvicorn and asyncpg or aiosqlite for the configured database).
+"""
+
+import os
+import json
+import asyncio
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database.db_setup import db_url
+from models.item import Item, ItemStock
+from models.warehouse import Warehouse
+from utils.cache import TTLCache
+
+# Async drivers for the synchronous URLs used by the rest of the application
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+# Connections shared by all concurrent requests of a worker process
+ASYNC_POOL_SIZE = int(os.environ.get('ASYNC_POOL_SIZE', '10'))
+
+# Seconds a request waits for a free connection before failing with 503
+ASYNC_POOL_TIMEOUT = float(os.environ.get('ASYNC_POOL_TIMEOUT', '10'))
+
+# Seconds an identical lookup reuses a response (0 disables; stock may be this stale)
+ASYNC_API_CACHE_TTL = float(os.environ.get('ASYNC_API_CACHE_TTL', '1'))
+
+def async_database_url(url=None):
+    """Get the async driver URL for a database URL (ASYNC_DATABASE_URL overrides)"""
+    override = os.environ.get('ASYNC_DATABASE_URL')
+    if override:
+        return override
+
+    url = make_url(url or db_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def _create_engine():
+    """Create the async engine with a small, fixed-size pool"""
+    url = make_url(async_database_url())
+    if url.get_backend_name() == 'sqlite':
+        # SQLite has no server connections to pool
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=ASYNC_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=ASYNC_POOL_TIMEOUT,
+        pool_pre_ping=True
+    )
+
+class NotFound(Exception):
+    """Raised by handlers for missing records"""
+
+
+class BadRequest(Exception):
+    """Raised by handlers for invalid parameters"""
+
+
+class ReadAPI:
+    """ASGI app serving stock and catalog lookups
+
+    Stock lookups need the Flask session cookie of a logged-in user, like
+    the Flask endpoints they replace, and responses carry the same JSON.
+    """
+
+    def __init__(self, flask_app):
+        """Create the API
+
+        Args:
+            flask_app: Flask application whose session cookies authenticate requests
+        """
+        self.engine = None
+        self.cache = TTLCache(ttl=ASYNC_API_CACHE_TTL, max_entries=4096)
+        self._pending = {}
+        self.session_cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+        self.session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        # Path parts -> (handler, login required), as on the Flask endpoints
+        self.routes = {
+            ('api', 'stock'): (self.get_stock, True),
+            ('api', 'items'): (self.get_items, False),
+        }
+
+    def handles(self, path):
+        """Check whether a request path is served by this API"""
+        return self._route(path) is not None
+
+    def _route(self, path):
+        """Get (handler, login required, path arguments) for a path, or None"""
+        parts = tuple(part for part in path.split('/') if part)
+        if parts in self.routes:
+            handler, login = self.routes[parts]
+            return handler, login, ()
+        if len(parts) == 3 and parts[:2] == ('api', 'items') and parts[2].isdigit():
+            return self.get_item, True, (int(parts[2]),)
+        return None
+
+    def _is_authenticated(self, scope):
+        """Check the Flask session cookie for a logged-in user"""
+        cookie = SimpleCookie()
+        for name, value in scope.get('headers', ()):
+            if name == b'cookie':
+                cookie.load(value.decode('latin-1'))
+
+        morsel = cookie.get(self.session_cookie_name)
+        if morsel is None or self.session_serializer is None:
+            return False
+        try:
+            data = self.session_serializer.loads(morsel.value, max_age=self.session_max_age)
+        except Exception:
+            # Bad signature, expired or malformed cookie
+            return False
+        return 'user_id' in data
+
+    async def startup(self):
+        """Create the engine (once per worker process)"""
+        if self.engine is None:
+            self.engine = _create_engine()
+
+    async def shutdown(self):
+        """Close pooled connections"""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        route = self._route(scope['path'])
+        if route is None:
+            await self._respond(send, 404, {'error': 'Not found'})
+            return
+        if scope['method'] not in ('GET', 'HEAD'):
+            await self._respond(send, 405, {'error': 'Method not allowed'})
+            return
+        handler, login, path_args = route
+        if login and not self._is_authenticated(scope):
+            await self._respond(send, 401, {'error': 'Login required'})
+            return
+
+        await self.startup()
+        params = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        cache_key = (scope['path'], scope.get('query_string', b''))
+
+        try:
+            payload = await self._cached(cache_key, lambda: self._render(handler, params, path_args))
+            status = 200
+        except BadRequest as e:
+            payload, status = self._encode({'error': str(e)}), 400
+        except NotFound as e:
+            payload, status = self._encode({'error': str(e)}), 404
+        except PoolTimeout:
+            # No pooled connection became free in time
+            payload, status = self._encode({'error': 'Server busy'}), 503
+
+        await self._send(send, status, payload, head=scope['method'] == 'HEAD')
+
+    async def _render(self, handler, params, path_args):
+        """Run a handler and encode its result"""
+        return self._encode(await handler(params, *path_args))
+
+    async def _cached(self, key, compute):
+        """Get a response body from the cache, computing it once for concurrent misses
+
+        Scanners poll the same lookups, so identical requests arriving
+        together share one query and a result is reused for
+        ASYNC_API_CACHE_TTL seconds.
+        """
+        if ASYNC_API_CACHE_TTL <= 0:
+            return await compute()
+
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.ensure_future(compute())
+        self._pending[key] = future
+        try:
+            payload = await asyncio.shield(future)
+        finally:
+            self._pending.pop(key, None)
+
+        self.cache.set(key, payload)
+        return payload
+
+    async def _lifespan(self, receive, send):
+        """Handle ASGI lifespan startup and shutdown events"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def _encode(body):
+        """Encode a response body as compact JSON"""
+        return json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+    async def _respond(self, send, status, body):
+        """Send a JSON response"""
+        await self._send(send, status, self._encode(body))
+
+    @staticmethod
+    async def _send(send, status, payload, head=False):
+        """Send an encoded JSON response"""
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(payload)).encode('ascii')),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b'' if head else payload})
+
+    async def _fetch(self, query):
+        """Run a query on a pooled connection and return all rows"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(query)
+            return result.all()
+
+    async def get_stock(self, params):
+        """Stock of a warehouse: {item_id: {quantity, reserved, available, item_name, main_unit}}"""
+        try:
+            warehouse_id = int(params['warehouse_id'])
+        except KeyError:
+            raise BadRequest('Warehouse ID is required')
+        except ValueError:
+            raise BadRequest('Invalid warehouse ID')
+
+        rows = await self._fetch(
+            select(ItemStock.item_id, ItemStock.quantity, ItemStock.reserved_quantity, Item.name, Item.main_unit)
+            .join(Item, Item.id == ItemStock.item_id)
+            .where(ItemStock.warehouse_id == warehouse_id)
+        )
+        return {
+            str(row.item_id): {
+                'quantity': row.quantity,
+                'reserved': row.reserved_quantity,
+                'available': (row.quantity or 0.0) - (row.reserved_quantity or 0.0),
+                'item_name': row.name,
+                'main_unit': row.main_unit
+            }
+            for row in rows
+        }
+
+    async def get_items(self, params):
+        """Active item catalog with total stock across warehouses (as the Flask /api/items)"""
+        stock = select(
+            ItemStock.item_id,
+            func.sum(ItemStock.quantity).label('stock')
+        ).group_by(ItemStock.item_id).subquery()
+
+        rows = await self._fetch(
+            select(
+                Item.id, Item.name, Item.main_unit, Item.sub_unit, Item.conversion_rate,
+                Item.purchase_price, Item.selling_price,
+                func.coalesce(stock.c.stock, 0.0).label('stock')
+            ).outerjoin(
+                stock, stock.c.item_id == Item.id
+            ).where(Item.is_active == True).order_by(Item.id)
+        )
+        return [dict(row._mapping) for row in rows]
+
+    async def get_item(self, params, item_id):
+        """One item with its stock per warehouse"""
+        rows = await self._fetch(
+            select(
+                Item.id, Item.name, Item.main_unit, Item.sub_unit, Item.conversion_rate,
+                Item.purchase_price, Item.selling_price,
+                ItemStock.warehouse_id, Warehouse.name.label('warehouse_name'), ItemStock.quantity
+            ).outerjoin(
+                ItemStock, ItemStock.item_id == Item.id
+            ).outerjoin(
+                Warehouse, Warehouse.id == ItemStock.warehouse_id
+            ).where(Item.id == item_id).order_by(ItemStock.warehouse_id)
+        )
+        if not rows:
+            raise NotFound('Item not found')
+
+        first = rows[0]
+        warehouses = [
+            {'warehouse_id': row.warehouse_id, 'warehouse_name': row.warehouse_name, 'quantity': row.quantity}
+            for row in rows if row.warehouse_id is not None
+        ]
+        return {
+            'id': first.id,
+            'name': first.name,
+            'main_unit': first.main_unit,
+            'sub_unit': first.sub_unit,
+            'conversion_rate': first.conversion_rate,
+            'purchase_price': first.purchase_price,
+            'selling_price': first.selling_price,
+            'stock': sum(warehouse['quantity'] or 0.0 for warehouse in warehouses),
+            'warehouses': warehouses
+        }
+
+
+class Application:
+    """ASGI entry point: the read API for its paths, the Flask app for everything else"""
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.read_api = ReadAPI(flask_app)
+        self.flask = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.read_api(scope, receive, send)
+        elif scope['type'] == 'http' and self.read_api.handles(scope['path']):
+            await self.read_api(scope, receive, send)
+        else:
+            await self.flask(scope, receive, send)
+
+
+def create_application():
+    """Build the combined ASGI application around the Flask app"""
+    from web_app import app as flask_app
+    return Application(flask_app)
+
+application = create_application()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Archive benchmark for ASSI Warehouse Management System
+
+Fills a temporary SQLite database with five years of invoices, invoice
+lines, COGS entries, cost layers, payments (direct and on account, with
+allocations) and fund transactions up to the current month, and times
+the reports over recent and whole-history ranges. Then archives every
+month but the last --keep-months with ArchiveController, times the
+reports again and checks that they return the same results.
+
+Usage:
+    python benchmarks/archive_reports.py [--invoices N] [--keep-months N] [--runs N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'archive_reports.db')}")
+
+LINES_PER_INVOICE = 4
+CHUNK_SIZE = 10000
+YEARS = 5
+ITEMS = 500
+CUSTOMERS = 200
+SUPPLIERS = 20
+
+def populate(engine, invoice_count, first_date, last_date):
+    """Insert synthetic master data and five years of ledger rows
+
+    Every fourth customer invoice is paid on account: one payment settles
+    two consecutive invoices of a customer through allocations. Invoices
+    of the last month are left open.
+    """
+    from models.item import Item
+    from models.warehouse import Warehouse
+    from models.fund import Fund, FundTransaction
+    from models.supplier_customer import SupplierCustomer, Payment, PaymentAllocation
+    from models.invoice import Invoice, InvoiceItem
+    from models.inventory_cost import CostLayer, CostOfGoodsSold
+
+    rng = random.Random(42)
+    span = int((last_date - first_date).total_seconds() // 60)
+    open_after = last_date - timedelta(days=30)
+
+    with engine.begin() as conn:
+        conn.execute(Warehouse.__table__.insert(), [{'id': 1, 'name': 'Main', 'is_active': True}])
+        conn.execute(Fund.__table__.insert(), [
+            {'id': 1, 'name': 'Cash', 'balance': 0.0, 'currency': 'USD', 'exchange_rate': 1.0, 'is_active': True},
+            {'id': 2, 'name': 'Bank', 'balance': 0.0, 'currency': 'USD', 'exchange_rate': 1.0, 'is_active': True},
+        ])
+        conn.execute(SupplierCustomer.__table__.insert(), [
+            {'id': i, 'name': f"Supplier {i}" if i <= SUPPLIERS else f"Customer {i}",
+             'type': 'supplier' if i <= SUPPLIERS else 'customer', 'balance': 0.0, 'currency': 'USD'}
+            for i in range(1, SUPPLIERS + CUSTOMERS + 1)
+        ])
+        conn.execute(Item.__table__.insert(), [
+            {'id': i, 'name': f"Item {i}", 'main_unit': 'bag', 'sub_unit': 'kg', 'conversion_rate': 50.0,
+             'purchase_price': 10.0 + i % 20, 'selling_price': 15.0 + i % 20, 'is_active': True}
+            for i in range(1, ITEMS + 1)
+        ])
+
+    # Invoice dates in order, so on-account pairs and ids follow time
+    dates = sorted(first_date + timedelta(minutes=rng.randrange(span)) for _ in range(invoice_count))
+    line_id = payment_id = transaction_id = allocation_id = 0
+    waiting = {}  # customer -> (invoice id, total) waiting for an on-account partner
+
+    for chunk_start in range(0, invoice_count, CHUNK_SIZE):
+        invoices, lines, cogs, layers = [], [], [], []
+        payments, allocations, transactions = [], [], []
+
+        for invoice_id in range(chunk_start + 1, min(invoice_count, chunk_start + CHUNK_SIZE) + 1):
+            invoice_date = dates[invoice_id - 1]
+            is_sale = invoice_id % 4 != 0
+            entity_id = rng.randint(SUPPLIERS + 1, SUPPLIERS + CUSTOMERS) if is_sale else rng.randint(1, SUPPLIERS)
+            total = 0.0
+
+            for _ in range(LINES_PER_INVOICE):
+                line_id += 1
+                item_id = rng.randint(1, ITEMS)
+                quantity = float(rng.randint(1, 20))
+                price = (15.0 if is_sale else 10.0) + item_id % 20
+                total += quantity * price
+                lines.append({'id': line_id, 'invoice_id': invoice_id, 'item_id': item_id, 'quantity': quantity,
+                              'unit': 'bag', 'price_per_unit': price, 'total_price': quantity * price,
+                              'warehouse_id': 1})
+                if is_sale:
+                    cost = quantity * (10.0 + item_id % 20)
+                    cogs.append({'invoice_id': invoice_id, 'invoice_item_id': line_id, 'item_id': item_id,
+                                 'warehouse_id': 1, 'quantity': quantity, 'fifo_cost': cost,
+                                 'average_cost': cost, 'issued_at': invoice_date})
+                else:
+                    layers.append({'item_id': item_id, 'warehouse_id': 1, 'invoice_id': invoice_id,
+                                   'source_type': 'purchase', 'received_at': invoice_date, 'quantity': quantity,
+                                   'remaining_quantity': quantity if invoice_date >= open_after else 0.0,
+                                   'unit_cost': price, 'created_at': invoice_date})
+
+            status = 'pending' if invoice_date >= open_after else 'paid'
+            invoices.append({'id': invoice_id, 'invoice_number': f"A-{invoice_id:09d}",
+                             'type': 'sale' if is_sale else 'purchase', 'entity_id': entity_id,
+                             'total_amount': total, 'currency': 'USD', 'exchange_rate': 1.0,
+                             'invoice_date': invoice_date, 'due_date': invoice_date + timedelta(days=30),
+                             'status': status, 'created_at': invoice_date})
+            if status != 'paid':
+                continue
+
+            payment_date = invoice_date + timedelta(days=rng.randint(0, 10))
+            if is_sale and invoice_id % 4 == 1 and entity_id not in waiting:
+                waiting[entity_id] = (invoice_id, total)
+                continue
+
+            payment_id += 1
+            transaction_id += 1
+            settled = [(invoice_id, total)]
+            if is_sale and entity_id in waiting and invoice_id % 4 != 1:
+                settled.append(waiting.pop(entity_id))
+            on_account = len(settled) > 1
+            amount = sum(value for _, value in settled)
+            payments.append({'id': payment_id, 'entity_id': entity_id, 'amount': amount, 'currency': 'USD',
+                             'exchange_rate': 1.0, 'payment_date': payment_date, 'payment_method': 'cash',
+                             'fund_id': 1 + payment_id % 2, 'invoice_id': None if on_account else invoice_id,
+                             'created_at': payment_date})
+            if on_account:
+                for settled_id, value in settled:
+                    allocation_id += 1
+                    allocations.append({'id': allocation_id, 'payment_id': payment_id, 'invoice_id': settled_id,
+                                        'amount': value, 'created_at': payment_date})
+            transactions.append({'id': transaction_id, 'fund_id': 1 + payment_id % 2,
+                                 'amount': amount if is_sale else -amount,
+                                 'transaction_type': 'deposit' if is_sale else 'withdrawal',
+                                 'description': f"Payment {payment_id}", 'reference_id': payment_id,
+                                 'reference_type': 'payment', 'created_at': payment_date})
+
+        with engine.begin() as conn:
+            conn.execute(Invoice.__table__.insert(), invoices)
+            conn.execute(InvoiceItem.__table__.insert(), lines)
+            for table, rows in ((CostOfGoodsSold, cogs), (CostLayer, layers), (Payment, payments),
+                                (PaymentAllocation, allocations), (FundTransaction, transactions)):
+                if rows:
+                    conn.execute(table.__table__.insert(), rows)
+
+        print(f"  {min(invoice_count, chunk_start + CHUNK_SIZE):,} / {invoice_count:,} invoices", end='\r', flush=True)
+    print()
+
+    # Customer invoices still waiting for a partner stay unpaid
+    if waiting:
+        with engine.begin() as conn:
+            conn.execute(Invoice.__table__.update().where(
+                Invoice.__table__.c.id.in_([invoice_id for invoice_id, _ in waiting.values()])
+            ).values(status='pending'))
+
+def comparable(value):
+    """Turn a report result into plain, rounded data for comparison"""
+    if hasattr(value, 'to_dict'):
+        value = value.to_dict('records')
+    if isinstance(value, tuple):
+        return tuple(comparable(element) for element in value)
+    if isinstance(value, dict):
+        return {key: comparable(element) for key, element in value.items() if key != 'entity'}
+    if isinstance(value, list):
+        return [comparable(element) for element in value]
+    if isinstance(value, float):
+        return round(value, 4)
+    if hasattr(value, '__dataclass_fields__'):
+        return repr(value)
+    return value
+
+def run_reports(calls, runs):
+    """Time each report (mean of runs, analytics cache cleared) and keep its result"""
+    from database.db_setup import session
+    from controllers.report_controller import ReportController
+
+    timings, results = {}, {}
+    for name, function in calls:
+        results[name] = comparable(function())  # Warm up (statement snapshots, page cache)
+        session.remove()
+        elapsed = 0.0
+        for _ in range(runs):
+            ReportController.invalidate_analytics()
+            started = time.perf_counter()
+            function()
+            elapsed += time.perf_counter() - started
+            session.remove()
+        timings[name] = elapsed / runs
+    return timings, results
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure report latency before and after archiving closed months')
+    parser.add_argument('--invoices', type=int, default=200000, help='Invoices over five years (default: 200000)')
+    parser.add_argument('--keep-months', type=int, default=12, help='Months kept hot (default: 12)')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per report (default: 5)')
+    args = parser.parse_args()
+
+    from sqlalchemy import select, func
+    from database.db_setup import init_db, engine, session
+    init_db()
+
+    from models.invoice import Invoice, InvoiceItem
+    from models.archive import invoices_archive, invoice_items_archive
+    from controllers.report_controller import ReportController
+    from controllers.statement_controller import StatementController
+    from controllers.fund_controller import FundController
+    from controllers.archive_controller import ArchiveController
+
+    now = datetime.utcnow()
+    current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    first_date = current_month.replace(year=current_month.year - YEARS)
+
+    print(f"Generating {args.invoices:,} invoices ({args.invoices * LINES_PER_INVOICE:,} lines) "
+          f"from {first_date:%Y-%m} to now")
+    started = time.perf_counter()
+    populate(engine, args.invoices, first_date, now)
+    print(f"Generated in {time.perf_counter() - started:.1f} s")
+
+    reports = ReportController()
+    statements = StatementController()
+    funds = FundController()
+    month_ago, year_ago = now - timedelta(days=30), now - timedelta(days=365)
+    customer_id = SUPPLIERS + 1
+
+    calls = [
+        ('financial summary, 30 days', lambda: reports.get_financial_summary(month_ago, now)),
+        ('item performance, 30 days', lambda: reports.get_item_performance(month_ago, now, limit=20)),
+        ('sales/purchases by month, 1 year', lambda: reports.generate_sales_purchases_chart(year_ago, now, 'month')),
+        ('statement, 30 days', lambda: statements.get_statement(customer_id, month_ago)),
+        ('fund feed, first page', lambda: funds.get_transaction_feed(limit=50)),
+        ('aging', lambda: reports.generate_aging_report(as_of=now)),
+        ('financial summary, 5 years', lambda: reports.get_financial_summary(first_date, now)),
+        ('statement, 5 years', lambda: statements.get_statement(customer_id, first_date)),
+    ]
+
+    before_timings, before_results = run_reports(calls, args.runs)
+
+    started = time.perf_counter()
+    success, summary = ArchiveController().archive(keep_months=args.keep_months)
+    if not success:
+        raise RuntimeError(summary)
+    archived = time.perf_counter() - started
+    session.remove()
+
+    hot = session.execute(select(func.count()).select_from(Invoice)).scalar()
+    hot_lines = session.execute(select(func.count()).select_from(InvoiceItem)).scalar()
+    cold = session.execute(select(func.count()).select_from(invoices_archive)).scalar()
+    cold_lines = session.execute(select(func.count()).select_from(invoice_items_archive)).scalar()
+    session.remove()
+    print(f"Archived before {summary['boundary']:%Y-%m} in {archived:.1f} s: {summary['invoices']:,} invoices, "
+          f"{summary['payments']:,} payments, {summary['fund_transactions']:,} fund transactions "
+          f"({summary['open_invoices']} open and {summary['held_back']} held back)")
+    print(f"Hot: {hot:,} invoices, {hot_lines:,} lines; archive: {cold:,} invoices, {cold_lines:,} lines")
+
+    after_timings, after_results = run_reports(calls, args.runs)
+
+    print(f"{'report':<36} {'before ms':>10} {'after ms':>10} {'same':>6}")
+    mismatches = 0
+    for name, _ in calls:
+        same = before_results[name] == after_results[name]
+        mismatches += not same
+        print(f"{name:<36} {before_timings[name] * 1000:>10.1f} {after_timings[name] * 1000:>10.1f} "
+              f"{'yes' if same else 'NO':>6}")
+
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Audit log benchmark for ASSI Warehouse Management System
+
+Creates sale invoices with many lines and records payments against them
+in a temporary SQLite database, in three modes taken in turn: auditing
+off, auditing with the background writer, and auditing with a wait for
+each operation's entries to be written (what writing them in the
+request would cost). Reports the latency percentiles of create_invoice
+and record_payment per mode, then the writer's throughput draining a
+backlog of entries.
+
+Usage:
+    python benchmarks/audit_log.py [--operations N] [--lines N] [--backlog N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'audit_log.db')}")
+
+MODES = ('off', 'background', 'synchronous')
+
+def percentile(latencies, p):
+    """Latency (ms) at a percentile of a sorted list"""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the request latency added by the audit log')
+    parser.add_argument('--operations', type=int, default=300, help='Invoices and payments per mode (default: 300)')
+    parser.add_argument('--lines', type=int, default=10, help='Lines per invoice (default: 10)')
+    parser.add_argument('--backlog', type=int, default=100000, help='Entries for the throughput test (default: 100000)')
+    args = parser.parse_args()
+
+    from sqlalchemy import select, func
+    from database.db_setup import init_db, session
+    init_db()
+
+    import database.audit as audit
+    from models.audit import AuditLog
+    from controllers.item_controller import ItemController
+    from controllers.warehouse_controller import WarehouseController
+    from controllers.supplier_customer_controller import SupplierCustomerController
+    from controllers.fund_controller import FundController
+    from controllers.invoice_controller import InvoiceController
+
+    _, warehouse = WarehouseController().create_warehouse('Main')
+    items = [ItemController().create_item(f"Item {i}", 'bag', 'kg', 50, 10, 12)[1] for i in range(args.lines)]
+    _, supplier = SupplierCustomerController().create_entity('Supplier', 'supplier')
+    _, customer = SupplierCustomerController().create_entity('Customer', 'customer')
+    _, fund = FundController().create_fund('Cash', initial_balance=1000000)
+    item_ids = [item.id for item in items]
+    warehouse_id, supplier_id, customer_id, fund_id = warehouse.id, supplier.id, customer.id, fund.id
+
+    invoices = InvoiceController()
+    success, result = invoices.create_invoice(
+        'purchase', supplier_id,
+        [{'item_id': item_id, 'quantity': 1000000, 'unit': 'bag', 'price_per_unit': 10} for item_id in item_ids],
+        warehouse_id
+    )
+    if not success:
+        raise RuntimeError(result)
+    session.remove()
+    audit.flush_audit_log()
+
+    interval = audit.audit_writer.interval
+    latencies = {(mode, operation): [] for mode in MODES for operation in ('create_invoice', 'record_payment')}
+    lines = [{'item_id': item_id, 'quantity': 1, 'unit': 'bag', 'price_per_unit': 12} for item_id in item_ids]
+
+    # Interleave the modes so drift (a growing database) affects them alike
+    for n in range(args.operations * len(MODES)):
+        mode = MODES[n % len(MODES)]
+        audit.AUDIT_ENABLED = mode != 'off'
+        audit.audit_writer.interval = 0 if mode == 'synchronous' else interval
+        if mode == 'synchronous':
+            # Do not time the wait for the background mode's batch
+            audit.flush_audit_log()
+
+        started = time.perf_counter()
+        success, invoice = invoices.create_invoice('sale', customer_id, lines, warehouse_id)
+        if mode == 'synchronous':
+            audit.flush_audit_log()
+        latencies[(mode, 'create_invoice')].append(time.perf_counter() - started)
+        if not success:
+            raise RuntimeError(invoice)
+        invoice_id = invoice.id
+        session.remove()
+
+        started = time.perf_counter()
+        success, result = invoices.record_payment(invoice_id, 5, fund_id=fund_id)
+        if mode == 'synchronous':
+            audit.flush_audit_log()
+        latencies[(mode, 'record_payment')].append(time.perf_counter() - started)
+        if not success:
+            raise RuntimeError(result)
+        session.remove()
+
+    audit.AUDIT_ENABLED = True
+    audit.audit_writer.interval = interval
+    audit.flush_audit_log()
+
+    print(f"{args.operations} operations per mode, {args.lines} lines per invoice")
+    print(f"{'operation':<16} {'audit':<12} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for (mode, operation), times in sorted(latencies.items(), key=lambda entry: (entry[0][1], MODES.index(entry[0][0]))):
+        times.sort()
+        print(f"{operation:<16} {mode:<12} {percentile(times, 0.5):>8.2f} {percentile(times, 0.99):>8.2f} "
+              f"{sum(times) / len(times) * 1000:>8.2f}")
+
+    logged = session.execute(select(func.count()).select_from(AuditLog)).scalar()
+    session.remove()
+    print(f"Audit log: {logged} entries, writer {audit.audit_stats()}")
+
+    entries = [{'table_name': 'items', 'entity_id': str(n), 'action': 'update',
+                'changes': {'selling_price': [12, 13]}, 'user_id': 1, 'created_at': audit.datetime.utcnow()}
+               for n in range(args.backlog)]
+    written = audit.audit_writer.written
+    started = time.perf_counter()
+    audit.audit_writer.submit(entries)
+    queued = time.perf_counter() - started
+    audit.flush_audit_log()
+    elapsed = time.perf_counter() - started
+    print(f"Backlog: {args.backlog} entries queued in {queued * 1000:.0f} ms, "
+          f"{audit.audit_writer.written - written} written in {elapsed:.2f} s "
+          f"({(audit.audit_writer.written - written) / elapsed:.0f} per second)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Barcode lookup benchmark for ASSI Warehouse Management System
+
+Bulk-inserts items with a SKU and two barcodes each into a temporary
+SQLite database, times loading the code index, then scans barcodes of a
+hot set of items (the ones on the shelves being worked) through the
+/api/items/by-barcode endpoint: first from one thread, then from many
+threads at once. Reports latency percentiles and throughput, and for
+comparison the time of the old way of finding an item by a code, which
+downloads the whole catalog from /api/items.
+
+Usage:
+    python benchmarks/barcode_lookup.py [--items N] [--hot N] [--threads N] [--lookups N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'barcode_lookup.db')}")
+
+INSERT_BATCH = 10000
+
+def populate(items):
+    """Insert items with SKU-<id> and barcodes 20<id> and 21<id>"""
+    from database.db_setup import engine
+    from models.item import Item, ItemBarcode
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        for offset in range(0, items, INSERT_BATCH):
+            ids = range(offset + 1, min(offset + INSERT_BATCH, items) + 1)
+            connection.execute(Item.__table__.insert(), [
+                {'id': i, 'name': f"Item {i}", 'sku': f"SKU-{i}", 'main_unit': 'bag', 'sub_unit': 'kg',
+                 'conversion_rate': 50, 'purchase_price': 10, 'selling_price': 12, 'is_active': True} for i in ids
+            ])
+            connection.execute(ItemBarcode.__table__.insert(), [
+                {'item_id': i, 'code': f"{prefix}{i:010d}", 'created_at': now} for i in ids for prefix in (20, 21)
+            ])
+
+def logged_in_client(app):
+    """Get a test client with a logged-in session"""
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = 1
+    return client
+
+def report(label, latencies, elapsed):
+    """Print latency percentiles (ms) and throughput of a set of lookups"""
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{label:<26} {len(latencies):>8} {percentile(0.5):>8.3f} {percentile(0.99):>8.3f} "
+          f"{latencies[-1] * 1000:>8.2f} {len(latencies) / elapsed:>10.0f}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Time barcode scans against the in-process code index')
+    parser.add_argument('--items', type=int, default=50000, help='Items in the catalog (default: 50000)')
+    parser.add_argument('--hot', type=int, default=500, help='Items being scanned (default: 500)')
+    parser.add_argument('--threads', type=int, default=1000, help='Threads scanning at once (default: 1000)')
+    parser.add_argument('--lookups', type=int, default=20, help='Scans per thread (default: 20)')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db, session, QueryCounter
+    init_db()
+
+    started = time.perf_counter()
+    populate(args.items)
+    print(f"Inserted {args.items} items with {args.items * 2} barcodes in {time.perf_counter() - started:.1f} s")
+
+    from web_app import app
+    from database.identity_cache import item_code_index, cache_stats
+
+    item_code_index.invalidate()
+    started = time.perf_counter()
+    entries = len(item_code_index.warm())
+    print(f"Code index: {entries} codes loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    hot = random.Random(1).sample(range(1, args.items + 1), min(args.hot, args.items))
+    codes = [f"{prefix}{item_id:010d}" for item_id in hot for prefix in (20, 21)]
+
+    client = logged_in_client(app)
+    for code in codes:
+        # Load the hot items' snapshots
+        client.get(f"/api/items/by-barcode/{code}")
+
+    print(f"{'scans':<26} {'lookups':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'per sec':>10}")
+
+    latencies = []
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        for code in codes:
+            scan_started = time.perf_counter()
+            response = client.get(f"/api/items/by-barcode/{code}")
+            latencies.append(time.perf_counter() - scan_started)
+            assert response.status_code == 200
+    report('Endpoint, 1 thread', latencies, time.perf_counter() - started)
+    print(f"  {counter.count} queries")
+
+    latencies = []
+    started = time.perf_counter()
+    for code in codes:
+        scan_started = time.perf_counter()
+        item_code_index.get(code)
+        latencies.append(time.perf_counter() - scan_started)
+    report('Index only, 1 thread', latencies, time.perf_counter() - started)
+
+    results = []
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(args.threads + 1)
+
+    def scanner(seed):
+        scanner_client = logged_in_client(app)
+        picks = random.Random(seed).choices(codes, k=args.lookups)
+        own = []
+        barrier.wait()
+        for code in picks:
+            scan_started = time.perf_counter()
+            scanner_client.get(f"/api/items/by-barcode/{code}")
+            own.append(time.perf_counter() - scan_started)
+        session.remove()
+        with results_lock:
+            results.extend(own)
+
+    threads = [threading.Thread(target=scanner, args=(seed,)) for seed in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    report(f"Endpoint, {args.threads} threads", results, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    catalog = client.get('/api/items').get_json()
+    found = next(item for item in catalog if item['name'] == f"Item {hot[0]}")
+    print(f"Old way (download /api/items, match by name): {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"for {len(catalog)} items ({found['id']})")
+    print(f"Cache stats: {cache_stats()['item_codes']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Identity cache benchmark for ASSI Warehouse Management System
+
+Creates purchase and sale invoices with many lines in a temporary SQLite
+database and reports the time and queries per invoice, then the hit rate
+of the item, warehouse and fund snapshot caches. Run once with and once
+with --no-cache (IDENTITY_CACHE_SIZE=0) to compare.
+
+Usage:
+    python benchmarks/identity_cache.py [--invoices N] [--lines N] [--no-cache]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'identity_cache.db')}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure queries per invoice with and without the identity cache')
+    parser.add_argument('--invoices', type=int, default=200, help='Invoices to create (default: 200)')
+    parser.add_argument('--lines', type=int, default=20, help='Lines per invoice (default: 20)')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the identity cache')
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ['IDENTITY_CACHE_SIZE'] = '0'
+
+    from database.db_setup import init_db, QueryCounter
+    init_db()
+
+    from controllers.item_controller import ItemController
+    from controllers.warehouse_controller import WarehouseController
+    from controllers.supplier_customer_controller import SupplierCustomerController
+    from controllers.invoice_controller import InvoiceController
+    from database.identity_cache import cache_stats
+
+    _, warehouse = WarehouseController().create_warehouse('Main')
+    items = [ItemController().create_item(f"Item {i}", 'bag', 'kg', 50, 10, 12)[1] for i in range(args.lines)]
+    _, supplier = SupplierCustomerController().create_entity('Supplier', 'supplier')
+    _, customer = SupplierCustomerController().create_entity('Customer', 'customer')
+
+    invoices = InvoiceController()
+    start = datetime(2025, 1, 1)
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        for i in range(args.invoices):
+            invoice_type, entity, quantity = ('purchase', supplier, 10) if i % 2 == 0 else ('sale', customer, 2)
+            success, result = invoices.create_invoice(
+                invoice_type, entity.id,
+                [{'item_id': item.id, 'quantity': quantity, 'unit': 'bag', 'price_per_unit': 10} for item in items],
+                warehouse.id, invoice_date=start + timedelta(hours=i)
+            )
+            if not success:
+                raise RuntimeError(result)
+    elapsed = time.perf_counter() - started
+
+    print(f"Identity cache {'disabled' if args.no_cache else 'enabled'}: {args.invoices} invoices x {args.lines} lines")
+    print(f"  {elapsed / args.invoices * 1000:.1f} ms and {counter.count / args.invoices:.1f} queries per invoice")
+    for name, stats in cache_stats().items():
+        print(f"  {name:<11} hit rate {stats['hit_rate']:>6.1%}  ({stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['entries']} entries)")
+
+if __name__ == '__main__':
+    main()
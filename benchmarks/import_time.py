@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cold-start import benchmark for ASSI Warehouse Management System
+
+Imports web_app in fresh interpreters and fails (exit code 1) if the
+median import time exceeds the budget or if the analytics stack
+(pandas/matplotlib) is loaded at import time.
+
+Usage:
+    python benchmarks/import_time.py [--budget SECONDS] [--runs N]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just by loading the web application
+HEAVY_MODULES = ['pandas', 'matplotlib', 'numpy', 'PIL']
+
+PROBE = """
+import sys, time, json, resource
+start = time.perf_counter()
+import web_app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+def run_probe():
+    """Import web_app in a fresh interpreter and return its measurements"""
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold import time of web_app')
+    parser.add_argument('--budget', type=float,
+                        default=float(os.environ.get('IMPORT_TIME_BUDGET', '1.0')),
+                        help='Maximum median import time in seconds (default: 1.0)')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts (default: 5)')
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    median = statistics.median(sample['seconds'] for sample in samples)
+    rss_mb = max(sample['max_rss_kb'] for sample in samples) / 1024
+    heavy = sorted({name for sample in samples for name in sample['heavy']})
+
+    print(f"web_app cold import: median {median * 1000:.0f} ms over {args.runs} runs "
+          f"(budget {args.budget * 1000:.0f} ms), peak RSS {rss_mb:.1f} MB")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if median > args.budget:
+        print("FAIL: import time exceeds budget")
+        failed = True
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Concurrent invoice numbering check for ASSI Warehouse Management System
+
+Generates invoice numbers from several processes at once through the
+block-reservation allocator and verifies that no number is handed out
+twice and that every reserved block is used without gaps. Exits non-zero
+on failure.
+
+Uses DATABASE_URL if set, otherwise a temporary SQLite file.
+
+Usage:
+    python benchmarks/invoice_numbers.py [--total N] [--processes N] [--block-size N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'numbering.db')
+
+from database.db_setup import engine, Base
+from controllers.invoice_numbering import InvoiceNumberAllocator
+
+BENCH_YEAR = 1999  # Keeps benchmark counters apart from real invoice years
+
+def worker(args):
+    """Allocate numbers in a child process and return them in order"""
+    count, block_size, invoice_type = args
+    engine.dispose(close=False)  # Never share the parent's pooled connections
+    allocator = InvoiceNumberAllocator(block_size=block_size)
+    return [allocator.next_value(invoice_type, BENCH_YEAR) for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check invoice numbering under concurrency')
+    parser.add_argument('--total', type=int, default=100000, help='Numbers to generate (default: 100000)')
+    parser.add_argument('--processes', type=int, default=8, help='Worker processes (default: 8)')
+    parser.add_argument('--block-size', type=int, default=50, help='Numbers per reserved block (default: 50)')
+    parser.add_argument('--type', default='bench', help='Invoice type used for the counter (default: bench)')
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables['invoice_sequences']])
+    start_counter = InvoiceNumberAllocator().peek_counter(args.type, BENCH_YEAR) or 1
+
+    per_process = args.total // args.processes
+    started = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(args.processes) as pool:
+        results = pool.map(worker, [(per_process, args.block_size, args.type)] * args.processes)
+    elapsed = time.perf_counter() - started
+
+    values = [value for result in results for value in result]
+    duplicates = len(values) - len(set(values))
+
+    # Within a process, values must be consecutive inside each block
+    gaps = 0
+    for result in results:
+        for previous, current in zip(result, result[1:]):
+            if current != previous + 1 and (current - start_counter) % args.block_size != 0:
+                gaps += 1
+
+    print(f"{len(values)} numbers from {args.processes} processes in {elapsed:.2f} s "
+          f"({len(values) / elapsed:.0f}/s, block size {args.block_size})")
+    print(f"duplicates: {duplicates}, gaps inside blocks: {gaps}")
+
+    return 1 if duplicates or gaps else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Read model benchmark for ASSI Warehouse Management System
+
+Bulk-inserts invoices into a temporary SQLite database and loads all of
+them three ways: as mapped Invoice objects (get_all_invoices), as Core
+rows from the same select used by the read model, and as InvoiceRow
+objects (get_invoice_rows). Reports load time and the peak memory
+allocated while loading, each measured in a separate pass because
+tracemalloc slows allocation down.
+
+Usage:
+    python benchmarks/read_models.py [--rows N] [--repeat N]
+"""
+
+import gc
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'read_models.db')}")
+
+BATCH_SIZE = 50000
+
+def populate(rows):
+    """Insert a supplier, a customer and the given number of invoices"""
+    from database.db_setup import engine
+    from models.invoice import Invoice
+    from models.supplier_customer import SupplierCustomer
+
+    start = datetime(2020, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(SupplierCustomer.__table__.insert(), [
+            {'id': 1, 'name': 'Supplier', 'type': 'supplier', 'balance': 0.0},
+            {'id': 2, 'name': 'Customer', 'type': 'customer', 'balance': 0.0},
+        ])
+        for offset in range(0, rows, BATCH_SIZE):
+            batch = []
+            for i in range(offset, min(offset + BATCH_SIZE, rows)):
+                invoice_type = 'sale' if i % 2 else 'purchase'
+                batch.append({
+                    'invoice_number': f"{invoice_type[0].upper()}-{i:08d}",
+                    'type': invoice_type,
+                    'entity_id': 2 if i % 2 else 1,
+                    'total_amount': float(i % 1000),
+                    'currency': 'USD',
+                    'exchange_rate': 1.0,
+                    'invoice_date': start + timedelta(minutes=i),
+                    'status': 'pending',
+                })
+            connection.execute(Invoice.__table__.insert(), batch)
+
+def load_objects():
+    """Load mapped Invoice objects"""
+    from controllers.invoice_controller import InvoiceController
+    return InvoiceController().get_all_invoices(limit=None)
+
+def load_core_rows():
+    """Load Core rows with the read model's columns"""
+    from database.db_setup import session
+    from models.invoice import Invoice
+    from models.supplier_customer import SupplierCustomer
+    from sqlalchemy import select
+
+    query = select(
+        Invoice.id, Invoice.invoice_number, Invoice.type, Invoice.entity_id,
+        SupplierCustomer.name.label('entity_name'), Invoice.total_amount, Invoice.currency,
+        Invoice.exchange_rate, Invoice.invoice_date, Invoice.due_date, Invoice.status
+    ).join(SupplierCustomer, SupplierCustomer.id == Invoice.entity_id).order_by(Invoice.invoice_date.desc())
+    return session.execute(query).all()
+
+def load_read_model():
+    """Load InvoiceRow objects"""
+    from controllers.invoice_controller import InvoiceController
+    return InvoiceController().get_invoice_rows(limit=None)
+
+def measure(loader, repeat):
+    """Run a loader; return (best seconds, peak MB, rows)"""
+    from database.db_setup import session
+
+    best = None
+    for _ in range(repeat):
+        session.remove()
+        gc.collect()
+        started = time.perf_counter()
+        result = loader()
+        elapsed = time.perf_counter() - started
+        count = len(result)
+        del result
+        best = elapsed if best is None else min(best, elapsed)
+
+    session.remove()
+    gc.collect()
+    tracemalloc.start()
+    result = loader()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    session.remove()
+    return best, peak / (1024 * 1024), count
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ORM objects with lightweight rows on a large read')
+    parser.add_argument('--rows', type=int, default=1000000, help='Invoices to insert (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per loader; the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db
+    init_db()
+
+    started = time.perf_counter()
+    populate(args.rows)
+    print(f"Inserted {args.rows} invoices in {time.perf_counter() - started:.1f} s")
+
+    print(f"{'loader':<22} {'rows':>9} {'seconds':>8} {'rows/s':>10} {'peak MB':>9}")
+    for label, loader in (('ORM objects', load_objects),
+                          ('Core rows', load_core_rows),
+                          ('InvoiceRow', load_read_model)):
+        elapsed, peak, count = measure(loader, args.repeat)
+        print(f"{label:<22} {count:>9} {elapsed:>8.2f} {count / elapsed:>10.0f} {peak:>9.1f}", flush=True)
+
+if __name__ == '__main__':
+    main()
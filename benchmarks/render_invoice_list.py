@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Invoice list rendering benchmark for ASSI Warehouse Management System
+
+Renders templates/invoices/list.html with synthetic invoices in English
+and Arabic, once with a cold fragment cache and then warm, and reports
+the mean render time per language.
+
+Usage:
+    python benchmarks/render_invoice_list.py [--invoices N] [--renders N]
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import render_template
+
+from web_app import app
+from utils.fragment_cache import clear_fragment_cache
+from utils.language import set_request_language
+
+def make_invoices(count):
+    """Build lightweight invoice stand-ins with the attributes the template uses"""
+    invoices = []
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        total = 100.0 + i
+        paid = total / 2 if i % 3 == 0 else 0.0
+        invoices.append(SimpleNamespace(
+            id=i + 1,
+            invoice_number=f"S-2025-{i + 1:06d}",
+            invoice_date=start + timedelta(hours=i),
+            type='sale' if i % 2 else 'purchase',
+            status=['pending', 'paid', 'partially_paid', 'cancelled'][i % 4],
+            entity_id=i % 50 + 1,
+            entity=SimpleNamespace(name=f"Customer {i % 50 + 1}"),
+            currency='USD',
+            total_amount=total,
+            calculate_paid_amount=lambda paid=paid: paid,
+            calculate_remaining_amount=lambda total=total, paid=paid: total - paid
+        ))
+    return invoices
+
+def render_once(lang_code, context):
+    """Render the invoice list for one language and return elapsed seconds"""
+    with app.test_request_context('/invoices'):
+        from flask import session
+        session['user_id'] = 1
+        session['username'] = 'admin'
+        set_request_language(lang_code)
+        start = time.perf_counter()
+        render_template('invoices/list.html', **context)
+        return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark invoice list rendering per language')
+    parser.add_argument('--invoices', type=int, default=100, help='Invoices per page (default: 100)')
+    parser.add_argument('--renders', type=int, default=200, help='Renders per language (default: 200)')
+    args = parser.parse_args()
+
+    context = {
+        'invoices': make_invoices(args.invoices),
+        'entities': [SimpleNamespace(id=i, name=f"Customer {i}") for i in range(1, 51)],
+        'funds': [SimpleNamespace(id=1, name='Main', currency='USD', balance=1000.0)],
+    }
+
+    clear_fragment_cache(app.jinja_env)
+    for lang_code in ('en_US', 'ar_SA'):
+        cold = render_once(lang_code, context)
+        warm = [render_once(lang_code, context) for _ in range(args.renders)]
+        print(f"{lang_code}: cold {cold * 1000:.2f} ms, warm mean {sum(warm) / len(warm) * 1000:.2f} ms "
+              f"({args.invoices} invoices, {args.renders} renders)")
+
+if __name__ == '__main__':
+    main()
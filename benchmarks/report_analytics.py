@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Report analytics benchmark for ASSI Warehouse Management System
+
+Fills a database with synthetic sale and purchase invoice lines (half of
+the sale lines with COGS entries) and times the reports dashboard
+analytics of ReportController, cold (cache cleared) and warm.
+
+The target workload is 10 million invoice lines; generating it takes a
+while and a few GB of disk, so the default is smaller:
+
+    python benchmarks/report_analytics.py --lines 10000000 --database /tmp/analytics.db
+
+An existing database file is reused as is, so the data only has to be
+generated once.
+
+Usage:
+    python benchmarks/report_analytics.py [--lines N] [--items N] [--database PATH] [--runs N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LINES_PER_INVOICE = 5
+CHUNK_SIZE = 50000
+FIRST_DATE = datetime(2024, 1, 1)
+DAYS = 730
+
+def populate(engine, line_count, item_count):
+    """Insert synthetic items, invoices, invoice lines and COGS entries"""
+    from models.item import Item
+    from models.warehouse import Warehouse
+    from models.supplier_customer import SupplierCustomer
+    from models.invoice import Invoice, InvoiceItem
+    from models.inventory_cost import CostOfGoodsSold
+
+    rng = random.Random(42)
+    invoice_count = line_count // LINES_PER_INVOICE
+
+    with engine.begin() as conn:
+        conn.execute(Warehouse.__table__.insert(), [{'id': 1, 'name': 'Main', 'is_active': True}])
+        conn.execute(SupplierCustomer.__table__.insert(), [
+            {'id': 1, 'name': 'Supplier', 'type': 'supplier', 'balance': 0.0, 'currency': 'USD'},
+            {'id': 2, 'name': 'Customer', 'type': 'customer', 'balance': 0.0, 'currency': 'USD'},
+        ])
+        conn.execute(Item.__table__.insert(), [
+            {'id': i, 'name': f"Item {i}", 'main_unit': 'bag', 'sub_unit': 'kg', 'conversion_rate': 50.0,
+             'purchase_price': 10.0 + i % 20, 'selling_price': 15.0 + i % 20, 'is_active': True}
+            for i in range(1, item_count + 1)
+        ])
+
+    line_id = 0
+    for chunk_start in range(0, invoice_count, CHUNK_SIZE // LINES_PER_INVOICE):
+        chunk_end = min(invoice_count, chunk_start + CHUNK_SIZE // LINES_PER_INVOICE)
+        invoices, lines, cogs = [], [], []
+
+        for invoice_id in range(chunk_start + 1, chunk_end + 1):
+            is_sale = invoice_id % 3 != 0
+            invoice_date = FIRST_DATE + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+            currency, rate = ('EUR', 0.9) if invoice_id % 10 == 0 else ('USD', 1.0)
+            total = 0.0
+
+            for _ in range(LINES_PER_INVOICE):
+                line_id += 1
+                item_id = rng.randint(1, item_count)
+                unit = 'kg' if line_id % 4 == 0 else 'bag'
+                quantity = float(rng.randint(1, 20))
+                price = 15.0 + item_id % 20
+                line_total = quantity * price
+                total += line_total
+                lines.append({'id': line_id, 'invoice_id': invoice_id, 'item_id': item_id,
+                              'quantity': quantity, 'unit': unit, 'price_per_unit': price,
+                              'total_price': line_total, 'warehouse_id': 1})
+                if is_sale and line_id % 2:
+                    main_quantity = quantity / 50.0 if unit == 'kg' else quantity
+                    cost = main_quantity * (10.0 + item_id % 20)
+                    cogs.append({'invoice_id': invoice_id, 'invoice_item_id': line_id, 'item_id': item_id,
+                                 'warehouse_id': 1, 'quantity': main_quantity, 'fifo_cost': cost,
+                                 'average_cost': cost, 'issued_at': invoice_date})
+
+            invoices.append({'id': invoice_id, 'invoice_number': f"B-{invoice_id:09d}",
+                             'type': 'sale' if is_sale else 'purchase', 'entity_id': 2 if is_sale else 1,
+                             'total_amount': total, 'currency': currency, 'exchange_rate': rate,
+                             'invoice_date': invoice_date,
+                             'status': 'cancelled' if invoice_id % 50 == 0 else 'paid'})
+
+        with engine.begin() as conn:
+            conn.execute(Invoice.__table__.insert(), invoices)
+            conn.execute(InvoiceItem.__table__.insert(), lines)
+            if cogs:
+                conn.execute(CostOfGoodsSold.__table__.insert(), cogs)
+
+        print(f"  {line_id:,} / {invoice_count * LINES_PER_INVOICE:,} lines", end='\r', flush=True)
+    print()
+
+def timed(function, runs):
+    """Return (cold seconds, warm mean seconds) for an analytics call"""
+    from controllers.report_controller import ReportController
+
+    ReportController.invalidate_analytics()
+    start = time.perf_counter()
+    function()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return cold, (time.perf_counter() - start) / runs
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the reports dashboard analytics')
+    parser.add_argument('--lines', type=int, default=1000000, help='Invoice lines to generate (default: 1000000)')
+    parser.add_argument('--items', type=int, default=2000, help='Distinct items (default: 2000)')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--runs', type=int, default=20, help='Warm runs per call (default: 20)')
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(tempfile.mkdtemp(), 'analytics.db')
+    exists = os.path.exists(path)
+    os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+
+    from database.db_setup import init_db, engine
+    init_db()
+    from controllers.report_controller import ReportController
+
+    if not exists:
+        print(f"Generating {args.lines:,} invoice lines in {path}")
+        start = time.perf_counter()
+        populate(engine, args.lines, args.items)
+        print(f"Generated in {time.perf_counter() - start:.1f} s")
+
+    controller = ReportController()
+    end = FIRST_DATE + timedelta(days=DAYS)
+    month_start, year_start = end - timedelta(days=30), end - timedelta(days=365)
+
+    calls = [
+        ('top items, 30 days', lambda: controller.get_top_selling_items(month_start, end)),
+        ('top items, 1 year', lambda: controller.get_top_selling_items(year_start, end)),
+        ('item performance by month, 1 year', lambda: controller.get_item_performance(year_start, end, period='month')),
+        ('sales/purchases chart, 30 days', lambda: controller.generate_sales_purchases_chart(month_start, end)),
+        ('financial summary, 1 year', lambda: controller.get_financial_summary(year_start, end)),
+        ('inventory status', controller.get_inventory_status),
+        ('receivables/payables', controller.get_receivables_payables_summary),
+    ]
+
+    for name, function in calls:
+        cold, warm = timed(function, args.runs)
+        print(f"{name}: cold {cold * 1000:.1f} ms, warm mean {warm * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Request memory benchmark for ASSI Warehouse Management System
+
+Sends requests to the Flask app through its test client, each from a new
+thread as the threaded development server does, and prints the process
+RSS and the number of checked-out pooled connections at regular
+intervals. With request-scoped sessions both stay flat; --no-teardown
+disables the session teardown to show the previous behaviour.
+
+Usage:
+    python benchmarks/request_memory.py [--requests N] [--report-every N] [--no-teardown]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'memory.db')}")
+
+PAGES = ('/api/items', '/api/stock?warehouse_id=1', '/funds', '/dashboard', '/warehouses')
+
+def rss_mb():
+    """Get the current resident memory of this process in MB (Linux)"""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def populate():
+    """Create a warehouse, items, parties, funds and invoices to render"""
+    from controllers.item_controller import ItemController
+    from controllers.warehouse_controller import WarehouseController
+    from controllers.supplier_customer_controller import SupplierCustomerController
+    from controllers.invoice_controller import InvoiceController
+    from controllers.fund_controller import FundController
+
+    _, warehouse = WarehouseController().create_warehouse('Main')
+    items = [ItemController().create_item(f"Item {i}", 'bag', 'kg', 50, 10, 12)[1] for i in range(50)]
+    _, supplier = SupplierCustomerController().create_entity('Supplier', 'supplier')
+    _, customer = SupplierCustomerController().create_entity('Customer', 'customer')
+    FundController().create_fund('Cash', initial_balance=1000)
+
+    invoices = InvoiceController()
+    start = datetime(2025, 1, 1)
+    for day in range(40):
+        invoices.create_invoice('purchase', supplier.id,
+                                [{'item_id': item.id, 'quantity': 10, 'unit': 'bag', 'price_per_unit': 10}
+                                 for item in items[:5]],
+                                warehouse.id, invoice_date=start + timedelta(days=day))
+        invoices.create_invoice('sale', customer.id,
+                                [{'item_id': item.id, 'quantity': 2, 'unit': 'bag', 'price_per_unit': 12}
+                                 for item in items[:5]],
+                                warehouse.id, invoice_date=start + timedelta(days=day, hours=1))
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory over many requests')
+    parser.add_argument('--requests', type=int, default=100000, help='Requests to send (default: 100000)')
+    parser.add_argument('--report-every', type=int, default=10000, help='Requests between reports (default: 10000)')
+    parser.add_argument('--no-teardown', action='store_true', help='Disable the request session teardown')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db, engine, session
+    init_db()
+    populate()
+    session.remove()
+
+    from web_app import app, remove_db_session
+    if args.no_teardown:
+        app.teardown_appcontext_funcs.remove(remove_db_session)
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = 1
+        flask_session['username'] = 'admin'
+        flask_session['role'] = 'admin'
+
+    failures = []
+
+    def request(path):
+        try:
+            if client.get(path).status_code != 200:
+                failures.append(path)
+        except Exception as e:
+            failures.append(f"{path}: {e}")
+
+    started = time.perf_counter()
+    print(f"{'requests':>10} {'RSS MB':>8} {'connections':>12} {'failures':>9} {'req/s':>7}")
+    for sent in range(1, args.requests + 1):
+        worker = threading.Thread(target=request, args=(PAGES[sent % len(PAGES)],))
+        worker.start()
+        worker.join()
+
+        if sent % args.report_every == 0 or sent == args.requests:
+            elapsed = time.perf_counter() - started
+            print(f"{sent:>10} {rss_mb():>8.1f} {engine.pool.checkedout():>12} {len(failures):>9} {sent / elapsed:>7.0f}",
+                  flush=True)
+
+if __name__ == '__main__':
+    main()
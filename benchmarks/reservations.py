@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock reservation benchmark for ASSI Warehouse Management System
+
+Stocks an item with a few units in a temporary SQLite database and lets
+several threads race to reserve one unit at a time, checking that no
+more than the stock is ever held. Then bulk-inserts many expired
+reservations across many items and times the expiry sweep, reporting
+its queries and commits.
+
+Usage:
+    python benchmarks/reservations.py [--threads N] [--attempts N] [--units N]
+                                      [--expired N] [--items N] [--batch-size N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'reservations.db')}")
+
+def populate(items, units):
+    """Insert a warehouse and items with the given units of stock each"""
+    from database.db_setup import engine
+    from models.warehouse import Warehouse
+    from models.item import Item, ItemStock
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Warehouse.__table__.insert(), [{'id': 1, 'name': 'Main', 'is_active': True}])
+        connection.execute(Item.__table__.insert(), [
+            {'id': i, 'name': f"Item {i}", 'main_unit': 'bag', 'sub_unit': 'kg', 'conversion_rate': 50,
+             'purchase_price': 10, 'selling_price': 12, 'is_active': True} for i in range(1, items + 1)
+        ])
+        connection.execute(ItemStock.__table__.insert(), [
+            {'item_id': i, 'warehouse_id': 1, 'quantity': float(units), 'reserved_quantity': 0.0, 'updated_at': now}
+            for i in range(1, items + 1)
+        ])
+
+def race(threads, attempts):
+    """Reserve one unit of item 1 from many threads at once; return (held, refused, errors)"""
+    from database.db_setup import session
+    from controllers.reservation_controller import ReservationController
+
+    results = {'held': 0, 'refused': 0, 'errors': 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        controller = ReservationController()
+        start.wait()
+        for _ in range(attempts):
+            success, result = controller.reserve(1, [{'item_id': 1, 'quantity': 1}], hold_minutes=30)
+            key = 'held' if success else 'refused' if result.startswith('Insufficient') else 'errors'
+            with lock:
+                results[key] += 1
+        session.remove()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results['held'], results['refused'], results['errors']
+
+def add_expired(count, items):
+    """Insert expired reservations spread over the items, with their holds"""
+    from sqlalchemy import update, bindparam
+    from database.db_setup import engine
+    from models.item import ItemStock
+    from models.reservation import StockReservation
+
+    now = datetime.utcnow()
+    rows = [{'item_id': n % items + 1, 'warehouse_id': 1, 'quantity': 0.001, 'status': 'active',
+             'expires_at': now - timedelta(minutes=n % 60 + 1), 'created_at': now - timedelta(hours=2)}
+            for n in range(count)]
+    per_item = {}
+    for row in rows:
+        per_item[row['item_id']] = per_item.get(row['item_id'], 0.0) + row['quantity']
+
+    stocks = ItemStock.__table__
+    with engine.begin() as connection:
+        connection.execute(StockReservation.__table__.insert(), rows)
+        connection.execute(
+            update(stocks).where(stocks.c.item_id == bindparam('stock_item_id')).values(
+                reserved_quantity=stocks.c.reserved_quantity + bindparam('held')),
+            [{'stock_item_id': item_id, 'held': held} for item_id, held in per_item.items()]
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description='Race concurrent reservations and time the expiry sweep')
+    parser.add_argument('--threads', type=int, default=8, help='Threads reserving at once (default: 8)')
+    parser.add_argument('--attempts', type=int, default=10, help='Reservations tried per thread (default: 10)')
+    parser.add_argument('--units', type=int, default=20, help='Units of stock per item (default: 20)')
+    parser.add_argument('--expired', type=int, default=100000, help='Expired reservations to sweep (default: 100000)')
+    parser.add_argument('--items', type=int, default=5000, help='Items the expired reservations spread over (default: 5000)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Reservations expired per batch (default: 1000)')
+    args = parser.parse_args()
+
+    from sqlalchemy import event, select, func
+    from database.db_setup import init_db, engine, session, QueryCounter
+    init_db()
+    populate(args.items, args.units)
+
+    from models.item import ItemStock
+    from controllers.reservation_controller import ReservationController
+
+    started = time.perf_counter()
+    held, refused, errors = race(args.threads, args.attempts)
+    elapsed = time.perf_counter() - started
+    reserved = session.execute(select(ItemStock.reserved_quantity).where(ItemStock.item_id == 1)).scalar()
+    session.remove()
+    print(f"Race: {args.threads} threads x {args.attempts} attempts for {args.units} units in {elapsed:.2f} s: "
+          f"{held} held, {refused} refused, {errors} errors, reserved {reserved:g}"
+          f"{' (OVERSOLD)' if reserved > args.units else ''}")
+
+    add_expired(args.expired, args.items)
+
+    commits = []
+    def count_commit(connection):
+        commits.append(1)
+
+    event.listen(engine, 'commit', count_commit)
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        success, expired = ReservationController().expire_reservations(batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    event.remove(engine, 'commit', count_commit)
+    if not success:
+        raise RuntimeError(expired)
+
+    left = session.execute(select(func.sum(ItemStock.reserved_quantity)).where(ItemStock.item_id != 1)).scalar()
+    session.remove()
+    print(f"Sweep: {expired} expired in {elapsed:.2f} s, {counter.count} queries, {len(commits)} commits, "
+          f"{left:.6f} still reserved")
+
+if __name__ == '__main__':
+    main()
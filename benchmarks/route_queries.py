@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Route query check for ASSI Warehouse Management System
+
+Requests every GET route of the web app (with IDs and filters of sample
+data in a temporary database) with LAZY_LOAD_MODE=raise and a query
+budget, and prints the queries each route ran. Routes that lazy-load a
+relationship their queries did not plan for, exceed the budget or fail
+otherwise are listed at the end and make the script exit with status 1,
+so N+1 query regressions can be caught before they ship.
+
+Usage:
+    python benchmarks/route_queries.py [--budget N] [--verbose]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'routes.db')}")
+os.environ['LAZY_LOAD_MODE'] = 'raise'
+
+# Routes skipped because they end the session or serve files
+SKIPPED_ENDPOINTS = {'static', 'logout'}
+
+# Extra requests for routes whose interesting branch needs query arguments
+EXTRA_PATHS = (
+    '/api/stock?warehouse_id=1',
+    '/api/stock/available?warehouse_id=1&item_id=1&item_id=2',
+    '/api/stock/matrix?format=csv&warehouse_id=1&warehouse_id=2&prefix=Item',
+    '/reports/inventory?warehouse_id=1',
+    '/reports/sales?start_date=2025-01-01&end_date=2025-12-31',
+    '/invoices?type=sale',
+    '/api/funds/transactions?fund_id=1&fund_id=2',
+    '/api/search/items?q=Item',
+    '/api/search/entities?q=Cust',
+)
+
+def populate():
+    """Create warehouses, items, parties, funds, invoices, payments, expenses, a stock transfer, a count and a reservation"""
+    from controllers.item_controller import ItemController
+    from controllers.warehouse_controller import WarehouseController
+    from controllers.supplier_customer_controller import SupplierCustomerController
+    from controllers.invoice_controller import InvoiceController
+    from controllers.fund_controller import FundController
+    from controllers.expense_controller import ExpenseController
+    from controllers.stock_transfer_controller import StockTransferController
+    from controllers.stock_count_controller import StockCountController
+    from controllers.reservation_controller import ReservationController
+
+    warehouses = [WarehouseController().create_warehouse(name)[1] for name in ('Main', 'Branch')]
+    items = [ItemController().create_item(f"Item {i}", 'bag', 'kg', 50, 10, 12)[1] for i in range(20)]
+    _, supplier = SupplierCustomerController().create_entity('Supplier', 'supplier')
+    _, customer = SupplierCustomerController().create_entity('Customer', 'customer')
+    _, cash = FundController().create_fund('Cash', initial_balance=5000)
+    FundController().create_fund('Bank', currency='SYP', exchange_rate=10000, initial_balance=1000000)
+
+    invoices = InvoiceController()
+    start = datetime(2025, 1, 1)
+    for day in range(20):
+        warehouse = warehouses[day % 2]
+        invoices.create_invoice('purchase', supplier.id,
+                                [{'item_id': item.id, 'quantity': 10, 'unit': 'bag', 'price_per_unit': 10}
+                                 for item in items[:5]],
+                                warehouse.id, invoice_date=start + timedelta(days=day))
+        invoices.create_invoice('sale', customer.id,
+                                [{'item_id': item.id, 'quantity': 2, 'unit': 'bag', 'price_per_unit': 12}
+                                 for item in items[:5]],
+                                warehouse.id, invoice_date=start + timedelta(days=day, hours=1))
+
+    for day in range(5):
+        SupplierCustomerController().add_payment(customer.id, 20, fund_id=cash.id,
+                                                 payment_date=start + timedelta(days=day * 3))
+
+    expenses = ExpenseController()
+    _, category = expenses.create_category('Rent')
+    for day in range(5):
+        expenses.create_expense(category.id, 50, expense_date=start + timedelta(days=day * 4), fund_id=cash.id)
+
+    StockTransferController().create_transfer(warehouses[0].id, warehouses[1].id,
+                                              [{'item_id': item.id, 'quantity': 1} for item in items[:5]])
+
+    _, count = StockCountController().start_count(warehouses[0].id)
+    StockCountController().submit_counts(count.id, [{'item_id': item.id, 'quantity': 5} for item in items[:5]])
+
+    ReservationController().reserve(warehouses[0].id, [{'item_id': item.id, 'quantity': 1} for item in items[:3]],
+                                    reference='Q-1', entity_id=customer.id)
+
+def route_paths(app):
+    """Get a path for every GET route, filling URL arguments with ID 1"""
+    paths = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        with app.test_request_context():
+            from flask import url_for
+            paths.append(url_for(rule.endpoint, **{argument: 1 for argument in rule.arguments}))
+    return sorted(paths) + list(EXTRA_PATHS)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check every GET route for unplanned lazy loads and query counts')
+    parser.add_argument('--budget', type=int, default=25, help='Maximum queries per request (default: 25)')
+    parser.add_argument('--verbose', action='store_true', help='Print the statements of every route')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db, session, QueryCounter
+    init_db()
+    populate()
+    session.remove()
+
+    from web_app import app
+    app.config['TESTING'] = True
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = 1
+        flask_session['username'] = 'admin'
+        flask_session['role'] = 'admin'
+
+    failures = []
+    print(f"{'route':<60} {'status':>6} {'queries':>8}")
+    for path in route_paths(app):
+        with QueryCounter() as counter:
+            try:
+                status = client.get(path).status_code
+                error = None if status < 500 else f"HTTP {status}"
+            except Exception as e:
+                status, error = 'error', f"{type(e).__name__}: {e}"
+
+        if error is None and counter.count > args.budget:
+            error = f"{counter.count} queries (budget {args.budget})"
+        if error:
+            failures.append((path, error))
+
+        print(f"{path:<60} {status:>6} {counter.count:>8}")
+        if args.verbose or (error and counter.count > args.budget):
+            for statement in counter.statements:
+                print(f"    {' '.join(statement.split())[:160]}")
+
+    if failures:
+        print(f"\n{len(failures)} route(s) failed:")
+        for path, error in failures:
+            print(f"  {path}: {error.splitlines()[0]}")
+        return 1
+
+    print('\nAll routes passed')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
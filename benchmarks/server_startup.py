@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Production server startup and memory benchmark for ASSI Warehouse Management System
+
+Starts `manage.py serve` twice on the same database, first with the schema
+missing and then with it current, and reports the time until the server
+answers. After sending requests to warm the workers, it reports resident
+(RSS) and private memory of the master and each worker. Memory figures
+are read from /proc, so this runs on Linux only.
+
+Usage:
+    python benchmarks/server_startup.py [--workers N] [--requests N] [--database PATH] [--asgi]
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    """Get an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(url, process, timeout=60):
+    """Poll a URL until it answers; return the elapsed seconds"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.02)
+    raise RuntimeError('Server did not start in time')
+
+def memory_kb(pid):
+    """Get (RSS, private) memory of a process in kB"""
+    rss = private = 0
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            name, _, value = line.partition(':')
+            if name == 'Rss':
+                rss = int(value.split()[0])
+            elif name in ('Private_Clean', 'Private_Dirty'):
+                private += int(value.split()[0])
+    return rss, private
+
+def child_pids(pid):
+    """Get the IDs of a process's direct children"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+def start_server(database_url, port, workers, asgi):
+    """Start manage.py serve and return the process"""
+    command = [sys.executable, os.path.join(ROOT, 'manage.py'), 'serve',
+               '--bind', f"127.0.0.1:{port}", '--workers', str(workers)]
+    if asgi:
+        command.append('--asgi')
+    env = dict(os.environ, DATABASE_URL=database_url)
+    return subprocess.Popen(command, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def stop_server(process):
+    """Shut a server down gracefully"""
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure production server startup time and worker memory')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes (default: 4)')
+    parser.add_argument('--requests', type=int, default=200, help='Warm-up requests before measuring memory (default: 200)')
+    parser.add_argument('--database', help='SQLite file to use (default: a new temporary file)')
+    parser.add_argument('--asgi', action='store_true', help='Serve the ASGI application')
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(tempfile.mkdtemp(), 'server.db')
+    database_url = f"sqlite:///{path}"
+
+    for label in ('schema setup', 'schema current'):
+        port = free_port()
+        process = start_server(database_url, port, args.workers, args.asgi)
+        try:
+            elapsed = wait_until_ready(f"http://127.0.0.1:{port}/login", process)
+            print(f"Startup ({label}): {elapsed:.2f} s until first response")
+        finally:
+            if label == 'schema setup':
+                stop_server(process)
+
+    try:
+        for i in range(args.requests):
+            for page in ('/login', '/api/items'):
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{page}").read()
+
+        rss, private = memory_kb(process.pid)
+        print(f"Master: RSS {rss / 1024:.1f} MB, private {private / 1024:.1f} MB")
+        for pid in child_pids(process.pid):
+            rss, private = memory_kb(pid)
+            print(f"Worker {pid}: RSS {rss / 1024:.1f} MB, private {private / 1024:.1f} MB")
+    finally:
+        stop_server(process)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock API load test for ASSI Warehouse Management System
+
+Sends GET requests from many concurrent keep-alive connections to the
+stock and catalog endpoints of one or more running servers and reports
+requests per second and latency percentiles for each. Requests carry a
+session cookie for user 1 signed with the Flask app's secret key, so the
+servers must use the same SECRET_KEY.
+
+Start the servers to compare, for example:
+
+    python main.py                                                 # Flask, port 5000
+    uvicorn async_api:application --port 8000 --workers 1          # async read API
+
+then run:
+
+    python benchmarks/stock_api_load.py --server http://127.0.0.1:5000 \\
+        --server http://127.0.0.1:8000 --concurrency 200 --requests 20000
+
+Usage:
+    python benchmarks/stock_api_load.py --server URL [--server URL ...]
+        [--path PATH ...] [--concurrency N] [--requests N] [--timeout SECONDS]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+DEFAULT_PATHS = ('/api/stock?warehouse_id=1', '/api/items')
+
+def session_cookie():
+    """Build a Flask session cookie for a logged-in admin"""
+    from web_app import app
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    value = serializer.dumps({'user_id': 1, 'username': 'admin', 'role': 'admin'})
+    return f"{app.config['SESSION_COOKIE_NAME']}={value}"
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response and return (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+
+    length, keep_alive, chunked = 0, True, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value != 'close'
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    elif not keep_alive:
+        await reader.read()
+
+    if status_line.startswith(b'HTTP/1.0'):
+        keep_alive = False
+    return status, keep_alive
+
+async def worker(host, port, requests, latencies, errors, paths, cookie, counter, timeout):
+    """Send requests over one connection, reconnecting when the server closes it"""
+    reader = writer = None
+    while True:
+        index = counter[0]
+        if index >= requests:
+            break
+        counter[0] += 1
+        path = paths[index % len(paths)]
+
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                   f"Cookie: {cookie}\r\nConnection: keep-alive\r\n\r\n").encode('latin-1')
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError, IndexError):
+            errors.append('connection')
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+async def run_load(url, paths, concurrency, requests, cookie, timeout):
+    """Run the load test against one server"""
+    parts = urlsplit(url)
+    latencies, errors, counter = [], [], [0]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(parts.hostname, parts.port or 80, requests, latencies, errors, paths, cookie, counter, timeout)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def percentile(fraction):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+    print(f"{url}: {len(latencies) / elapsed:.0f} req/s, p50 {percentile(0.50):.1f} ms, "
+          f"p99 {percentile(0.99):.1f} ms, {len(errors)} errors "
+          f"({len(latencies)} responses, {concurrency} connections, {elapsed:.1f} s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the stock and catalog endpoints')
+    parser.add_argument('--server', action='append', required=True, help='Base URL of a running server (repeatable)')
+    parser.add_argument('--path', action='append', help=f"Request path (repeatable; default: {', '.join(DEFAULT_PATHS)})")
+    parser.add_argument('--concurrency', type=int, default=100, help='Concurrent connections (default: 100)')
+    parser.add_argument('--requests', type=int, default=10000, help='Requests per server (default: 10000)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request counts as failed (default: 10)')
+    args = parser.parse_args()
+
+    cookie = session_cookie()
+    for url in args.server:
+        asyncio.run(run_load(url, args.path or list(DEFAULT_PATHS), args.concurrency, args.requests, cookie, args.timeout))
+
+if __name__ == '__main__':
+    main()
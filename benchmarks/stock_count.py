@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock count benchmark for ASSI Warehouse Management System
+
+Bulk-inserts items with stock and cost layers into a temporary SQLite
+database and runs a full count session: freeze the expected quantities,
+submit counted quantities in scanner-sized batches (one in ten differs),
+read the summary and first variance page, and post. Reports the time
+and queries of each step (and with --memory the peak memory allocated,
+which slows the steps down), then the time of adjusting a sample of
+items one at a time with update_stock(is_absolute=True) for comparison.
+
+Usage:
+    python benchmarks/stock_count.py [--lines N] [--batch N] [--baseline N] [--memory]
+"""
+
+import gc
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stock_count.db')}")
+
+INSERT_BATCH = 10000
+
+def populate(lines):
+    """Insert a warehouse and items with 100 units of stock in one cost layer each"""
+    from database.db_setup import engine
+    from models.warehouse import Warehouse
+    from models.item import Item, ItemStock
+    from models.inventory_cost import CostLayer, ItemCost
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Warehouse.__table__.insert(), [{'id': 1, 'name': 'Main', 'is_active': True}])
+        for offset in range(0, lines, INSERT_BATCH):
+            ids = range(offset + 1, min(offset + INSERT_BATCH, lines) + 1)
+            connection.execute(Item.__table__.insert(), [
+                {'id': i, 'name': f"Item {i}", 'main_unit': 'bag', 'sub_unit': 'kg', 'conversion_rate': 50,
+                 'purchase_price': 10, 'selling_price': 12, 'is_active': True} for i in ids
+            ])
+            connection.execute(ItemStock.__table__.insert(), [
+                {'item_id': i, 'warehouse_id': 1, 'quantity': 100.0, 'updated_at': now} for i in ids
+            ])
+            connection.execute(CostLayer.__table__.insert(), [
+                {'item_id': i, 'warehouse_id': 1, 'source_type': 'opening', 'received_at': now,
+                 'quantity': 100.0, 'remaining_quantity': 100.0, 'unit_cost': 9.5} for i in ids
+            ])
+            connection.execute(ItemCost.__table__.insert(), [
+                {'item_id': i, 'warehouse_id': 1, 'quantity': 100.0, 'fifo_value': 950.0, 'average_cost': 9.5}
+                for i in ids
+            ])
+
+def measure(label, step, memory=False):
+    """Run one step and print its time, queries and peak memory; return its result"""
+    from database.db_setup import session, QueryCounter
+
+    session.remove()
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        result = step()
+    elapsed = time.perf_counter() - started
+    peak = '-'
+    if memory:
+        peak = f"{tracemalloc.get_traced_memory()[1] / (1024 * 1024):.1f}"
+        tracemalloc.stop()
+    session.remove()
+
+    print(f"{label:<28} {elapsed:>8.2f} {counter.count:>9} {peak:>9}", flush=True)
+    return result
+
+def counted_quantity(item_id):
+    """Counted quantity of an item: one in ten differs from the expected 100"""
+    return 100.0 + (item_id % 7 - 3) if item_id % 10 == 0 else 100.0
+
+def main():
+    parser = argparse.ArgumentParser(description='Time a large count session from snapshot to posting')
+    parser.add_argument('--lines', type=int, default=50000, help='Items in the warehouse (default: 50000)')
+    parser.add_argument('--batch', type=int, default=5000, help='Counted quantities per submit (default: 5000)')
+    parser.add_argument('--baseline', type=int, default=1000,
+                        help='Items adjusted one at a time for comparison (default: 1000)')
+    parser.add_argument('--memory', action='store_true', help='Trace the peak memory of each step')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db
+    init_db()
+
+    started = time.perf_counter()
+    populate(args.lines)
+    print(f"Inserted {args.lines} items in {time.perf_counter() - started:.1f} s")
+
+    from controllers.stock_count_controller import StockCountController
+    from controllers.item_controller import ItemController
+
+    counts = StockCountController()
+
+    def check(result):
+        success, value = result
+        if not success:
+            raise RuntimeError(value)
+        return value
+
+    def submit_all():
+        for offset in range(0, args.lines, args.batch):
+            check(counts.submit_counts(count_id, [
+                {'item_id': item_id, 'quantity': counted_quantity(item_id)}
+                for item_id in range(offset + 1, min(offset + args.batch, args.lines) + 1)
+            ]))
+
+    print(f"{'step':<28} {'seconds':>8} {'queries':>9} {'peak MB':>9}")
+    count_id = measure('Start (freeze snapshot)', lambda: check(counts.start_count(1)).id, args.memory)
+    measure(f"Submit ({args.batch} per batch)", submit_all, args.memory)
+    summary = measure('Summary', lambda: check(counts.get_count_summary(count_id)), args.memory)
+    measure('First variance page', lambda: check(counts.get_variances(count_id)), args.memory)
+    measure('Post', lambda: check(counts.post_count(count_id)), args.memory)
+    print(f"  {summary['variance_lines']} variances, net value {summary['variance_value']:.2f}")
+
+    items = ItemController()
+    sample = min(args.baseline, args.lines)
+    started = time.perf_counter()
+    for item_id in range(1, sample + 1):
+        items.update_stock(item_id, 1, counted_quantity(item_id), is_absolute=True)
+    elapsed = time.perf_counter() - started
+    print(f"update_stock per item: {sample} items in {elapsed:.2f} s "
+          f"(~{elapsed / sample * args.lines:.0f} s for {args.lines})")
+
+if __name__ == '__main__':
+    main()
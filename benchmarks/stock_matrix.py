@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock matrix benchmark for ASSI Warehouse Management System
+
+Bulk-inserts items stocked in many warehouses (with cost rows for half
+of them) into a temporary SQLite database and streams the whole
+item x warehouse matrix from /api/stock/matrix as JSON lines and as CSV,
+reading the response chunk by chunk. Reports the time to the first
+chunk, the total time, the size, the queries and (with --memory, which
+slows every step down) the peak memory allocated. For comparison it
+builds the same matrix the way the inventory pages gather stock: one
+get_warehouse_stock() call per warehouse, collected in a dictionary.
+
+Usage:
+    python benchmarks/stock_matrix.py [--items N] [--warehouses N] [--memory]
+"""
+
+import gc
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stock_matrix.db')}")
+
+INSERT_BATCH = 20000
+
+def populate(items, warehouses):
+    """Insert warehouses and items stocked in every warehouse; every other item has cost rows"""
+    from database.db_setup import engine
+    from models.warehouse import Warehouse
+    from models.item import Item, ItemStock
+    from models.inventory_cost import ItemCost
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Warehouse.__table__.insert(), [
+            {'id': w, 'name': f"Warehouse {w}", 'is_active': True} for w in range(1, warehouses + 1)
+        ])
+        connection.execute(Item.__table__.insert(), [
+            {'id': i, 'name': f"Item {i}", 'sku': f"SKU-{i}", 'main_unit': 'bag', 'sub_unit': 'kg',
+             'conversion_rate': 50, 'purchase_price': 10, 'selling_price': 12, 'is_active': True}
+            for i in range(1, items + 1)
+        ])
+        stocks = []
+        costs = []
+        for i in range(1, items + 1):
+            for w in range(1, warehouses + 1):
+                quantity = float((i * 7 + w * 3) % 40)
+                stocks.append({'item_id': i, 'warehouse_id': w, 'quantity': quantity,
+                               'reserved_quantity': 0.0, 'updated_at': now})
+                if i % 2 == 0:
+                    costs.append({'item_id': i, 'warehouse_id': w, 'quantity': quantity,
+                                  'fifo_value': quantity * 9.5, 'average_cost': 9.5})
+            if len(stocks) >= INSERT_BATCH:
+                connection.execute(ItemStock.__table__.insert(), stocks)
+                stocks = []
+            if len(costs) >= INSERT_BATCH:
+                connection.execute(ItemCost.__table__.insert(), costs)
+                costs = []
+        if stocks:
+            connection.execute(ItemStock.__table__.insert(), stocks)
+        if costs:
+            connection.execute(ItemCost.__table__.insert(), costs)
+
+def measure(label, step, memory):
+    """Run one step, printing its time to first chunk, total time, bytes, queries and peak memory"""
+    from database.db_setup import session, QueryCounter
+
+    session.remove()
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        first, size = step(started)
+    elapsed = time.perf_counter() - started
+    peak = '-'
+    if memory:
+        peak = f"{tracemalloc.get_traced_memory()[1] / (1024 * 1024):.1f}"
+        tracemalloc.stop()
+    session.remove()
+
+    first = f"{first:.3f}" if first is not None else '-'
+    print(f"{label:<26} {first:>8} {elapsed:>8.2f} {size / (1024 * 1024):>8.1f} {counter.count:>8} {peak:>8}",
+          flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Time streaming the item x warehouse stock matrix')
+    parser.add_argument('--items', type=int, default=50000, help='Items (default: 50000)')
+    parser.add_argument('--warehouses', type=int, default=30, help='Warehouses (default: 30)')
+    parser.add_argument('--memory', action='store_true', help='Trace the peak memory of each step')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db
+    init_db()
+
+    started = time.perf_counter()
+    populate(args.items, args.warehouses)
+    print(f"Inserted {args.items} items x {args.warehouses} warehouses in {time.perf_counter() - started:.1f} s")
+
+    from web_app import app
+    from controllers.warehouse_controller import WarehouseController
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = 1
+
+    def stream(path):
+        def step(started):
+            response = client.get(path, buffered=False)
+            first = None
+            size = 0
+            for chunk in response.response:
+                if first is None:
+                    first = time.perf_counter() - started
+                size += len(chunk)
+            response.close()
+            return first, size
+        return step
+
+    def per_warehouse(started):
+        controller = WarehouseController()
+        matrix = {}
+        for warehouse in controller.get_all_warehouses():
+            for stock in controller.get_warehouse_stock(warehouse.id):
+                matrix.setdefault(stock.item_id, {})[warehouse.id] = (
+                    stock.quantity, stock.quantity * stock.item.purchase_price)
+        return None, 0
+
+    print(f"{'method':<26} {'first s':>8} {'total s':>8} {'MB':>8} {'queries':>8} {'peak MB':>8}")
+    measure('Matrix, JSON lines', stream('/api/stock/matrix'), args.memory)
+    measure('Matrix, CSV', stream('/api/stock/matrix?format=csv'), args.memory)
+    measure('Matrix, prefix SKU-1', stream('/api/stock/matrix?prefix=SKU-1'), args.memory)
+    measure('Per warehouse (ORM)', per_warehouse, args.memory)
+
+if __name__ == '__main__':
+    main()
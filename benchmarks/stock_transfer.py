@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock transfer benchmark for ASSI Warehouse Management System
+
+Stocks many items with cost layers in a temporary SQLite database, then
+moves them to a second warehouse two ways: one item at a time through
+the old update_stock / costing transfer path (two stock commits and one
+costing commit per item), and as a single StockTransfer document that
+is dispatched and received in one transaction. Reports the time,
+queries and commits of each.
+
+Usage:
+    python benchmarks/stock_transfer.py [--lines N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stock_transfer.db')}")
+
+def populate(lines):
+    """Create two warehouses and the given number of items with stock and two cost layers each"""
+    from database.db_setup import session
+    from controllers.item_controller import ItemController
+    from controllers.warehouse_controller import WarehouseController
+    from controllers.costing_controller import CostingController
+
+    _, source = WarehouseController().create_warehouse('Source')
+    _, destination = WarehouseController().create_warehouse('Destination')
+
+    items = ItemController()
+    costing = CostingController()
+    item_ids = []
+    start = datetime(2025, 1, 1)
+    for i in range(lines):
+        _, item = items.create_item(f"Item {i}", 'bag', 'kg', 50, 10, 12)
+        items.update_stock(item.id, source.id, 100)
+        costing.receive(item.id, source.id, 60, 9.0, received_at=start)
+        costing.receive(item.id, source.id, 40, 11.0, received_at=start + timedelta(days=30))
+        item_ids.append(item.id)
+    session.commit()
+    return source.id, destination.id, item_ids
+
+def transfer_per_item(source_id, destination_id, item_ids, quantity):
+    """Move items one at a time the way transfer_stock did before transfer documents"""
+    from database.db_setup import session
+    from controllers.item_controller import ItemController
+
+    items = ItemController()
+    for item_id in item_ids:
+        items.update_stock(item_id, source_id, -quantity)
+        items.update_stock(item_id, destination_id, quantity)
+        items.costing_controller.transfer(item_id, source_id, destination_id, quantity)
+        session.commit()
+
+def transfer_document(source_id, destination_id, item_ids, quantity):
+    """Move all items as one transfer document"""
+    from controllers.stock_transfer_controller import StockTransferController
+
+    success, result = StockTransferController().create_transfer(
+        source_id, destination_id,
+        [{'item_id': item_id, 'quantity': quantity} for item_id in item_ids],
+        receive=True
+    )
+    if not success:
+        raise RuntimeError(result)
+
+def measure(label, transfer, source_id, destination_id, item_ids, quantity):
+    """Run one transfer method and print its time, queries and commits"""
+    from sqlalchemy import event
+    from database.db_setup import engine, session, QueryCounter
+
+    commits = []
+    def count_commit(connection):
+        commits.append(1)
+
+    session.remove()
+    event.listen(engine, 'commit', count_commit)
+    started = time.perf_counter()
+    with QueryCounter() as counter:
+        transfer(source_id, destination_id, item_ids, quantity)
+    elapsed = time.perf_counter() - started
+    event.remove(engine, 'commit', count_commit)
+    session.remove()
+
+    print(f"{label:<22} {elapsed:>8.2f} {counter.count:>9} {len(commits):>8}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-item stock transfers with one transfer document')
+    parser.add_argument('--lines', type=int, default=1000, help='Items transferred (default: 1000)')
+    args = parser.parse_args()
+
+    from database.db_setup import init_db
+    init_db()
+
+    started = time.perf_counter()
+    source_id, destination_id, item_ids = populate(args.lines)
+    print(f"Stocked {args.lines} items in {time.perf_counter() - started:.1f} s")
+
+    print(f"{'method':<22} {'seconds':>8} {'queries':>9} {'commits':>8}")
+    measure('Per item', transfer_per_item, source_id, destination_id, item_ids, 20)
+    measure('Transfer document', transfer_document, source_id, destination_id, item_ids, 20)
+
+if __name__ == '__main__':
+    main()
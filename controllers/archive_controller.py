@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Archive controller for ASSI Warehouse Management System
+
+Closes months of the ledger and moves their settled documents from the
+hot tables to the archive tables (models/archive.py), so the tables that
+every posting and report touches only hold the open periods.
+
+A month is closed by a row in archived_periods. Its period_end is the
+archive boundary: only rows dated before it are ever archived. A query
+whose range starts on or after the boundary reads the hot tables alone;
+one reaching further back reads both (see ledger_tables()), the archive
+side pruned by date: by monthly partitions on PostgreSQL and by the date
+indexes on SQLite.
+
+An invoice moves with its lines, direct payments, allocations, COGS
+entries, cost layers and fulfilled reservations once it is paid or
+cancelled (before the boundary), its purchase layers are used up and its
+payments are dated before the boundary. Invoices allocated from the same on-account payment
+move together with that payment (which must be fully allocated), so the
+hot tables never hold half of a settlement. Documents still open stay hot
+and move on a later run. Fund transactions dated before the boundary move
+without conditions.
+
+Moves run in batches of whole settlements, each an INSERT ... SELECT and
+a DELETE per table in one transaction. Months are closed in a committed
+transaction before any of their rows move, so a reader that sees the old
+boundary can only miss rows of a month being archived at that moment.
+"""
+
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func, text, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, chunked, IN_CLAUSE_SIZE
+from models.invoice import Invoice, InvoiceItem
+from models.supplier_customer import Payment, PaymentAllocation
+from models.inventory_cost import CostLayer, CostOfGoodsSold
+from models.reservation import StockReservation
+from models.fund import FundTransaction
+from models.archive import ArchivedPeriod, ARCHIVE_TABLES, HOT, ARCHIVE
+from controllers.payment_allocation_controller import OPEN_STATUSES, EPSILON
+from controllers.costing_controller import QUANTITY_EPSILON
+
+# Months kept in the hot tables by default when archiving
+ARCHIVE_KEEP_MONTHS = int(os.environ.get('ARCHIVE_KEEP_MONTHS', '12'))
+
+# Invoices moved per transaction (whole settlements can exceed it)
+ARCHIVE_BATCH_SIZE = IN_CLAUSE_SIZE
+
+def _month_start(value):
+    """Get midnight on the first day of a datetime's month"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _next_month(month):
+    """Get the first day of the month after a month start"""
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+def _months_back(month, count):
+    """Get the month start count months before a month start"""
+    index = month.year * 12 + month.month - 1 - count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def archive_boundary():
+    """Get the date before which ledger rows may be archived (None if no month is closed)"""
+    return session.execute(select(func.max(ArchivedPeriod.period_end))).scalar()
+
+def ledger_tables(start=None):
+    """Get the storages holding ledger rows dated on or after start
+
+    Args:
+        start: Earliest date a query reads (datetime), or None for all history
+
+    Returns:
+        (HOT,) when the range starts at or after the archive boundary,
+        otherwise (HOT, ARCHIVE)
+    """
+    boundary = archive_boundary()
+    if boundary is None or (start is not None and start >= boundary):
+        return (HOT,)
+    return (HOT, ARCHIVE)
+
+
+class ArchiveController:
+    """Controller for closing ledger periods and moving them to the archive tables"""
+
+    def __init__(self):
+        self._partitions = set()
+
+    def get_periods(self):
+        """Get the closed months, oldest first"""
+        return session.query(ArchivedPeriod).order_by(ArchivedPeriod.period_start).all()
+
+    def close_periods(self, before):
+        """Close every month not yet closed up to (not including) a month
+
+        The first closed month is the month of the oldest hot ledger row.
+
+        Args:
+            before: First month that stays open (datetime; truncated to its month)
+
+        Returns:
+            Tuple (success, number of months closed or error message)
+        """
+        before = _month_start(before)
+        if before > _month_start(datetime.utcnow()):
+            return False, "The current month cannot be closed"
+
+        try:
+            start = archive_boundary()
+            if start is None:
+                oldest = [
+                    session.execute(select(func.min(column))).scalar()
+                    for column in (Invoice.invoice_date, Payment.payment_date, FundTransaction.created_at)
+                ]
+                oldest = [value for value in oldest if value is not None]
+                if not oldest:
+                    return True, 0
+                start = _month_start(min(oldest))
+
+            months = []
+            month = start
+            while month < before:
+                months.append(month)
+                month = _next_month(month)
+            if not months:
+                return True, 0
+
+            now = datetime.utcnow()
+            session.execute(ArchivedPeriod.__table__.insert(), [
+                {'period_start': month, 'period_end': _next_month(month), 'invoices': 0, 'payments': 0,
+                 'fund_transactions': 0, 'closed_at': now}
+                for month in months
+            ])
+            self._ensure_partitions(months)
+            session.commit()
+            return True, len(months)
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+
+    def archive(self, before=None, keep_months=ARCHIVE_KEEP_MONTHS, batch_size=ARCHIVE_BATCH_SIZE, progress=None):
+        """Close the months before a month and move their settled rows to the archive
+
+        Also moves rows of earlier closed months that have settled since
+        the last run.
+
+        Args:
+            before: First month that stays hot (datetime; default keep_months
+                    months before the current one)
+            keep_months: Months kept hot when before is not given
+            batch_size: Invoices per transaction
+            progress: Optional callable(summary) after each batch
+
+        Returns:
+            Tuple (success, summary or error message). The summary holds
+            boundary, periods_closed, invoices, payments and
+            fund_transactions moved, batches, held_back (settled invoices
+            waiting for related documents) and open_invoices (before the
+            boundary, still open).
+        """
+        if before is None:
+            before = _months_back(_month_start(datetime.utcnow()), keep_months)
+
+        success, closed = self.close_periods(before)
+        if not success:
+            return False, closed
+
+        summary = {'boundary': None, 'periods_closed': closed, 'invoices': 0, 'payments': 0,
+                   'fund_transactions': 0, 'batches': 0, 'held_back': 0, 'open_invoices': 0}
+
+        try:
+            boundary = archive_boundary()
+            summary['boundary'] = boundary
+            if boundary is None:
+                return True, summary
+
+            settlements, summary['held_back'], summary['open_invoices'] = self._find_settlements(boundary)
+
+            for invoices, payments in self._batches(settlements, batch_size):
+                moved = self._move_settlement(boundary, invoices, payments)
+                if moved:
+                    summary['invoices'] += moved['invoices']
+                    summary['payments'] += moved['payments']
+                else:
+                    summary['held_back'] += len(invoices)
+                summary['batches'] += 1
+                if progress:
+                    progress(summary)
+
+            while True:
+                moved = self._move_fund_transactions(boundary, batch_size)
+                if not moved:
+                    break
+                summary['fund_transactions'] += moved
+                summary['batches'] += 1
+                if progress:
+                    progress(summary)
+
+            return True, summary
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+
+    def _find_settlements(self, boundary):
+        """Group the hot invoices that can move into settlements
+
+        Returns:
+            Tuple (list of settlements, held back count, open count). A
+            settlement is a (dict invoice ID -> invoice date, dict on-account
+            payment ID -> payment date) that must move in one transaction.
+        """
+        settled = dict(session.execute(
+            select(Invoice.id, Invoice.invoice_date).where(
+                Invoice.invoice_date < boundary,
+                Invoice.status.notin_(OPEN_STATUSES)
+            )
+        ).all())
+        open_invoices = session.execute(
+            select(func.count()).select_from(Invoice).where(
+                Invoice.invoice_date < boundary,
+                Invoice.status.in_(OPEN_STATUSES)
+            )
+        ).scalar()
+
+        # Purchases whose stock is still on hand, and invoices paid on or after the boundary
+        blocked = set(session.execute(
+            select(CostLayer.invoice_id).where(
+                CostLayer.invoice_id.isnot(None),
+                CostLayer.remaining_quantity > QUANTITY_EPSILON
+            ).distinct()
+        ).scalars())
+        blocked.update(session.execute(
+            select(Payment.invoice_id).where(
+                Payment.invoice_id.isnot(None),
+                (Payment.payment_date.is_(None)) | (Payment.payment_date >= boundary)
+            ).distinct()
+        ).scalars())
+        # Invoices cancelled on or after the boundary (statements credit the reversal then)
+        blocked.update(session.execute(
+            select(Invoice.id).where(
+                Invoice.invoice_date < boundary,
+                Invoice.status == 'cancelled',
+                func.coalesce(Invoice.cancelled_at, Invoice.updated_at, Invoice.invoice_date) >= boundary
+            )
+        ).scalars())
+        candidates = set(settled) - blocked
+
+        # On-account payments and the invoices they were allocated to
+        allocated_to = defaultdict(set)
+        allocated = defaultdict(float)
+        for payment_id, invoice_id, amount in session.execute(
+            select(PaymentAllocation.payment_id, PaymentAllocation.invoice_id, PaymentAllocation.amount)
+        ):
+            allocated_to[payment_id].add(invoice_id)
+            allocated[payment_id] += amount
+
+        payments = {}
+        for payment_ids in chunked(allocated_to):
+            for payment_id, invoice_id, amount, payment_date in session.execute(
+                select(Payment.id, Payment.invoice_id, Payment.amount, Payment.payment_date).where(
+                    Payment.id.in_(payment_ids)
+                )
+            ):
+                closable = (invoice_id is None and payment_date is not None and payment_date < boundary
+                            and allocated[payment_id] >= amount - EPSILON)
+                payments[payment_id] = payment_date if closable else None
+
+        # Drop invoices allocated from payments that cannot move, until none is left
+        changed = True
+        while changed:
+            changed = False
+            for payment_id, invoice_ids in allocated_to.items():
+                if not invoice_ids & candidates:
+                    continue
+                if payments.get(payment_id) is None or not invoice_ids <= candidates:
+                    candidates -= invoice_ids
+                    changed = True
+
+        # Settlements: invoices connected through on-account payments (union-find)
+        parent = {invoice_id: invoice_id for invoice_id in candidates}
+
+        def root(invoice_id):
+            while parent[invoice_id] != invoice_id:
+                parent[invoice_id] = parent[parent[invoice_id]]
+                invoice_id = parent[invoice_id]
+            return invoice_id
+
+        linked_payments = defaultdict(dict)
+        for payment_id, invoice_ids in allocated_to.items():
+            if not invoice_ids <= candidates:
+                continue
+            first, *others = invoice_ids
+            for invoice_id in others:
+                parent[root(invoice_id)] = root(first)
+            linked_payments[first][payment_id] = payments[payment_id]
+
+        groups = defaultdict(lambda: ({}, {}))
+        for invoice_id in candidates:
+            groups[root(invoice_id)][0][invoice_id] = settled[invoice_id]
+        for invoice_id, group_payments in linked_payments.items():
+            groups[root(invoice_id)][1].update(group_payments)
+
+        settlements = sorted(groups.values(), key=lambda group: min(group[0].values()))
+        return settlements, len(settled) - len(candidates), open_invoices
+
+    def _batches(self, settlements, batch_size):
+        """Combine settlements, oldest first, into batches of about batch_size invoices"""
+        invoices, payments = {}, {}
+        for group_invoices, group_payments in settlements:
+            invoices.update(group_invoices)
+            payments.update(group_payments)
+            if len(invoices) >= batch_size:
+                yield invoices, payments
+                invoices, payments = {}, {}
+        if invoices:
+            yield invoices, payments
+
+    def _move_settlement(self, boundary, invoices, payments):
+        """Move a batch of settled invoices and their documents in one transaction
+
+        The invoices are locked and checked again first; a batch changed
+        since it was selected is left for the next run.
+
+        Args:
+            boundary: Archive boundary
+            invoices: Dictionary invoice ID -> invoice date
+            payments: Dictionary on-account payment ID -> payment date
+
+        Returns:
+            Dictionary with the invoices and payments moved, or None if the
+            batch was left hot
+        """
+        invoice_ids = list(invoices)
+        payment_ids = list(payments)
+
+        still_settled = session.execute(
+            select(func.count()).select_from(
+                select(Invoice.id).where(
+                    Invoice.id.in_(invoice_ids),
+                    Invoice.status.notin_(OPEN_STATUSES)
+                ).with_for_update().subquery()
+            )
+        ).scalar()
+        direct = dict(session.execute(
+            select(Payment.id, Payment.payment_date).where(Payment.invoice_id.in_(invoice_ids))
+        ).all())
+        allocations = session.execute(
+            select(PaymentAllocation.payment_id, PaymentAllocation.invoice_id).where(
+                PaymentAllocation.invoice_id.in_(invoice_ids)
+            )
+        ).all()
+        if payment_ids:
+            allocations += session.execute(
+                select(PaymentAllocation.payment_id, PaymentAllocation.invoice_id).where(
+                    PaymentAllocation.payment_id.in_(payment_ids)
+                )
+            ).all()
+
+        if (still_settled != len(invoice_ids)
+                or any(date is None or date >= boundary for date in direct.values())
+                or any(payment_id not in payments or invoice_id not in invoices
+                       for payment_id, invoice_id in allocations)):
+            session.rollback()
+            return None
+
+        months = {_month_start(date) for date in invoices.values()}
+        months.update(_month_start(date) for date in direct.values())
+        months.update(_month_start(date) for date in payments.values())
+        self._ensure_partitions(months)
+
+        self._move(PaymentAllocation, PaymentAllocation.invoice_id.in_(invoice_ids))
+        self._move(CostOfGoodsSold, CostOfGoodsSold.invoice_id.in_(invoice_ids))
+        self._move(CostLayer, CostLayer.invoice_id.in_(invoice_ids))
+        self._move(StockReservation, StockReservation.invoice_id.in_(invoice_ids))
+        self._move(InvoiceItem, InvoiceItem.invoice_id.in_(invoice_ids))
+        moved_payments = self._move(Payment, Payment.invoice_id.in_(invoice_ids))
+        for ids in chunked(payment_ids):
+            moved_payments += self._move(Payment, Payment.id.in_(ids))
+        moved_invoices = self._move(Invoice, Invoice.id.in_(invoice_ids))
+
+        counts = defaultdict(Counter)
+        for date in invoices.values():
+            counts[_month_start(date)]['invoices'] += 1
+        for date in list(direct.values()) + list(payments.values()):
+            counts[_month_start(date)]['payments'] += 1
+        self._count_moved(counts)
+
+        session.commit()
+        return {'invoices': moved_invoices, 'payments': moved_payments}
+
+    def _move_fund_transactions(self, boundary, batch_size):
+        """Move one batch of fund transactions dated before the boundary
+
+        Returns:
+            Number of transactions moved (0 when none are left)
+        """
+        rows = session.execute(
+            select(FundTransaction.id, FundTransaction.created_at).where(
+                FundTransaction.created_at < boundary
+            ).order_by(FundTransaction.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return 0
+
+        self._ensure_partitions({_month_start(created_at) for _id, created_at in rows})
+        moved = self._move(FundTransaction, FundTransaction.id.in_([row.id for row in rows]))
+
+        counts = defaultdict(Counter)
+        for _id, created_at in rows:
+            counts[_month_start(created_at)]['fund_transactions'] += 1
+        self._count_moved(counts)
+
+        session.commit()
+        return moved
+
+    def _move(self, model, condition):
+        """Copy the hot rows matching a condition to the archive table and delete them (no commit)
+
+        Returns:
+            Number of rows moved
+        """
+        archive, _date_column = ARCHIVE_TABLES[model]
+        hot = model.__table__
+
+        columns = [hot.c[column.name] for column in archive.columns if column.name in hot.c]
+        names = [column.name for column in columns]
+        query = select(*columns)
+        if 'invoice_date' not in hot.c and 'invoice_date' in archive.c:
+            # Child rows take their invoice's date
+            query = select(*columns, Invoice.invoice_date).join(Invoice, Invoice.id == hot.c.invoice_id)
+            names.append('invoice_date')
+
+        session.execute(archive.insert().from_select(names, query.where(condition)))
+        return session.execute(delete(hot).where(condition)).rowcount
+
+    def _count_moved(self, counts):
+        """Add moved row counts to their closed months (no commit)
+
+        Args:
+            counts: Dictionary month start -> Counter of invoices, payments, fund_transactions
+        """
+        table = ArchivedPeriod.__table__
+        session.execute(
+            update(table).where(table.c.period_start == bindparam('month')).values(
+                invoices=table.c.invoices + bindparam('moved_invoices'),
+                payments=table.c.payments + bindparam('moved_payments'),
+                fund_transactions=table.c.fund_transactions + bindparam('moved_fund_transactions'),
+                archived_at=datetime.utcnow()
+            ),
+            [{'month': month, 'moved_invoices': count['invoices'], 'moved_payments': count['payments'],
+              'moved_fund_transactions': count['fund_transactions']} for month, count in counts.items()]
+        )
+
+    def _ensure_partitions(self, months):
+        """Create the monthly partitions of the archive tables on PostgreSQL (no commit)"""
+        if session.get_bind().dialect.name != 'postgresql':
+            return
+
+        for month in sorted(set(months) - self._partitions):
+            for archive, _date_column in ARCHIVE_TABLES.values():
+                session.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {archive.name}_{month:%Y_%m} PARTITION OF {archive.name} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+                ))
+            self._partitions.add(month)
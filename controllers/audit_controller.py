@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Audit log controller for ASSI Warehouse Management System
+
+Reads the change history written by the audit writer (database/audit.py).
+Pages are fetched newest first with a keyset cursor on (created_at, id),
+so the history of one row (table_name + entity_id), of one user or of a
+time range is read from its index range whatever the size of the log.
+"""
+
+from sqlalchemy import select, and_, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, read_only
+from database.audit import audit_stats, flush_audit_log
+from models.audit import AuditLog
+from models.user import User
+from models.rows import AuditLogRow, fetch_rows
+from controllers.fund_controller import _parse_date, encode_feed_cursor, decode_feed_cursor
+
+
+class AuditController:
+    """Controller for the change history of the database"""
+
+    @read_only
+    def get_audit_rows(self, table_name=None, entity_id=None, user_id=None, action=None,
+                       start_date=None, end_date=None, cursor=None, limit=100):
+        """Get a page of audit log entries, newest first
+
+        Args:
+            table_name: Only changes to this table (e.g. 'invoices')
+            entity_id: Only changes to the row with this primary key (with table_name)
+            user_id: Only changes made by this user
+            action: Only this action (insert, update, delete, bulk_update, ...)
+            start_date: Earliest date (datetime or 'YYYY-MM-DD')
+            end_date: Latest date (inclusive for 'YYYY-MM-DD')
+            cursor: next_cursor of the previous page
+            limit: Entries per page
+
+        Returns:
+            Tuple (success, page or error message). The page holds entries
+            (list of AuditLogRow, changes as a JSON string) and next_cursor
+            (None on the last page).
+        """
+        try:
+            start = _parse_date(start_date)
+            end = _parse_date(end_date, end_of_day=True)
+            position = decode_feed_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return False, str(e)
+
+        if entity_id is not None and not table_name:
+            return False, "entity_id requires table_name"
+
+        limit = max(1, int(limit))
+
+        query = select(
+            AuditLog.id,
+            AuditLog.table_name,
+            AuditLog.entity_id,
+            AuditLog.action,
+            AuditLog.changes,
+            AuditLog.user_id,
+            User.username,
+            AuditLog.created_at
+        ).outerjoin(
+            User, User.id == AuditLog.user_id
+        )
+
+        if table_name:
+            query = query.where(AuditLog.table_name == table_name)
+        if entity_id is not None:
+            query = query.where(AuditLog.entity_id == str(entity_id))
+        if user_id:
+            query = query.where(AuditLog.user_id == user_id)
+        if action:
+            query = query.where(AuditLog.action == action)
+        if start:
+            query = query.where(AuditLog.created_at >= start)
+        if end:
+            query = query.where(AuditLog.created_at < end)
+        if position:
+            last_date, last_id = position
+            query = query.where(or_(
+                AuditLog.created_at < last_date,
+                and_(AuditLog.created_at == last_date, AuditLog.id < last_id)
+            ))
+
+        query = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1)
+
+        try:
+            entries = fetch_rows(AuditLogRow, session.execute(query))
+        except SQLAlchemyError as e:
+            return False, f"Database error: {str(e)}"
+
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        return True, {
+            'entries': entries,
+            'next_cursor': encode_feed_cursor(entries[-1]) if has_more else None
+        }
+
+    def get_writer_stats(self):
+        """Get this process's audit writer statistics (queued, written, dropped, ...)"""
+        return audit_stats()
+
+    def flush(self):
+        """Wait until this process's committed changes are in the audit log"""
+        flush_audit_log()
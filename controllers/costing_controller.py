@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Inventory costing controller for ASSI Warehouse Management System
+
+Maintains FIFO cost layers and a moving average cost per item and
+warehouse as purchase and sale invoices are posted, so inventory
+valuation and cost of goods sold are read from small indexed tables.
+All costs are in USD per main unit.
+
+rebuild_costs() recomputes everything from invoice history, one item per
+task, in parallel worker processes.
+"""
+
+import os
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import select, func, case, delete, insert, literal
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, engine, reset_after_fork, chunked
+from models.invoice import InvoiceItem
+from models.item import Item, ItemStock
+from models.inventory_cost import CostLayer, ItemCost, CostOfGoodsSold
+
+# Quantities below this are treated as zero (float rounding)
+QUANTITY_EPSILON = 1e-9
+
+def quantity_in_main_unit(item, quantity, unit):
+    """Convert an invoice line quantity to the item's main unit"""
+    if unit == item.sub_unit and unit != item.main_unit:
+        return quantity / item.conversion_rate
+    return quantity
+
+def _to_usd(amount, currency, exchange_rate):
+    """Convert an invoice amount to USD (exchange rates are units per USD)"""
+    if currency == 'USD' or not exchange_rate:
+        return amount
+    return amount / exchange_rate
+
+
+class CostingController:
+    """Controller for inventory cost layers and valuation"""
+
+    def _get_item_cost(self, item_id, warehouse_id):
+        """Get (creating if needed) the locked valuation row of an item in a warehouse"""
+        item_cost = session.query(ItemCost).filter_by(
+            item_id=item_id, warehouse_id=warehouse_id
+        ).with_for_update().first()
+
+        if item_cost is None:
+            item_cost = ItemCost(item_id=item_id, warehouse_id=warehouse_id,
+                                 quantity=0.0, fifo_value=0.0, average_cost=0.0)
+            session.add(item_cost)
+
+        return item_cost
+
+    def _get_item_costs(self, item_ids, warehouse_id):
+        """Get (creating if needed) the locked valuation rows of many items in a warehouse
+
+        Returns:
+            Dictionary {item_id: ItemCost}
+        """
+        item_costs = {}
+        for chunk in chunked(sorted(set(item_ids))):
+            for item_cost in session.query(ItemCost).filter(
+                ItemCost.warehouse_id == warehouse_id,
+                ItemCost.item_id.in_(chunk)
+            ).order_by(ItemCost.item_id).with_for_update():
+                item_costs[item_cost.item_id] = item_cost
+
+        for item_id in item_ids:
+            if item_id not in item_costs:
+                item_cost = ItemCost(item_id=item_id, warehouse_id=warehouse_id,
+                                     quantity=0.0, fifo_value=0.0, average_cost=0.0)
+                session.add(item_cost)
+                item_costs[item_id] = item_cost
+
+        return item_costs
+
+    def _fallback_cost(self, item_id, item_cost):
+        """Cost for stock not covered by layers (stock that predates costing)"""
+        if item_cost.average_cost:
+            return item_cost.average_cost
+        item = session.query(Item).filter_by(id=item_id).first()
+        return item.purchase_price if item else 0.0
+
+    def receive(self, item_id, warehouse_id, quantity, unit_cost, received_at=None,
+                invoice_id=None, source_type='purchase'):
+        """Add a cost layer and update the moving average (no commit)
+
+        Args:
+            item_id: ID of the item
+            warehouse_id: ID of the warehouse
+            quantity: Quantity received in the main unit
+            unit_cost: USD cost per main unit
+            received_at: Receipt date used for FIFO order (defaults to now)
+            invoice_id: Source purchase invoice, if any
+            source_type: 'purchase', 'transfer', 'return', 'opening' or 'count'
+
+        Returns:
+            The new CostLayer
+        """
+        item_cost = self._get_item_cost(item_id, warehouse_id)
+
+        layer = CostLayer(
+            item_id=item_id,
+            warehouse_id=warehouse_id,
+            invoice_id=invoice_id,
+            source_type=source_type,
+            received_at=received_at or datetime.utcnow(),
+            quantity=quantity,
+            remaining_quantity=quantity,
+            unit_cost=unit_cost
+        )
+        session.add(layer)
+
+        new_quantity = item_cost.quantity + quantity
+        if item_cost.quantity > QUANTITY_EPSILON and new_quantity > QUANTITY_EPSILON:
+            item_cost.average_cost = (
+                item_cost.quantity * item_cost.average_cost + quantity * unit_cost
+            ) / new_quantity
+        else:
+            item_cost.average_cost = unit_cost
+        item_cost.quantity = new_quantity
+        item_cost.fifo_value += quantity * unit_cost
+
+        return layer
+
+    def _consume(self, item_cost, layers, quantity):
+        """Take quantity from layers in order
+
+        Returns:
+            Tuple (list of (layer, quantity taken), quantity covered, FIFO cost)
+        """
+        consumed = []
+        covered = 0.0
+        fifo_cost = 0.0
+
+        for layer in layers:
+            if quantity - covered <= QUANTITY_EPSILON:
+                break
+            take = min(layer.remaining_quantity, quantity - covered)
+            if take <= QUANTITY_EPSILON:
+                continue
+            layer.remaining_quantity -= take
+            covered += take
+            fifo_cost += take * layer.unit_cost
+            consumed.append((layer, take))
+
+        item_cost.quantity = max(item_cost.quantity - covered, 0.0)
+        item_cost.fifo_value = max(item_cost.fifo_value - fifo_cost, 0.0) if item_cost.quantity > QUANTITY_EPSILON else 0.0
+        if item_cost.quantity <= QUANTITY_EPSILON:
+            item_cost.quantity = 0.0
+
+        return consumed, covered, fifo_cost
+
+    def _open_layers(self, item_id, warehouse_id, invoice_id=None):
+        """Open layers of an item in a warehouse, oldest first"""
+        query = session.query(CostLayer).filter(
+            CostLayer.item_id == item_id,
+            CostLayer.warehouse_id == warehouse_id,
+            CostLayer.remaining_quantity > QUANTITY_EPSILON
+        )
+        if invoice_id is not None:
+            query = query.filter(CostLayer.invoice_id == invoice_id)
+        return query.order_by(CostLayer.received_at, CostLayer.id).with_for_update().all()
+
+    def issue(self, item_id, warehouse_id, quantity):
+        """Consume quantity from the oldest layers (no commit)
+
+        Quantity not covered by layers is costed at the moving average, or
+        the item's purchase price when no average exists yet.
+
+        Returns:
+            Tuple (FIFO cost, moving average cost, list of (layer, quantity taken))
+        """
+        item_cost = self._get_item_cost(item_id, warehouse_id)
+        average_cost = item_cost.average_cost
+
+        consumed, covered, fifo_cost = self._consume(
+            item_cost, self._open_layers(item_id, warehouse_id), quantity
+        )
+
+        shortfall = quantity - covered
+        if shortfall > QUANTITY_EPSILON:
+            fallback = self._fallback_cost(item_id, item_cost)
+            fifo_cost += shortfall * fallback
+            if not average_cost:
+                average_cost = fallback
+
+        return fifo_cost, quantity * average_cost, consumed
+
+    def get_unit_costs(self, warehouse_id, item_ids):
+        """Get the cost per main unit for stock added without a purchase
+
+        The moving average in the warehouse, or the item's purchase price
+        when there is none.
+
+        Returns:
+            Dictionary {item_id: USD cost per main unit}
+        """
+        unit_costs = {}
+        for chunk in chunked(sorted(set(item_ids))):
+            unit_costs.update(session.execute(
+                select(
+                    Item.id,
+                    func.coalesce(func.nullif(ItemCost.average_cost, 0.0), Item.purchase_price)
+                ).outerjoin(
+                    ItemCost, (ItemCost.item_id == Item.id) & (ItemCost.warehouse_id == warehouse_id)
+                ).where(Item.id.in_(chunk))
+            ).all())
+        return unit_costs
+
+    def _open_layers_many(self, item_ids, warehouse_id):
+        """Open layers of many items in a warehouse, oldest first
+
+        Returns:
+            Dictionary {item_id: list of CostLayer}
+        """
+        layers = {}
+        for chunk in chunked(sorted(set(item_ids))):
+            for layer in session.query(CostLayer).filter(
+                CostLayer.warehouse_id == warehouse_id,
+                CostLayer.item_id.in_(chunk),
+                CostLayer.remaining_quantity > QUANTITY_EPSILON
+            ).order_by(CostLayer.item_id, CostLayer.received_at, CostLayer.id).with_for_update():
+                layers.setdefault(layer.item_id, []).append(layer)
+        return layers
+
+    def issue_many(self, warehouse_id, quantities):
+        """Consume quantities of many items from their oldest layers (no commit)
+
+        Costs like issue(), with one query for the valuations and one for
+        the layers of all items instead of two per item.
+
+        Args:
+            warehouse_id: ID of the warehouse
+            quantities: Dictionary {item_id: quantity in the main unit}
+
+        Returns:
+            Dictionary {item_id: (FIFO cost, moving average cost, list of (layer, quantity taken))}
+        """
+        item_costs = self._get_item_costs(list(quantities), warehouse_id)
+        layers = self._open_layers_many(list(quantities), warehouse_id)
+
+        issued = {}
+        for item_id, quantity in quantities.items():
+            item_cost = item_costs[item_id]
+            average_cost = item_cost.average_cost
+            consumed, covered, fifo_cost = self._consume(item_cost, layers.get(item_id, ()), quantity)
+            issued[item_id] = (fifo_cost, average_cost, consumed, quantity - covered)
+
+        # Uncovered stock without a moving average is costed at the purchase price
+        unpriced = [item_id for item_id, (_fifo, average_cost, _consumed, shortfall) in issued.items()
+                    if shortfall > QUANTITY_EPSILON and not average_cost]
+        purchase_prices = {}
+        for chunk in chunked(unpriced):
+            purchase_prices.update(session.execute(
+                select(Item.id, Item.purchase_price).where(Item.id.in_(chunk))
+            ).all())
+
+        results = {}
+        for item_id, (fifo_cost, average_cost, consumed, shortfall) in issued.items():
+            if shortfall > QUANTITY_EPSILON:
+                fallback = average_cost or purchase_prices.get(item_id) or 0.0
+                fifo_cost += shortfall * fallback
+                if not average_cost:
+                    average_cost = fallback
+            results[item_id] = (fifo_cost, quantities[item_id] * average_cost, consumed)
+
+        return results
+
+    def receive_many(self, warehouse_id, layers, source_type='transfer'):
+        """Add many cost layers to a warehouse and update the moving averages (no commit)
+
+        Args:
+            warehouse_id: ID of the warehouse
+            layers: List of dictionaries with item_id, quantity, unit_cost and
+                received_at, applied in order
+            source_type: 'purchase', 'transfer', 'return', 'opening' or 'count'
+        """
+        if not layers:
+            return
+
+        item_costs = self._get_item_costs([layer['item_id'] for layer in layers], warehouse_id)
+        now = datetime.utcnow()
+        rows = []
+
+        for layer in layers:
+            item_cost = item_costs[layer['item_id']]
+            quantity, unit_cost = layer['quantity'], layer['unit_cost']
+
+            new_quantity = item_cost.quantity + quantity
+            if item_cost.quantity > QUANTITY_EPSILON and new_quantity > QUANTITY_EPSILON:
+                item_cost.average_cost = (
+                    item_cost.quantity * item_cost.average_cost + quantity * unit_cost
+                ) / new_quantity
+            else:
+                item_cost.average_cost = unit_cost
+            item_cost.quantity = new_quantity
+            item_cost.fifo_value += quantity * unit_cost
+
+            rows.append({
+                'item_id': layer['item_id'], 'warehouse_id': warehouse_id, 'invoice_id': None,
+                'source_type': source_type, 'received_at': layer.get('received_at') or now,
+                'quantity': quantity, 'remaining_quantity': quantity, 'unit_cost': unit_cost,
+                'created_at': now
+            })
+
+        session.execute(insert(CostLayer), rows)
+        session.flush()
+
+    def post_invoice(self, invoice):
+        """Update cost layers for a newly created invoice (no commit)
+
+        Purchases add one layer per line; sales consume layers and record
+        cost of goods sold.
+        """
+        lines = session.query(InvoiceItem, Item).join(
+            Item, Item.id == InvoiceItem.item_id
+        ).filter(InvoiceItem.invoice_id == invoice.id).order_by(InvoiceItem.id).all()
+
+        for invoice_item, item in lines:
+            quantity = quantity_in_main_unit(item, invoice_item.quantity, invoice_item.unit)
+            if quantity <= QUANTITY_EPSILON:
+                continue
+
+            if invoice.type == 'purchase':
+                unit_cost = _to_usd(invoice_item.total_price, invoice.currency, invoice.exchange_rate) / quantity
+                self.receive(item.id, invoice_item.warehouse_id, quantity, unit_cost,
+                             received_at=invoice.invoice_date, invoice_id=invoice.id)
+            else:
+                fifo_cost, average_cost, _consumed = self.issue(item.id, invoice_item.warehouse_id, quantity)
+                session.add(CostOfGoodsSold(
+                    invoice_id=invoice.id,
+                    invoice_item_id=invoice_item.id,
+                    item_id=item.id,
+                    warehouse_id=invoice_item.warehouse_id,
+                    quantity=quantity,
+                    fifo_cost=fifo_cost,
+                    average_cost=average_cost,
+                    issued_at=invoice.invoice_date or datetime.utcnow()
+                ))
+
+        session.flush()
+
+    def reverse_invoice(self, invoice):
+        """Undo an invoice's cost effects when it is cancelled (no commit)
+
+        A cancelled purchase removes what is left of its own layers first,
+        then the oldest stock. A cancelled sale returns its quantities as new
+        layers at the cost they were issued at.
+        """
+        if invoice.type == 'purchase':
+            lines = session.query(
+                CostLayer.item_id, CostLayer.warehouse_id, func.sum(CostLayer.quantity)
+            ).filter(CostLayer.invoice_id == invoice.id).group_by(
+                CostLayer.item_id, CostLayer.warehouse_id
+            ).all()
+
+            for item_id, warehouse_id, quantity in lines:
+                item_cost = self._get_item_cost(item_id, warehouse_id)
+                value_before = item_cost.quantity * item_cost.average_cost
+
+                own_layers = self._open_layers(item_id, warehouse_id, invoice_id=invoice.id)
+                _consumed, covered, removed = self._consume(item_cost, own_layers, quantity)
+                if quantity - covered > QUANTITY_EPSILON:
+                    _consumed, more, more_cost = self._consume(
+                        item_cost, self._open_layers(item_id, warehouse_id), quantity - covered
+                    )
+                    removed += more_cost
+
+                if item_cost.quantity > QUANTITY_EPSILON:
+                    item_cost.average_cost = max(value_before - removed, 0.0) / item_cost.quantity
+        else:
+            entries = session.query(CostOfGoodsSold).filter_by(invoice_id=invoice.id).all()
+            for entry in entries:
+                if entry.quantity > QUANTITY_EPSILON:
+                    self.receive(entry.item_id, entry.warehouse_id, entry.quantity,
+                                 entry.fifo_cost / entry.quantity,
+                                 received_at=entry.issued_at, source_type='return')
+                session.delete(entry)
+
+        session.flush()
+
+    def transfer(self, item_id, from_warehouse_id, to_warehouse_id, quantity):
+        """Move cost layers between warehouses, keeping their cost and age (no commit)"""
+        fifo_cost, _average_cost, consumed = self.issue(item_id, from_warehouse_id, quantity)
+
+        moved = 0.0
+        for layer, taken in consumed:
+            self.receive(item_id, to_warehouse_id, taken, layer.unit_cost,
+                         received_at=layer.received_at, source_type='transfer')
+            moved += taken
+
+        # Uncovered stock arrives at the cost it was issued at
+        if quantity - moved > QUANTITY_EPSILON:
+            already_costed = sum(layer.unit_cost * taken for layer, taken in consumed)
+            self.receive(item_id, to_warehouse_id, quantity - moved,
+                         (fifo_cost - already_costed) / (quantity - moved), source_type='transfer')
+
+        session.flush()
+
+    def stock_value_expression(self, method='fifo'):
+        """SQL value of an ItemStock row: costed layers plus uncovered stock at list price
+
+        Must be used in a query that outer-joins ItemCost and joins Item.
+        """
+        covered_value = func.coalesce(
+            ItemCost.quantity * ItemCost.average_cost if method == 'average' else ItemCost.fifo_value,
+            0.0
+        )
+        uncovered = ItemStock.quantity - func.coalesce(ItemCost.quantity, 0.0)
+        return covered_value + case((uncovered > 0, uncovered * Item.purchase_price), else_=0.0)
+
+    def get_stock_values(self, warehouse_id=None, method='fifo'):
+        """Get inventory value per item
+
+        Args:
+            warehouse_id: Restrict to one warehouse (all warehouses if None)
+            method: 'fifo' or 'average'
+
+        Returns:
+            Dictionary {item_id: value in USD}
+        """
+        query = session.query(
+            ItemStock.item_id,
+            func.sum(self.stock_value_expression(method))
+        ).join(
+            Item, Item.id == ItemStock.item_id
+        ).outerjoin(
+            ItemCost,
+            (ItemCost.item_id == ItemStock.item_id) & (ItemCost.warehouse_id == ItemStock.warehouse_id)
+        )
+
+        if warehouse_id:
+            query = query.filter(ItemStock.warehouse_id == warehouse_id)
+
+        return dict(query.group_by(ItemStock.item_id).all())
+
+    def get_inventory_value(self, warehouse_id=None, method='fifo'):
+        """Get the total inventory value in USD (one aggregate query)"""
+        query = session.query(
+            func.coalesce(func.sum(self.stock_value_expression(method)), 0.0)
+        ).select_from(ItemStock).join(
+            Item, Item.id == ItemStock.item_id
+        ).outerjoin(
+            ItemCost,
+            (ItemCost.item_id == ItemStock.item_id) & (ItemCost.warehouse_id == ItemStock.warehouse_id)
+        )
+
+        if warehouse_id:
+            query = query.filter(ItemStock.warehouse_id == warehouse_id)
+
+        return query.scalar()
+
+    def get_cogs(self, start_date=None, end_date=None, item_id=None, method='fifo'):
+        """Get total cost of goods sold in USD for a period (archived periods included)"""
+        # archive_controller imports this module
+        from controllers.archive_controller import ledger_tables
+
+        total = 0.0
+        for tables in ledger_tables(start_date):
+            entry = tables.cogs
+            column = entry.average_cost if method == 'average' else entry.fifo_cost
+            query = session.query(func.coalesce(func.sum(column), 0.0))
+
+            if start_date:
+                query = query.filter(entry.issued_at >= start_date)
+            if end_date:
+                query = query.filter(entry.issued_at <= end_date)
+            if item_id:
+                query = query.filter(entry.item_id == item_id)
+
+            total += query.scalar()
+
+        return total
+
+    def rebuild_item(self, item_id):
+        """Recompute an item's layers, valuations and COGS from invoice history
+
+        Non-cancelled invoices are replayed in date order in memory and the
+        result is written in bulk. Stock not explained by invoices (transfers
+        and manual adjustments) is reconciled with ItemStock through opening
+        layers or FIFO removals.
+
+        Archived invoices are replayed too, but their COGS entries and used
+        up layers stay in the archive; a layer of an archived purchase with
+        stock left is written to the hot table without its invoice.
+
+        Returns:
+            Tuple (success, summary dictionary or error message)
+        """
+        item = session.query(Item).filter_by(id=item_id).first()
+        if not item:
+            return False, "Item not found"
+
+        # archive_controller imports this module
+        from controllers.archive_controller import ledger_tables
+
+        try:
+            lines = []
+            for tables in ledger_tables():
+                line_item, invoice = tables.invoice_item, tables.invoice
+                lines.extend(session.execute(
+                    select(
+                        line_item.id, line_item.invoice_id, line_item.warehouse_id,
+                        line_item.quantity, line_item.unit, line_item.total_price,
+                        invoice.type, invoice.invoice_date, invoice.currency, invoice.exchange_rate,
+                        literal(tables.name == 'archive').label('archived')
+                    ).join(
+                        invoice, invoice.id == line_item.invoice_id
+                    ).where(
+                        line_item.item_id == item_id,
+                        invoice.status != 'cancelled'
+                    )
+                ))
+            lines.sort(key=lambda line: (line.invoice_date, line.invoice_id, line.id))
+
+            # warehouse_id -> {'layers': deque of layer dicts, 'quantity', 'fifo_value', 'average_cost'}
+            states = {}
+            layers = []
+            cogs = []
+
+            def state_for(warehouse_id):
+                return states.setdefault(warehouse_id, {
+                    'layers': deque(), 'quantity': 0.0, 'fifo_value': 0.0, 'average_cost': 0.0
+                })
+
+            def add_layer(state, warehouse_id, quantity, unit_cost, received_at, invoice_id, source_type,
+                          archived=False):
+                layer = {
+                    'item_id': item_id, 'warehouse_id': warehouse_id, 'invoice_id': invoice_id,
+                    'source_type': source_type, 'received_at': received_at,
+                    'quantity': quantity, 'remaining_quantity': quantity, 'unit_cost': unit_cost,
+                    'created_at': datetime.utcnow()
+                }
+                layers.append((layer, archived))
+                state['layers'].append(layer)
+                new_quantity = state['quantity'] + quantity
+                if state['quantity'] > QUANTITY_EPSILON and new_quantity > QUANTITY_EPSILON:
+                    state['average_cost'] = (state['quantity'] * state['average_cost'] + quantity * unit_cost) / new_quantity
+                else:
+                    state['average_cost'] = unit_cost
+                state['quantity'] = new_quantity
+                state['fifo_value'] += quantity * unit_cost
+
+            def take(state, quantity):
+                covered = cost = 0.0
+                while state['layers'] and quantity - covered > QUANTITY_EPSILON:
+                    layer = state['layers'][0]
+                    taken = min(layer['remaining_quantity'], quantity - covered)
+                    layer['remaining_quantity'] -= taken
+                    covered += taken
+                    cost += taken * layer['unit_cost']
+                    if layer['remaining_quantity'] <= QUANTITY_EPSILON:
+                        layer['remaining_quantity'] = 0.0
+                        state['layers'].popleft()
+                state['quantity'] = max(state['quantity'] - covered, 0.0)
+                state['fifo_value'] = max(state['fifo_value'] - cost, 0.0) if state['quantity'] > QUANTITY_EPSILON else 0.0
+                return covered, cost
+
+            for line in lines:
+                quantity = quantity_in_main_unit(item, line.quantity, line.unit)
+                if quantity <= QUANTITY_EPSILON:
+                    continue
+                state = state_for(line.warehouse_id)
+
+                if line.type == 'purchase':
+                    unit_cost = _to_usd(line.total_price, line.currency, line.exchange_rate) / quantity
+                    add_layer(state, line.warehouse_id, quantity, unit_cost, line.invoice_date,
+                              None if line.archived else line.invoice_id, 'purchase', line.archived)
+                else:
+                    average_cost = state['average_cost']
+                    covered, fifo_cost = take(state, quantity)
+                    if quantity - covered > QUANTITY_EPSILON:
+                        fallback = average_cost or item.purchase_price
+                        fifo_cost += (quantity - covered) * fallback
+                        average_cost = average_cost or fallback
+                    if line.archived:
+                        continue
+                    cogs.append({
+                        'invoice_id': line.invoice_id, 'invoice_item_id': line.id,
+                        'item_id': item_id, 'warehouse_id': line.warehouse_id,
+                        'quantity': quantity, 'fifo_cost': fifo_cost,
+                        'average_cost': quantity * average_cost,
+                        'issued_at': line.invoice_date
+                    })
+
+            # Reconcile with actual stock (transfers and adjustments are not
+            # invoice-driven); unexplained stock is costed at the item's
+            # average across warehouses
+            total_quantity = sum(state['quantity'] for state in states.values())
+            item_average = (
+                sum(state['quantity'] * state['average_cost'] for state in states.values()) / total_quantity
+                if total_quantity > QUANTITY_EPSILON else item.purchase_price
+            )
+            opening_date = lines[0].invoice_date if lines else datetime.utcnow()
+            stocks = session.query(ItemStock).filter_by(item_id=item_id).all()
+            for stock in stocks:
+                state = state_for(stock.warehouse_id)
+                difference = (stock.quantity or 0.0) - state['quantity']
+                if difference > QUANTITY_EPSILON:
+                    add_layer(state, stock.warehouse_id, difference,
+                              state['average_cost'] or item_average,
+                              opening_date, None, 'opening')
+                elif difference < -QUANTITY_EPSILON:
+                    take(state, -difference)
+
+            session.execute(delete(CostOfGoodsSold).where(CostOfGoodsSold.item_id == item_id))
+            session.execute(delete(CostLayer).where(CostLayer.item_id == item_id))
+            session.execute(delete(ItemCost).where(ItemCost.item_id == item_id))
+
+            layers = [
+                layer for layer, archived in layers
+                if not archived or layer['remaining_quantity'] > QUANTITY_EPSILON
+            ]
+            if layers:
+                session.execute(insert(CostLayer), layers)
+            if cogs:
+                session.execute(insert(CostOfGoodsSold), cogs)
+            if states:
+                session.execute(insert(ItemCost), [
+                    {
+                        'item_id': item_id, 'warehouse_id': warehouse_id,
+                        'quantity': state['quantity'], 'fifo_value': state['fifo_value'],
+                        'average_cost': state['average_cost'], 'updated_at': datetime.utcnow()
+                    }
+                    for warehouse_id, state in states.items()
+                ])
+
+            session.commit()
+            return True, {
+                'item_id': item_id,
+                'layers': len(layers),
+                'cogs_entries': len(cogs),
+                'warehouses': len(states)
+            }
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error rebuilding costs: {str(e)}"
+
+
+def _init_rebuild_worker():
+    """Give a forked worker its own connections and session"""
+    reset_after_fork()
+
+def _rebuild_one(item_id):
+    """Rebuild one item in a worker process"""
+    try:
+        return item_id, CostingController().rebuild_item(item_id)
+    finally:
+        session.remove()
+
+def rebuild_costs(item_ids=None, workers=None, progress=None):
+    """Recompute cost layers for many items, one item per task
+
+    Items are independent, so they are rebuilt in parallel worker
+    processes. SQLite allows a single writer, so it always runs inline.
+
+    Args:
+        item_ids: Items to rebuild (all items if None)
+        workers: Number of worker processes (defaults to the CPU count)
+        progress: Optional callable(item_id, success, result) per finished item
+
+    Returns:
+        Tuple (number of items rebuilt, list of (item_id, error message))
+    """
+    if item_ids is None:
+        item_ids = [item_id for (item_id,) in session.query(Item.id).order_by(Item.id)]
+    session.remove()
+
+    workers = workers or os.cpu_count() or 1
+    if engine.dialect.name == 'sqlite':
+        workers = 1
+
+    if workers <= 1 or len(item_ids) <= 1:
+        results = map(_rebuild_one, item_ids)
+        return _collect_rebuild_results(results, progress)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Pooled connections must not be shared with the children
+    engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_rebuild_worker) as executor:
+        results = executor.map(_rebuild_one, item_ids, chunksize=max(1, len(item_ids) // (workers * 8)))
+        return _collect_rebuild_results(results, progress)
+
+def _collect_rebuild_results(results, progress):
+    """Count rebuilt items and gather errors"""
+    rebuilt = 0
+    errors = []
+    for item_id, (success, result) in results:
+        if success:
+            rebuilt += 1
+        else:
+            errors.append((item_id, result))
+        if progress:
+            progress(item_id, success, result)
+    return rebuilt, errors
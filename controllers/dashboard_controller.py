@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dashboard controller for ASSI Warehouse Management System
+
+Computes the landing page summary (item, warehouse and fund figures and
+the latest fund transactions) and keeps the result for a few seconds per
+process. Commits that touch the summarized tables invalidate the cached
+summary immediately.
+"""
+
+import os
+
+from sqlalchemy import select, func, case
+
+from database.db_setup import session, session_factory, read_only
+from models.item import Item
+from models.warehouse import Warehouse
+from models.fund import Fund, FundTransaction
+from utils.cache import TTLCache, invalidate_on_commit
+from controllers.fund_controller import FundController
+
+# Seconds a computed summary is reused (other processes see writes after at most this long)
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '5'))
+
+# Models whose changes affect the summary
+_SUMMARY_MODELS = (Item, Warehouse, Fund, FundTransaction)
+
+_summary_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL, max_entries=8)
+
+class DashboardController:
+    """Controller for the dashboard summary"""
+
+    def __init__(self):
+        self.fund_controller = FundController()
+
+    def _query_summary(self, recent_limit):
+        """Run the summary queries and return plain data"""
+        item_count = select(func.count(Item.id)).where(Item.is_active == True).scalar_subquery()
+        warehouse_count = select(func.count(Warehouse.id)).where(Warehouse.is_active == True).scalar_subquery()
+        usd_balance = case(
+            (Fund.currency == 'USD', Fund.balance),
+            else_=Fund.balance / Fund.exchange_rate
+        )
+
+        # One row per active fund (or a single row without fund columns when
+        # there are none), each carrying the counts and the USD total
+        counts = select(
+            item_count.label('item_count'),
+            warehouse_count.label('warehouse_count')
+        ).subquery()
+
+        rows = session.execute(
+            select(
+                counts.c.item_count,
+                counts.c.warehouse_count,
+                func.coalesce(func.sum(usd_balance).over(), 0.0).label('total_usd'),
+                Fund.id,
+                Fund.name,
+                Fund.balance,
+                Fund.currency,
+                Fund.exchange_rate
+            ).select_from(counts).outerjoin(
+                Fund, Fund.is_active == True
+            ).order_by(Fund.id)
+        ).all()
+
+        funds = [
+            {
+                'id': row.id,
+                'name': row.name,
+                'balance': row.balance,
+                'currency': row.currency,
+                'exchange_rate': row.exchange_rate
+            }
+            for row in rows if row.id is not None
+        ]
+
+        # Latest transactions of the active funds in one index-ordered query
+        recent_transactions = [
+            {
+                'fund': row.fund_name,
+                'amount': row.amount,
+                'currency': row.currency,
+                'type': row.transaction_type,
+                'date': row.created_at,
+                'description': row.description
+            }
+            for row in self.fund_controller.get_recent_transaction_rows(limit=recent_limit)
+        ]
+
+        return {
+            'total_items': rows[0].item_count,
+            'total_warehouses': rows[0].warehouse_count,
+            'total_usd': rows[0].total_usd if funds else 0.0,
+            'funds': funds,
+            'recent_transactions': recent_transactions
+        }
+
+    @read_only
+    def get_summary(self, recent_limit=10, use_cache=True):
+        """Get the dashboard summary
+
+        Args:
+            recent_limit: Number of latest fund transactions to include
+            use_cache: Reuse a summary computed in the last few seconds
+
+        Returns:
+            Dictionary with total_items, total_warehouses, total_usd, funds
+            (list of dicts) and recent_transactions (list of dicts)
+        """
+        if not use_cache:
+            return self._query_summary(recent_limit)
+
+        return _summary_cache.get_or_set(
+            ('summary', recent_limit),
+            lambda: self._query_summary(recent_limit)
+        )
+
+    @staticmethod
+    def invalidate():
+        """Drop cached summaries in this process"""
+        _summary_cache.invalidate()
+
+
+# Invalidate on commits that wrote summarized tables
+invalidate_on_commit(_summary_cache, session_factory, _SUMMARY_MODELS)
@@ -8,7 +8,9 @@ Expense controller for ASSI Warehouse Management System
 from database.db_setup import session
 from models.expense import Expense, ExpenseCategory
 from models.fund import Fund
+from models.rows import ExpenseRow, fetch_rows
 from controllers.fund_controller import FundController
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -33,6 +35,39 @@ class ExpenseController:
         
         return query.order_by(Expense.expense_date.desc()).limit(limit).all()
     
+    def get_expense_rows(self, start_date=None, end_date=None, category_id=None, limit=100):
+        """Get expenses as lightweight read-only rows (same filters as get_all_expenses)
+        
+        Args:
+            limit: Maximum number of rows (None for all)
+        
+        Returns:
+            List of ExpenseRow, newest first
+        """
+        query = select(
+            Expense.id,
+            Expense.category_id,
+            ExpenseCategory.name.label('category_name'),
+            Expense.amount,
+            Expense.currency,
+            Expense.exchange_rate,
+            Expense.expense_date,
+            Expense.description,
+            Expense.fund_id
+        ).join(ExpenseCategory, ExpenseCategory.id == Expense.category_id)
+        
+        if start_date:
+            query = query.where(Expense.expense_date >= start_date)
+        
+        if end_date:
+            query = query.where(Expense.expense_date <= end_date)
+        
+        if category_id:
+            query = query.where(Expense.category_id == category_id)
+        
+        query = query.order_by(Expense.expense_date.desc()).limit(limit)
+        return fetch_rows(ExpenseRow, session.execute(query))
+    
     def get_expense_by_id(self, expense_id):
         """Get an expense by its ID"""
         return session.query(Expense).filter_by(id=expense_id).first()
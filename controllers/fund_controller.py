@@ -3,12 +3,58 @@
 
 """
 Fund controller for ASSI Warehouse Management System
+
+Transaction rows and the transaction feed also read the archived fund
+transactions when their range reaches back before the archive boundary.
 """
 
-from database.db_setup import session
+import json
+import heapq
+import base64
+from itertools import islice
+
+from database.db_setup import session, read_only
 from models.fund import Fund, FundTransaction
+from models.rows import FundTransactionRow, fetch_rows
+from database.identity_cache import fund_cache
+from controllers.archive_controller import ledger_tables, archive_boundary
+from models.archive import HOT
+from sqlalchemy import select, and_, or_
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
+from datetime import datetime, timedelta
+
+def _parse_date(value, end_of_day=False):
+    """Parse a datetime or 'YYYY-MM-DD' string (None passes through)
+
+    Args:
+        value: datetime, date string or None
+        end_of_day: Return the start of the following day for date strings,
+                    so the value can be used as an exclusive upper bound
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.strptime(value[:10], '%Y-%m-%d')
+    return parsed + timedelta(days=1) if end_of_day else parsed
+
+def encode_feed_cursor(transaction):
+    """Encode a feed transaction's position as an opaque cursor"""
+    position = {'date': transaction.created_at.isoformat(), 'id': transaction.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_feed_cursor(cursor):
+    """Decode a cursor from encode_feed_cursor()
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(position['date']), int(position['id'])
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
 
 class FundController:
     """Controller for fund operations"""
@@ -24,6 +70,13 @@ class FundController:
         """Get a fund by its ID"""
         return session.query(Fund).filter_by(id=fund_id).first()
     
+    def get_fund_snapshot(self, fund_id):
+        """Get a cached read-only snapshot of a fund (FundSnapshot, without balance), or None
+        
+        Use get_fund_by_id() for the balance or to modify the fund.
+        """
+        return fund_cache.get(fund_id)
+    
     def create_fund(self, name, currency='USD', exchange_rate=1.0, initial_balance=0.0):
         """Create a new fund"""
         try:
@@ -79,8 +132,14 @@ class FundController:
         except Exception as e:
             return False, f"Error updating fund: {str(e)}"
     
-    def add_transaction(self, fund_id, amount, transaction_type, description=None, reference_id=None, reference_type=None):
-        """Add a transaction to a fund and update the balance"""
+    def add_transaction(self, fund_id, amount, transaction_type, description=None, reference_id=None,
+                        reference_type=None, commit=True):
+        """Add a transaction to a fund and update the balance
+
+        Args:
+            commit: Commit the transaction; False only flushes, leaving the
+                commit (or rollback) to the caller's transaction
+        """
         fund = self.get_fund_by_id(fund_id)
         
         if not fund:
@@ -109,7 +168,10 @@ class FundController:
             # For transfers, the balance is adjusted in separate operations
             
             fund.updated_at = datetime.utcnow()
-            session.commit()
+            if commit:
+                session.commit()
+            else:
+                session.flush()
             return True, transaction
         except SQLAlchemyError as e:
             session.rollback()
@@ -184,7 +246,7 @@ class FundController:
             return False, f"Error transferring between funds: {str(e)}"
     
     def get_fund_transactions(self, fund_id, start_date=None, end_date=None, limit=100):
-        """Get transactions for a specific fund with optional date filtering"""
+        """Get transactions for a specific fund with optional date filtering (hot tables only)"""
         query = session.query(FundTransaction).filter_by(fund_id=fund_id)
         
         if start_date:
@@ -194,3 +256,172 @@ class FundController:
             query = query.filter(FundTransaction.created_at <= end_date)
         
         return query.order_by(FundTransaction.created_at.desc()).limit(limit).all()
+    
+    def _transaction_rows_query(self, transaction=FundTransaction):
+        """Build the select for FundTransactionRow
+
+        Args:
+            transaction: FundTransaction or its archive (a LedgerTables.fund_transaction)
+        """
+        return select(
+            transaction.id,
+            transaction.fund_id,
+            Fund.name.label('fund_name'),
+            Fund.currency,
+            transaction.amount,
+            transaction.transaction_type,
+            transaction.description,
+            transaction.reference_id,
+            transaction.reference_type,
+            transaction.created_at
+        ).join(
+            Fund, Fund.id == transaction.fund_id
+        )
+    
+    def get_fund_transaction_rows(self, fund_id, start_date=None, end_date=None, limit=100):
+        """Get a fund's transactions as lightweight read-only rows
+        
+        Args:
+            limit: Maximum number of rows (None for all)
+        
+        Returns:
+            List of FundTransactionRow, newest first
+        """
+        rows = []
+        for tables in ledger_tables(start_date):
+            transaction = tables.fund_transaction
+            query = self._transaction_rows_query(transaction).where(transaction.fund_id == fund_id)
+            
+            if start_date:
+                query = query.where(transaction.created_at >= start_date)
+            
+            if end_date:
+                query = query.where(transaction.created_at <= end_date)
+            
+            query = query.order_by(transaction.created_at.desc()).limit(limit)
+            rows.extend(fetch_rows(FundTransactionRow, session.execute(query)))
+            
+            # Archived rows are all older than the hot ones
+            if limit is not None and len(rows) >= limit:
+                break
+        
+        return rows[:limit]
+
+    def get_recent_transaction_rows(self, limit=10):
+        """Get the latest transactions of the active funds
+
+        Reads the (created_at, id) index with one query instead of merging
+        per-fund streams; the archive is read only when the hot table holds
+        fewer than limit rows.
+
+        Args:
+            limit: Maximum number of rows
+
+        Returns:
+            List of FundTransactionRow, newest first
+        """
+        rows = []
+        for tables in ledger_tables():
+            transaction = tables.fund_transaction
+            query = self._transaction_rows_query(transaction).where(
+                Fund.is_active == True
+            ).order_by(
+                transaction.created_at.desc(), transaction.id.desc()
+            ).limit(limit - len(rows))
+            rows.extend(fetch_rows(FundTransactionRow, session.execute(query)))
+
+            # Archived rows are all older than the hot ones
+            if len(rows) >= limit:
+                break
+
+        return rows
+
+    @read_only
+    def get_transaction_feed(self, fund_ids=None, transaction_type=None, reference_type=None,
+                             reference_id=None, start_date=None, end_date=None, cursor=None, limit=100):
+        """Get a page of transactions across funds, newest first
+        
+        Each fund's transactions are read in (created_at, id) order from its
+        own index range and the per-fund streams are merged, so a page costs
+        at most limit + 1 rows per fund whatever the history size. The
+        archive is read only when the page reaches back past the archive
+        boundary.
+        
+        Args:
+            fund_ids: IDs of the funds to include (None for all funds)
+            transaction_type: Only this transaction type (deposit, withdrawal, ...)
+            reference_type: Only transactions referencing this entity type
+            reference_id: Only transactions referencing this entity ID
+            start_date: Earliest date (datetime or 'YYYY-MM-DD')
+            end_date: Latest date (inclusive for 'YYYY-MM-DD')
+            cursor: next_cursor of the previous page
+            limit: Transactions per page
+        
+        Returns:
+            Tuple (success, page or error message). The page holds
+            transactions (list of FundTransactionRow) and next_cursor
+            (None on the last page).
+        """
+        try:
+            start = _parse_date(start_date)
+            end = _parse_date(end_date, end_of_day=True)
+            position = decode_feed_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return False, str(e)
+        
+        limit = max(1, int(limit))
+        
+        def conditions(transaction):
+            where = []
+            if transaction_type:
+                where.append(transaction.transaction_type == transaction_type)
+            if reference_type:
+                where.append(transaction.reference_type == reference_type)
+            if reference_id:
+                where.append(transaction.reference_id == reference_id)
+            if start:
+                where.append(transaction.created_at >= start)
+            if end:
+                where.append(transaction.created_at < end)
+            if position:
+                last_date, last_id = position
+                where.append(or_(
+                    transaction.created_at < last_date,
+                    and_(transaction.created_at == last_date, transaction.id < last_id)
+                ))
+            return where
+        
+        def merge(streams):
+            merged = heapq.merge(*streams, key=lambda row: (row.created_at, row.id), reverse=True)
+            return list(islice(merged, limit + 1))
+        
+        try:
+            if fund_ids is None:
+                fund_ids = session.execute(select(Fund.id).order_by(Fund.id)).scalars().all()
+            
+            streams = []
+            transactions = []
+            for tables in ledger_tables(start):
+                if tables is not HOT and len(transactions) > limit and transactions[-1].created_at >= archive_boundary():
+                    # The page ends in the hot tables
+                    break
+                
+                transaction = tables.fund_transaction
+                for fund_id in fund_ids:
+                    query = self._transaction_rows_query(transaction).where(
+                        transaction.fund_id == fund_id, *conditions(transaction)
+                    ).order_by(
+                        transaction.created_at.desc(), transaction.id.desc()
+                    ).limit(limit + 1)
+                    streams.append(fetch_rows(FundTransactionRow, session.execute(query)))
+                transactions = merge(streams)
+        except SQLAlchemyError as e:
+            return False, f"Database error: {str(e)}"
+        
+        has_more = len(transactions) > limit
+        transactions = transactions[:limit]
+        
+        return True, {
+            'transactions': transactions,
+            'next_cursor': encode_feed_cursor(transactions[-1]) if has_more else None
+        }
@@ -12,9 +12,14 @@ from models.item import Item
 from models.fund import Fund
 from controllers.item_controller import ItemController
 from controllers.fund_controller import FundController
+from controllers.invoice_numbering import invoice_number_allocator
+from controllers.costing_controller import CostingController
+from controllers.reservation_controller import ReservationController
+from models.rows import InvoiceRow, fetch_rows
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
-import uuid
 
 class InvoiceController:
     """Controller for invoice operations"""
@@ -22,10 +27,20 @@ class InvoiceController:
     def __init__(self):
         self.item_controller = ItemController()
         self.fund_controller = FundController()
+        self.costing_controller = CostingController()
+        self.reservation_controller = ReservationController()
     
     def get_all_invoices(self, invoice_type=None, status=None, start_date=None, end_date=None, limit=100):
-        """Get all invoices with optional filtering"""
-        query = session.query(Invoice)
+        """Get all invoices with optional filtering
+        
+        The entity, payments and allocations (for the paid amount) are loaded
+        with the invoices.
+        """
+        query = session.query(Invoice).options(
+            joinedload(Invoice.entity),
+            selectinload(Invoice.payments),
+            selectinload(Invoice.allocations)
+        )
         
         if invoice_type:
             query = query.filter_by(type=invoice_type)
@@ -41,15 +56,63 @@ class InvoiceController:
         
         return query.order_by(Invoice.invoice_date.desc()).limit(limit).all()
     
+    def get_invoice_rows(self, invoice_type=None, status=None, start_date=None, end_date=None, limit=100):
+        """Get invoices as lightweight read-only rows (same filters as get_all_invoices)
+        
+        Args:
+            limit: Maximum number of rows (None for all)
+        
+        Returns:
+            List of InvoiceRow, newest first
+        """
+        query = select(
+            Invoice.id,
+            Invoice.invoice_number,
+            Invoice.type,
+            Invoice.entity_id,
+            SupplierCustomer.name.label('entity_name'),
+            Invoice.total_amount,
+            Invoice.currency,
+            Invoice.exchange_rate,
+            Invoice.invoice_date,
+            Invoice.due_date,
+            Invoice.status
+        ).join(SupplierCustomer, SupplierCustomer.id == Invoice.entity_id)
+        
+        if invoice_type:
+            query = query.where(Invoice.type == invoice_type)
+        
+        if status:
+            query = query.where(Invoice.status == status)
+        
+        if start_date:
+            query = query.where(Invoice.invoice_date >= start_date)
+        
+        if end_date:
+            query = query.where(Invoice.invoice_date <= end_date)
+        
+        query = query.order_by(Invoice.invoice_date.desc()).limit(limit)
+        return fetch_rows(InvoiceRow, session.execute(query))
+    
     def get_invoice_by_id(self, invoice_id):
-        """Get an invoice by its ID"""
-        return session.query(Invoice).filter_by(id=invoice_id).first()
+        """Get an invoice by its ID, with its entity, lines (and their items) and payments"""
+        return session.query(Invoice).options(
+            joinedload(Invoice.entity),
+            selectinload(Invoice.items).joinedload(InvoiceItem.item),
+            selectinload(Invoice.payments),
+            selectinload(Invoice.allocations)
+        ).filter_by(id=invoice_id).first()
     
     def create_invoice(self, invoice_type, entity_id, items_data, warehouse_id, 
                        invoice_date=None, due_date=None, currency='USD', 
-                       exchange_rate=1.0, additional_costs=0.0, tax=0.0, notes=None):
+                       exchange_rate=1.0, additional_costs=0.0, tax=0.0, notes=None,
+                       reservation_ids=None):
         """Create a new invoice
         
+        Sales only take stock that is available to promise (on hand minus
+        active reservations); the reservations of the sale are fulfilled
+        first, so their held stock becomes available to it.
+        
         Args:
             invoice_type: 'purchase' or 'sale'
             entity_id: ID of supplier or customer
@@ -62,6 +125,7 @@ class InvoiceController:
             additional_costs: Additional costs
             tax: Tax amount
             notes: Additional notes
+            reservation_ids: IDs of active reservations a sale fulfils
         """
         entity = session.query(SupplierCustomer).filter_by(id=entity_id).first()
         
@@ -74,8 +138,11 @@ class InvoiceController:
         elif invoice_type == 'sale' and entity.type not in ['customer', 'both']:
             return False, "Entity is not a customer"
         
-        # Generate unique invoice number
-        invoice_number = f"{invoice_type[:1].upper()}-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
+        # Allocate the next sequential invoice number for this type and year
+        invoice_number, number_year, number_value = invoice_number_allocator.next_number(
+            invoice_type, invoice_date
+        )
+        invoice = None
         
         try:
             # Create invoice
@@ -97,6 +164,15 @@ class InvoiceController:
             session.add(invoice)
             session.flush()  # Get invoice ID without committing
             
+            if invoice_type == 'sale' and reservation_ids:
+                success, error = self.reservation_controller.fulfil_reservations(
+                    reservation_ids, invoice.id, warehouse_id
+                )
+                if not success:
+                    session.rollback()
+                    self._release_invoice_number(invoice, invoice_type, number_year, number_value)
+                    return False, error
+            
             # Process items and update total
             total_amount = 0
             for item_data in items_data:
@@ -105,9 +181,10 @@ class InvoiceController:
                 unit = item_data['unit']
                 price_per_unit = float(item_data['price_per_unit'])
                 
-                item = self.item_controller.get_item_by_id(item_id)
+                item = self.item_controller.get_item_snapshot(item_id)
                 if not item:
                     session.rollback()
+                    self._release_invoice_number(invoice, invoice_type, number_year, number_value)
                     return False, f"Item with ID {item_id} not found"
                 
                 # Calculate total price for this item
@@ -141,12 +218,11 @@ class InvoiceController:
                         quantity_change=quantity_main_unit
                     )
                 else:  # 'sale'
-                    # Decrease stock for sales
-                    self.item_controller.update_stock(
-                        item_id=item_id,
-                        warehouse_id=warehouse_id,
-                        quantity_change=-quantity_main_unit
-                    )
+                    # Decrease stock for sales, never below what others have reserved
+                    if not self.reservation_controller.issue_available(item_id, warehouse_id, quantity_main_unit):
+                        session.rollback()
+                        self._release_invoice_number(invoice, invoice_type, number_year, number_value)
+                        return False, f"Insufficient available stock for {item.name}"
             
             # Update invoice total (including additional costs and tax)
             invoice.total_amount = total_amount + additional_costs + tax
@@ -159,15 +235,25 @@ class InvoiceController:
                 # Increase customer balance (they owe us money)
                 entity.balance += invoice.total_amount
             
+            # Add cost layers for purchases, record cost of goods sold for sales
+            self.costing_controller.post_invoice(invoice)
+            
             session.commit()
             return True, invoice
         except SQLAlchemyError as e:
             session.rollback()
+            self._release_invoice_number(invoice, invoice_type, number_year, number_value)
             return False, f"Database error: {str(e)}"
         except Exception as e:
             session.rollback()
+            self._release_invoice_number(invoice, invoice_type, number_year, number_value)
             return False, f"Error creating invoice: {str(e)}"
     
+    def _release_invoice_number(self, invoice, invoice_type, year, value):
+        """Return an allocated number for reuse unless the invoice row was committed"""
+        if invoice is None or not inspect(invoice).persistent:
+            invoice_number_allocator.release(invoice_type, year, value)
+    
     def record_payment(self, invoice_id, amount, payment_date=None, 
                        payment_method='cash', fund_id=None, notes=None):
         """Record a payment for an invoice
@@ -277,7 +363,7 @@ class InvoiceController:
             
             # Reverse stock changes
             for invoice_item in invoice_items:
-                item = self.item_controller.get_item_by_id(invoice_item.item_id)
+                item = self.item_controller.get_item_snapshot(invoice_item.item_id)
                 
                 # Convert to main unit if needed
                 quantity_main_unit = invoice_item.quantity
@@ -314,8 +400,13 @@ class InvoiceController:
                 # Decrease customer balance (they no longer owe us)
                 entity.balance -= remaining_amount
             
+            # Reverse cost layers and cost of goods sold
+            self.costing_controller.reverse_invoice(invoice)
+            
             # Mark invoice as cancelled
             invoice.status = 'cancelled'
+            invoice.cancelled_at = datetime.utcnow()
+            invoice.cancelled_amount = remaining_amount
             
             session.commit()
             return True, "Invoice cancelled successfully"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Invoice numbering for ASSI Warehouse Management System
+
+Sequential per-type, per-year invoice numbers backed by the
+invoice_sequences counter table. Each process reserves blocks of numbers
+in a short transaction of its own and hands them out from memory, so
+concurrent workers never contend on the counter row while an invoice
+transaction is open.
+"""
+
+import os
+import heapq
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from database.db_setup import engine
+from models.invoice import InvoiceSequence
+
+# Defaults can be overridden per deployment
+DEFAULT_BLOCK_SIZE = int(os.environ.get('INVOICE_NUMBER_BLOCK_SIZE', '20'))
+DEFAULT_FORMAT = os.environ.get('INVOICE_NUMBER_FORMAT', '{prefix}-{year}-{number:06d}')
+DEFAULT_PREFIXES = {
+    'purchase': 'P',
+    'sale': 'S',
+    'transfer': 'T',
+    'count': 'C',
+}
+
+def invoice_year(invoice_date=None):
+    """Get the numbering year for an invoice date (datetime or 'YYYY-MM-DD')"""
+    if isinstance(invoice_date, datetime):
+        return invoice_date.year
+    if isinstance(invoice_date, str) and len(invoice_date) >= 4 and invoice_date[:4].isdigit():
+        return int(invoice_date[:4])
+    return datetime.utcnow().year
+
+
+class InvoiceNumberAllocator:
+    """Hands out invoice numbers from blocks reserved in the counter table"""
+
+    def __init__(self, bind=None, block_size=None, number_format=None, prefixes=None):
+        """Create an allocator
+
+        Args:
+            bind: Engine used for block reservations (defaults to the app engine)
+            block_size: Numbers reserved per database round trip
+            number_format: str.format pattern with {prefix}, {type}, {year} and {number}
+            prefixes: Mapping of invoice type to number prefix
+        """
+        self.bind = bind if bind is not None else engine
+        self.block_size = max(1, int(block_size or DEFAULT_BLOCK_SIZE))
+        self.number_format = number_format or DEFAULT_FORMAT
+        self.prefixes = dict(prefixes or DEFAULT_PREFIXES)
+        self._lock = threading.Lock()
+        self._blocks = {}    # (type, year) -> [next, end] (end exclusive)
+        self._released = {}  # (type, year) -> heap of returned numbers
+
+        # A forked worker must not hand out numbers from its parent's block
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Forget reserved blocks (called in forked children)"""
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._released = {}
+
+    def reserve_block(self, invoice_type, year, size=None):
+        """Reserve a contiguous block of numbers in the counter table
+
+        Returns:
+            Tuple (first, end) where end is exclusive
+        """
+        size = size or self.block_size
+        table = InvoiceSequence.__table__
+        key_filter = (table.c.invoice_type == invoice_type) & (table.c.year == year)
+
+        while True:
+            with self.bind.begin() as conn:
+                new_next = conn.execute(
+                    update(table)
+                    .where(key_filter)
+                    .values(next_value=table.c.next_value + size, updated_at=datetime.utcnow())
+                    .returning(table.c.next_value)
+                ).scalar()
+
+                if new_next is not None:
+                    return new_next - size, new_next
+
+            # First number of this type and year: create the counter row
+            try:
+                with self.bind.begin() as conn:
+                    conn.execute(insert(table).values(
+                        invoice_type=invoice_type,
+                        year=year,
+                        next_value=1 + size,
+                        updated_at=datetime.utcnow()
+                    ))
+                return 1, 1 + size
+            except IntegrityError:
+                # Another worker created it concurrently; reserve from its row
+                continue
+
+    def next_value(self, invoice_type, year=None):
+        """Get the next sequence value for an invoice type and year"""
+        key = (invoice_type, year or datetime.utcnow().year)
+
+        with self._lock:
+            released = self._released.get(key)
+            if released:
+                return heapq.heappop(released)
+
+            block = self._blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                block = list(self.reserve_block(*key))
+                self._blocks[key] = block
+
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def release(self, invoice_type, year, value):
+        """Return an unused value (e.g. after a rolled back invoice) for reuse"""
+        with self._lock:
+            heapq.heappush(self._released.setdefault((invoice_type, year), []), value)
+
+    def format_number(self, invoice_type, year, value):
+        """Format a sequence value as an invoice number"""
+        return self.number_format.format(
+            prefix=self.prefixes.get(invoice_type, invoice_type[:1].upper()),
+            type=invoice_type,
+            year=year,
+            number=value
+        )
+
+    def next_number(self, invoice_type, invoice_date=None):
+        """Allocate the next invoice number
+
+        Returns:
+            Tuple (invoice_number, year, value)
+        """
+        year = invoice_year(invoice_date)
+        value = self.next_value(invoice_type, year)
+        return self.format_number(invoice_type, year, value), year, value
+
+    def peek_counter(self, invoice_type, year):
+        """Read the stored counter (next unreserved value) for diagnostics"""
+        table = InvoiceSequence.__table__
+        with self.bind.connect() as conn:
+            return conn.execute(
+                select(table.c.next_value).where(
+                    (table.c.invoice_type == invoice_type) & (table.c.year == year)
+                )
+            ).scalar()
+
+# Shared allocator for the application
+invoice_number_allocator = InvoiceNumberAllocator()
@@ -5,39 +5,116 @@
 Item controller for ASSI Warehouse Management System
 """
 
-from database.db_setup import session
-from models.item import Item, ItemStock
-from models.warehouse import Warehouse
+from database.db_setup import session, chunked
+from models.item import Item, ItemStock, ItemBarcode
+from models.rows import ItemRow, fetch_rows
+from database.identity_cache import item_cache, warehouse_cache, item_code_index, record_bulk_write
+from controllers.costing_controller import CostingController, QUANTITY_EPSILON
+from controllers.stock_transfer_controller import StockTransferController
+from sqlalchemy import select, func, insert, update, bindparam
+from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
 class ItemController:
     """Controller for item operations"""
     
-    def get_all_items(self, active_only=True):
-        """Get all items, optionally filtering for active ones only"""
+    def __init__(self):
+        self.costing_controller = CostingController()
+        self.stock_transfer_controller = StockTransferController()
+    
+    def get_all_items(self, active_only=True, with_stock=False):
+        """Get all items, optionally filtering for active ones only
+        
+        Args:
+            active_only: Only active items
+            with_stock: Load each item's stocks (for get_total_stock()) in one extra query
+        """
         query = session.query(Item)
+        if with_stock:
+            query = query.options(selectinload(Item.stocks))
         if active_only:
             query = query.filter_by(is_active=True)
         return query.all()
     
+    def get_item_rows(self, active_only=True):
+        """Get items as lightweight read-only rows with their total stock
+        
+        Returns:
+            List of ItemRow ordered by ID
+        """
+        stock = select(
+            ItemStock.item_id,
+            func.sum(ItemStock.quantity).label('total_stock')
+        ).group_by(ItemStock.item_id).subquery()
+        
+        query = select(
+            Item.id,
+            Item.name,
+            Item.main_unit,
+            Item.sub_unit,
+            Item.conversion_rate,
+            Item.purchase_price,
+            Item.selling_price,
+            Item.is_active,
+            func.coalesce(stock.c.total_stock, 0.0).label('total_stock')
+        ).outerjoin(stock, stock.c.item_id == Item.id)
+        
+        if active_only:
+            query = query.where(Item.is_active == True)
+        
+        return fetch_rows(ItemRow, session.execute(query.order_by(Item.id)))
+    
     def get_item_by_id(self, item_id):
         """Get an item by its ID"""
         return session.query(Item).filter_by(id=item_id).first()
     
+    def get_item_snapshot(self, item_id):
+        """Get a cached read-only snapshot of an item (ItemSnapshot), or None
+        
+        Use get_item_by_id() to modify the item.
+        """
+        return item_cache.get(item_id)
+    
+    def get_item_by_code(self, code):
+        """Get the snapshot of the item with a barcode or SKU (hash index lookup), or None"""
+        item_id = item_code_index.get(code)
+        return item_cache.get(item_id) if item_id is not None else None
+    
+    def _code_owner(self, code):
+        """Get the ID of the item already using a code as barcode or SKU, or None"""
+        owner = session.execute(select(ItemBarcode.item_id).where(ItemBarcode.code == code)).scalar()
+        if owner is None:
+            owner = session.execute(select(Item.id).where(Item.sku == code)).scalar()
+        return owner
+    
     def create_item(self, name, main_unit, sub_unit, conversion_rate, 
-                    purchase_price, selling_price, description=None):
-        """Create a new item"""
+                    purchase_price, selling_price, description=None, sku=None, barcodes=None):
+        """Create a new item
+        
+        Args:
+            sku: Optional stock keeping unit (unique)
+            barcodes: Optional list of barcodes (unique)
+        """
+        sku = (sku or '').strip() or None
+        codes = [code for code in dict.fromkeys((code or '').strip() for code in barcodes or ()) if code]
+        
+        for code in ([sku] if sku else []) + codes:
+            if self._code_owner(code) is not None:
+                return False, f"Code {code} is already used by another item"
+        
         try:
             item = Item(
                 name=name,
                 description=description,
+                sku=sku,
                 main_unit=main_unit,
                 sub_unit=sub_unit,
                 conversion_rate=float(conversion_rate),
                 purchase_price=float(purchase_price),
                 selling_price=float(selling_price)
             )
+            item.barcodes = [ItemBarcode(code=code) for code in codes]
             
             session.add(item)
             session.commit()
@@ -50,16 +127,28 @@ class ItemController:
     
     def update_item(self, item_id, name=None, description=None, main_unit=None, 
                     sub_unit=None, conversion_rate=None, purchase_price=None, 
-                    selling_price=None, is_active=None):
-        """Update an existing item"""
+                    selling_price=None, is_active=None, sku=None):
+        """Update an existing item
+        
+        Args:
+            sku: New stock keeping unit ('' clears it)
+        """
         item = self.get_item_by_id(item_id)
         
         if not item:
             return False, "Item not found"
         
+        new_sku = (sku or '').strip() or None
+        if new_sku:
+            owner = self._code_owner(new_sku)
+            if owner is not None and owner != item.id:
+                return False, f"Code {new_sku} is already used by another item"
+        
         try:
             if name is not None:
                 item.name = name
+            if sku is not None:
+                item.sku = new_sku
             if description is not None:
                 item.description = description
             if main_unit is not None:
@@ -103,8 +192,8 @@ class ItemController:
                            or absolute quantity if is_absolute=True
             is_absolute: If True, sets the stock to the exact quantity_change value
         """
-        item = self.get_item_by_id(item_id)
-        warehouse = session.query(Warehouse).filter_by(id=warehouse_id).first()
+        item = self.get_item_snapshot(item_id)
+        warehouse = warehouse_cache.get(warehouse_id)
         
         if not item:
             return False, "Item not found"
@@ -115,7 +204,7 @@ class ItemController:
         try:
             stock = session.query(ItemStock).filter_by(
                 item_id=item_id, warehouse_id=warehouse_id
-            ).first()
+            ).with_for_update().first()
             
             if not stock:
                 # Create new stock entry if it doesn't exist
@@ -127,15 +216,23 @@ class ItemController:
                 session.add(stock)
             
             # Update quantity
+            old_quantity = stock.quantity or 0.0
             if is_absolute:
                 stock.quantity = float(quantity_change)
             else:
-                stock.quantity += float(quantity_change)
+                stock.quantity = old_quantity + float(quantity_change)
                 
                 # Prevent negative stock unless specifically allowed
                 if stock.quantity < 0:
+                    session.rollback()
                     return False, "Insufficient stock quantity"
             
+            # Stock held by reservations cannot be removed
+            reserved = stock.reserved_quantity or 0.0
+            if stock.quantity < old_quantity and stock.quantity < reserved - QUANTITY_EPSILON:
+                session.rollback()
+                return False, f"Insufficient available stock quantity ({reserved:g} reserved)"
+            
             stock.updated_at = datetime.utcnow()
             session.commit()
             return True, stock
@@ -146,60 +243,33 @@ class ItemController:
             return False, f"Error updating stock: {str(e)}"
     
     def transfer_stock(self, item_id, from_warehouse_id, to_warehouse_id, quantity):
-        """Transfer stock of an item from one warehouse to another"""
-        item = self.get_item_by_id(item_id)
-        from_warehouse = session.query(Warehouse).filter_by(id=from_warehouse_id).first()
-        to_warehouse = session.query(Warehouse).filter_by(id=to_warehouse_id).first()
+        """Transfer stock of an item from one warehouse to another
+        
+        Posts a one-line stock transfer that is dispatched and received in
+        a single transaction.
+        """
+        item = self.get_item_snapshot(item_id)
         
         if not item:
             return False, "Item not found"
         
-        if not from_warehouse:
-            return False, "Source warehouse not found"
-        
-        if not to_warehouse:
-            return False, "Destination warehouse not found"
+        success, result = self.stock_transfer_controller.create_transfer(
+            from_warehouse_id,
+            to_warehouse_id,
+            [{'item_id': item.id, 'quantity': quantity, 'unit': item.main_unit}],
+            receive=True
+        )
         
-        from_stock = self.get_item_stock(item_id, from_warehouse_id)
+        if not success:
+            return False, result
         
-        if not from_stock or from_stock.quantity < quantity:
-            return False, "Insufficient stock in source warehouse"
-        
-        try:
-            # Remove from source warehouse
-            remove_result, _ = self.update_stock(
-                item_id=item_id,
-                warehouse_id=from_warehouse_id,
-                quantity_change=-quantity
-            )
-            
-            if not remove_result:
-                return False, "Failed to remove stock from source warehouse"
-            
-            # Add to destination warehouse
-            add_result, _ = self.update_stock(
-                item_id=item_id,
-                warehouse_id=to_warehouse_id,
-                quantity_change=quantity
-            )
-            
-            if not add_result:
-                # Rollback if adding fails
-                self.update_stock(
-                    item_id=item_id,
-                    warehouse_id=from_warehouse_id,
-                    quantity_change=quantity
-                )
-                return False, "Failed to add stock to destination warehouse"
-            
-            return True, {
-                'item': item.name,
-                'from_warehouse': from_warehouse.name,
-                'to_warehouse': to_warehouse.name,
-                'quantity': quantity
-            }
-        except Exception as e:
-            return False, f"Error transferring stock: {str(e)}"
+        return True, {
+            'item': item.name,
+            'from_warehouse': warehouse_cache.get(result.from_warehouse_id).name,
+            'to_warehouse': warehouse_cache.get(result.to_warehouse_id).name,
+            'quantity': quantity,
+            'transfer_number': result.transfer_number
+        }
     
     def get_low_stock_items(self, threshold=10):
         """Get items with low stock (below threshold)"""
@@ -214,3 +284,160 @@ class ItemController:
                 })
         
         return low_stock_items
+    
+    def get_barcodes(self, item_id):
+        """Get the barcodes of an item, oldest first"""
+        return session.execute(
+            select(ItemBarcode.code).where(ItemBarcode.item_id == item_id).order_by(ItemBarcode.id)
+        ).scalars().all()
+    
+    def add_barcode(self, item_id, code):
+        """Add a barcode to an item
+        
+        Returns:
+            Tuple (success, ItemBarcode or error message)
+        """
+        code = (code or '').strip()
+        if not code:
+            return False, "Barcode is required"
+        
+        if not item_cache.get(item_id):
+            return False, "Item not found"
+        
+        owner = self._code_owner(code)
+        if owner is not None:
+            return False, f"Code {code} is already used by {'this' if owner == int(item_id) else 'another'} item"
+        
+        try:
+            barcode = ItemBarcode(item_id=int(item_id), code=code)
+            session.add(barcode)
+            session.commit()
+            return True, barcode
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+    
+    def remove_barcode(self, item_id, code):
+        """Remove a barcode from an item
+        
+        Returns:
+            Tuple (success, None or error message)
+        """
+        barcode = session.query(ItemBarcode).filter_by(item_id=item_id, code=(code or '').strip()).first()
+        if not barcode:
+            return False, "Barcode not found"
+        
+        try:
+            session.delete(barcode)
+            session.commit()
+            return True, None
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+    
+    def import_barcodes(self, rows, replace=False):
+        """Import barcodes in bulk
+        
+        Rows are checked with one query per IN_CLAUSE_SIZE codes and
+        inserted with one executemany per chunk, in a single transaction.
+        Invalid rows are skipped and reported; the others are imported.
+        
+        Args:
+            rows: Iterable of dictionaries with code and either item_id or sku
+            replace: Move barcodes that belong to another item instead of
+                reporting them
+        
+        Returns:
+            Tuple (success, dict with imported, moved, unchanged and errors
+            (list of (row number, message)) or error message)
+        """
+        errors = []
+        wanted = {}  # code -> (row number, item_id or None, sku or None)
+        for number, row in enumerate(rows, start=1):
+            code = str(row.get('code') or '').strip()
+            sku = str(row.get('sku') or '').strip() or None
+            item_id = row.get('item_id')
+            if not code:
+                errors.append((number, "Barcode is required"))
+                continue
+            try:
+                item_id = int(item_id) if item_id not in (None, '') else None
+            except (TypeError, ValueError):
+                errors.append((number, f"Invalid item ID {item_id}"))
+                continue
+            if item_id is None and sku is None:
+                errors.append((number, "Item ID or SKU is required"))
+                continue
+            if code in wanted:
+                errors.append((number, f"Barcode {code} is repeated (row {wanted[code][0]})"))
+                continue
+            wanted[code] = (number, item_id, sku)
+        
+        try:
+            # Resolve SKUs and check item IDs
+            skus = {sku for _, item_id, sku in wanted.values() if item_id is None}
+            sku_items = {}
+            for chunk in chunked(sorted(skus)):
+                sku_items.update(session.execute(select(Item.sku, Item.id).where(Item.sku.in_(chunk))).all())
+            existing_items = item_cache.load_many(item_id for _, item_id, _ in wanted.values() if item_id is not None)
+            
+            targets = {}
+            for code, (number, item_id, sku) in wanted.items():
+                if item_id is None:
+                    item_id = sku_items.get(sku)
+                    if item_id is None:
+                        errors.append((number, f"No item with SKU {sku}"))
+                        continue
+                elif item_id not in existing_items:
+                    errors.append((number, f"Item with ID {item_id} not found"))
+                    continue
+                targets[code] = (number, item_id)
+            
+            # Codes already in use as barcodes or SKUs
+            barcode_owners = {}
+            sku_owners = {}
+            for chunk in chunked(sorted(targets)):
+                barcode_owners.update(session.execute(
+                    select(ItemBarcode.code, ItemBarcode.item_id).where(ItemBarcode.code.in_(chunk))
+                ).all())
+                sku_owners.update(session.execute(select(Item.sku, Item.id).where(Item.sku.in_(chunk))).all())
+            
+            new_rows = []
+            moved_rows = []
+            unchanged = 0
+            for code, (number, item_id) in targets.items():
+                if sku_owners.get(code, item_id) != item_id:
+                    errors.append((number, f"Code {code} is the SKU of another item"))
+                elif code not in barcode_owners:
+                    new_rows.append({'item_id': item_id, 'code': code})
+                elif barcode_owners[code] == item_id:
+                    unchanged += 1
+                elif replace:
+                    moved_rows.append({'barcode_code': code, 'new_item_id': item_id})
+                else:
+                    errors.append((number, f"Barcode {code} belongs to another item"))
+            
+            if new_rows or moved_rows:
+                now = datetime.utcnow()
+                for chunk in chunked(new_rows):
+                    session.execute(insert(ItemBarcode), [dict(row, created_at=now) for row in chunk])
+                if moved_rows:
+                    barcodes = ItemBarcode.__table__
+                    session.execute(
+                        update(barcodes).where(barcodes.c.code == bindparam('barcode_code')).values(
+                            item_id=bindparam('new_item_id')),
+                        moved_rows
+                    )
+                record_bulk_write(item_code_index)
+            
+            session.commit()
+            errors.sort()
+            return True, {
+                'imported': len(new_rows),
+                'moved': len(moved_rows),
+                'unchanged': unchanged,
+                'errors': errors
+            }
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Payment allocation controller for ASSI Warehouse Management System
+
+Applies on-account payments across an entity's open invoices, oldest
+first (FIFO by invoice date) or by due date. Open invoices are read in
+keyset-paginated batches from the open-invoice indexes, so entities with
+tens of thousands of open invoices are never loaded at once.
+"""
+
+from database.db_setup import session
+from models.invoice import Invoice
+from models.supplier_customer import SupplierCustomer, Payment, PaymentAllocation
+from sqlalchemy import func, and_, or_, union_all, select
+from sqlalchemy.exc import SQLAlchemyError
+
+# Invoice statuses that can still receive payments
+OPEN_STATUSES = ('pending', 'partially_paid')
+
+# Amounts below this are treated as fully settled (float rounding)
+EPSILON = 0.005
+
+class PaymentAllocationController:
+    """Controller for allocating payments to open invoices"""
+
+    def get_unallocated_amount(self, payment_id):
+        """Get the part of a payment not yet applied to any invoice"""
+        payment = session.query(Payment).filter_by(id=payment_id).first()
+
+        if not payment:
+            return 0.0
+
+        if payment.invoice_id:
+            # Payments recorded against an invoice are fully applied
+            return 0.0
+
+        allocated = session.query(
+            func.coalesce(func.sum(PaymentAllocation.amount), 0.0)
+        ).filter(PaymentAllocation.payment_id == payment_id).scalar()
+
+        return payment.amount - allocated
+
+    def _open_invoices_query(self, entity_id, invoice_type):
+        """Base query for an entity's open invoices of one type"""
+        return session.query(Invoice).filter(
+            Invoice.entity_id == entity_id,
+            Invoice.type == invoice_type,
+            Invoice.status.in_(OPEN_STATUSES)
+        )
+
+    def _keyset_batches(self, query, sort_column, batch_size):
+        """Yield batches of invoices ordered by (sort_column, id) using keyset pagination"""
+        last_value = last_id = None
+
+        while True:
+            page = query
+            if last_id is not None:
+                page = page.filter(or_(
+                    sort_column > last_value,
+                    and_(sort_column == last_value, Invoice.id > last_id)
+                ))
+
+            batch = page.order_by(sort_column, Invoice.id).limit(batch_size).all()
+            if not batch:
+                return
+
+            yield batch
+
+            last_value = getattr(batch[-1], sort_column.key)
+            last_id = batch[-1].id
+
+    def iter_open_invoices(self, entity_id, invoice_type, strategy='fifo', batch_size=500):
+        """Yield an entity's open invoices in allocation order, batch by batch
+
+        Args:
+            entity_id: ID of supplier or customer
+            invoice_type: 'purchase' or 'sale'
+            strategy: 'fifo' (invoice date) or 'due_date' (earliest due first,
+                      invoices without a due date last in FIFO order)
+            batch_size: Invoices loaded per query
+        """
+        query = self._open_invoices_query(entity_id, invoice_type)
+
+        if strategy == 'due_date':
+            yield from self._keyset_batches(
+                query.filter(Invoice.due_date.isnot(None)), Invoice.due_date, batch_size
+            )
+            yield from self._keyset_batches(
+                query.filter(Invoice.due_date.is_(None)), Invoice.invoice_date, batch_size
+            )
+        else:
+            yield from self._keyset_batches(query, Invoice.invoice_date, batch_size)
+
+    def _paid_amounts(self, invoice_ids):
+        """Get amounts already paid per invoice (direct payments and allocations) in one query"""
+        paid = union_all(
+            select(Payment.invoice_id.label('invoice_id'), Payment.amount.label('amount'))
+            .where(Payment.invoice_id.in_(invoice_ids)),
+            select(PaymentAllocation.invoice_id, PaymentAllocation.amount)
+            .where(PaymentAllocation.invoice_id.in_(invoice_ids))
+        ).subquery()
+
+        rows = session.execute(
+            select(paid.c.invoice_id, func.sum(paid.c.amount)).group_by(paid.c.invoice_id)
+        ).all()
+
+        return {invoice_id: amount for invoice_id, amount in rows}
+
+    def apply_payment(self, payment, invoice_type, strategy='fifo', batch_size=500):
+        """Allocate a payment's unapplied amount without committing
+
+        Must be called inside the caller's transaction; the entity row is
+        locked (where the database supports it) so concurrent allocations
+        for the same entity are serialized.
+
+        Returns:
+            Dictionary with allocated and unallocated amounts and the
+            number of invoices touched
+        """
+        # Serialize allocations per entity
+        session.query(SupplierCustomer).filter_by(id=payment.entity_id).with_for_update().first()
+
+        remaining = payment.amount
+        if payment.id is not None:
+            remaining -= session.query(
+                func.coalesce(func.sum(PaymentAllocation.amount), 0.0)
+            ).filter(PaymentAllocation.payment_id == payment.id).scalar()
+
+        allocated = 0.0
+        invoices_touched = 0
+
+        if remaining > EPSILON:
+            for batch in self.iter_open_invoices(payment.entity_id, invoice_type, strategy, batch_size):
+                paid_amounts = self._paid_amounts([invoice.id for invoice in batch])
+
+                for invoice in batch:
+                    open_amount = invoice.total_amount - paid_amounts.get(invoice.id, 0.0)
+
+                    if open_amount <= EPSILON:
+                        # Status was stale; the invoice is already settled
+                        invoice.status = 'paid'
+                        continue
+
+                    applied = min(open_amount, remaining)
+                    session.add(PaymentAllocation(
+                        payment=payment,
+                        invoice_id=invoice.id,
+                        amount=applied
+                    ))
+                    invoice.status = 'paid' if open_amount - applied <= EPSILON else 'partially_paid'
+
+                    allocated += applied
+                    remaining -= applied
+                    invoices_touched += 1
+
+                    if remaining <= EPSILON:
+                        break
+
+                # Keep the unit of work small between batches
+                session.flush()
+
+                if remaining <= EPSILON:
+                    break
+
+        return {
+            'allocated': allocated,
+            'unallocated': max(remaining, 0.0),
+            'invoices': invoices_touched
+        }
+
+    def allocate_payment(self, payment_id, invoice_type=None, strategy='fifo', batch_size=500):
+        """Allocate an on-account payment across the entity's open invoices
+
+        Args:
+            payment_id: ID of the payment
+            invoice_type: 'purchase' or 'sale'; inferred from the entity type
+                          when omitted (required for entities marked 'both')
+            strategy: 'fifo' or 'due_date'
+            batch_size: Invoices loaded per query
+
+        Returns:
+            Tuple (success, allocation summary or error message)
+        """
+        payment = session.query(Payment).filter_by(id=payment_id).first()
+
+        if not payment:
+            return False, "Payment not found"
+
+        if payment.invoice_id:
+            return False, "Payment is already linked to an invoice"
+
+        if strategy not in ('fifo', 'due_date'):
+            return False, "Invalid strategy. Must be 'fifo' or 'due_date'"
+
+        if invoice_type is None:
+            entity_type = payment.entity.type
+            if entity_type == 'supplier':
+                invoice_type = 'purchase'
+            elif entity_type == 'customer':
+                invoice_type = 'sale'
+            else:
+                return False, "Invoice type is required for entities that are both supplier and customer"
+
+        try:
+            result = self.apply_payment(payment, invoice_type, strategy, batch_size)
+            session.commit()
+            return True, result
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error allocating payment: {str(e)}"
@@ -5,29 +5,153 @@
 Report controller for ASSI Warehouse Management System
 """
 
-from database.db_setup import session
+import os
+
+from database.db_setup import session, session_factory, read_only
 from models.report import Report
 from models.invoice import Invoice, InvoiceItem
-from models.supplier_customer import SupplierCustomer, Payment
+from models.supplier_customer import SupplierCustomer, Payment, PaymentAllocation
 from models.fund import Fund, FundTransaction
 from models.item import Item, ItemStock
 from models.expense import Expense, ExpenseCategory
+from models.inventory_cost import ItemCost, CostOfGoodsSold
 
-from sqlalchemy import func, desc, extract
+from sqlalchemy import func, desc, extract, case, select, union_all, literal, and_, or_, cast, Date, Integer
 import json
 from datetime import datetime, timedelta
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
 from io import BytesIO
 import base64
 
-# Configure matplotlib to use a non-GUI backend
-matplotlib.use('Agg')
+# pandas and matplotlib are imported on first use to keep startup fast
+from utils.lazy_imports import load_pandas, load_numpy, load_pyplot, is_dataframe
+from utils.cache import TTLCache, invalidate_on_commit
+from utils.export import export_to_csv
+from controllers.payment_allocation_controller import OPEN_STATUSES, EPSILON
+from controllers.costing_controller import CostingController
+from controllers.warehouse_controller import WarehouseController
+from controllers.archive_controller import ledger_tables
+from models.archive import HOT
+
+# Aging buckets as (key, label, maximum days past due); None means no upper limit
+AGING_BUCKETS = (
+    ('current', 'Current', 0),
+    ('days_1_30', '1-30 Days', 30),
+    ('days_31_60', '31-60 Days', 60),
+    ('days_61_90', '61-90 Days', 90),
+    ('days_91_120', '91-120 Days', 120),
+    ('days_over_120', '120+ Days', None),
+)
+
+def _aging_as_of(as_of=None):
+    """Normalize the aging reference date (datetime, 'YYYY-MM-DD' or None for today)"""
+    if isinstance(as_of, str) and as_of:
+        as_of = datetime.strptime(as_of[:10], '%Y-%m-%d')
+    if not isinstance(as_of, datetime):
+        as_of = datetime.now()
+    return as_of.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Seconds analytics results are reused (other processes see writes after at most this long)
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', '60'))
+
+# Models whose changes affect the analytics
+_ANALYTICS_MODELS = (Invoice, InvoiceItem, CostOfGoodsSold, ItemCost, Item, ItemStock,
+                     Expense, Payment, PaymentAllocation)
+
+_analytics_cache = TTLCache(ttl=REPORT_CACHE_TTL, max_entries=128)
+
+def _range_key(start_date, end_date):
+    """Cache key part for a date range, truncated to the minute
+
+    Ranges ending "now" are recomputed at most once a minute instead of
+    on every request.
+    """
+    def truncate(value):
+        if isinstance(value, datetime):
+            return value.replace(second=0, microsecond=0)
+        return value
+    return truncate(start_date), truncate(end_date)
+
+def _usd(amount, currency_column, rate_column):
+    """SQL expression converting an amount to USD (exchange rates are units per USD)"""
+    return amount / case(
+        (or_(currency_column == 'USD', rate_column.is_(None), rate_column == 0), 1.0),
+        else_=rate_column
+    )
+
+def _line_quantity(tables=HOT):
+    """SQL expression for an invoice line's quantity in the item's main unit (joins Item)"""
+    line = tables.invoice_item
+    return case(
+        (and_(line.unit == Item.sub_unit, Item.sub_unit != Item.main_unit),
+         line.quantity / Item.conversion_rate),
+        else_=line.quantity
+    )
+
+def _line_cost(tables=HOT):
+    """SQL expression for a sale line's FIFO cost (outer-joins the storage's COGS entries)
+
+    Lines posted before costing was enabled fall back to the list purchase price.
+    """
+    return func.coalesce(tables.cogs.fifo_cost, _line_quantity(tables) * Item.purchase_price)
+
+def _sale_lines(tables, start_date, end_date, *columns):
+    """Select columns over a storage's non-cancelled sale lines in a date range
+
+    Joins the invoice, the item and (outer) the line's COGS entry.
+    """
+    line, invoice, cogs = tables.invoice_item, tables.invoice, tables.cogs
+    return select(*columns).select_from(line).join(
+        invoice, invoice.id == line.invoice_id
+    ).join(
+        Item, Item.id == line.item_id
+    ).outerjoin(
+        cogs, cogs.invoice_item_id == line.id
+    ).where(
+        invoice.type == 'sale',
+        invoice.status != 'cancelled',
+        invoice.invoice_date >= start_date,
+        invoice.invoice_date <= end_date,
+        *tables.line_dates(start_date, end_date)
+    )
+
+def _combine(branches, group_columns, sum_columns):
+    """Re-aggregate per-storage grouped selects into one
+
+    A single branch (the range does not reach the archive) is returned
+    as it is.
+
+    Args:
+        branches: Selects grouped by group_columns, one per storage
+        group_columns: Labels of the grouping columns
+        sum_columns: Labels of the summed columns
+    """
+    if len(branches) == 1:
+        return branches[0]
+    combined = union_all(*branches).subquery('storages')
+    keys = [combined.c[name] for name in group_columns]
+    return select(
+        *keys, *(func.sum(combined.c[name]).label(name) for name in sum_columns)
+    ).group_by(*keys)
+
+def _period_start(column, period):
+    """SQL expression truncating a datetime column to the start of a day or month"""
+    if session.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(period, column)
+    return func.strftime('%Y-%m-01' if period == 'month' else '%Y-%m-%d', column)
+
+def _days_since(as_of, column):
+    """SQL expression for the calendar days from a datetime column's date to as_of's date"""
+    if session.get_bind().dialect.name == 'postgresql':
+        return cast(literal(as_of.date()), Date) - cast(column, Date)
+    return cast(func.julianday(as_of.strftime('%Y-%m-%d')) - func.julianday(func.date(column)), Integer)
 
 class ReportController:
     """Controller for generating reports"""
     
+    def __init__(self):
+        self.costing_controller = CostingController()
+        self.warehouse_controller = WarehouseController()
+    
     def save_report(self, name, report_type, parameters, created_by=None, is_favorite=False):
         """Save a report configuration for future use"""
         try:
@@ -71,8 +195,14 @@ class ReportController:
         
         return query.all()
     
+    @read_only
     def generate_sales_report(self, start_date=None, end_date=None, customer_id=None, include_chart=True):
-        """Generate a sales report with optional filtering"""
+        """Generate a sales report with optional filtering
+
+        Lists the invoices in the hot tables only: archived invoices are
+        settled and are covered by the analytics methods and statements.
+        """
+        pd = load_pandas()
         if not start_date:
             start_date = datetime.now() - timedelta(days=30)
         if not end_date:
@@ -111,6 +241,7 @@ class ReportController:
         # Prepare chart if requested
         chart_base64 = None
         if include_chart and date_sales:
+            plt = load_pyplot()
             plt.figure(figsize=(10, 6))
             dates = list(date_sales.keys())
             sales = list(date_sales.values())
@@ -162,12 +293,14 @@ class ReportController:
             'raw_invoices': invoices
         }
     
+    @read_only
     def generate_inventory_report(self, warehouse_id=None):
         """Generate an inventory report, optionally for a specific warehouse"""
+        pd = load_pandas()
         if warehouse_id:
-            # Query for specific warehouse
-            stocks = session.query(ItemStock).filter_by(warehouse_id=warehouse_id).all()
-            warehouse_name = stocks[0].warehouse.name if stocks else "Unknown Warehouse"
+            # Stock rows carry the item and warehouse columns, so no per-row lazy loads
+            stocks = self.warehouse_controller.get_stock_rows(warehouse_id)
+            warehouse_name = stocks[0].warehouse_name if stocks else "Unknown Warehouse"
         else:
             # Group by item and sum quantities across all warehouses
             stocks = session.query(
@@ -184,27 +317,22 @@ class ReportController:
             ).all()
             warehouse_name = "All Warehouses"
         
-        # Calculate inventory value
-        total_value = 0
-        if warehouse_id:
-            for stock in stocks:
-                total_value += stock.quantity * stock.item.purchase_price
-        else:
-            for item_id, name, unit, purchase_price, selling_price, quantity in stocks:
-                total_value += quantity * purchase_price
+        # Value stock at cost (FIFO layers; list price for stock without layers)
+        item_values = self.costing_controller.get_stock_values(warehouse_id)
+        total_value = sum(item_values.values())
         
         # Prepare data for DataFrame
         data = []
         if warehouse_id:
             for stock in stocks:
                 data.append({
-                    'Item ID': stock.item.id,
-                    'Item Name': stock.item.name,
-                    'Unit': stock.item.main_unit,
+                    'Item ID': stock.item_id,
+                    'Item Name': stock.item_name,
+                    'Unit': stock.main_unit,
                     'Quantity': stock.quantity,
-                    'Purchase Price': stock.item.purchase_price,
-                    'Selling Price': stock.item.selling_price,
-                    'Value': stock.quantity * stock.item.purchase_price
+                    'Purchase Price': stock.purchase_price,
+                    'Selling Price': stock.selling_price,
+                    'Value': item_values.get(stock.item_id, 0.0)
                 })
         else:
             for item_id, name, unit, purchase_price, selling_price, quantity in stocks:
@@ -215,7 +343,7 @@ class ReportController:
                     'Quantity': quantity,
                     'Purchase Price': purchase_price,
                     'Selling Price': selling_price,
-                    'Value': quantity * purchase_price
+                    'Value': item_values.get(item_id, 0.0)
                 })
         
         # Create DataFrame
@@ -234,8 +362,10 @@ class ReportController:
             'data': df
         }
     
+    @read_only
     def generate_financial_report(self, start_date=None, end_date=None, include_chart=True):
         """Generate a financial report for a specific period"""
+        pd = load_pandas()
         if not start_date:
             start_date = datetime.now() - timedelta(days=30)
         if not end_date:
@@ -244,14 +374,19 @@ class ReportController:
         # Get funds
         funds = session.query(Fund).all()
         
+        storages = ledger_tables(start_date)
+
         # Get income (sales invoices)
-        sales = session.query(
-            func.sum(Invoice.total_amount).label('total_sales')
-        ).filter(
-            Invoice.type == 'sale',
-            Invoice.invoice_date >= start_date,
-            Invoice.invoice_date <= end_date
-        ).scalar() or 0
+        sales = sum(
+            session.query(
+                func.sum(tables.invoice.total_amount).label('total_sales')
+            ).filter(
+                tables.invoice.type == 'sale',
+                tables.invoice.invoice_date >= start_date,
+                tables.invoice.invoice_date <= end_date
+            ).scalar() or 0
+            for tables in storages
+        )
         
         # Get expenses
         expenses = session.query(
@@ -262,13 +397,16 @@ class ReportController:
         ).scalar() or 0
         
         # Get purchases
-        purchases = session.query(
-            func.sum(Invoice.total_amount).label('total_purchases')
-        ).filter(
-            Invoice.type == 'purchase',
-            Invoice.invoice_date >= start_date,
-            Invoice.invoice_date <= end_date
-        ).scalar() or 0
+        purchases = sum(
+            session.query(
+                func.sum(tables.invoice.total_amount).label('total_purchases')
+            ).filter(
+                tables.invoice.type == 'purchase',
+                tables.invoice.invoice_date >= start_date,
+                tables.invoice.invoice_date <= end_date
+            ).scalar() or 0
+            for tables in storages
+        )
         
         # Calculate profit
         profit = sales - expenses - purchases
@@ -291,6 +429,7 @@ class ReportController:
         # Prepare chart if requested
         chart_base64 = None
         if include_chart:
+            plt = load_pyplot()
             plt.figure(figsize=(12, 6))
             
             # Financial Summary Pie Chart
@@ -383,8 +522,10 @@ class ReportController:
             'expenses': expenses_df
         }
     
+    @read_only
     def generate_receivables_payables_report(self):
         """Generate a report of receivables (customer debts) and payables (supplier debts)"""
+        pd = load_pandas()
         # Get customers with outstanding balances
         customers = session.query(SupplierCustomer).filter(
             SupplierCustomer.type.in_(['customer', 'both']),
@@ -449,8 +590,554 @@ class ReportController:
             'payables': suppliers_df
         }
     
+    def _analytics_range(self, start_date=None, end_date=None):
+        """Normalize an analytics date range (datetimes or 'YYYY-MM-DD'; default last 30 days)"""
+        if isinstance(start_date, str) and start_date:
+            start_date = datetime.strptime(start_date[:10], '%Y-%m-%d')
+        if isinstance(end_date, str) and end_date:
+            end_date = datetime.strptime(end_date[:10], '%Y-%m-%d').replace(
+                hour=23, minute=59, second=59, microsecond=999999)
+        if not end_date:
+            end_date = datetime.now()
+        if not start_date:
+            start_date = end_date - timedelta(days=30)
+        return start_date, end_date
+
+    def _query_item_performance(self, start_date, end_date, period, limit):
+        """Run the grouped item performance query and return a DataFrame"""
+        pd = load_pandas()
+        np = load_numpy()
+
+        group_names = ['item_id', 'name', 'unit']
+        if period:
+            group_names.insert(0, 'period')
+
+        branches = []
+        for tables in ledger_tables(start_date):
+            invoice = tables.invoice
+            group_columns = [Item.id.label('item_id'), Item.name.label('name'), Item.main_unit.label('unit')]
+            if period:
+                group_columns.insert(0, _period_start(invoice.invoice_date, period).label('period'))
+
+            branches.append(_sale_lines(
+                tables, start_date, end_date,
+                *group_columns,
+                func.sum(_line_quantity(tables)).label('quantity'),
+                func.sum(_usd(tables.invoice_item.total_price, invoice.currency, invoice.exchange_rate)).label('revenue'),
+                func.sum(_line_cost(tables)).label('cost')
+            ).group_by(*group_columns))
+
+        query = _combine(branches, group_names, ('quantity', 'revenue', 'cost'))
+
+        if period:
+            query = query.order_by(query.selected_columns.period, desc('revenue'))
+        else:
+            query = query.order_by(desc('revenue'))
+        if limit:
+            query = query.limit(limit)
+
+        result = session.execute(query)
+        df = pd.DataFrame(result.all(), columns=list(result.keys()))
+        if df.empty:
+            df = pd.DataFrame(columns=list(result.keys()))
+
+        for column in ('quantity', 'revenue', 'cost'):
+            df[column] = df[column].astype(float)
+        if period:
+            df['period'] = pd.to_datetime(df['period'])
+
+        revenue_values = df['revenue'].to_numpy()
+        df['margin'] = revenue_values - df['cost'].to_numpy()
+        df['margin_pct'] = np.divide(
+            df['margin'].to_numpy() * 100.0, revenue_values,
+            out=np.zeros(len(df)), where=revenue_values != 0
+        )
+
+        # Share of revenue within the period (or the whole range)
+        totals = df.groupby('period')['revenue'].transform('sum').to_numpy() if period else df['revenue'].sum()
+        df['revenue_share'] = np.divide(
+            revenue_values * 100.0, totals,
+            out=np.zeros(len(df)), where=np.asarray(totals) != 0
+        )
+
+        return df
+
+    @read_only
+    def get_item_performance(self, start_date=None, end_date=None, period=None, limit=None):
+        """Get quantity, revenue, cost and margin per item (optionally per period)
+
+        Aggregation happens in one grouped query over sale invoice lines;
+        margins and shares are computed on whole columns. Results are cached
+        per date range until a relevant commit or REPORT_CACHE_TTL seconds.
+
+        Args:
+            start_date: Range start (datetime or 'YYYY-MM-DD'; default 30 days before end)
+            end_date: Range end, inclusive (default now)
+            period: None for the whole range, or 'day' / 'month'
+            limit: Maximum rows, highest revenue first (per range, not per period)
+
+        Returns:
+            DataFrame with columns [period,] item_id, name, unit, quantity
+            (main unit), revenue, cost, margin (USD), margin_pct and
+            revenue_share (percent)
+        """
+        if period not in (None, 'day', 'month'):
+            raise ValueError(f"Unsupported period: {period}")
+
+        start_date, end_date = self._analytics_range(start_date, end_date)
+        df = _analytics_cache.get_or_set(
+            ('item_performance', _range_key(start_date, end_date), period, limit),
+            lambda: self._query_item_performance(start_date, end_date, period, limit)
+        )
+        # The cached frame is shared; callers get their own copy
+        return df.copy()
+
+    @read_only
+    def get_top_selling_items(self, start_date=None, end_date=None, limit=5):
+        """Get the items with the highest sales revenue in a date range
+
+        Returns:
+            List of dictionaries with item_id, name, unit, quantity, total
+            (revenue in USD), cost, margin, margin_pct and percentage
+            (revenue relative to the best seller)
+        """
+        df = self.get_item_performance(start_date, end_date, limit=limit)
+        if df.empty:
+            return []
+
+        best = df['revenue'].max()
+        df['percentage'] = (df['revenue'] / best * 100.0) if best else 0.0
+        df = df.rename(columns={'revenue': 'total'})
+
+        return df[['item_id', 'name', 'unit', 'quantity', 'total', 'cost',
+                   'margin', 'margin_pct', 'percentage']].to_dict('records')
+
+    def _query_sales_purchases(self, start_date, end_date, period):
+        """Run the grouped sales/purchases totals query and return chart series"""
+        pd = load_pandas()
+
+        branches = []
+        for tables in ledger_tables(start_date):
+            invoice = tables.invoice
+            period_column = _period_start(invoice.invoice_date, period).label('period')
+            branches.append(select(
+                period_column,
+                invoice.type.label('type'),
+                func.sum(_usd(invoice.total_amount, invoice.currency, invoice.exchange_rate)).label('total')
+            ).where(
+                invoice.status != 'cancelled',
+                invoice.invoice_date >= start_date,
+                invoice.invoice_date <= end_date
+            ).group_by(period_column, invoice.type))
+
+        result = session.execute(_combine(branches, ('period', 'type'), ('total',)))
+        df = pd.DataFrame(result.all(), columns=['period', 'type', 'total'])
+
+        frequency = 'MS' if period == 'month' else 'D'
+        first = pd.Timestamp(start_date).to_period('M').to_timestamp() if period == 'month' \
+            else pd.Timestamp(start_date).normalize()
+        index = pd.date_range(first, pd.Timestamp(end_date).normalize(), freq=frequency)
+
+        if df.empty:
+            series = pd.DataFrame(0.0, index=index, columns=['sale', 'purchase'])
+        else:
+            df['period'] = pd.to_datetime(df['period'])
+            df['total'] = df['total'].astype(float)
+            series = df.pivot_table(index='period', columns='type', values='total', aggfunc='sum')
+            series = series.reindex(index=index, columns=['sale', 'purchase'], fill_value=0.0).fillna(0.0)
+
+        label_format = '%Y-%m' if period == 'month' else '%Y-%m-%d'
+        return {
+            'labels': list(index.strftime(label_format)),
+            'sales': series['sale'].round(2).tolist(),
+            'purchases': series['purchase'].round(2).tolist()
+        }
+
+    @read_only
+    def generate_sales_purchases_chart(self, start_date=None, end_date=None, period='day'):
+        """Get sales and purchase totals per day (or month) for charting
+
+        Periods without invoices are filled with zeros.
+
+        Returns:
+            Dictionary with labels, sales and purchases lists (USD)
+        """
+        if period not in ('day', 'month'):
+            raise ValueError(f"Unsupported period: {period}")
+
+        start_date, end_date = self._analytics_range(start_date, end_date)
+        return _analytics_cache.get_or_set(
+            ('sales_purchases', _range_key(start_date, end_date), period),
+            lambda: self._query_sales_purchases(start_date, end_date, period)
+        )
+
+    def _query_financial_summary(self, start_date, end_date):
+        """Run the financial summary query"""
+        storages = ledger_tables(start_date)
+
+        def invoice_total(invoice_type):
+            return sum(
+                select(func.coalesce(func.sum(
+                    _usd(invoice.total_amount, invoice.currency, invoice.exchange_rate)
+                ), 0.0)).where(
+                    invoice.type == invoice_type,
+                    invoice.status != 'cancelled',
+                    invoice.invoice_date >= start_date,
+                    invoice.invoice_date <= end_date
+                ).scalar_subquery()
+                for invoice in (tables.invoice for tables in storages)
+            )
+
+        cost_of_goods = sum(
+            _sale_lines(tables, start_date, end_date, func.coalesce(func.sum(_line_cost(tables)), 0.0)).scalar_subquery()
+            for tables in storages
+        )
+
+        expenses = select(func.coalesce(func.sum(
+            _usd(Expense.amount, Expense.currency, Expense.exchange_rate)
+        ), 0.0)).where(
+            Expense.expense_date >= start_date,
+            Expense.expense_date <= end_date
+        ).scalar_subquery()
+
+        row = session.execute(select(
+            invoice_total('sale').label('revenue'),
+            invoice_total('purchase').label('purchases'),
+            cost_of_goods.label('cost_of_goods'),
+            expenses.label('expenses')
+        )).one()
+
+        gross_profit = row.revenue - row.cost_of_goods
+        net_profit = gross_profit - row.expenses
+
+        return {
+            'total_revenue': row.revenue,
+            'total_purchases': row.purchases,
+            'cost_of_goods': row.cost_of_goods,
+            'gross_profit': gross_profit,
+            'total_expenses': row.expenses,
+            'net_profit': net_profit,
+            'profit_margin': (net_profit / row.revenue * 100) if row.revenue else 0.0
+        }
+
+    @read_only
+    def get_financial_summary(self, start_date=None, end_date=None):
+        """Get revenue, purchases, cost of goods sold, expenses and profit for a date range
+
+        Returns:
+            Dictionary with total_revenue, total_purchases, cost_of_goods,
+            gross_profit, total_expenses, net_profit (USD) and profit_margin
+            (percent of revenue)
+        """
+        start_date, end_date = self._analytics_range(start_date, end_date)
+        return _analytics_cache.get_or_set(
+            ('financial_summary', _range_key(start_date, end_date)),
+            lambda: self._query_financial_summary(start_date, end_date)
+        )
+
+    def _query_inventory_status(self, low_stock_threshold):
+        """Run the inventory status query"""
+        item_quantities = select(
+            Item.id.label('item_id'),
+            func.coalesce(func.sum(ItemStock.quantity), 0.0).label('quantity')
+        ).outerjoin(
+            ItemStock, ItemStock.item_id == Item.id
+        ).where(
+            Item.is_active == True
+        ).group_by(Item.id).subquery()
+
+        quantity = item_quantities.c.quantity
+        row = session.execute(select(
+            func.count(item_quantities.c.item_id).label('total_items'),
+            func.coalesce(func.sum(case((quantity >= low_stock_threshold, 1), else_=0)), 0).label('in_stock'),
+            func.coalesce(func.sum(case((and_(quantity > 0, quantity < low_stock_threshold), 1), else_=0)), 0).label('low_stock'),
+            func.coalesce(func.sum(case((quantity <= 0, 1), else_=0)), 0).label('out_of_stock')
+        )).one()
+
+        return {
+            'total_items': row.total_items,
+            'in_stock_count': row.in_stock,
+            'low_stock_count': row.low_stock,
+            'out_of_stock_count': row.out_of_stock,
+            'total_value': self.costing_controller.get_inventory_value()
+        }
+
+    @read_only
+    def get_inventory_status(self, low_stock_threshold=10):
+        """Get stock level counts of active items and the inventory value
+
+        Args:
+            low_stock_threshold: Total quantity (all warehouses) below which
+                                 an item in stock counts as low
+
+        Returns:
+            Dictionary with total_items, in_stock_count, low_stock_count,
+            out_of_stock_count and total_value (FIFO, USD)
+        """
+        return _analytics_cache.get_or_set(
+            ('inventory_status', low_stock_threshold),
+            lambda: self._query_inventory_status(low_stock_threshold)
+        )
+
+    def _query_receivables_payables(self):
+        """Run the open receivables/payables totals query"""
+        remainders = self._open_remainders(_aging_as_of())
+        usd_remainder = _usd(remainders.c.remainder, remainders.c.currency, remainders.c.exchange_rate)
+
+        totals = {
+            row.invoice_type: row
+            for row in session.execute(
+                select(
+                    remainders.c.invoice_type,
+                    func.sum(usd_remainder).label('total'),
+                    func.count(func.distinct(remainders.c.entity_id)).label('entities')
+                ).group_by(remainders.c.invoice_type)
+            )
+        }
+
+        receivables = totals.get('sale')
+        payables = totals.get('purchase')
+        total_receivables = receivables.total if receivables else 0.0
+        total_payables = payables.total if payables else 0.0
+
+        return {
+            'total_receivables': total_receivables,
+            'total_payables': total_payables,
+            'receivables_count': receivables.entities if receivables else 0,
+            'payables_count': payables.entities if payables else 0,
+            'balance': total_receivables - total_payables
+        }
+
+    @read_only
+    def get_receivables_payables_summary(self):
+        """Get open receivables and payables totals from unpaid invoice remainders
+
+        Returns:
+            Dictionary with total_receivables, total_payables (USD),
+            receivables_count, payables_count (entities with open invoices)
+            and balance (receivables minus payables)
+        """
+        return _analytics_cache.get_or_set(
+            ('receivables_payables', _aging_as_of()),
+            self._query_receivables_payables
+        )
+
+    @staticmethod
+    def invalidate_analytics():
+        """Drop cached analytics results in this process"""
+        _analytics_cache.invalidate()
+
+    def _open_remainders(self, as_of, invoice_type=None, currency=None, entity_id=None):
+        """Subquery of open invoice remainders with their days past due and aging bucket
+
+        Paid amounts (direct payments and allocations) are summed per
+        invoice in the database, so no invoice rows are loaded in Python.
+        """
+        paid = union_all(
+            select(Payment.invoice_id.label('invoice_id'), Payment.amount.label('amount'))
+            .where(Payment.invoice_id.isnot(None)),
+            select(PaymentAllocation.invoice_id, PaymentAllocation.amount)
+        ).subquery()
+
+        paid_totals = select(
+            paid.c.invoice_id,
+            func.sum(paid.c.amount).label('paid')
+        ).group_by(paid.c.invoice_id).subquery()
+
+        remainder = Invoice.total_amount - func.coalesce(paid_totals.c.paid, 0.0)
+        due_date = func.coalesce(Invoice.due_date, Invoice.invoice_date)
+
+        # Days past due and the bucket both come from the calendar-day
+        # difference, so detail rows always agree with their bucket
+        days = _days_since(as_of, due_date)
+        days_past_due = case((days > 0, days), else_=0)
+        whens = []
+        for key, _label, max_days in AGING_BUCKETS:
+            if max_days is not None:
+                whens.append((days_past_due <= max_days, literal(key)))
+        bucket = case(*whens, else_=literal(AGING_BUCKETS[-1][0]))
+
+        query = select(
+            Invoice.id.label('invoice_id'),
+            Invoice.entity_id.label('entity_id'),
+            Invoice.type.label('invoice_type'),
+            Invoice.currency.label('currency'),
+            Invoice.exchange_rate.label('exchange_rate'),
+            remainder.label('remainder'),
+            days_past_due.label('days_past_due'),
+            bucket.label('bucket')
+        ).outerjoin(
+            paid_totals, paid_totals.c.invoice_id == Invoice.id
+        ).where(
+            Invoice.status.in_(OPEN_STATUSES),
+            Invoice.invoice_date < as_of + timedelta(days=1),
+            remainder > EPSILON
+        )
+
+        if invoice_type:
+            query = query.where(Invoice.type == invoice_type)
+        if currency:
+            query = query.where(Invoice.currency == currency)
+        if entity_id:
+            query = query.where(Invoice.entity_id == entity_id)
+
+        return query.subquery()
+
+    @read_only
+    def generate_aging_report(self, invoice_type=None, as_of=None, currency=None, page=1, per_page=50):
+        """Generate a receivables/payables aging report
+
+        Open invoice remainders are summed into Current, 1-30, 31-60, 61-90,
+        91-120 and 120+ days past due buckets per entity, invoice type and
+        currency in a single grouped query; totals and pages are taken
+        from its (per-entity sized) result.
+
+        Args:
+            invoice_type: 'sale' (receivables), 'purchase' (payables) or None for both
+            as_of: Reference date (datetime or 'YYYY-MM-DD'), defaults to today
+            currency: Optional currency filter
+            page: Page number (1-based)
+            per_page: Rows per page, or None for all rows
+
+        Returns:
+            Dictionary with rows, totals per invoice type and currency,
+            and pagination details
+        """
+        as_of = _aging_as_of(as_of)
+        remainders = self._open_remainders(as_of, invoice_type, currency)
+
+        bucket_sums = [
+            func.sum(case((remainders.c.bucket == key, remainders.c.remainder), else_=0.0)).label(key)
+            for key, _label, _max_days in AGING_BUCKETS
+        ]
+
+        aging = select(
+            remainders.c.entity_id,
+            remainders.c.invoice_type,
+            remainders.c.currency,
+            *bucket_sums,
+            func.sum(remainders.c.remainder).label('total'),
+            func.count().label('invoice_count')
+        ).group_by(
+            remainders.c.entity_id,
+            remainders.c.invoice_type,
+            remainders.c.currency
+        ).subquery()
+
+        query = select(
+            aging,
+            SupplierCustomer.name.label('entity_name')
+        ).join(
+            SupplierCustomer, SupplierCustomer.id == aging.c.entity_id
+        ).order_by(
+            desc(aging.c.total), aging.c.entity_id, aging.c.invoice_type, aging.c.currency
+        )
+
+        # One row per entity, type and currency: small enough to total and
+        # paginate here instead of re-running the aggregation per page
+        all_rows = [dict(row._mapping) for row in session.execute(query)]
+
+        amount_keys = [key for key, _label, _max_days in AGING_BUCKETS] + ['total', 'invoice_count']
+        totals = {}
+        for row in all_rows:
+            total = totals.setdefault((row['invoice_type'], row['currency']), {
+                'invoice_type': row['invoice_type'],
+                'currency': row['currency'],
+                **{key: 0 for key in amount_keys}
+            })
+            for key in amount_keys:
+                total[key] += row[key]
+
+        page = max(1, int(page or 1))
+        total_rows = len(all_rows)
+        rows = all_rows[(page - 1) * per_page:page * per_page] if per_page else all_rows
+
+        return {
+            'as_of': as_of,
+            'buckets': [(key, label) for key, label, _max_days in AGING_BUCKETS],
+            'rows': rows,
+            'totals': [totals[key] for key in sorted(totals)],
+            'page': page,
+            'per_page': per_page,
+            'total_rows': total_rows,
+            'pages': (total_rows + per_page - 1) // per_page if per_page else 1
+        }
+
+    @read_only
+    def get_entity_aging_detail(self, entity_id, invoice_type=None, as_of=None, currency=None, page=1, per_page=50):
+        """Get the open invoices behind an entity's aging row
+
+        Args:
+            entity_id: ID of supplier or customer
+            invoice_type: 'sale', 'purchase' or None for both
+            as_of: Reference date (datetime or 'YYYY-MM-DD'), defaults to today
+            currency: Optional currency filter
+            page: Page number (1-based)
+            per_page: Rows per page, or None for all rows
+
+        Returns:
+            Dictionary with the invoices (oldest due first) and pagination details
+        """
+        as_of = _aging_as_of(as_of)
+        remainders = self._open_remainders(as_of, invoice_type, currency, entity_id)
+        due_date = func.coalesce(Invoice.due_date, Invoice.invoice_date)
+
+        query = select(
+            Invoice.id,
+            Invoice.invoice_number,
+            Invoice.type,
+            Invoice.invoice_date,
+            Invoice.due_date,
+            Invoice.currency,
+            Invoice.total_amount,
+            remainders.c.remainder,
+            remainders.c.days_past_due,
+            remainders.c.bucket
+        ).join(
+            remainders, remainders.c.invoice_id == Invoice.id
+        ).order_by(due_date, Invoice.id)
+
+        page = max(1, int(page or 1))
+        if per_page:
+            query = query.limit(per_page).offset((page - 1) * per_page)
+
+        invoices = [dict(row._mapping) for row in session.execute(query)]
+
+        total_rows = session.execute(select(func.count()).select_from(remainders)).scalar()
+
+        return {
+            'as_of': as_of,
+            'entity': session.query(SupplierCustomer).filter_by(id=entity_id).first(),
+            'invoices': invoices,
+            'page': page,
+            'per_page': per_page,
+            'total_rows': total_rows,
+            'pages': (total_rows + per_page - 1) // per_page if per_page else 1
+        }
+
+    @read_only
+    def export_aging_report(self, invoice_type=None, as_of=None, currency=None):
+        """Export the full aging report to CSV
+
+        Returns:
+            Path to created file or empty string if export failed
+        """
+        report = self.generate_aging_report(invoice_type, as_of, currency, per_page=None)
+
+        columns = {
+            'entity_id': 'Entity ID',
+            'entity_name': 'Name',
+            'invoice_type': 'Type',
+            'currency': 'Currency',
+        }
+        columns.update({key: label for key, label in report['buckets']})
+        columns.update({'total': 'Total', 'invoice_count': 'Invoices'})
+
+        return export_to_csv(report['rows'], f"aging_report_{report['as_of']:%Y%m%d}", columns)
+
     def export_to_excel(self, report_data, filename=None):
         """Export report data to Excel"""
+        pd = load_pandas()
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"report_{timestamp}.xlsx"
@@ -466,8 +1153,12 @@ class ReportController:
             
             # Write data sheets
             for key, value in report_data.items():
-                if key == 'summary' or not isinstance(value, pd.DataFrame):
+                if key == 'summary' or not is_dataframe(value):
                     continue
                 value.to_excel(writer, sheet_name=key.capitalize(), index=False)
         
         return filename
+
+
+# Invalidate on commits that wrote analyzed tables
+invalidate_on_commit(_analytics_cache, session_factory, _ANALYTICS_MODELS)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock reservation controller for ASSI Warehouse Management System
+
+Reservations hold stock for quotes and orders being picked. Each stock
+row keeps the total of its active reservations in reserved_quantity, so
+the quantity available to promise (ATP) is quantity - reserved_quantity
+and is read without summing reservations.
+
+Holds and sales take stock with one conditional UPDATE each
+("... WHERE quantity - reserved_quantity >= :quantity"). The database
+re-checks the condition against the latest row under its row lock, so
+concurrent requests for the last units cannot both succeed. Expired
+reservations are closed in batches by expire_reservations() (see
+manage.py expire-reservations); a hold that finds expired reservations
+still counted sweeps them for its item first.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func, case, and_, bindparam
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, read_only
+from models.item import Item, ItemStock
+from models.warehouse import Warehouse
+from models.reservation import StockReservation
+from models.rows import ReservationRow, fetch_rows
+from database.identity_cache import item_cache, warehouse_cache
+from controllers.costing_controller import QUANTITY_EPSILON, quantity_in_main_unit
+
+# Minutes a reservation holds stock unless the caller gives an expiry
+DEFAULT_HOLD_MINUTES = int(os.environ.get('RESERVATION_HOLD_MINUTES', '60'))
+
+# Reservations expired per statement (and commit) by expire_reservations()
+EXPIRY_BATCH_SIZE = 1000
+
+def _stock_row_id(item_id, warehouse_id):
+    """Subquery for the ID of the stock row that holds an item's reservations in a warehouse
+
+    Always the oldest row, so duplicate stock rows never count a hold twice.
+    """
+    stock = aliased(ItemStock)
+    return select(func.min(stock.id)).where(
+        stock.item_id == item_id, stock.warehouse_id == warehouse_id
+    ).scalar_subquery()
+
+
+class ReservationController:
+    """Controller for stock reservations and available-to-promise quantities"""
+
+    def _hold(self, item_id, warehouse_id, quantity):
+        """Add quantity to a stock row's reserved quantity if that much is available (no commit)
+
+        Returns:
+            True if the stock was held
+        """
+        stocks = ItemStock.__table__
+        result = session.execute(
+            update(stocks).where(
+                stocks.c.id == _stock_row_id(item_id, warehouse_id),
+                stocks.c.quantity - stocks.c.reserved_quantity >= quantity - QUANTITY_EPSILON
+            ).values(reserved_quantity=stocks.c.reserved_quantity + quantity)
+        )
+        return result.rowcount > 0
+
+    def _unhold(self, closed):
+        """Take closed reservations off their stock rows' reserved quantities (no commit)
+
+        Args:
+            closed: Rows of (id, item_id, warehouse_id, quantity)
+        """
+        totals = {}
+        for _, item_id, warehouse_id, quantity in closed:
+            totals[(item_id, warehouse_id)] = totals.get((item_id, warehouse_id), 0.0) + quantity
+
+        stocks = ItemStock.__table__
+        reserved = stocks.c.reserved_quantity - bindparam('released')
+        session.execute(
+            update(stocks).where(
+                stocks.c.id == _stock_row_id(bindparam('stock_item_id'), bindparam('stock_warehouse_id'))
+            ).values(reserved_quantity=case((reserved > 0, reserved), else_=0.0)),
+            [{'stock_item_id': item_id, 'stock_warehouse_id': warehouse_id, 'released': quantity}
+             for (item_id, warehouse_id), quantity in totals.items()]
+        )
+
+    def _close(self, condition, status, invoice_id=None):
+        """Close the active reservations matching a condition and release their holds (no commit)
+
+        The status check runs in the UPDATE, so a reservation closed by two
+        requests at once (e.g. released while being swept) is released once.
+
+        Returns:
+            Rows of (id, item_id, warehouse_id, quantity) closed
+        """
+        reservations = StockReservation.__table__
+        values = {'status': status, 'closed_at': datetime.utcnow()}
+        if invoice_id is not None:
+            values['invoice_id'] = invoice_id
+
+        closed = session.execute(
+            update(reservations).where(
+                condition, reservations.c.status == 'active'
+            ).values(**values).returning(
+                reservations.c.id, reservations.c.item_id, reservations.c.warehouse_id, reservations.c.quantity
+            )
+        ).all()
+        if closed:
+            self._unhold(closed)
+        return closed
+
+    def _available_quantity(self, item_id, warehouse_id):
+        """Get the quantity of an item available to promise in a warehouse"""
+        return session.execute(
+            select(func.coalesce(func.sum(ItemStock.quantity - ItemStock.reserved_quantity), 0.0)).where(
+                ItemStock.item_id == item_id, ItemStock.warehouse_id == warehouse_id
+            )
+        ).scalar()
+
+    def reserve(self, warehouse_id, lines, expires_at=None, hold_minutes=None,
+                reference=None, entity_id=None, created_by=None):
+        """Reserve stock for a quote or order
+
+        All lines are reserved or none are.
+
+        Args:
+            warehouse_id: ID of the warehouse
+            lines: List of dictionaries with item_id, quantity and optional unit
+                (main or sub unit name; main unit if omitted). Lines of the
+                same item are merged.
+            expires_at: When the reservations expire (UTC)
+            hold_minutes: Minutes until they expire, if expires_at is not given
+                (DEFAULT_HOLD_MINUTES if neither is)
+            reference: Quote or order number
+            entity_id: ID of the customer
+            created_by: ID of the user making the reservation
+
+        Returns:
+            Tuple (success, list of StockReservation or error message)
+        """
+        warehouse = warehouse_cache.get(warehouse_id)
+        if not warehouse:
+            return False, "Warehouse not found"
+
+        if not lines:
+            return False, "A reservation needs at least one line"
+
+        try:
+            items = item_cache.load_many(int(line['item_id']) for line in lines)
+            quantities = {}
+            for line in lines:
+                item = items.get(int(line['item_id']))
+                if not item:
+                    return False, f"Item with ID {line['item_id']} not found"
+
+                quantity = float(line['quantity'])
+                if quantity <= 0:
+                    return False, f"Quantity of {item.name} must be greater than zero"
+
+                quantity = quantity_in_main_unit(item, quantity, line.get('unit') or item.main_unit)
+                quantities[item.id] = quantities.get(item.id, 0.0) + quantity
+        except (KeyError, TypeError, ValueError):
+            return False, "Each line needs a numeric item_id and quantity"
+
+        now = datetime.utcnow()
+        if expires_at is None:
+            expires_at = now + timedelta(minutes=hold_minutes or DEFAULT_HOLD_MINUTES)
+        if expires_at <= now:
+            return False, "Expiry must be in the future"
+
+        reservations = StockReservation.__table__
+        try:
+            # Items in ID order, so concurrent multi-line reservations lock
+            # stock rows in the same order
+            for item_id in sorted(quantities):
+                quantity = quantities[item_id]
+                if self._hold(item_id, warehouse.id, quantity):
+                    continue
+
+                # Expired reservations may not have been swept yet
+                expired = self._close(and_(
+                    reservations.c.item_id == item_id,
+                    reservations.c.warehouse_id == warehouse.id,
+                    reservations.c.expires_at <= now
+                ), 'expired')
+                if expired and self._hold(item_id, warehouse.id, quantity):
+                    continue
+
+                item = items[item_id]
+                available = self._available_quantity(item_id, warehouse.id)
+                session.rollback()
+                return False, f"Insufficient available stock for {item.name}: {max(available, 0.0):g} {item.main_unit} available"
+
+            created = [
+                StockReservation(
+                    item_id=item_id,
+                    warehouse_id=warehouse.id,
+                    quantity=quantity,
+                    status='active',
+                    reference=reference,
+                    entity_id=entity_id,
+                    expires_at=expires_at,
+                    created_by=created_by,
+                    created_at=now
+                )
+                for item_id, quantity in sorted(quantities.items())
+            ]
+            session.add_all(created)
+            session.commit()
+            return True, created
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error reserving stock: {str(e)}"
+
+    def release_reservation(self, reservation_id):
+        """Release an active reservation, making its stock available again
+
+        Returns:
+            Tuple (success, StockReservation or error message)
+        """
+        reservation = session.query(StockReservation).filter_by(id=reservation_id).first()
+        if not reservation:
+            return False, "Reservation not found"
+
+        try:
+            if not self._close(StockReservation.__table__.c.id == reservation.id, 'released'):
+                session.rollback()
+                return False, f"Reservation is already {reservation.status}"
+
+            session.commit()
+            return True, reservation
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error releasing reservation: {str(e)}"
+
+    def fulfil_reservations(self, reservation_ids, invoice_id, warehouse_id):
+        """Mark reservations as fulfilled by a sales invoice, releasing their holds
+
+        Runs in the caller's transaction (no commit); the invoice then takes
+        the stock with issue_available().
+
+        Args:
+            reservation_ids: IDs of active reservations in the warehouse
+            invoice_id: ID of the sales invoice
+            warehouse_id: ID of the invoice's warehouse
+
+        Returns:
+            Tuple (success, closed rows or error message)
+        """
+        try:
+            ids = {int(reservation_id) for reservation_id in reservation_ids}
+        except (TypeError, ValueError):
+            return False, "Reservation IDs must be integers"
+
+        reservations = StockReservation.__table__
+        closed = self._close(and_(
+            reservations.c.id.in_(ids),
+            reservations.c.warehouse_id == warehouse_id
+        ), 'fulfilled', invoice_id=invoice_id)
+
+        if len(closed) != len(ids):
+            missing = sorted(ids - {row.id for row in closed})
+            return False, f"Reservations not active in this warehouse: {', '.join(map(str, missing))}"
+        return True, closed
+
+    def issue_available(self, item_id, warehouse_id, quantity):
+        """Take stock that is not held by reservations (no commit)
+
+        Returns:
+            True if the quantity was available and taken
+        """
+        stocks = ItemStock.__table__
+        result = session.execute(
+            update(stocks).where(
+                stocks.c.id == _stock_row_id(item_id, warehouse_id),
+                stocks.c.quantity - stocks.c.reserved_quantity >= quantity - QUANTITY_EPSILON
+            ).values(quantity=stocks.c.quantity - quantity, updated_at=datetime.utcnow())
+        )
+        return result.rowcount > 0
+
+    def expire_reservations(self, now=None, batch_size=EXPIRY_BATCH_SIZE):
+        """Expire active reservations past their expiry, releasing their holds
+
+        Each batch is one UPDATE ... RETURNING on the (status, expires_at)
+        index, one executemany on the stock rows and one commit. Rows locked
+        by another sweeper are skipped (PostgreSQL), so sweepers can run in
+        parallel.
+
+        Args:
+            now: Expire reservations due by this time (defaults to now)
+            batch_size: Reservations per batch
+
+        Returns:
+            Tuple (success, number expired or error message)
+        """
+        now = now or datetime.utcnow()
+        reservations = StockReservation.__table__
+        expired = 0
+
+        try:
+            while True:
+                due = select(reservations.c.id).where(
+                    reservations.c.status == 'active',
+                    reservations.c.expires_at <= now
+                ).order_by(reservations.c.expires_at).limit(batch_size).with_for_update(skip_locked=True)
+
+                closed = self._close(reservations.c.id.in_(due), 'expired')
+                session.commit()
+                expired += len(closed)
+                if len(closed) < batch_size:
+                    return True, expired
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+
+    @read_only
+    def get_reservation_rows(self, status=None, warehouse_id=None, item_id=None, reference=None, limit=100):
+        """Get reservations as lightweight read-only rows, newest first
+
+        Args:
+            status: Filter by status
+            warehouse_id: Filter by warehouse
+            item_id: Filter by item
+            reference: Filter by quote or order number
+            limit: Maximum number of rows (None for all)
+
+        Returns:
+            List of ReservationRow
+        """
+        query = select(
+            StockReservation.id,
+            StockReservation.item_id,
+            Item.name.label('item_name'),
+            Item.main_unit,
+            StockReservation.warehouse_id,
+            Warehouse.name.label('warehouse_name'),
+            StockReservation.quantity,
+            StockReservation.status,
+            StockReservation.reference,
+            StockReservation.entity_id,
+            StockReservation.invoice_id,
+            StockReservation.expires_at,
+            StockReservation.created_at,
+            StockReservation.closed_at
+        ).join(
+            Item, Item.id == StockReservation.item_id
+        ).join(
+            Warehouse, Warehouse.id == StockReservation.warehouse_id
+        )
+
+        if status:
+            query = query.where(StockReservation.status == status)
+
+        if warehouse_id:
+            query = query.where(StockReservation.warehouse_id == warehouse_id)
+
+        if item_id:
+            query = query.where(StockReservation.item_id == item_id)
+
+        if reference:
+            query = query.where(StockReservation.reference == reference)
+
+        query = query.order_by(StockReservation.created_at.desc(), StockReservation.id.desc()).limit(limit)
+        return fetch_rows(ReservationRow, session.execute(query))
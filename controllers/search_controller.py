@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Search controller for ASSI Warehouse Management System
+
+Typeahead search over items and suppliers/customers. Uses PostgreSQL
+pg_trgm (with unaccent) when the extensions are installed and an
+in-process n-gram index otherwise. Both normalize names the same way.
+"""
+
+import threading
+from functools import partial
+
+from sqlalchemy import event, func, desc, literal_column, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import object_session
+
+from database.db_setup import session, session_factory, engine, read_only
+from models.item import Item
+from models.supplier_customer import SupplierCustomer
+from utils.text_search import NgramIndex, normalize_name
+
+# Characters folded by the SQL normalization expression; mirrors
+# utils.text_search.normalize_name for Arabic letter variants and
+# Arabic-Indic digits. Characters in _SQL_FOLD_FROM beyond the length of
+# _SQL_FOLD_TO (tatweel and harakat) are deleted by translate().
+_SQL_FOLD_FROM = 'أإآٱىئؤة٠١٢٣٤٥٦٧٨٩ـًٌٍَُِّْٰ'
+_SQL_FOLD_TO = 'ااااييوه0123456789'
+
+# Runs of anything but letters and digits become one space, as _SEPARATORS does
+_SQL_SEPARATORS = '[^[:alnum:]]+'
+
+# unaccent() is only STABLE, so index expressions call it through an
+# IMMUTABLE wrapper with the dictionary fixed
+_UNACCENT_FUNCTION = 'search_unaccent'
+
+# Backend detection and in-process indexes are shared per process
+_trigram_available = None
+_item_index = None
+_entity_index = None
+_index_lock = threading.Lock()
+
+def _sql_normalized(column):
+    """SQL expression normalizing a name column like normalize_name()
+
+    Strips Latin accents (unaccent), folds case and Arabic letter variants
+    and digits, and collapses separators to single spaces. The trigram
+    indexes are built on this same expression.
+    """
+    folded = func.translate(
+        func.lower(getattr(func, _UNACCENT_FUNCTION)(column)),
+        literal_column(f"'{_SQL_FOLD_FROM}'"),
+        literal_column(f"'{_SQL_FOLD_TO}'")
+    )
+    return func.btrim(func.regexp_replace(
+        folded, literal_column(f"'{_SQL_SEPARATORS}'"), literal_column("' '"), literal_column("'g'")
+    ))
+
+def _entity_text(entity):
+    """Searchable text for a supplier/customer"""
+    return f"{entity.name} {entity.phone or ''}"
+
+
+class SearchController:
+    """Controller for typeahead search operations"""
+
+    @staticmethod
+    def ensure_trigram_indexes():
+        """Create pg_trgm GIN indexes on PostgreSQL (no-op elsewhere)
+
+        Returns:
+            True if trigram search is available after the call
+        """
+        global _trigram_available
+
+        if engine.dialect.name != 'postgresql':
+            _trigram_available = False
+            return False
+
+        fold = _sql_normalized(literal_column('name')).compile(
+            dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+        )
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+                conn.execute(text(
+                    f"CREATE OR REPLACE FUNCTION {_UNACCENT_FUNCTION}(text) RETURNS text "
+                    f"LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+                    f"AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+                ))
+                # Indexes on the earlier expression (case and Arabic letters only)
+                conn.execute(text("DROP INDEX IF EXISTS ix_items_name_trgm"))
+                conn.execute(text("DROP INDEX IF EXISTS ix_suppliers_customers_name_trgm"))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_items_name_normalized_trgm "
+                    f"ON items USING gin (({fold}) gin_trgm_ops)"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_suppliers_customers_name_normalized_trgm "
+                    f"ON suppliers_customers USING gin (({fold}) gin_trgm_ops)"
+                ))
+            _trigram_available = True
+        except SQLAlchemyError:
+            # Missing privileges or extension package; fall back to in-process index
+            _trigram_available = None
+
+        return SearchController._use_trigram_sql()
+
+    @staticmethod
+    def _use_trigram_sql():
+        """Check (once per process) whether pg_trgm and the unaccent wrapper can be used"""
+        global _trigram_available
+
+        if _trigram_available is None:
+            _trigram_available = False
+            if engine.dialect.name == 'postgresql':
+                try:
+                    with engine.connect() as conn:
+                        _trigram_available = bool(conn.execute(text(
+                            f"SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') "
+                            f"AND to_regprocedure('{_UNACCENT_FUNCTION}(text)') IS NOT NULL"
+                        )).scalar())
+                except SQLAlchemyError:
+                    _trigram_available = False
+
+        return _trigram_available
+
+    @staticmethod
+    def _get_item_index():
+        """Get the in-process item index, building it on first use"""
+        global _item_index
+
+        if _item_index is None:
+            with _index_lock:
+                if _item_index is None:
+                    index = NgramIndex()
+                    rows = session.query(Item.id, Item.name, Item.is_active).all()
+                    index.build((row.id, row.name, row.is_active) for row in rows)
+                    _item_index = index
+
+        return _item_index
+
+    @staticmethod
+    def _get_entity_index():
+        """Get the in-process supplier/customer index, building it on first use"""
+        global _entity_index
+
+        if _entity_index is None:
+            with _index_lock:
+                if _entity_index is None:
+                    index = NgramIndex()
+                    rows = session.query(
+                        SupplierCustomer.id,
+                        SupplierCustomer.name,
+                        SupplierCustomer.phone,
+                        SupplierCustomer.type
+                    ).all()
+                    index.build((row.id, _entity_text(row), row.type) for row in rows)
+                    _entity_index = index
+
+        return _entity_index
+
+    @staticmethod
+    def _fetch_in_order(model, ids):
+        """Load rows for IDs in one query, preserving the ranking order"""
+        if not ids:
+            return []
+        rows = {row.id: row for row in session.query(model).filter(model.id.in_(ids)).all()}
+        return [rows[row_id] for row_id in ids if row_id in rows]
+
+    @read_only
+    def search_items(self, query, limit=10, active_only=True):
+        """Search items by name
+
+        Args:
+            query: Search text (Arabic or English, any case/diacritics)
+            limit: Maximum number of results
+            active_only: Only return active items
+
+        Returns:
+            List of Item objects ordered by relevance
+        """
+        normalized = normalize_name(query)
+
+        if not normalized:
+            base = session.query(Item)
+            if active_only:
+                base = base.filter_by(is_active=True)
+            return base.order_by(Item.name).limit(limit).all()
+
+        if self._use_trigram_sql():
+            name = _sql_normalized(Item.name)
+            is_prefix = name.startswith(normalized, autoescape=True)
+            base = session.query(Item).filter(is_prefix | name.op('%')(normalized))
+            if active_only:
+                base = base.filter_by(is_active=True)
+            return base.order_by(
+                desc(is_prefix),
+                desc(func.similarity(name, normalized)),
+                Item.name
+            ).limit(limit).all()
+
+        accept = (lambda is_active: bool(is_active)) if active_only else None
+        ids = self._get_item_index().search(normalized, limit=limit, accept=accept)
+        return self._fetch_in_order(Item, ids)
+
+    @read_only
+    def search_entities(self, query, entity_type=None, limit=10):
+        """Search suppliers/customers by name or phone
+
+        Args:
+            query: Search text
+            entity_type: 'supplier', 'customer' or None for all
+                         (entities marked 'both' always match)
+            limit: Maximum number of results
+
+        Returns:
+            List of SupplierCustomer objects ordered by relevance
+        """
+        normalized = normalize_name(query)
+        types = [entity_type, 'both'] if entity_type in ('supplier', 'customer') else None
+
+        if not normalized:
+            base = session.query(SupplierCustomer)
+            if types:
+                base = base.filter(SupplierCustomer.type.in_(types))
+            return base.order_by(SupplierCustomer.name).limit(limit).all()
+
+        if self._use_trigram_sql():
+            name = _sql_normalized(SupplierCustomer.name)
+            is_prefix = name.startswith(normalized, autoescape=True)
+            base = session.query(SupplierCustomer).filter(
+                is_prefix | name.op('%')(normalized) | SupplierCustomer.phone.startswith(normalized, autoescape=True)
+            )
+            if types:
+                base = base.filter(SupplierCustomer.type.in_(types))
+            return base.order_by(
+                desc(is_prefix),
+                desc(func.similarity(name, normalized)),
+                SupplierCustomer.name
+            ).limit(limit).all()
+
+        accept = (lambda tag: tag in types) if types else None
+        ids = self._get_entity_index().search(normalized, limit=limit, accept=accept)
+        return self._fetch_in_order(SupplierCustomer, ids)
+
+
+# Keep in-process indexes in sync with committed writes: flushed changes
+# wait in session.info until the transaction commits, and are dropped on
+# rollback
+_PENDING = 'search_index_changes'
+
+def _queue_change(target, change):
+    """Record an index change of the flushing session's transaction
+
+    Args:
+        target: Flushed instance
+        change: Callable applying the change to the indexes
+    """
+    db_session = object_session(target)
+    if db_session is not None:
+        db_session.info.setdefault(_PENDING, []).append(change)
+
+def _add_item(item_id, name, is_active):
+    if _item_index is not None:
+        _item_index.add(item_id, name, is_active)
+
+def _discard_item(item_id):
+    if _item_index is not None:
+        _item_index.discard(item_id)
+
+def _add_entity(entity_id, text, entity_type):
+    if _entity_index is not None:
+        _entity_index.add(entity_id, text, entity_type)
+
+def _discard_entity(entity_id):
+    if _entity_index is not None:
+        _entity_index.discard(entity_id)
+
+@event.listens_for(Item, 'after_insert')
+@event.listens_for(Item, 'after_update')
+def _index_item(mapper, connection, target):
+    _queue_change(target, partial(_add_item, target.id, target.name, target.is_active))
+
+@event.listens_for(Item, 'after_delete')
+def _unindex_item(mapper, connection, target):
+    _queue_change(target, partial(_discard_item, target.id))
+
+@event.listens_for(SupplierCustomer, 'after_insert')
+@event.listens_for(SupplierCustomer, 'after_update')
+def _index_entity(mapper, connection, target):
+    _queue_change(target, partial(_add_entity, target.id, _entity_text(target), target.type))
+
+@event.listens_for(SupplierCustomer, 'after_delete')
+def _unindex_entity(mapper, connection, target):
+    _queue_change(target, partial(_discard_entity, target.id))
+
+@event.listens_for(session_factory, 'after_commit')
+def _apply_committed_changes(db_session):
+    """Apply the committed transaction's changes to the indexes, in flush order"""
+    for change in db_session.info.pop(_PENDING, ()):
+        change()
+
+@event.listens_for(session_factory, 'after_soft_rollback')
+def _discard_rolled_back_changes(db_session, previous_transaction):
+    if previous_transaction.parent is None:
+        db_session.info.pop(_PENDING, None)
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Statement controller for ASSI Warehouse Management System
+
+Builds supplier/customer statements: invoices and payments merged into one
+chronological ledger with a running balance computed by a SQL window
+function. Pages are fetched with a keyset cursor that carries the balance
+forward, and the opening balance of a period comes from monthly balance
+snapshots plus at most one month of entries. Periods reaching back
+before the archive boundary also read the archived invoices and payments.
+"""
+
+import json
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, union_all, literal, func, and_, or_, delete, update, event
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.attributes import get_history
+
+from database.db_setup import session, engine, read_only
+from models.invoice import Invoice
+from models.supplier_customer import SupplierCustomer, Payment, EntityBalanceSnapshot
+from controllers.archive_controller import ledger_tables
+
+# Entry kinds; invoices sort before payments made at the same moment
+ENTRY_INVOICE = 0
+ENTRY_PAYMENT = 1
+ENTRY_CANCELLATION = 2
+
+def _parse_date(value, end_of_day=False):
+    """Parse a datetime or 'YYYY-MM-DD' string (None passes through)
+
+    Args:
+        value: datetime, date string or None
+        end_of_day: Return the start of the following day for date strings,
+                    so the value can be used as an exclusive upper bound
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.strptime(value[:10], '%Y-%m-%d')
+    return parsed + timedelta(days=1) if end_of_day else parsed
+
+def _month_start(value):
+    """Get midnight on the first day of a datetime's month"""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def encode_cursor(entry):
+    """Encode a statement entry's position and balance as an opaque cursor"""
+    position = {
+        'date': entry['entry_date'].isoformat(),
+        'kind': entry['entry_kind'],
+        'id': entry['entry_id'],
+        'balance': entry['balance']
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor()
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (
+            datetime.fromisoformat(position['date']),
+            int(position['kind']),
+            int(position['id']),
+            float(position['balance'])
+        )
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def _cancellation(tables):
+    """Date and amount of the reversal entry of a storage's cancelled invoices
+
+    cancel_invoice() reverses the unpaid remainder only, so the invoice
+    stays on the statement and the reversal is a credit dated at the
+    cancellation. Invoices cancelled before the amount was stored fall back
+    to their current payments and last update.
+    """
+    invoice, payment, allocation = tables.invoice, tables.payment, tables.allocation
+    paid = select(func.coalesce(func.sum(payment.amount), 0.0)).where(
+        payment.invoice_id == invoice.id
+    ).correlate(invoice).scalar_subquery() + select(func.coalesce(func.sum(allocation.amount), 0.0)).where(
+        allocation.invoice_id == invoice.id
+    ).correlate(invoice).scalar_subquery()
+
+    date = func.coalesce(invoice.cancelled_at, invoice.updated_at, invoice.invoice_date)
+    amount = func.coalesce(invoice.cancelled_amount, invoice.total_amount - paid)
+    return date, amount
+
+
+class StatementController:
+    """Controller for supplier/customer statements"""
+
+    def _ledger(self, entity_id, start=None):
+        """Union of an entity's invoices (debits), payments and cancellations (credits)
+
+        Follows the balance convention of InvoiceController: invoices of
+        either type increase the outstanding balance, and payments and the
+        reversal of a cancelled invoice's unpaid remainder reduce it.
+
+        Args:
+            entity_id: ID of supplier or customer
+            start: Earliest entry date the caller reads; the archive is only
+                   included when it starts before the archive boundary
+        """
+        branches = []
+        for tables in ledger_tables(start):
+            invoice, payment = tables.invoice, tables.payment
+            branches.append(select(
+                invoice.invoice_date.label('entry_date'),
+                literal(ENTRY_INVOICE).label('entry_kind'),
+                invoice.id.label('entry_id'),
+                invoice.type.label('entry_type'),
+                invoice.invoice_number.label('reference'),
+                invoice.currency.label('currency'),
+                invoice.total_amount.label('debit'),
+                literal(0.0).label('credit')
+            ).where(invoice.entity_id == entity_id))
+
+            cancelled_at, reversed_amount = _cancellation(tables)
+            branches.append(select(
+                cancelled_at,
+                literal(ENTRY_CANCELLATION),
+                invoice.id,
+                literal('cancellation'),
+                invoice.invoice_number,
+                invoice.currency,
+                literal(0.0),
+                reversed_amount
+            ).where(
+                invoice.entity_id == entity_id,
+                invoice.status == 'cancelled'
+            ))
+
+            branches.append(select(
+                payment.payment_date,
+                literal(ENTRY_PAYMENT),
+                payment.id,
+                literal('payment'),
+                payment.payment_method,
+                payment.currency,
+                literal(0.0),
+                payment.amount
+            ).where(payment.entity_id == entity_id))
+
+        return union_all(*branches).subquery('ledger')
+
+    def _sum_entries(self, entity_id, start=None, end=None, bind=None):
+        """Sum of statement entries dated in [start, end)
+
+        Args:
+            entity_id: ID of supplier or customer
+            start: Inclusive lower bound or None
+            end: Exclusive upper bound or None
+            bind: Connection to run on (defaults to the session)
+        """
+        bind = bind if bind is not None else session
+
+        total = 0.0
+        for tables in ledger_tables(start):
+            invoice, payment = tables.invoice, tables.payment
+            invoices = select(func.coalesce(func.sum(invoice.total_amount), 0.0)).where(
+                invoice.entity_id == entity_id
+            )
+            payments = select(func.coalesce(func.sum(payment.amount), 0.0)).where(
+                payment.entity_id == entity_id
+            )
+            cancelled_at, reversed_amount = _cancellation(tables)
+            cancellations = select(func.coalesce(func.sum(reversed_amount), 0.0)).where(
+                invoice.entity_id == entity_id,
+                invoice.status == 'cancelled'
+            )
+
+            if start is not None:
+                invoices = invoices.where(invoice.invoice_date >= start)
+                payments = payments.where(payment.payment_date >= start)
+                cancellations = cancellations.where(cancelled_at >= start)
+            if end is not None:
+                invoices = invoices.where(invoice.invoice_date < end)
+                payments = payments.where(payment.payment_date < end)
+                cancellations = cancellations.where(cancelled_at < end)
+
+            total += (bind.execute(invoices).scalar() - bind.execute(payments).scalar()
+                      - bind.execute(cancellations).scalar())
+
+        return total
+
+    def get_snapshot_balance(self, entity_id, month):
+        """Get the balance of all entries before a month start, caching it
+
+        Missing snapshots are built from the nearest earlier snapshot (or
+        from scratch) and stored in a short transaction of their own.
+        Months after the current one are computed but not stored.
+
+        Snapshot writes are serialized against ledger writes through the
+        entity row: the row is locked (where the database supports it)
+        while the snapshot is built, and the snapshot is only stored if
+        the entity's statement_version, bumped by every invalidation, is
+        unchanged, so an invalidation by a concurrent writer is never lost.
+        """
+        snapshot = session.query(EntityBalanceSnapshot).filter(
+            EntityBalanceSnapshot.entity_id == entity_id,
+            EntityBalanceSnapshot.snapshot_date == month
+        ).first()
+
+        if snapshot:
+            return snapshot.balance
+
+        store = month <= _month_start(datetime.utcnow())
+        entities = SupplierCustomer.__table__
+        snapshots = EntityBalanceSnapshot.__table__
+
+        try:
+            with engine.begin() as conn:
+                version = None
+                if store:
+                    version = conn.execute(
+                        select(entities.c.statement_version).where(entities.c.id == entity_id).with_for_update()
+                    ).scalar()
+
+                base_snapshot = conn.execute(
+                    select(snapshots.c.snapshot_date, snapshots.c.balance).where(
+                        snapshots.c.entity_id == entity_id,
+                        snapshots.c.snapshot_date < month
+                    ).order_by(snapshots.c.snapshot_date.desc()).limit(1)
+                ).first()
+
+                start = base_snapshot.snapshot_date if base_snapshot else None
+                base = base_snapshot.balance if base_snapshot else 0.0
+                balance = base + self._sum_entries(entity_id, start, month, bind=conn)
+
+                if version is not None:
+                    # Recheck the version in the insert itself (databases without
+                    # row locks only block here, behind the writer's commit)
+                    conn.execute(snapshots.insert().from_select(
+                        ['entity_id', 'snapshot_date', 'balance', 'created_at'],
+                        select(
+                            literal(entity_id),
+                            literal(month),
+                            literal(balance),
+                            literal(datetime.utcnow())
+                        ).where(select(entities.c.statement_version).where(
+                            entities.c.id == entity_id
+                        ).scalar_subquery() == version)
+                    ))
+        except IntegrityError:
+            # Stored concurrently by another worker; our value is equally valid
+            pass
+
+        return balance
+
+    def get_opening_balance(self, entity_id, as_of):
+        """Get an entity's balance just before a date
+
+        Args:
+            entity_id: ID of supplier or customer
+            as_of: datetime; entries dated before it are included
+        """
+        month = _month_start(as_of)
+        return self.get_snapshot_balance(entity_id, month) + self._sum_entries(entity_id, month, as_of)
+
+    @read_only
+    def get_statement(self, entity_id, start_date=None, end_date=None, cursor=None, limit=100):
+        """Get a page of an entity's statement with running balances
+
+        Args:
+            entity_id: ID of supplier or customer
+            start_date: Period start (datetime or 'YYYY-MM-DD'); the opening
+                        balance covers everything before it
+            end_date: Period end (inclusive for 'YYYY-MM-DD')
+            cursor: next_cursor of the previous page
+            limit: Entries per page
+
+        Returns:
+            Tuple (success, statement page or error message). The page holds
+            entity, opening_balance, entries (each with its running balance),
+            closing_balance and next_cursor (None on the last page).
+        """
+        entity = session.query(SupplierCustomer).filter_by(id=entity_id).first()
+
+        if not entity:
+            return False, "Entity not found"
+
+        try:
+            start = _parse_date(start_date)
+            end = _parse_date(end_date, end_of_day=True)
+            position = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return False, str(e)
+
+        limit = max(1, int(limit))
+        ledger = self._ledger(entity_id, position[0] if position else start)
+        sort_key = (ledger.c.entry_date, ledger.c.entry_kind, ledger.c.entry_id)
+
+        try:
+            if position:
+                last_date, last_kind, last_id, opening_balance = position
+            elif start:
+                opening_balance = self.get_opening_balance(entity_id, start)
+            else:
+                opening_balance = 0.0
+
+            conditions = []
+            if start:
+                conditions.append(ledger.c.entry_date >= start)
+            if end:
+                conditions.append(ledger.c.entry_date < end)
+            if position:
+                conditions.append(or_(
+                    ledger.c.entry_date > last_date,
+                    and_(ledger.c.entry_date == last_date, ledger.c.entry_kind > last_kind),
+                    and_(ledger.c.entry_date == last_date, ledger.c.entry_kind == last_kind,
+                         ledger.c.entry_id > last_id)
+                ))
+
+            running_balance = literal(opening_balance) + func.sum(
+                ledger.c.debit - ledger.c.credit
+            ).over(order_by=sort_key, rows=(None, 0))
+
+            query = select(
+                ledger,
+                running_balance.label('balance')
+            ).where(*conditions).order_by(*sort_key).limit(limit + 1)
+
+            entries = [dict(row._mapping) for row in session.execute(query)]
+        except SQLAlchemyError as e:
+            return False, f"Database error: {str(e)}"
+
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        return True, {
+            'entity': entity,
+            'opening_balance': opening_balance,
+            'entries': entries,
+            'closing_balance': entries[-1]['balance'] if entries else opening_balance,
+            'next_cursor': encode_cursor(entries[-1]) if has_more else None
+        }
+
+
+# Drop snapshots made stale by back-dated or edited entries
+def _invalidate_snapshots(connection, target, date_attr):
+    """Delete snapshots taken after the earliest affected entry date"""
+    entity_ids = {target.entity_id}
+    dates = [getattr(target, date_attr)]
+
+    entity_history = get_history(target, 'entity_id')
+    date_history = get_history(target, date_attr)
+    entity_ids.update(value for value in entity_history.deleted if value is not None)
+    dates.extend(date_history.deleted)
+
+    dates = [value for value in dates if value is not None]
+    if not dates:
+        return
+
+    # Bump the version first: it locks the entity rows until commit, so
+    # snapshots being built for them wait for (or are discarded by) this write
+    entities = SupplierCustomer.__table__
+    connection.execute(update(entities).where(entities.c.id.in_(entity_ids)).values(
+        statement_version=entities.c.statement_version + 1,
+        updated_at=entities.c.updated_at
+    ))
+
+    table = EntityBalanceSnapshot.__table__
+    connection.execute(delete(table).where(
+        table.c.entity_id.in_(entity_ids),
+        table.c.snapshot_date > min(dates)
+    ))
+
+def _statement_changed(target, tracked_attrs):
+    """Check whether an update touches fields that appear on statements"""
+    for attr in tracked_attrs:
+        history = get_history(target, attr)
+        if not history.has_changes():
+            continue
+        if attr != 'status':
+            return True
+        # Status only matters when an invoice enters or leaves 'cancelled'
+        if 'cancelled' in (list(history.added) + list(history.deleted)):
+            return True
+    return False
+
+_INVOICE_ATTRS = ('entity_id', 'invoice_date', 'total_amount', 'status', 'cancelled_amount')
+_PAYMENT_ATTRS = ('entity_id', 'payment_date', 'amount')
+
+@event.listens_for(Invoice, 'after_insert')
+@event.listens_for(Invoice, 'after_delete')
+def _invoice_written(mapper, connection, target):
+    _invalidate_snapshots(connection, target, 'invoice_date')
+
+@event.listens_for(Invoice, 'after_update')
+def _invoice_updated(mapper, connection, target):
+    if _statement_changed(target, _INVOICE_ATTRS):
+        _invalidate_snapshots(connection, target, 'invoice_date')
+
+@event.listens_for(Payment, 'after_insert')
+@event.listens_for(Payment, 'after_delete')
+def _payment_written(mapper, connection, target):
+    _invalidate_snapshots(connection, target, 'payment_date')
+
+@event.listens_for(Payment, 'after_update')
+def _payment_updated(mapper, connection, target):
+    if _statement_changed(target, _PAYMENT_ATTRS):
+        _invalidate_snapshots(connection, target, 'payment_date')
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock count controller for ASSI Warehouse Management System
+
+A count session freezes the expected quantities of a warehouse (or of a
+list of items) with one INSERT ... SELECT. Scanners then submit counted
+quantities in batches, each written with one executemany statement.
+Variances and totals are computed by the database and read page by page,
+and posting applies every variance to the stock with one UPDATE and one
+INSERT ... SELECT, so a count of any size never has to be loaded into
+memory at once. Costing walks the changed lines IN_CLAUSE_SIZE items at a
+time.
+"""
+
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import select, update, insert, func, case, exists, literal, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, read_only, chunked, IN_CLAUSE_SIZE
+from models.item import Item, ItemStock
+from models.warehouse import Warehouse
+from models.inventory_cost import ItemCost, CostLayer
+from models.stock_count import StockCount, StockCountLine
+from models.rows import StockCountRow, StockVarianceRow, fetch_rows
+from database.identity_cache import item_cache, warehouse_cache
+from controllers.costing_controller import CostingController, QUANTITY_EPSILON, quantity_in_main_unit
+from controllers.invoice_numbering import invoice_number_allocator
+
+# Counted quantities accepted per submit_counts() call
+MAX_BATCH_LINES = 5000
+
+# Item names listed in a reserved stock error
+SHORTAGE_NAMES_SHOWN = 5
+
+def encode_variance_cursor(item_id):
+    """Encode the last item of a variance page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps({'item_id': item_id}).encode('utf-8')).decode('ascii')
+
+def decode_variance_cursor(cursor):
+    """Decode a cursor from encode_variance_cursor()
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['item_id'])
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+class StockCountController:
+    """Controller for stock count sessions"""
+
+    def __init__(self):
+        self.costing_controller = CostingController()
+
+    def _get_locked_count(self, count_id, shared=False):
+        """Get a count header, locking it (shared locks let batches run side by side)"""
+        return session.query(StockCount).filter_by(id=count_id).with_for_update(read=shared).first()
+
+    def start_count(self, warehouse_id, item_ids=None, notes=None, created_by=None):
+        """Start a count session, freezing the expected quantities
+
+        Args:
+            warehouse_id: ID of the warehouse to count
+            item_ids: Count only these items (whole warehouse if None)
+            notes: Optional notes
+            created_by: ID of the user starting the count
+
+        Returns:
+            Tuple (success, StockCount or error message)
+        """
+        warehouse = warehouse_cache.get(warehouse_id)
+        if not warehouse:
+            return False, "Warehouse not found"
+
+        if session.query(StockCount.id).filter_by(warehouse_id=warehouse.id, status='open').first():
+            return False, "This warehouse already has an open count"
+
+        now = datetime.utcnow()
+        count_number, number_year, number_value = invoice_number_allocator.next_number('count', now)
+        committed = False
+
+        try:
+            count = StockCount(
+                count_number=count_number,
+                warehouse_id=warehouse.id,
+                scope='partial' if item_ids else 'full',
+                status='open',
+                notes=notes,
+                created_by=created_by,
+                created_at=now
+            )
+            session.add(count)
+            session.flush()
+
+            columns = ['count_id', 'item_id', 'expected_quantity']
+            lines = StockCountLine.__table__
+
+            if item_ids:
+                stock = select(
+                    ItemStock.item_id,
+                    func.sum(ItemStock.quantity).label('quantity')
+                ).where(ItemStock.warehouse_id == warehouse.id).group_by(ItemStock.item_id).subquery()
+
+                for chunk in chunked(sorted({int(item_id) for item_id in item_ids})):
+                    session.execute(insert(lines).from_select(columns, select(
+                        literal(count.id), Item.id, func.coalesce(stock.c.quantity, 0.0)
+                    ).outerjoin(stock, stock.c.item_id == Item.id).where(Item.id.in_(chunk))))
+            else:
+                session.execute(insert(lines).from_select(columns, select(
+                    literal(count.id), ItemStock.item_id, func.coalesce(func.sum(ItemStock.quantity), 0.0)
+                ).where(ItemStock.warehouse_id == warehouse.id).group_by(ItemStock.item_id)))
+
+            session.commit()
+            committed = True
+            return True, count
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error starting count: {str(e)}"
+        finally:
+            if not committed:
+                invoice_number_allocator.release('count', number_year, number_value)
+
+    def submit_counts(self, count_id, counts, accumulate=False):
+        """Record a batch of counted quantities
+
+        Args:
+            count_id: ID of the open count
+            counts: List of dictionaries with item_id, quantity and optional unit
+                (main or sub unit name; main unit if omitted), at most
+                MAX_BATCH_LINES
+            accumulate: Add to quantities already counted (repeated scans)
+                instead of replacing them
+
+        Returns:
+            Tuple (success, {'updated': lines changed, 'added': lines added} or error message)
+        """
+        if not counts:
+            return False, "No counted quantities given"
+
+        if len(counts) > MAX_BATCH_LINES:
+            return False, f"Submit at most {MAX_BATCH_LINES} lines per batch"
+
+        try:
+            items = item_cache.load_many(int(entry['item_id']) for entry in counts)
+            quantities = {}
+            for entry in counts:
+                item = items.get(int(entry['item_id']))
+                if not item:
+                    return False, f"Item with ID {entry['item_id']} not found"
+
+                quantity = float(entry['quantity'])
+                if quantity < 0:
+                    return False, f"Counted quantity of {item.name} cannot be negative"
+
+                quantity = quantity_in_main_unit(item, quantity, entry.get('unit') or item.main_unit)
+                # Repeated scans in one batch add up; otherwise the last one wins
+                quantities[item.id] = quantities.get(item.id, 0.0) + quantity if accumulate else quantity
+        except (KeyError, TypeError, ValueError):
+            return False, "Each line needs a numeric item_id and quantity"
+
+        try:
+            count = self._get_locked_count(count_id, shared=True)
+            if not count:
+                return False, "Count not found"
+
+            if count.status != 'open':
+                session.rollback()
+                return False, f"Only open counts accept quantities (status: {count.status})"
+
+            lines = StockCountLine.__table__
+            existing = set()
+            for chunk in chunked(sorted(quantities)):
+                existing.update(session.execute(
+                    select(lines.c.item_id).where(lines.c.count_id == count.id, lines.c.item_id.in_(chunk))
+                ).scalars())
+
+            outside = [item_id for item_id in quantities if item_id not in existing]
+            if outside and count.scope == 'partial':
+                session.rollback()
+                return False, f"{items[outside[0]].name} is not part of this count"
+
+            now = datetime.utcnow()
+            counted = bindparam('counted')
+            if accumulate:
+                counted = func.coalesce(lines.c.counted_quantity, 0.0) + counted
+
+            if existing:
+                session.execute(
+                    update(lines).where(
+                        lines.c.count_id == count.id,
+                        lines.c.item_id == bindparam('line_item_id')
+                    ).values(counted_quantity=counted, counted_at=now),
+                    [{'line_item_id': item_id, 'counted': quantities[item_id]} for item_id in existing]
+                )
+
+            # Items found on the shelves but not in stock when the count started
+            if outside:
+                session.execute(insert(lines), [
+                    {'count_id': count.id, 'item_id': item_id, 'expected_quantity': 0.0,
+                     'counted_quantity': quantities[item_id], 'counted_at': now}
+                    for item_id in outside
+                ])
+
+            session.commit()
+            return True, {'updated': len(existing), 'added': len(outside)}
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error recording counts: {str(e)}"
+
+    def _unit_cost_expression(self):
+        """SQL cost per main unit of a count line's variance
+
+        The posted cost once the count is posted, else the moving average
+        or the purchase price. Must be used in a query that joins Item and
+        outer-joins ItemCost.
+        """
+        return func.coalesce(
+            StockCountLine.unit_cost,
+            func.nullif(ItemCost.average_cost, 0.0),
+            Item.purchase_price
+        )
+
+    def _lines_query(self, count):
+        """Select of a count's lines with item names and costs"""
+        variance = StockCountLine.counted_quantity - StockCountLine.expected_quantity
+        unit_cost = self._unit_cost_expression()
+
+        return select(
+            StockCountLine.item_id,
+            Item.name.label('item_name'),
+            Item.main_unit,
+            StockCountLine.expected_quantity,
+            StockCountLine.counted_quantity,
+            variance.label('variance'),
+            unit_cost.label('unit_cost'),
+            (variance * unit_cost).label('variance_value')
+        ).join(
+            Item, Item.id == StockCountLine.item_id
+        ).outerjoin(
+            ItemCost,
+            (ItemCost.item_id == StockCountLine.item_id) & (ItemCost.warehouse_id == count.warehouse_id)
+        ).where(StockCountLine.count_id == count.id)
+
+    @read_only
+    def get_variances(self, count_id, cursor=None, limit=100, differences_only=True):
+        """Get a page of count lines in item order
+
+        Args:
+            count_id: ID of the count
+            cursor: next_cursor of the previous page
+            limit: Lines per page
+            differences_only: Only counted lines whose quantity differs
+
+        Returns:
+            Tuple (success, page or error message). The page holds lines
+            (list of StockVarianceRow) and next_cursor (None on the last page).
+        """
+        try:
+            last_item_id = decode_variance_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return False, str(e)
+
+        count = session.get(StockCount, count_id)
+        if not count:
+            return False, "Count not found"
+
+        limit = max(1, int(limit))
+        query = self._lines_query(count)
+
+        if differences_only:
+            query = query.where(
+                StockCountLine.counted_quantity.isnot(None),
+                func.abs(StockCountLine.counted_quantity - StockCountLine.expected_quantity) > QUANTITY_EPSILON
+            )
+        if last_item_id is not None:
+            query = query.where(StockCountLine.item_id > last_item_id)
+
+        rows = fetch_rows(StockVarianceRow, session.execute(
+            query.order_by(StockCountLine.item_id).limit(limit + 1)
+        ))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_variance_cursor(rows[-1].item_id)
+
+        return True, {'lines': rows, 'next_cursor': next_cursor}
+
+    @read_only
+    def get_count_summary(self, count_id):
+        """Get a count's progress and variance totals in one aggregate query
+
+        Returns:
+            Tuple (success, summary dictionary or error message)
+        """
+        count = session.get(StockCount, count_id)
+        if not count:
+            return False, "Count not found"
+
+        lines = self._lines_query(count).subquery()
+        is_counted = lines.c.counted_quantity.isnot(None)
+        differs = is_counted & (func.abs(lines.c.variance) > QUANTITY_EPSILON)
+
+        totals = session.execute(select(
+            func.count(),
+            func.count(lines.c.counted_quantity),
+            func.coalesce(func.sum(case((differs, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((differs & (lines.c.variance > 0), lines.c.variance), else_=0.0)), 0.0),
+            func.coalesce(func.sum(case((differs & (lines.c.variance < 0), -lines.c.variance), else_=0.0)), 0.0),
+            func.coalesce(func.sum(case((differs, lines.c.variance_value), else_=0.0)), 0.0)
+        )).one()
+
+        return True, {
+            'id': count.id,
+            'count_number': count.count_number,
+            'warehouse_id': count.warehouse_id,
+            'scope': count.scope,
+            'status': count.status,
+            'created_at': count.created_at,
+            'posted_at': count.posted_at,
+            'line_count': totals[0],
+            'counted_lines': totals[1],
+            'uncounted_lines': totals[0] - totals[1],
+            'variance_lines': totals[2],
+            'surplus_quantity': totals[3],
+            'shortage_quantity': totals[4],
+            'variance_value': totals[5]
+        }
+
+    def _post_costs(self, warehouse_id, rows, posted_at):
+        """Apply the cost effect of one chunk of variances (no commit)
+
+        Shortages consume the oldest cost layers; surpluses add a layer at
+        the moving average (or purchase price). The cost used is stored on
+        each line.
+
+        Args:
+            warehouse_id: ID of the counted warehouse
+            rows: List of (line ID, item ID, variance)
+            posted_at: Date of the new layers
+        """
+        shortages = {item_id: -variance for _line_id, item_id, variance in rows if variance < 0}
+        surpluses = {item_id: variance for _line_id, item_id, variance in rows if variance > 0}
+        unit_costs = {}
+
+        if shortages:
+            for item_id, (fifo_cost, _average_cost, _consumed) in self.costing_controller.issue_many(
+                    warehouse_id, shortages).items():
+                unit_costs[item_id] = fifo_cost / shortages[item_id]
+
+        if surpluses:
+            unit_costs.update(self.costing_controller.get_unit_costs(warehouse_id, list(surpluses)))
+            self.costing_controller.receive_many(warehouse_id, [
+                {'item_id': item_id, 'quantity': quantity, 'unit_cost': unit_costs[item_id], 'received_at': posted_at}
+                for item_id, quantity in surpluses.items()
+            ], source_type='count')
+
+        lines = StockCountLine.__table__
+        session.execute(
+            update(lines).where(lines.c.id == bindparam('line_id')).values(unit_cost=bindparam('cost')),
+            [{'line_id': line_id, 'cost': unit_costs[item_id]} for line_id, item_id, _variance in rows]
+        )
+
+        # Valuations and layers of this chunk are written; keep the identity map small
+        session.flush()
+        for instance in list(session.identity_map.values()):
+            if isinstance(instance, (ItemCost, CostLayer)):
+                session.expunge(instance)
+
+    def post_count(self, count_id, zero_uncounted=False):
+        """Post all variances of a count as stock adjustments in one transaction
+
+        Each counted line changes the stock by counted minus expected
+        quantity, keeping movements made since the count started.
+
+        Args:
+            count_id: ID of the open count
+            zero_uncounted: Treat lines nobody counted as counted zero
+                (otherwise they are left unchanged)
+
+        Returns:
+            Tuple (success, summary dictionary or error message)
+        """
+        try:
+            count = self._get_locked_count(count_id)
+            if not count:
+                return False, "Count not found"
+
+            if count.status != 'open':
+                session.rollback()
+                return False, f"Only open counts can be posted (status: {count.status})"
+
+            now = datetime.utcnow()
+            lines = StockCountLine.__table__
+            stock = ItemStock.__table__
+
+            if zero_uncounted:
+                session.execute(update(lines).where(
+                    lines.c.count_id == count.id, lines.c.counted_quantity.is_(None)
+                ).values(counted_quantity=0.0, counted_at=now))
+
+            variance = lines.c.counted_quantity - lines.c.expected_quantity
+            changed = (
+                (lines.c.count_id == count.id)
+                & lines.c.counted_quantity.isnot(None)
+                & (func.abs(variance) > QUANTITY_EPSILON)
+            )
+
+            # Shortages may not take the stock below what reservations hold
+            held = session.execute(
+                select(lines.c.item_id).join(
+                    stock, (stock.c.warehouse_id == count.warehouse_id) & (stock.c.item_id == lines.c.item_id)
+                ).where(
+                    changed,
+                    variance < 0,
+                    func.coalesce(stock.c.quantity, 0.0) + variance < stock.c.reserved_quantity - QUANTITY_EPSILON
+                ).order_by(lines.c.item_id).with_for_update(of=stock)
+            ).scalars().all()
+            if held:
+                session.rollback()
+                items = item_cache.load_many(held[:SHORTAGE_NAMES_SHOWN])
+                names = ", ".join(items[item_id].name for item_id in held[:SHORTAGE_NAMES_SHOWN] if item_id in items)
+                if len(held) > SHORTAGE_NAMES_SHOWN:
+                    names += f" and {len(held) - SHORTAGE_NAMES_SHOWN} more"
+                return False, f"Counted stock is below the reserved quantity: {names}; release the reservations first"
+
+            # Costing, one chunk of items at a time
+            last_item_id = 0
+            while True:
+                rows = session.execute(
+                    select(lines.c.id, lines.c.item_id, variance).where(
+                        changed, lines.c.item_id > last_item_id
+                    ).order_by(lines.c.item_id).limit(IN_CLAUSE_SIZE)
+                ).all()
+                if not rows:
+                    break
+                self._post_costs(count.warehouse_id, rows, now)
+                last_item_id = rows[-1].item_id
+
+            # Stock: one UPDATE for items with a stock row (the first, if
+            # there are several), one INSERT ... SELECT for the others
+            other_stock = stock.alias('other_stock')
+            first_stock_id = select(func.min(other_stock.c.id)).where(
+                other_stock.c.warehouse_id == count.warehouse_id,
+                other_stock.c.item_id == stock.c.item_id
+            ).scalar_subquery()
+
+            line_variance = select(variance).where(
+                lines.c.count_id == count.id, lines.c.item_id == stock.c.item_id
+            ).scalar_subquery()
+
+            adjusted = session.execute(
+                update(stock).where(
+                    stock.c.warehouse_id == count.warehouse_id,
+                    stock.c.id == first_stock_id,
+                    stock.c.item_id.in_(select(lines.c.item_id).where(changed))
+                ).values(quantity=func.coalesce(stock.c.quantity, 0.0) + line_variance, updated_at=now)
+            ).rowcount
+
+            created = session.execute(insert(stock).from_select(
+                ['item_id', 'warehouse_id', 'quantity', 'updated_at'],
+                select(lines.c.item_id, literal(count.warehouse_id), variance, literal(now)).where(
+                    changed,
+                    ~exists().where(stock.c.warehouse_id == count.warehouse_id, stock.c.item_id == lines.c.item_id)
+                )
+            )).rowcount
+
+            count.status = 'posted'
+            count.posted_at = now
+            session.commit()
+            return True, {'count_number': count.count_number, 'adjusted_lines': adjusted + created}
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error posting count: {str(e)}"
+
+    def cancel_count(self, count_id):
+        """Cancel an open count without changing stock
+
+        Returns:
+            Tuple (success, StockCount or error message)
+        """
+        try:
+            count = self._get_locked_count(count_id)
+            if not count:
+                return False, "Count not found"
+
+            if count.status != 'open':
+                session.rollback()
+                return False, f"Only open counts can be cancelled (status: {count.status})"
+
+            count.status = 'cancelled'
+            session.commit()
+            return True, count
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+
+    @read_only
+    def get_count_rows(self, warehouse_id=None, status=None, limit=100):
+        """Get count sessions as lightweight read-only rows, newest first
+
+        Returns:
+            List of StockCountRow
+        """
+        # Correlated counts read only the listed counts' index ranges
+        line_count = select(func.count()).where(
+            StockCountLine.count_id == StockCount.id
+        ).correlate(StockCount).scalar_subquery()
+        counted_lines = select(func.count(StockCountLine.counted_quantity)).where(
+            StockCountLine.count_id == StockCount.id
+        ).correlate(StockCount).scalar_subquery()
+
+        query = select(
+            StockCount.id,
+            StockCount.count_number,
+            StockCount.warehouse_id,
+            Warehouse.name.label('warehouse_name'),
+            StockCount.scope,
+            StockCount.status,
+            line_count.label('line_count'),
+            counted_lines.label('counted_lines'),
+            StockCount.created_at,
+            StockCount.posted_at
+        ).join(
+            Warehouse, Warehouse.id == StockCount.warehouse_id
+        )
+
+        if warehouse_id:
+            query = query.where(StockCount.warehouse_id == warehouse_id)
+
+        if status:
+            query = query.where(StockCount.status == status)
+
+        query = query.order_by(StockCount.created_at.desc(), StockCount.id.desc())
+        if limit:
+            query = query.limit(limit)
+
+        return fetch_rows(StockCountRow, session.execute(query))
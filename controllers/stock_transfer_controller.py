@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock transfer controller for ASSI Warehouse Management System
+
+A stock transfer is a document moving many items between two warehouses.
+Dispatching it takes the stock out of the source warehouse and keeps
+the consumed cost layers on the transfer while the goods are in transit;
+receiving it adds the stock and those layers to the destination. Each
+step is one transaction that locks the affected stock rows in a single
+query and updates them with one executemany statement, whatever the
+number of lines.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select, update, insert, func, bindparam
+from sqlalchemy.orm import joinedload, selectinload, aliased
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, read_only, chunked
+from models.item import ItemStock
+from models.warehouse import Warehouse
+from models.stock_transfer import StockTransfer, StockTransferLine, StockTransferLayer
+from models.rows import StockTransferRow, fetch_rows
+from database.identity_cache import item_cache, warehouse_cache
+from controllers.costing_controller import CostingController, QUANTITY_EPSILON, quantity_in_main_unit
+from controllers.invoice_numbering import invoice_number_allocator
+
+# Item names listed in an insufficient stock message
+SHORTAGE_NAMES_SHOWN = 5
+
+class StockTransferController:
+    """Controller for stock transfer documents"""
+
+    def __init__(self):
+        self.costing_controller = CostingController()
+
+    def _lock_stock(self, warehouse_id, item_ids):
+        """Lock the stock rows of many items in a warehouse
+
+        Returns:
+            Dictionary {item_id: (ItemStock ID, quantity, reserved quantity)}
+        """
+        stocks = {}
+        for chunk in chunked(sorted(set(item_ids))):
+            rows = session.execute(
+                select(ItemStock.id, ItemStock.item_id, ItemStock.quantity, ItemStock.reserved_quantity).where(
+                    ItemStock.warehouse_id == warehouse_id,
+                    ItemStock.item_id.in_(chunk)
+                ).order_by(ItemStock.item_id, ItemStock.id).with_for_update()
+            )
+            for stock_id, item_id, quantity, reserved in rows:
+                stocks.setdefault(item_id, (stock_id, quantity or 0.0, reserved or 0.0))
+        return stocks
+
+    def _change_stock(self, warehouse_id, quantities, stocks):
+        """Add quantities to locked stock rows, creating missing rows (no commit)
+
+        Args:
+            warehouse_id: ID of the warehouse
+            quantities: Dictionary {item_id: quantity change}
+            stocks: Result of _lock_stock() for the same items
+        """
+        now = datetime.utcnow()
+        table = ItemStock.__table__
+
+        changes = [{'stock_id': stocks[item_id][0], 'change': quantity}
+                   for item_id, quantity in quantities.items() if item_id in stocks]
+        if changes:
+            session.execute(
+                update(table).where(table.c.id == bindparam('stock_id')).values(
+                    quantity=table.c.quantity + bindparam('change'),
+                    updated_at=now
+                ),
+                changes
+            )
+
+        new_rows = [{'item_id': item_id, 'warehouse_id': warehouse_id, 'quantity': quantity, 'updated_at': now}
+                    for item_id, quantity in quantities.items() if item_id not in stocks]
+        if new_rows:
+            session.execute(insert(table), new_rows)
+
+    def _dispatch(self, transfer):
+        """Take a transfer's stock and cost layers out of the source warehouse (no commit)
+
+        Returns:
+            Error message, or None on success
+        """
+        quantities = {line.item_id: line.quantity for line in transfer.lines}
+        stocks = self._lock_stock(transfer.from_warehouse_id, quantities)
+
+        # Stock held by reservations cannot leave the warehouse
+        short = [item_id for item_id, quantity in quantities.items()
+                 if item_id not in stocks or stocks[item_id][1] - stocks[item_id][2] < quantity - QUANTITY_EPSILON]
+        if short:
+            items = item_cache.load_many(short[:SHORTAGE_NAMES_SHOWN])
+            names = ", ".join(items[item_id].name for item_id in short[:SHORTAGE_NAMES_SHOWN] if item_id in items)
+            if len(short) > SHORTAGE_NAMES_SHOWN:
+                names += f" and {len(short) - SHORTAGE_NAMES_SHOWN} more"
+            return f"Insufficient available stock in source warehouse: {names}"
+
+        self._change_stock(transfer.from_warehouse_id,
+                           {item_id: -quantity for item_id, quantity in quantities.items()}, stocks)
+
+        now = datetime.utcnow()
+        issued = self.costing_controller.issue_many(transfer.from_warehouse_id, quantities)
+        layers = []
+        for line in transfer.lines:
+            fifo_cost, _average_cost, consumed = issued[line.item_id]
+            line.unit_cost = fifo_cost / line.quantity
+
+            moved = already_costed = 0.0
+            for layer, taken in consumed:
+                layers.append({'line_id': line.id, 'quantity': taken,
+                               'unit_cost': layer.unit_cost, 'received_at': layer.received_at})
+                moved += taken
+                already_costed += taken * layer.unit_cost
+
+            # Uncovered stock travels at the cost it was issued at
+            if line.quantity - moved > QUANTITY_EPSILON:
+                layers.append({'line_id': line.id, 'quantity': line.quantity - moved,
+                               'unit_cost': (fifo_cost - already_costed) / (line.quantity - moved),
+                               'received_at': now})
+
+        if layers:
+            session.execute(insert(StockTransferLayer), layers)
+
+        transfer.status = 'in_transit'
+        transfer.dispatched_at = now
+        return None
+
+    def _deliver(self, transfer, warehouse_id):
+        """Add a dispatched transfer's stock and cost layers to a warehouse (no commit)
+
+        Used to receive a transfer at its destination and to return a
+        cancelled one to its source.
+        """
+        quantities = {line.item_id: line.quantity for line in transfer.lines}
+        self._change_stock(warehouse_id, quantities, self._lock_stock(warehouse_id, quantities))
+
+        layers = session.execute(
+            select(
+                StockTransferLine.item_id,
+                StockTransferLayer.quantity,
+                StockTransferLayer.unit_cost,
+                StockTransferLayer.received_at
+            ).join(
+                StockTransferLayer, StockTransferLayer.line_id == StockTransferLine.id
+            ).where(
+                StockTransferLine.transfer_id == transfer.id
+            ).order_by(StockTransferLayer.received_at, StockTransferLayer.id)
+        ).mappings().all()
+
+        self.costing_controller.receive_many(warehouse_id, [dict(layer) for layer in layers],
+                                             source_type='transfer')
+
+    def _get_locked_transfer(self, transfer_id):
+        """Get a transfer with its lines, locking the header row"""
+        return session.query(StockTransfer).options(
+            selectinload(StockTransfer.lines)
+        ).filter_by(id=transfer_id).with_for_update(of=StockTransfer).first()
+
+    def create_transfer(self, from_warehouse_id, to_warehouse_id, lines, notes=None,
+                        created_by=None, dispatch=True, receive=False):
+        """Create a stock transfer document
+
+        Args:
+            from_warehouse_id: ID of the source warehouse
+            to_warehouse_id: ID of the destination warehouse
+            lines: List of dictionaries with item_id, quantity and optional unit
+                (main or sub unit name; main unit if omitted). Lines of the
+                same item are merged.
+            notes: Optional notes
+            created_by: ID of the user creating the transfer
+            dispatch: Take the stock out of the source warehouse now
+            receive: Also receive it at the destination now (implies dispatch)
+
+        Returns:
+            Tuple (success, StockTransfer or error message)
+        """
+        from_warehouse = warehouse_cache.get(from_warehouse_id)
+        to_warehouse = warehouse_cache.get(to_warehouse_id)
+
+        if not from_warehouse:
+            return False, "Source warehouse not found"
+
+        if not to_warehouse:
+            return False, "Destination warehouse not found"
+
+        if from_warehouse.id == to_warehouse.id:
+            return False, "Source and destination warehouses must be different"
+
+        if not lines:
+            return False, "A transfer needs at least one line"
+
+        try:
+            items = item_cache.load_many(int(line['item_id']) for line in lines)
+            quantities = {}
+            for line in lines:
+                item = items.get(int(line['item_id']))
+                if not item:
+                    return False, f"Item with ID {line['item_id']} not found"
+
+                quantity = float(line['quantity'])
+                if quantity <= 0:
+                    return False, f"Quantity of {item.name} must be greater than zero"
+
+                quantity = quantity_in_main_unit(item, quantity, line.get('unit') or item.main_unit)
+                quantities[item.id] = quantities.get(item.id, 0.0) + quantity
+        except (KeyError, TypeError, ValueError):
+            return False, "Each line needs a numeric item_id and quantity"
+
+        now = datetime.utcnow()
+        transfer_number, number_year, number_value = invoice_number_allocator.next_number('transfer', now)
+        committed = False
+
+        try:
+            transfer = StockTransfer(
+                transfer_number=transfer_number,
+                from_warehouse_id=from_warehouse.id,
+                to_warehouse_id=to_warehouse.id,
+                status='draft',
+                notes=notes,
+                created_by=created_by,
+                created_at=now
+            )
+            session.add(transfer)
+            session.flush()
+
+            # One executemany for the lines, then a single select for their IDs
+            session.execute(insert(StockTransferLine), [
+                {'transfer_id': transfer.id, 'item_id': item_id, 'quantity': quantity}
+                for item_id, quantity in quantities.items()
+            ])
+            session.refresh(transfer, attribute_names=['lines'])
+
+            if dispatch or receive:
+                error = self._dispatch(transfer)
+                if error:
+                    session.rollback()
+                    return False, error
+
+            if receive:
+                self._deliver(transfer, transfer.to_warehouse_id)
+                transfer.status = 'received'
+                transfer.received_at = datetime.utcnow()
+
+            session.commit()
+            committed = True
+            return True, transfer
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error creating transfer: {str(e)}"
+        finally:
+            if not committed:
+                invoice_number_allocator.release('transfer', number_year, number_value)
+
+    def dispatch_transfer(self, transfer_id):
+        """Dispatch a draft transfer, taking its stock out of the source warehouse
+
+        Returns:
+            Tuple (success, StockTransfer or error message)
+        """
+        try:
+            transfer = self._get_locked_transfer(transfer_id)
+            if not transfer:
+                return False, "Transfer not found"
+
+            if transfer.status != 'draft':
+                session.rollback()
+                return False, f"Only draft transfers can be dispatched (status: {transfer.status})"
+
+            error = self._dispatch(transfer)
+            if error:
+                session.rollback()
+                return False, error
+
+            session.commit()
+            return True, transfer
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error dispatching transfer: {str(e)}"
+
+    def receive_transfer(self, transfer_id):
+        """Receive an in-transit transfer at its destination warehouse
+
+        Returns:
+            Tuple (success, StockTransfer or error message)
+        """
+        try:
+            transfer = self._get_locked_transfer(transfer_id)
+            if not transfer:
+                return False, "Transfer not found"
+
+            if transfer.status != 'in_transit':
+                session.rollback()
+                return False, f"Only transfers in transit can be received (status: {transfer.status})"
+
+            self._deliver(transfer, transfer.to_warehouse_id)
+            transfer.status = 'received'
+            transfer.received_at = datetime.utcnow()
+
+            session.commit()
+            return True, transfer
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error receiving transfer: {str(e)}"
+
+    def cancel_transfer(self, transfer_id):
+        """Cancel a draft or in-transit transfer
+
+        Stock of an in-transit transfer goes back to the source warehouse
+        with its cost layers.
+
+        Returns:
+            Tuple (success, StockTransfer or error message)
+        """
+        try:
+            transfer = self._get_locked_transfer(transfer_id)
+            if not transfer:
+                return False, "Transfer not found"
+
+            if transfer.status not in ('draft', 'in_transit'):
+                session.rollback()
+                return False, f"Only draft or in-transit transfers can be cancelled (status: {transfer.status})"
+
+            if transfer.status == 'in_transit':
+                self._deliver(transfer, transfer.from_warehouse_id)
+
+            transfer.status = 'cancelled'
+            session.commit()
+            return True, transfer
+        except SQLAlchemyError as e:
+            session.rollback()
+            return False, f"Database error: {str(e)}"
+        except Exception as e:
+            session.rollback()
+            return False, f"Error cancelling transfer: {str(e)}"
+
+    def get_transfer_by_id(self, transfer_id):
+        """Get a transfer with its warehouses, lines and line items"""
+        return session.query(StockTransfer).options(
+            joinedload(StockTransfer.from_warehouse),
+            joinedload(StockTransfer.to_warehouse),
+            selectinload(StockTransfer.lines).joinedload(StockTransferLine.item)
+        ).filter_by(id=transfer_id).first()
+
+    @read_only
+    def get_transfer_rows(self, status=None, warehouse_id=None, limit=100):
+        """Get transfers as lightweight read-only rows, newest first
+
+        Args:
+            status: Only transfers with this status
+            warehouse_id: Only transfers from or to this warehouse
+            limit: Maximum number of transfers (None for all)
+
+        Returns:
+            List of StockTransferRow
+        """
+        totals = select(
+            StockTransferLine.transfer_id,
+            func.count(StockTransferLine.id).label('line_count'),
+            func.sum(StockTransferLine.quantity).label('total_quantity')
+        ).group_by(StockTransferLine.transfer_id).subquery()
+
+        from_warehouse = aliased(Warehouse)
+        to_warehouse = aliased(Warehouse)
+
+        query = select(
+            StockTransfer.id,
+            StockTransfer.transfer_number,
+            StockTransfer.from_warehouse_id,
+            from_warehouse.name.label('from_warehouse_name'),
+            StockTransfer.to_warehouse_id,
+            to_warehouse.name.label('to_warehouse_name'),
+            StockTransfer.status,
+            func.coalesce(totals.c.line_count, 0).label('line_count'),
+            func.coalesce(totals.c.total_quantity, 0.0).label('total_quantity'),
+            StockTransfer.created_at,
+            StockTransfer.dispatched_at,
+            StockTransfer.received_at
+        ).join(
+            from_warehouse, from_warehouse.id == StockTransfer.from_warehouse_id
+        ).join(
+            to_warehouse, to_warehouse.id == StockTransfer.to_warehouse_id
+        ).outerjoin(
+            totals, totals.c.transfer_id == StockTransfer.id
+        )
+
+        if status:
+            query = query.where(StockTransfer.status == status)
+
+        if warehouse_id:
+            query = query.where(
+                (StockTransfer.from_warehouse_id == warehouse_id) | (StockTransfer.to_warehouse_id == warehouse_id)
+            )
+
+        query = query.order_by(StockTransfer.created_at.desc(), StockTransfer.id.desc())
+        if limit:
+            query = query.limit(limit)
+
+        return fetch_rows(StockTransferRow, session.execute(query))
+
+    @read_only
+    def get_in_transit_quantities(self, warehouse_id=None):
+        """Get quantities dispatched but not yet received, per item
+
+        Args:
+            warehouse_id: Only transfers to this warehouse
+
+        Returns:
+            Dictionary {item_id: quantity in the main unit}
+        """
+        query = select(
+            StockTransferLine.item_id,
+            func.sum(StockTransferLine.quantity)
+        ).join(
+            StockTransfer, StockTransfer.id == StockTransferLine.transfer_id
+        ).where(StockTransfer.status == 'in_transit')
+
+        if warehouse_id:
+            query = query.where(StockTransfer.to_warehouse_id == warehouse_id)
+
+        return dict(session.execute(query.group_by(StockTransferLine.item_id)).all())
@@ -9,6 +9,8 @@ from database.db_setup import session
 from models.supplier_customer import SupplierCustomer, Payment
 from models.fund import Fund
 from controllers.fund_controller import FundController
+from controllers.payment_allocation_controller import PaymentAllocationController
+from controllers.statement_controller import StatementController
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -17,6 +19,8 @@ class SupplierCustomerController:
     
     def __init__(self):
         self.fund_controller = FundController()
+        self.allocation_controller = PaymentAllocationController()
+        self.statement_controller = StatementController()
     
     def get_all_entities(self, entity_type=None):
         """Get all suppliers and customers, optionally filtered by type"""
@@ -119,7 +123,8 @@ class SupplierCustomerController:
             return False, f"Error updating entity: {str(e)}"
     
     def add_payment(self, entity_id, amount, payment_method='cash', fund_id=None, 
-                    payment_date=None, notes=None, invoice_id=None):
+                    payment_date=None, notes=None, invoice_id=None,
+                    allocate=True, allocation_strategy='fifo'):
         """Add a direct payment to/from a supplier or customer (not linked to an invoice)
         
         Args:
@@ -130,6 +135,9 @@ class SupplierCustomerController:
             payment_date: Date of payment (defaults to now)
             notes: Additional notes
             invoice_id: Optional invoice ID if this payment is for a specific invoice
+            allocate: Apply an on-account payment to open invoices (committed
+                together with the payment and its fund transaction)
+            allocation_strategy: 'fifo' (oldest invoice first) or 'due_date'
         """
         entity = self.get_entity_by_id(entity_id)
         
@@ -160,6 +168,7 @@ class SupplierCustomerController:
             )
             
             session.add(payment)
+            session.flush()  # Assign payment.id for the fund transaction reference
             
             # Update entity balance
             if is_payment_to_entity:
@@ -182,19 +191,29 @@ class SupplierCustomerController:
                     transaction_type=transaction_type,
                     description=description,
                     reference_id=payment.id,
-                    reference_type='direct_payment'
+                    reference_type='direct_payment',
+                    commit=False
                 )
                 
                 if not result:
                     session.rollback()
                     return False, f"Failed to update fund: {message}"
             
+            # Apply on-account payments to open invoices (purchases when paying, sales when receiving)
+            if allocate and not invoice_id:
+                self.allocation_controller.apply_payment(
+                    payment,
+                    invoice_type='purchase' if is_payment_to_entity else 'sale',
+                    strategy=allocation_strategy
+                )
+            
             session.commit()
             return True, payment
         except SQLAlchemyError as e:
             session.rollback()
             return False, f"Database error: {str(e)}"
         except Exception as e:
+            session.rollback()
             return False, f"Error adding payment: {str(e)}"
     
     def get_entity_payments(self, entity_id, start_date=None, end_date=None):
@@ -209,6 +228,19 @@ class SupplierCustomerController:
         
         return query.order_by(Payment.payment_date.desc()).all()
     
+    def get_entity_statement(self, entity_id, start_date=None, end_date=None, cursor=None, limit=100):
+        """Get a page of an entity's statement (invoices and payments with running balance)
+        
+        See StatementController.get_statement for arguments and result.
+        """
+        return self.statement_controller.get_statement(
+            entity_id,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            limit=limit
+        )
+    
     def get_outstanding_balances(self, entity_type=None, min_balance=0):
         """Get entities with outstanding balances
         
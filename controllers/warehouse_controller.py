@@ -5,18 +5,36 @@
 Warehouse controller for ASSI Warehouse Management System
 """
 
+from itertools import groupby
+from operator import itemgetter
 from database.db_setup import session
 from models.warehouse import Warehouse
-from models.item import ItemStock
+from models.item import Item, ItemStock
+from models.inventory_cost import ItemCost
+from models.rows import StockRow, StockMatrixRow, fetch_rows
+from database.identity_cache import warehouse_cache
+from controllers.costing_controller import CostingController
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import selectinload, joinedload
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
 class WarehouseController:
     """Controller for warehouse operations"""
     
-    def get_all_warehouses(self, active_only=True):
-        """Get all warehouses, optionally filtering for active ones only"""
+    def __init__(self):
+        self.costing_controller = CostingController()
+    
+    def get_all_warehouses(self, active_only=True, with_stock=False):
+        """Get all warehouses, optionally filtering for active ones only
+        
+        Args:
+            active_only: Only active warehouses
+            with_stock: Load each warehouse's stocks in one extra query
+        """
         query = session.query(Warehouse)
+        if with_stock:
+            query = query.options(selectinload(Warehouse.stocks))
         if active_only:
             query = query.filter_by(is_active=True)
         return query.all()
@@ -25,6 +43,13 @@ class WarehouseController:
         """Get a warehouse by its ID"""
         return session.query(Warehouse).filter_by(id=warehouse_id).first()
     
+    def get_warehouse_snapshot(self, warehouse_id):
+        """Get a cached read-only snapshot of a warehouse (WarehouseSnapshot), or None
+        
+        Use get_warehouse_by_id() to modify the warehouse.
+        """
+        return warehouse_cache.get(warehouse_id)
+    
     def create_warehouse(self, name, location=None, description=None):
         """Create a new warehouse"""
         try:
@@ -71,15 +96,136 @@ class WarehouseController:
     
     def get_warehouse_stock(self, warehouse_id):
         """Get all items and their quantities in a specific warehouse"""
-        return session.query(ItemStock).filter_by(warehouse_id=warehouse_id).all()
+        return session.query(ItemStock).options(
+            joinedload(ItemStock.item)
+        ).filter_by(warehouse_id=warehouse_id).all()
+    
+    def get_stock_rows(self, warehouse_id=None, item_ids=None):
+        """Get stock levels as lightweight read-only rows
+        
+        Rows carry the reserved quantity and the quantity available to
+        promise (on hand minus active reservations).
+        
+        Args:
+            warehouse_id: Restrict to one warehouse (all warehouses if None)
+            item_ids: Restrict to these items (all items if None)
+        
+        Returns:
+            List of StockRow ordered by warehouse and item
+        """
+        query = select(
+            ItemStock.item_id,
+            Item.name.label('item_name'),
+            Item.main_unit,
+            Item.purchase_price,
+            Item.selling_price,
+            ItemStock.warehouse_id,
+            Warehouse.name.label('warehouse_name'),
+            ItemStock.quantity,
+            ItemStock.reserved_quantity,
+            (ItemStock.quantity - ItemStock.reserved_quantity).label('available_quantity')
+        ).join(
+            Item, Item.id == ItemStock.item_id
+        ).join(
+            Warehouse, Warehouse.id == ItemStock.warehouse_id
+        )
+        
+        if warehouse_id:
+            query = query.where(ItemStock.warehouse_id == warehouse_id)
+        
+        if item_ids is not None:
+            query = query.where(ItemStock.item_id.in_(item_ids))
+        
+        return fetch_rows(StockRow, session.execute(query.order_by(ItemStock.warehouse_id, ItemStock.item_id)))
     
-    def get_warehouse_inventory_value(self, warehouse_id):
-        """Calculate the total value of inventory in a warehouse"""
-        total_value = 0
-        stocks = self.get_warehouse_stock(warehouse_id)
-        
-        for stock in stocks:
-            item = stock.item
-            total_value += stock.quantity * item.purchase_price
+    def get_stock_matrix(self, warehouse_ids=None, prefix=None, low_stock_threshold=10,
+                         active_only=True, batch_size=1000):
+        """Get the stock of every item in every warehouse as a streamed pivot
+        
+        One grouped query returns a row per item and warehouse, ordered by
+        item, and is read batch_size rows at a time (a server-side cursor
+        where supported); the rows of each item are folded into one
+        StockMatrixRow as they arrive, so the matrix is never held in
+        memory. Values are at cost (FIFO layers; list price for stock
+        without layers), like the inventory report.
+        
+        Args:
+            warehouse_ids: Columns of the matrix (all active warehouses if None)
+            prefix: Only items whose name or SKU starts with this
+            low_stock_threshold: Flag cells with less stock than this
+            active_only: Only active items
+            batch_size: Rows fetched at a time
+        
+        Returns:
+            Tuple (list of (warehouse_id, name) columns, iterator of StockMatrixRow)
+        """
+        warehouse_query = select(Warehouse.id, Warehouse.name).order_by(Warehouse.id)
+        if warehouse_ids:
+            warehouse_query = warehouse_query.where(Warehouse.id.in_(warehouse_ids))
+        else:
+            warehouse_query = warehouse_query.where(Warehouse.is_active == True)
+        warehouses = [tuple(row) for row in session.execute(warehouse_query)]
+        columns = [warehouse_id for warehouse_id, _ in warehouses]
+        
+        value = self.costing_controller.stock_value_expression()
+        query = select(
+            Item.id.label('item_id'),
+            Item.name,
+            Item.sku,
+            Item.main_unit,
+            ItemStock.warehouse_id,
+            func.coalesce(func.sum(ItemStock.quantity), 0.0).label('quantity'),
+            func.coalesce(func.sum(value), 0.0).label('value')
+        ).select_from(Item).outerjoin(
+            ItemStock, and_(ItemStock.item_id == Item.id, ItemStock.warehouse_id.in_(columns))
+        ).outerjoin(
+            ItemCost,
+            (ItemCost.item_id == ItemStock.item_id) & (ItemCost.warehouse_id == ItemStock.warehouse_id)
+        ).group_by(
+            Item.id, ItemStock.warehouse_id
+        ).order_by(Item.id, ItemStock.warehouse_id)
+        
+        if active_only:
+            query = query.where(Item.is_active == True)
+        
+        if prefix:
+            query = query.where(or_(
+                func.lower(Item.name).startswith(prefix.lower(), autoescape=True),
+                Item.sku.startswith(prefix, autoescape=True)
+            ))
+        
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        return warehouses, self._fold_matrix_rows(result, columns, low_stock_threshold)
+    
+    def _fold_matrix_rows(self, result, columns, low_stock_threshold):
+        """Fold the per-warehouse rows of each item into StockMatrixRow objects"""
+        positions = {warehouse_id: position for position, warehouse_id in enumerate(columns)}
+        for item_id, rows in groupby(result.tuples(), key=itemgetter(0)):
+            quantities = [0.0] * len(columns)
+            values = [0.0] * len(columns)
+            for _, name, sku, main_unit, warehouse_id, quantity, value in rows:
+                position = positions.get(warehouse_id)
+                if position is not None:
+                    quantities[position] = quantity
+                    values[position] = value
             
-        return total_value
+            yield StockMatrixRow(
+                item_id=item_id,
+                item_name=name,
+                sku=sku,
+                main_unit=main_unit,
+                quantities=tuple(quantities),
+                values=tuple(values),
+                low_stock=tuple(quantity < low_stock_threshold for quantity in quantities),
+                total_quantity=sum(quantities),
+                total_value=sum(values)
+            )
+    
+    def get_warehouse_inventory_value(self, warehouse_id, method='fifo'):
+        """Calculate the total value of inventory in a warehouse
+        
+        Args:
+            warehouse_id: ID of the warehouse
+            method: 'fifo' (cost layers) or 'average' (moving average cost)
+        """
+        return self.costing_controller.get_inventory_value(warehouse_id, method=method)
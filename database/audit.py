@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Change-data-capture audit log for ASSI Warehouse Management System
+
+An after_flush listener records the column changes ([old, new] per
+column) of every inserted, updated and deleted mapped row, and a
+do_orm_execute listener records bulk INSERT/UPDATE/DELETE statements run
+through the session (which no flush sees) with their parameters. Entries
+wait in session.info until the transaction commits, and are dropped on
+rollback.
+
+Committed entries go onto an in-memory queue. A background thread per
+process serializes them and writes them to audit_log in batches (up to
+AUDIT_BATCH_SIZE entries, at most AUDIT_FLUSH_INTERVAL seconds after the
+first), each batch one executemany on its own connection, so auditing
+costs a request a few dictionary operations per changed row. A full
+queue drops entries rather than slowing requests down; audit_stats()
+counts them.
+
+The user is taken from set_audit_user() (per session: web requests) or
+set_default_audit_user() (per process: the desktop app). Set
+AUDIT_ENABLED=0 to turn capturing off.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.dml import Insert
+
+from database.db_setup import session, session_factory, engine
+from models.audit import AuditLog
+
+AUDIT_ENABLED = os.environ.get('AUDIT_ENABLED', '1') != '0'
+
+# Entries per write, and seconds the writer waits to fill a batch
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '0.5'))
+
+# Entries waiting to be written before new ones are dropped
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '100000'))
+
+# Parameter sets kept per bulk statement, and characters of its SQL
+AUDIT_MAX_BULK_ROWS = 100
+AUDIT_MAX_STATEMENT_LENGTH = 2000
+
+# Bookkeeping tables whose writes are not audited
+AUDIT_EXCLUDED_TABLES = frozenset({
+    'audit_log', 'cache_versions', 'schema_version', 'invoice_sequences', 'replica_heartbeat'
+})
+
+# Columns whose values are never written to the log
+AUDIT_MASKED_COLUMNS = frozenset({('users', 'password')})
+
+# session.info keys: entries of the current transaction, and the acting user
+_PENDING = 'audit_pending'
+_USER = 'audit_user_id'
+
+_default_user_id = None
+
+def set_audit_user(user_id):
+    """Attribute the current session's changes to a user (web requests)"""
+    session().info[_USER] = user_id
+
+def set_default_audit_user(user_id):
+    """Attribute this process's changes to a user unless a session names one (desktop app)"""
+    global _default_user_id
+    _default_user_id = user_id
+
+
+class AuditWriter:
+    """Background writer of committed audit entries"""
+
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, interval=AUDIT_FLUSH_INTERVAL, max_queued=AUDIT_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queued = max_queued
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.last_error = None
+
+    def submit(self, entries):
+        """Queue entries for writing, dropping them if the queue is full"""
+        self._ensure_thread()
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+
+    def flush(self):
+        """Wait until every queued entry has been written (or dropped)"""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def _ensure_thread(self):
+        """Start the writer thread, again in a forked child (threads do not survive a fork)"""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Entries inherited from the parent are the parent's to write
+                self._queue = queue.Queue(maxsize=self.max_queued)
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        """Write batches as entries arrive"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch, attempts=3):
+        """Insert a batch with one executemany, retrying a few times before dropping it"""
+        rows = [dict(entry, changes=_serialize_changes(entry['changes'])) for entry in batch]
+        for attempt in range(attempts):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(AuditLog.__table__), rows)
+                self.written += len(rows)
+                return
+            except SQLAlchemyError as e:
+                self.last_error = str(e)
+                time.sleep(self.interval * (attempt + 1))
+
+        self.failed_batches += 1
+        self.dropped += len(rows)
+        print(f"Audit log: dropped {len(rows)} entries: {self.last_error}", file=sys.stderr)
+
+    def stats(self):
+        """Get queued, written, dropped and failed_batches counts and the last error"""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_batches': self.failed_batches,
+            'last_error': self.last_error
+        }
+
+
+audit_writer = AuditWriter()
+
+def audit_stats():
+    """Get this process's audit writer statistics"""
+    return audit_writer.stats()
+
+def flush_audit_log():
+    """Wait until this process's committed entries are in audit_log"""
+    audit_writer.flush()
+
+atexit.register(flush_audit_log)
+
+
+def _compile_statement(statement, parameters):
+    """Compile a bulk statement for the log: (SQL text, bound values)
+
+    ORM-enabled statements (insert(Model), update(Model) ...) need the
+    ORM compile state, which only exists during execution, so the table's
+    Core statement is compiled instead, for the columns that were bound.
+    """
+    try:
+        compiled = statement.compile(dialect=engine.dialect)
+    except Exception:
+        table = statement.table
+        rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+        columns = sorted({key for row in rows for key in row if key in table.c})
+        if isinstance(statement, Insert) and columns:
+            compiled = table.insert().compile(dialect=engine.dialect, column_keys=columns)
+        else:
+            verb = type(statement).__name__.replace('Annotated', '').upper()
+            return f"{verb} {table.name} ({', '.join(columns)})", {}
+    return str(compiled), {key: value for key, value in compiled.params.items() if value is not None}
+
+def _serialize_changes(changes):
+    """JSON text of an entry's changes, with a bulk statement compiled to SQL and its bound values"""
+    statement = changes.get('statement')
+    if statement is not None and not isinstance(statement, str):
+        sql, bound = _compile_statement(statement, changes['parameters'])
+        changes = dict(changes, statement=sql[:AUDIT_MAX_STATEMENT_LENGTH], parameters=changes['parameters'] or bound)
+    return json.dumps(changes, default=str)
+
+def _entity_id(mapper, instance):
+    """Primary key of an instance as text ("1", or "1,2" for composite keys)"""
+    return ','.join(str(value) for value in mapper.primary_key_from_instance(instance))
+
+def _column_keys(mapper):
+    """Attribute keys of a mapper's columns"""
+    keys = _column_keys_by_mapper.get(mapper)
+    if keys is None:
+        keys = _column_keys_by_mapper[mapper] = tuple(attribute.key for attribute in mapper.column_attrs)
+    return keys
+
+_column_keys_by_mapper = {}
+
+def _row_changes(state, table_name, action):
+    """Column changes of a flushed instance as {column: [old, new]}"""
+    changes = {}
+    if action == 'insert':
+        for key in _column_keys(state.mapper):
+            new = state.dict.get(key)
+            if new is not None:
+                changes[key] = [None, new]
+    elif action == 'delete':
+        for key in _column_keys(state.mapper):
+            changes[key] = [state.dict.get(key), None]
+    else:
+        # Only attributes set since the last flush have history
+        modified = state.committed_state
+        for key in _column_keys(state.mapper):
+            if key not in modified:
+                continue
+            history = state.attrs[key].history
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old != new:
+                changes[key] = [old, new]
+
+    for masked_table, key in AUDIT_MASKED_COLUMNS:
+        if masked_table == table_name and key in changes:
+            changes[key] = [value and '***' for value in changes[key]]
+    return changes
+
+def _pending_entries(db_session):
+    """Entries of the session's current transaction"""
+    return db_session.info.setdefault(_PENDING, [])
+
+def _user_id(db_session):
+    return db_session.info.get(_USER, _default_user_id)
+
+
+@event.listens_for(session_factory, 'after_flush')
+def _capture_flushed_changes(db_session, flush_context):
+    """Record the column changes of the rows a flush wrote"""
+    if not AUDIT_ENABLED:
+        return
+
+    entries = _pending_entries(db_session)
+    user_id = _user_id(db_session)
+    for action, instances in (('insert', db_session.new), ('update', db_session.dirty), ('delete', db_session.deleted)):
+        for instance in instances:
+            state = inspect(instance)
+            table_name = state.mapper.persist_selectable.name
+            if table_name in AUDIT_EXCLUDED_TABLES:
+                continue
+
+            changes = _row_changes(state, table_name, action)
+            if not changes and action == 'update':
+                continue
+
+            entries.append({
+                'table_name': table_name,
+                'entity_id': _entity_id(state.mapper, instance),
+                'action': action,
+                'changes': changes,
+                'user_id': user_id
+            })
+
+@event.listens_for(session_factory, 'do_orm_execute')
+def _capture_bulk_statement(orm_execute_state):
+    """Record an INSERT, UPDATE or DELETE statement run through the session"""
+    if not AUDIT_ENABLED or not (orm_execute_state.is_insert or orm_execute_state.is_update
+                                 or orm_execute_state.is_delete):
+        return
+
+    statement = orm_execute_state.statement
+    table_name = statement.table.name
+    if table_name in AUDIT_EXCLUDED_TABLES:
+        return
+
+    parameters = orm_execute_state.parameters
+    if isinstance(parameters, (list, tuple)):
+        rows = len(parameters)
+        parameters = [dict(row) for row in parameters[:AUDIT_MAX_BULK_ROWS]]
+    else:
+        rows = 1
+        parameters = dict(parameters) if parameters else None
+
+    # Compiling costs milliseconds, so the writer does it (statements are immutable)
+    action = 'bulk_insert' if orm_execute_state.is_insert else 'bulk_update' if orm_execute_state.is_update else 'bulk_delete'
+    _pending_entries(orm_execute_state.session).append({
+        'table_name': table_name,
+        'entity_id': None,
+        'action': action,
+        'changes': {'statement': statement, 'parameter_sets': rows, 'parameters': parameters},
+        'user_id': _user_id(orm_execute_state.session)
+    })
+
+@event.listens_for(session_factory, 'after_commit')
+def _queue_committed_changes(db_session):
+    """Hand the committed transaction's entries to the writer"""
+    entries = db_session.info.pop(_PENDING, None)
+    if entries:
+        now = datetime.utcnow()
+        for entry in entries:
+            entry['created_at'] = now
+        audit_writer.submit(entries)
+
+@event.listens_for(session_factory, 'after_soft_rollback')
+def _discard_rolled_back_changes(db_session, previous_transaction):
+    if previous_transaction.parent is None:
+        db_session.info.pop(_PENDING, None)
@@ -3,30 +3,301 @@
 
 """
 Database setup and session management for ASSI Warehouse Management System
+
+Writes always go to the primary database (DATABASE_URL). Optional read
+replicas (comma-separated DATABASE_REPLICA_URLS) serve reads inside
+use_replica() blocks and @read_only methods, as long as their lag stays
+within REPLICA_MAX_LAG seconds and the session has not written recently.
+
+Relationships are loaded lazily on access unless a query asks for them
+(selectinload/joinedload). With LAZY_LOAD_MODE=raise, lazy loads that
+would emit SQL raise instead, so N+1 query patterns fail in development
+and tests. QueryCounter and QUERY_BUDGET cap the statements per unit of
+work (a web request).
 """
 
 import os
+import time
 import hashlib
+import itertools
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, select, insert, update, text, inspect
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker, scoped_session, Session, raiseload
+from sqlalchemy.schema import CreateColumn
+
+from utils.cache import TTLCache
 
 # Create database connection
 db_url = os.environ.get('DATABASE_URL')
 engine = create_engine(db_url, echo=False)
 
+# Optional read replicas
+replica_urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+replica_engines = [create_engine(url, echo=False) for url in replica_urls]
+
+# Replicas further behind than this (seconds) are skipped; a session also
+# reads from the primary for this long after it writes
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', '5'))
+
+# Seconds a measured replica lag is reused before measuring again
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', '1'))
+
+_replica_lags = TTLCache(ttl=REPLICA_CHECK_INTERVAL, max_entries=max(1, len(replica_engines)))
+_replica_cycle = itertools.count()
+
+# Lag of a PostgreSQL standby; zero when it has replayed everything it received
+_POSTGRESQL_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def _heartbeat_lag(replica):
+    """Measure lag through the replica_heartbeat row (any database)
+
+    Reads the primary's last heartbeat, writes a new one and compares the
+    replica's copy: a replica that has the last heartbeat is current,
+    otherwise it is behind by at least the age of the heartbeat it has.
+    """
+    from models.replication import ReplicaHeartbeat
+    table = ReplicaHeartbeat.__table__
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        primary_beat = conn.execute(select(table.c.beat_at).where(table.c.id == 1)).scalar()
+        if primary_beat is None:
+            conn.execute(insert(table).values(id=1, beat_at=now))
+        else:
+            conn.execute(update(table).where(table.c.id == 1).values(beat_at=now))
+
+    with replica.connect() as conn:
+        replica_beat = conn.execute(select(table.c.beat_at).where(table.c.id == 1)).scalar()
+
+    if primary_beat is None or (replica_beat is not None and replica_beat >= primary_beat):
+        return 0.0
+    if replica_beat is None:
+        return float('inf')
+    return (now - replica_beat).total_seconds()
+
+def replica_lag(replica):
+    """Get how many seconds a replica is behind the primary
+
+    Returns:
+        Lag in seconds, or None if the replica cannot be reached
+    """
+    try:
+        if replica.dialect.name == 'postgresql':
+            with replica.connect() as conn:
+                return float(conn.execute(_POSTGRESQL_LAG_SQL).scalar() or 0.0)
+        return _heartbeat_lag(replica)
+    except SQLAlchemyError:
+        return None
+
+def choose_replica():
+    """Get a replica within REPLICA_MAX_LAG (round robin), or None to use the primary"""
+    count = len(replica_engines)
+    start = next(_replica_cycle)
+    for offset in range(count):
+        index = (start + offset) % count
+        replica = replica_engines[index]
+        lag = _replica_lags.get_or_set(index, lambda: replica_lag(replica))
+        if lag is not None and lag <= REPLICA_MAX_LAG:
+            return replica
+    return None
+
+class RoutingSession(Session):
+    """Session that sends read-only work to a replica and everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (replica_engines
+                and self.info.get('read_only')
+                and not self._flushing
+                and not getattr(clause, 'is_dml', False)
+                and self.info.get('primary_until', 0) <= time.time()):
+            replica = choose_replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _pin_after_flush(db_session, flush_context):
+    """Read from the primary for a while after writing (read-after-write)"""
+    db_session.info['primary_until'] = time.time() + REPLICA_MAX_LAG
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _pin_after_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['primary_until'] = time.time() + REPLICA_MAX_LAG
+
+# 'select' loads unplanned relationships on access; 'raise' makes those
+# lazy loads raise when they would query the database
+LAZY_LOAD_MODE = os.environ.get('LAZY_LOAD_MODE', 'select')
+
+# Maximum statements per web request (0 disables the check)
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '0'))
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _raise_on_lazy_load(orm_execute_state):
+    """Make relationships not loaded by the query itself raise on access (LAZY_LOAD_MODE=raise)
+
+    Options on the query (selectinload, joinedload, lazyload) take
+    precedence over the wildcard; refreshes keep it after commits.
+    Relationships already in the identity map stay accessible.
+    """
+    if (LAZY_LOAD_MODE == 'raise'
+            and orm_execute_state.is_select
+            and not orm_execute_state.is_relationship_load):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*', sql_only=True))
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised when a unit of work runs more statements than its budget"""
+
+_query_counters = threading.local()
+
+class QueryCounter:
+    """Collects the SQL statements this thread runs while started
+
+    Counters can nest; each sees the statements run while it is active:
+
+        with QueryCounter() as counter:
+            controller.get_all_invoices()
+        counter.check(5)
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def start(self):
+        if not hasattr(_query_counters, 'active'):
+            _query_counters.active = []
+        _query_counters.active.append(self)
+        return self
+
+    def stop(self):
+        active = getattr(_query_counters, 'active', [])
+        if self in active:
+            active.remove(self)
+        return self
+
+    def check(self, budget, label='Unit of work'):
+        """Raise QueryBudgetExceeded if more than budget statements ran
+
+        Args:
+            budget: Maximum number of statements (0 or None disables the check)
+            label: Name of the unit of work for the error message
+        """
+        if budget and self.count > budget:
+            statements = '\n'.join(f"  {statement}" for statement in self.statements)
+            raise QueryBudgetExceeded(f"{label} ran {self.count} queries (budget {budget}):\n{statements}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_query_counters, 'active', ()):
+        counter.statements.append(statement)
+
+for _counted_engine in (engine, *replica_engines):
+    event.listen(_counted_engine, 'before_cursor_execute', _count_statement)
+
 # Create session factory
-session_factory = sessionmaker(bind=engine)
+session_factory = sessionmaker(bind=engine, class_=RoutingSession)
 session = scoped_session(session_factory)
 
+@contextmanager
+def use_replica(enabled=True):
+    """Let this thread's session read from a replica inside the block
+
+    The outermost block decides, so use_replica(False) around a request
+    keeps nested @read_only methods on the primary.
+    """
+    db_session = session()
+    if 'read_only' in db_session.info:
+        yield
+        return
+
+    db_session.info['read_only'] = enabled
+    try:
+        yield
+    finally:
+        db_session.info.pop('read_only', None)
+
+# IDs per IN (...) list in bulk queries
+IN_CLAUSE_SIZE = 500
+
+def chunked(values, size=IN_CLAUSE_SIZE):
+    """Split values into lists of at most size values (for IN lists)"""
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+def read_only(method):
+    """Decorator for controller methods that only read (they may use a replica)"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return method(*args, **kwargs)
+    return wrapper
+
 # Create base class for models
 Base = declarative_base()
 Base.query = session.query_property()
 
-def init_db():
-    """Initialize the database, creating all tables"""
-    # Import all models to ensure they're registered
+def _has_pending_changes(db_session):
+    """Check whether a session holds unflushed new, changed or deleted objects"""
+    return bool(db_session.new or db_session.dirty or db_session.deleted)
+
+def recycle_session():
+    """Discard this thread's session unless it holds unsaved changes
+
+    For long-lived threads (the desktop UI) at points where no loaded
+    objects are in use any more: the next query starts a fresh session
+    with an empty identity map.
+
+    Returns:
+        True if the session was discarded (or none existed)
+    """
+    if not session.registry.has():
+        return True
+    if _has_pending_changes(session()):
+        return False
+    session.remove()
+    return True
+
+def expire_idle_session():
+    """End this thread's transaction and expire loaded objects unless there are unsaved changes
+
+    Releases the pooled connection and the loaded attribute state; objects
+    still referenced reload their data from the database on next access.
+
+    Returns:
+        True if the session was expired
+    """
+    if not session.registry.has():
+        return False
+    db_session = session()
+    if _has_pending_changes(db_session):
+        return False
+    db_session.rollback()
+    return True
+
+# Bump for schema work init_db() does outside the table metadata
+# (e.g. new trigram indexes), so existing databases run it again
+SCHEMA_REVISION = 2
+
+def _import_models():
+    """Import all models so they are registered on Base.metadata"""
     import models.user
     import models.warehouse
     import models.item
@@ -35,13 +306,144 @@ def init_db():
     import models.fund
     import models.expense
     import models.report
+    import models.inventory_cost
+    import models.replication
+    import models.schema_version
+    import models.cache_version
+    import models.stock_transfer
+    import models.stock_count
+    import models.reservation
+    import models.audit
+    import models.archive
+
+def schema_fingerprint():
+    """Get a hash of the table definitions and SCHEMA_REVISION"""
+    _import_models()
+
+    digest = hashlib.sha256(f"revision:{SCHEMA_REVISION}".encode('utf-8'))
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name):
+        digest.update(f"table:{table.name}".encode('utf-8'))
+        for column in table.columns:
+            digest.update(f"column:{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}".encode('utf-8'))
+        for index in sorted(table.indexes, key=lambda index: index.name or ''):
+            digest.update(f"index:{index.name}:{[column.name for column in index.columns]}:{index.unique}".encode('utf-8'))
+    return digest.hexdigest()
+
+def add_missing_columns():
+    """Add model columns that existing tables do not have yet
+
+    create_all() only creates missing tables, so columns added to a model
+    later are added here with ALTER TABLE. New columns must be nullable
+    or have a server default.
+
+    Returns:
+        List of "table.column" names added
+    """
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                definition = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+def add_missing_indexes():
+    """Create model indexes that existing tables do not have yet
+
+    create_all() skips the indexes of tables that already exist. Run
+    after add_missing_columns(), so indexes on new columns can be built.
+
+    Returns:
+        List of index names created
+    """
+    created = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name and index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+    return created
+
+def get_schema_version():
+    """Get the schema fingerprint stored in the database, or None"""
+    from models.schema_version import SchemaVersion
+
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except SQLAlchemyError:
+        # Table not created yet
+        return None
+
+def init_db(force=False):
+    """Initialize the database, creating all tables
+
+    Schema work is skipped when the stored schema version matches the
+    models, so repeated starts cost a single query.
+
+    Args:
+        force: Run the schema work even if the version is current
+
+    Returns:
+        True if schema work ran, False if it was skipped
+    """
+    fingerprint = schema_fingerprint()
+    if not force and get_schema_version() == fingerprint:
+        return False
     
-    # Create tables
+    # Create tables, then add columns and indexes new to existing tables
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+    
+    # Create trigram search indexes where supported (PostgreSQL)
+    from controllers.search_controller import SearchController
+    SearchController.ensure_trigram_indexes()
     
     # Create default admin user if not exists
     create_admin_if_not_exists()
     
+    # Create the version rows of the identity caches
+    from database.identity_cache import ensure_cache_versions
+    ensure_cache_versions()
+    
+    # Record the version last, so an interrupted setup runs again
+    from models.schema_version import SchemaVersion
+    with engine.begin() as conn:
+        updated = conn.execute(
+            update(SchemaVersion.__table__).where(SchemaVersion.id == 1).values(
+                version=fingerprint, applied_at=datetime.utcnow())
+        ).rowcount
+        if not updated:
+            conn.execute(insert(SchemaVersion.__table__).values(
+                id=1, version=fingerprint, applied_at=datetime.utcnow()))
+    return True
+
+def reset_after_fork():
+    """Give a forked process its own connections and session
+
+    Pooled connections inherited from the parent are dropped without
+    closing them, so the parent's sockets stay usable.
+    """
+    engine.dispose(close=False)
+    for replica in replica_engines:
+        replica.dispose(close=False)
+    session.remove()
+    
 def create_admin_if_not_exists():
     """Create default admin user if it doesn't exist"""
     from models.user import User
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Second-level identity cache for ASSI Warehouse Management System
+
+Keeps immutable snapshots (models/rows.py) of rarely changing dimension
+rows (items, warehouses and funds) per process, keyed by ID, holding up
+to IDENTITY_CACHE_SIZE recently used entries each. A commit that changes
+a snapshot column drops the changed IDs in the committing process and
+bumps the cache's row in cache_versions within the same transaction;
+other processes compare versions at most every
+IDENTITY_CACHE_CHECK_INTERVAL seconds and clear their copy when it moved.
+
+Snapshots are for reads. Code that modifies a row still loads it through
+the session, and a session that changed a row in its current transaction
+reads that row from the database instead of the cache.
+
+item_code_index maps every barcode and SKU to its item ID for scanner
+lookups. It is loaded whole and dropped whole when a code changes, and
+versioned the same way.
+"""
+
+import os
+import time
+import threading
+
+from sqlalchemy import event, select, update, insert, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db_setup import session, session_factory, engine, chunked
+from models.item import Item, ItemBarcode
+from models.warehouse import Warehouse
+from models.fund import Fund
+from models.cache_version import CacheVersion
+from models.rows import ItemSnapshot, WarehouseSnapshot, FundSnapshot, row_columns
+from utils.cache import LRUCache
+
+# Entries kept per cache
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', '1024'))
+
+# Seconds between checks for commits made by other processes
+IDENTITY_CACHE_CHECK_INTERVAL = float(os.environ.get('IDENTITY_CACHE_CHECK_INTERVAL', '1'))
+
+# session.info keys: IDs written per cache, and caches whose version was bumped, in this transaction
+_WRITTEN = 'identity_cache_written'
+_BUMPED = 'identity_cache_bumped'
+
+class IdentityCache:
+    """Cache of snapshots of one model's rows by ID"""
+
+    def __init__(self, name, model, row_type, max_entries=IDENTITY_CACHE_SIZE):
+        """Create a cache
+
+        Args:
+            name: Cache name (row in cache_versions)
+            model: Mapped class whose rows are cached
+            row_type: Frozen dataclass whose fields are columns of the model
+            max_entries: Snapshots kept
+        """
+        self.name = name
+        self.model = model
+        self.models = (model,)
+        self.row_type = row_type
+        self.fields = row_columns(row_type)
+        self._query = select(*(getattr(model, field) for field in self.fields))
+        self._cache = LRUCache(max_entries)
+
+    def get(self, key):
+        """Get the snapshot of a row, or None if there is no row with that ID"""
+        try:
+            key = int(key)
+        except (TypeError, ValueError):
+            return None
+
+        _check_versions()
+        db_session = session()
+        if self._written_in(db_session, key):
+            return self._load(db_session, key)
+        return self._cache.get_or_set(key, lambda: self._load(db_session, key))
+
+    def load_many(self, keys):
+        """Read snapshots of many rows, one query per IN list
+
+        For documents with thousands of lines: the snapshots are read from
+        the database and not stored, so they do not push out hot entries.
+
+        Returns:
+            Dictionary {id: snapshot} of the rows that exist
+        """
+        db_session = session()
+        snapshots = {}
+        for chunk in chunked(sorted({int(key) for key in keys})):
+            for row in db_session.execute(self._query.where(self.model.id.in_(chunk)), bind_arguments={'bind': engine}):
+                snapshots[row.id] = self.row_type(*row)
+        return snapshots
+
+    def _written_in(self, db_session, key):
+        """Check whether a session changed a row in its current transaction"""
+        if key in db_session.info.get(_WRITTEN, {}).get(self.name, ()):
+            return True
+        return any(isinstance(instance, self.model) and instance.id == key and self.changed(instance)
+                   for instance in db_session.dirty)
+
+    def _load(self, db_session, key):
+        """Read a snapshot through the session's primary connection"""
+        row = db_session.execute(
+            self._query.where(self.model.id == key),
+            bind_arguments={'bind': engine}
+        ).first()
+        return self.row_type(*row) if row else None
+
+    def changed(self, instance):
+        """Check whether an instance has unsaved changes to snapshot columns"""
+        attrs = inspect(instance).attrs
+        return any(attrs[field].history.has_changes() for field in self.fields)
+
+    def invalidate(self, key=None):
+        """Drop one snapshot, or all of them when key is None"""
+        self._cache.invalidate(key)
+
+    def stats(self):
+        """Get entries, hits, misses, hit_rate and evictions"""
+        return self._cache.stats()
+
+
+class ItemCodeIndex:
+    """Hash index of every barcode and SKU to its item ID
+
+    The whole index is read with two queries on first use (or by warm()
+    at startup) and dropped whole when a commit adds, changes or removes
+    a code, so a lookup is a dictionary read without a database round
+    trip. Barcodes take precedence over SKUs. Hit and miss counts are not
+    locked and may drift slightly under concurrency.
+    """
+
+    name = 'item_codes'
+    models = (Item, ItemBarcode)
+
+    def __init__(self):
+        self._codes = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, code):
+        """Get the ID of the item with a barcode or SKU, or None"""
+        code = str(code).strip() if code is not None else ''
+        if not code:
+            return None
+
+        _check_versions()
+        db_session = session()
+        if self._written_in(db_session):
+            return self._lookup(db_session, code)
+
+        codes = self._codes
+        if codes is None:
+            codes = self.warm()
+
+        item_id = codes.get(code)
+        if item_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item_id
+
+    def warm(self):
+        """Load the index unless it is loaded (call at startup to take the first scan's wait)
+
+        An index read while a commit invalidated it is returned to the
+        caller but not kept.
+
+        Returns:
+            Dictionary {code: item_id}
+        """
+        # Record the current versions first, so the first check does not drop the index
+        _check_versions()
+        with self._load_lock:
+            codes = self._codes
+            if codes is not None:
+                return codes
+
+            with self._lock:
+                generation = self._generation
+
+            with engine.connect() as conn:
+                codes = dict(conn.execute(select(Item.sku, Item.id).where(Item.sku.isnot(None))).all())
+                codes.update(conn.execute(select(ItemBarcode.code, ItemBarcode.item_id)).all())
+
+            with self._lock:
+                self.loads += 1
+                if self._generation == generation:
+                    self._codes = codes
+            return codes
+
+    def _written_in(self, db_session):
+        """Check whether a session changed codes in its current transaction"""
+        if db_session.info.get(_WRITTEN, {}).get(self.name):
+            return True
+        return any(isinstance(instance, self.models) and self.changed(instance)
+                   for instance in (*db_session.new, *db_session.dirty))
+
+    def _lookup(self, db_session, code):
+        """Look a code up through the session's primary connection"""
+        item_id = db_session.execute(
+            select(ItemBarcode.item_id).where(ItemBarcode.code == code),
+            bind_arguments={'bind': engine}
+        ).scalar()
+        if item_id is None:
+            item_id = db_session.execute(
+                select(Item.id).where(Item.sku == code),
+                bind_arguments={'bind': engine}
+            ).scalar()
+        return item_id
+
+    def changed(self, instance):
+        """Check whether an item or barcode has unsaved changes to its codes"""
+        attrs = inspect(instance).attrs
+        fields = ('sku',) if isinstance(instance, Item) else ('code', 'item_id')
+        return any(attrs[field].history.has_changes() for field in fields)
+
+    def invalidate(self, key=None):
+        """Drop the index (codes are not dropped one by one)"""
+        with self._lock:
+            self._generation += 1
+            self._codes = None
+
+    def stats(self):
+        """Get entries, hits, misses, hit_rate and loads"""
+        codes = self._codes
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(codes) if codes is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'loads': self.loads
+        }
+
+
+item_cache = IdentityCache('items', Item, ItemSnapshot)
+warehouse_cache = IdentityCache('warehouses', Warehouse, WarehouseSnapshot)
+fund_cache = IdentityCache('funds', Fund, FundSnapshot)
+item_code_index = ItemCodeIndex()
+
+_caches = {cache.name: cache for cache in (item_cache, warehouse_cache, fund_cache, item_code_index)}
+_caches_by_model = {
+    model: [cache for cache in _caches.values() if model in cache.models]
+    for model in (Item, ItemBarcode, Warehouse, Fund)
+}
+
+_versions_lock = threading.Lock()
+_known_versions = {}
+_next_check = 0.0
+
+def _check_versions():
+    """Clear caches whose version another process bumped (at most once per interval)"""
+    global _next_check
+    if time.monotonic() < _next_check:
+        return
+
+    with _versions_lock:
+        now = time.monotonic()
+        if now < _next_check:
+            return
+        _next_check = now + IDENTITY_CACHE_CHECK_INTERVAL
+
+        try:
+            with engine.connect() as conn:
+                versions = dict(conn.execute(select(CacheVersion.name, CacheVersion.version)).all())
+        except SQLAlchemyError:
+            # Versions unknown: start over rather than serve stale snapshots
+            versions = {}
+            _known_versions.clear()
+
+        for name, cache in _caches.items():
+            version = versions.get(name, 0)
+            if _known_versions.get(name) != version:
+                cache.invalidate()
+                _known_versions[name] = version
+
+def ensure_cache_versions():
+    """Create the cache_versions rows of all caches (called by init_db)"""
+    with engine.begin() as conn:
+        existing = set(conn.execute(select(CacheVersion.name)).scalars())
+        for name in _caches:
+            if name not in existing:
+                conn.execute(insert(CacheVersion.__table__).values(name=name, version=0))
+
+def cache_stats():
+    """Get the statistics of every identity cache in this process
+
+    Returns:
+        Dictionary of cache name to stats (entries, hits, misses, hit_rate, evictions)
+    """
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+def invalidate_all():
+    """Drop all snapshots in this process"""
+    for cache in _caches.values():
+        cache.invalidate()
+
+
+def _mark_written(db_session, cache, key):
+    """Record a cached row written in the session's transaction, bumping the cache's version once"""
+    db_session.info.setdefault(_WRITTEN, {}).setdefault(cache.name, set()).add(key)
+    bumped = db_session.info.setdefault(_BUMPED, set())
+    if cache.name not in bumped:
+        db_session.execute(
+            update(CacheVersion.__table__).where(
+                CacheVersion.name == cache.name
+            ).values(version=CacheVersion.version + 1)
+        )
+        bumped.add(cache.name)
+
+def record_bulk_write(cache, keys=(None,)):
+    """Record rows written with Core statements, which the flush events do not see
+
+    Call inside the writing transaction; the cache drops the rows (all of
+    them for the default key None) when it commits.
+    """
+    db_session = session()
+    for key in keys:
+        _mark_written(db_session, cache, key)
+
+
+@event.listens_for(session_factory, 'after_flush')
+def _track_snapshot_writes(db_session, flush_context):
+    """Record the cached rows a flush changed and bump their caches' versions once per transaction"""
+    for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+        for cache in _caches_by_model.get(type(instance), ()):
+            if instance not in db_session.deleted and not cache.changed(instance):
+                continue
+            _mark_written(db_session, cache, instance.id)
+
+@event.listens_for(session_factory, 'after_commit')
+def _invalidate_committed_writes(db_session):
+    """Drop snapshots of the rows a commit changed"""
+    written = db_session.info.pop(_WRITTEN, {})
+    bumped = db_session.info.pop(_BUMPED, set())
+
+    for name, keys in written.items():
+        for key in keys:
+            _caches[name].invalidate(key)
+
+    # Our own bump is already applied locally; any other process's bump
+    # still shows up as a difference at the next check
+    with _versions_lock:
+        for name in bumped:
+            if name in _known_versions:
+                _known_versions[name] += 1
+
+@event.listens_for(session_factory, 'after_soft_rollback')
+def _forget_rolled_back_writes(db_session, previous_transaction):
+    if previous_transaction.parent is None:
+        db_session.info.pop(_WRITTEN, None)
+        db_session.info.pop(_BUMPED, None)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ASSI Warehouse Management System
+Maintenance commands
+
+Usage:
+    python manage.py rebuild-costs [--workers N] [--item ID ...]
+    python manage.py serve [--bind ADDRESS] [--workers N] [--threads N] [--asgi]
+                           [--max-requests N] [--max-requests-jitter N]
+    python manage.py init-db [--force]
+    python manage.py expire-reservations [--batch-size N] [--interval SECONDS]
+    python manage.py import-barcodes FILE [--replace]
+    python manage.py archive [--before YYYY-MM | --keep-months N] [--batch-size N]
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+
+# Setup path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database.db_setup import init_db
+import database.audit  # Audit the changes made by maintenance commands
+
+def rebuild_costs_command(args):
+    """Recompute inventory cost layers from invoice history"""
+    from controllers.costing_controller import rebuild_costs
+
+    started = time.perf_counter()
+
+    def report(item_id, success, result):
+        if not success:
+            print(f"Item {item_id}: {result}", file=sys.stderr)
+
+    rebuilt, errors = rebuild_costs(item_ids=args.item or None, workers=args.workers, progress=report)
+
+    print(f"Rebuilt cost layers for {rebuilt} item(s) in {time.perf_counter() - started:.1f}s"
+          f"{f', {len(errors)} failed' if errors else ''}")
+    return 1 if errors else 0
+
+def serve_command(args):
+    """Run the production web server"""
+    from server import build_options, run
+
+    options = build_options(
+        bind=args.bind,
+        workers=args.workers,
+        threads=args.threads,
+        asgi=args.asgi,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        timeout=args.timeout,
+        graceful_timeout=args.graceful_timeout,
+        access_log=args.access_log
+    )
+    run(options, asgi=args.asgi)
+    return 0
+
+def expire_reservations_command(args):
+    """Expire stock reservations past their expiry, once or every --interval seconds"""
+    from controllers.reservation_controller import ReservationController
+
+    controller = ReservationController()
+    while True:
+        started = time.perf_counter()
+        success, result = controller.expire_reservations(batch_size=args.batch_size)
+        if not success:
+            print(result, file=sys.stderr)
+            if not args.interval:
+                return 1
+        elif result or not args.interval:
+            print(f"Expired {result} reservation(s) in {time.perf_counter() - started:.2f}s")
+
+        if not args.interval:
+            return 0
+        time.sleep(args.interval)
+
+def import_barcodes_command(args):
+    """Import barcodes from a CSV file with a barcode (or code) column and an item_id or sku column"""
+    from controllers.item_controller import ItemController
+
+    with open(args.file, newline='', encoding='utf-8-sig') as csv_file:
+        rows = [
+            {'code': row.get('barcode') or row.get('code'), 'item_id': row.get('item_id'), 'sku': row.get('sku')}
+            for row in csv.DictReader(csv_file)
+        ]
+
+    started = time.perf_counter()
+    success, result = ItemController().import_barcodes(rows, replace=args.replace)
+    if not success:
+        print(result, file=sys.stderr)
+        return 1
+
+    for number, message in result['errors']:
+        print(f"Row {number}: {message}", file=sys.stderr)
+    print(f"Imported {result['imported']} barcode(s), moved {result['moved']}, "
+          f"{result['unchanged']} already present, {len(result['errors'])} skipped "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 1 if result['errors'] else 0
+
+def archive_command(args):
+    """Close the months before --before and move their settled documents to the archive tables"""
+    from datetime import datetime
+    from controllers.archive_controller import ArchiveController
+
+    before = None
+    if args.before:
+        try:
+            before = datetime.strptime(args.before, '%Y-%m')
+        except ValueError:
+            print(f"Invalid month: {args.before} (expected YYYY-MM)", file=sys.stderr)
+            return 1
+
+    started = time.perf_counter()
+    reported = []
+
+    def report(summary):
+        reported.append(summary['batches'])
+        print(f"Moved {summary['invoices']} invoice(s), {summary['payments']} payment(s), "
+              f"{summary['fund_transactions']} fund transaction(s)", end='\r', flush=True)
+
+    options = {'before': before, 'progress': report}
+    if args.keep_months is not None:
+        options['keep_months'] = args.keep_months
+    if args.batch_size:
+        options['batch_size'] = args.batch_size
+    success, result = ArchiveController().archive(**options)
+    if reported:
+        print()
+    if not success:
+        print(result, file=sys.stderr)
+        return 1
+
+    boundary = result['boundary'].strftime('%Y-%m-%d') if result['boundary'] else 'none'
+    print(f"Closed {result['periods_closed']} month(s), archive boundary {boundary}")
+    print(f"Moved {result['invoices']} invoice(s), {result['payments']} payment(s), "
+          f"{result['fund_transactions']} fund transaction(s) in {result['batches']} batch(es) "
+          f"in {time.perf_counter() - started:.2f}s")
+    if result['open_invoices'] or result['held_back']:
+        print(f"Left hot: {result['open_invoices']} open invoice(s), "
+              f"{result['held_back']} settled invoice(s) waiting for related documents")
+    return 0
+
+def init_db_command(args):
+    """Create tables and indexes (already done by every command when the schema changed)"""
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ASSI Warehouse Management System maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rebuild = commands.add_parser('rebuild-costs', help="Recompute FIFO layers, moving averages and COGS")
+    rebuild.add_argument('--workers', type=int, default=None,
+                         help="Worker processes (default: CPU count; always 1 on SQLite)")
+    rebuild.add_argument('--item', type=int, action='append',
+                         help="Only rebuild this item ID (repeatable)")
+    rebuild.set_defaults(handler=rebuild_costs_command)
+
+    serve = commands.add_parser('serve', help="Run the production web server (preforking gunicorn)")
+    serve.add_argument('--bind', default=os.environ.get('WEB_BIND', '0.0.0.0:5000'),
+                       help="Address to listen on (default: 0.0.0.0:5000)")
+    serve.add_argument('--workers', type=int, default=None,
+                       help="Worker processes (default: WEB_WORKERS or the CPU count)")
+    serve.add_argument('--threads', type=int, default=1,
+                       help="Threads per worker (default: 1)")
+    serve.add_argument('--asgi', action='store_true',
+                       help="Serve the async read API in front of the Flask app")
+    serve.add_argument('--max-requests', type=int, default=1000,
+                       help="Recycle a worker after this many requests (default: 1000, 0 disables)")
+    serve.add_argument('--max-requests-jitter', type=int, default=100,
+                       help="Random extra requests before recycling (default: 100)")
+    serve.add_argument('--timeout', type=int, default=30,
+                       help="Seconds before a stuck worker is killed (default: 30)")
+    serve.add_argument('--graceful-timeout', type=int, default=30,
+                       help="Seconds workers get to finish on reload or shutdown (default: 30)")
+    serve.add_argument('--access-log', default=None,
+                       help="Access log file, '-' for stdout (default: off)")
+    serve.set_defaults(handler=serve_command)
+
+    init = commands.add_parser('init-db', help="Create tables and indexes")
+    init.add_argument('--force', action='store_true',
+                      help="Run schema setup even if the schema version is current")
+    init.set_defaults(handler=init_db_command)
+
+    expire = commands.add_parser('expire-reservations', help="Release the stock held by expired reservations")
+    expire.add_argument('--batch-size', type=int, default=1000,
+                        help="Reservations expired per statement and commit (default: 1000)")
+    expire.add_argument('--interval', type=float, default=0,
+                        help="Keep running, sweeping every this many seconds (default: run once)")
+    expire.set_defaults(handler=expire_reservations_command)
+
+    barcodes = commands.add_parser('import-barcodes', help="Import item barcodes from a CSV file")
+    barcodes.add_argument('file', help="CSV file with barcode and item_id or sku columns")
+    barcodes.add_argument('--replace', action='store_true',
+                          help="Move barcodes that belong to another item instead of skipping them")
+    barcodes.set_defaults(handler=import_barcodes_command)
+
+    archive = commands.add_parser('archive', help="Move closed months of invoices, payments and fund transactions to the archive")
+    archive.add_argument('--before', default=None,
+                         help="First month kept hot, YYYY-MM (default: --keep-months before the current month)")
+    archive.add_argument('--keep-months', type=int, default=None,
+                         help="Months kept hot (default: ARCHIVE_KEEP_MONTHS or 12)")
+    archive.add_argument('--batch-size', type=int, default=None,
+                         help="Invoices moved per transaction (default: 500)")
+    archive.set_defaults(handler=archive_command)
+
+    args = parser.parse_args(argv)
+
+    # Make sure all tables exist (a single query when the schema is current)
+    started = time.perf_counter()
+    if init_db(force=getattr(args, 'force', False)):
+        print(f"Database schema updated in {time.perf_counter() - started:.2f}s")
+
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Archive models for ASSI Warehouse Management System
+
+Closed periods of the ledger (invoices with their lines, payments,
+allocations, COGS entries, consumed cost layers and fulfilled
+reservations, and fund transactions) are moved from the hot tables to
+<table>_archive tables with the same columns (controllers.archive_controller).
+Rows of child tables without a date of their own carry a copy of their
+invoice's date, so every archive table has a date to partition and prune
+by, and every archived row is dated before the archive boundary.
+
+On PostgreSQL the archive tables are range-partitioned by month on that
+date; the archiver creates the monthly partitions. On SQLite they are
+plain tables indexed by it. The archive tables have no foreign keys,
+and the hot tables keep theirs.
+
+LedgerTables gives queries the same mapped names over either storage,
+so a query is written once and run against HOT, ARCHIVE or both.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, Table, Index, PrimaryKeyConstraint
+from sqlalchemy.orm import aliased
+
+from database.db_setup import Base
+from models.invoice import Invoice, InvoiceItem
+from models.supplier_customer import Payment, PaymentAllocation
+from models.inventory_cost import CostLayer, CostOfGoodsSold
+from models.reservation import StockReservation
+from models.fund import FundTransaction
+
+class ArchivedPeriod(Base):
+    """Month closed for archiving
+
+    Its rows are moved to the archive tables once they are settled, so
+    period_end of the latest month is the archive boundary: archived rows
+    are all dated before it.
+    """
+
+    __tablename__ = 'archived_periods'
+
+    period_start = Column(DateTime, primary_key=True)
+    period_end = Column(DateTime, nullable=False)
+    invoices = Column(Integer, nullable=False, default=0)  # Invoices moved so far
+    payments = Column(Integer, nullable=False, default=0)
+    fund_transactions = Column(Integer, nullable=False, default=0)
+    closed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    archived_at = Column(DateTime)  # Last time rows of the month were moved
+
+    def __repr__(self):
+        return f"<ArchivedPeriod(period_start={self.period_start}, invoices={self.invoices})>"
+
+
+def _archive_table(model, date_column, indexes=(), invoice_date=False):
+    """Define the archive table of a hot table
+
+    Args:
+        model: Mapped class of the hot table
+        date_column: Column partitioned (PostgreSQL) and indexed by
+        indexes: Column tuples of further indexes, for the readers' lookups
+        invoice_date: Add an invoice_date column (the date of the row's invoice)
+    """
+    hot = model.__table__
+    name = f"{hot.name}_archive"
+    columns = [
+        Column(column.name, column.type, nullable=column.nullable and column.name != date_column)
+        for column in hot.columns
+    ]
+    if invoice_date:
+        columns.append(Column('invoice_date', DateTime, nullable=False))
+
+    return Table(
+        name, Base.metadata,
+        *columns,
+        # PostgreSQL requires the partition key in the primary key
+        PrimaryKeyConstraint('id', date_column),
+        Index(f"ix_{name}_{date_column}", date_column),
+        *(Index(f"ix_{name}_{'_'.join(index_columns)}", *index_columns) for index_columns in indexes),
+        postgresql_partition_by=f"RANGE ({date_column})"
+    )
+
+invoices_archive = _archive_table(Invoice, 'invoice_date', indexes=[
+    ('entity_id', 'invoice_date'), ('type', 'invoice_date')
+])
+invoice_items_archive = _archive_table(InvoiceItem, 'invoice_date', invoice_date=True, indexes=[
+    ('invoice_id',), ('item_id', 'invoice_date')
+])
+payments_archive = _archive_table(Payment, 'payment_date', indexes=[('entity_id', 'payment_date')])
+payment_allocations_archive = _archive_table(PaymentAllocation, 'invoice_date', invoice_date=True, indexes=[
+    ('invoice_id',), ('payment_id',)
+])
+cogs_entries_archive = _archive_table(CostOfGoodsSold, 'issued_at', indexes=[('invoice_item_id',), ('item_id',)])
+cost_layers_archive = _archive_table(CostLayer, 'received_at', indexes=[('item_id',)])
+stock_reservations_archive = _archive_table(StockReservation, 'invoice_date', invoice_date=True, indexes=[
+    ('invoice_id',)
+])
+fund_transactions_archive = _archive_table(FundTransaction, 'created_at', indexes=[('fund_id', 'created_at')])
+
+# Hot model -> (archive table, date column) in the order rows are deleted (children first)
+ARCHIVE_TABLES = {
+    PaymentAllocation: (payment_allocations_archive, 'invoice_date'),
+    CostOfGoodsSold: (cogs_entries_archive, 'issued_at'),
+    CostLayer: (cost_layers_archive, 'received_at'),
+    StockReservation: (stock_reservations_archive, 'invoice_date'),
+    InvoiceItem: (invoice_items_archive, 'invoice_date'),
+    Payment: (payments_archive, 'payment_date'),
+    Invoice: (invoices_archive, 'invoice_date'),
+    FundTransaction: (fund_transactions_archive, 'created_at'),
+}
+
+
+class LedgerTables:
+    """The ledger models of one storage: the hot tables or their archive"""
+
+    def __init__(self, name, invoice, invoice_item, payment, allocation, cogs, fund_transaction, line_date=None):
+        """Create a storage
+
+        Args:
+            name: 'hot' or 'archive'
+            invoice, invoice_item, payment, allocation, cogs, fund_transaction: Mapped
+                classes (or aliases of them) of the storage's tables
+            line_date: Invoice date column of the invoice lines, if they have one
+        """
+        self.name = name
+        self.invoice = invoice
+        self.invoice_item = invoice_item
+        self.payment = payment
+        self.allocation = allocation
+        self.cogs = cogs
+        self.fund_transaction = fund_transaction
+        self.line_date = line_date
+
+    def line_dates(self, start=None, end=None, inclusive_end=True):
+        """Conditions on the invoice lines' own copy of the invoice date
+
+        Invoice date conditions select the same lines; repeating them on the
+        lines lets PostgreSQL prune the lines' partitions too. Empty for
+        the hot tables, whose lines have no date.
+        """
+        if self.line_date is None:
+            return []
+        conditions = []
+        if start is not None:
+            conditions.append(self.line_date >= start)
+        if end is not None:
+            conditions.append(self.line_date <= end if inclusive_end else self.line_date < end)
+        return conditions
+
+    def __repr__(self):
+        return f"<LedgerTables({self.name})>"
+
+
+HOT = LedgerTables('hot', Invoice, InvoiceItem, Payment, PaymentAllocation, CostOfGoodsSold, FundTransaction)
+
+ARCHIVE = LedgerTables(
+    'archive',
+    aliased(Invoice, invoices_archive, adapt_on_names=True, name='invoices_archive'),
+    aliased(InvoiceItem, invoice_items_archive, adapt_on_names=True, name='invoice_items_archive'),
+    aliased(Payment, payments_archive, adapt_on_names=True, name='payments_archive'),
+    aliased(PaymentAllocation, payment_allocations_archive, adapt_on_names=True, name='payment_allocations_archive'),
+    aliased(CostOfGoodsSold, cogs_entries_archive, adapt_on_names=True, name='cogs_entries_archive'),
+    aliased(FundTransaction, fund_transactions_archive, adapt_on_names=True, name='fund_transactions_archive'),
+    line_date=invoice_items_archive.c.invoice_date
+)
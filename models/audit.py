@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Audit log model for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from database.db_setup import Base
+from datetime import datetime
+
+class AuditLog(Base):
+    """Committed change to a row, or a bulk statement, and the user who made it
+
+    Written in batches by the audit writer (database/audit.py), so entries
+    appear shortly after the commit they describe.
+    """
+
+    __tablename__ = 'audit_log'
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(64), nullable=False)
+    entity_id = Column(String(64))  # Primary key ("1", or "1,2" for composite keys); None for bulk statements
+    action = Column(String(16), nullable=False)  # insert, update, delete, bulk_insert, bulk_update, bulk_delete
+    changes = Column(Text, nullable=False)  # JSON: {column: [old, new]}, or the statement and its parameters
+    user_id = Column(Integer)  # No foreign key, so entries outlive deleted users
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Commit time
+
+    __table_args__ = (
+        Index('ix_audit_log_entity_time', 'table_name', 'entity_id', 'created_at'),
+        Index('ix_audit_log_user_time', 'user_id', 'created_at'),
+        Index('ix_audit_log_time', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<AuditLog(table='{self.table_name}', entity_id={self.entity_id}, action='{self.action}')>"
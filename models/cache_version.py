@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache version model for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, String
+from database.db_setup import Base
+
+class CacheVersion(Base):
+    """Counter per process-local cache, bumped by every commit that makes it stale
+
+    Processes compare it with the version they last saw to drop entries
+    written by other processes.
+    """
+
+    __tablename__ = 'cache_versions'
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheVersion(name='{self.name}', version={self.version})>"
@@ -5,7 +5,7 @@
 Fund model for ASSI Warehouse Management System
 """
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.db_setup import Base
@@ -49,5 +49,10 @@ class FundTransaction(Base):
     # Relationship with fund
     fund = relationship("Fund", back_populates="transactions")
     
+    __table_args__ = (
+        Index('ix_fund_transactions_created', 'created_at', 'id'),
+        Index('ix_fund_transactions_fund_created', 'fund_id', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f"<FundTransaction(fund_id={self.fund_id}, amount={self.amount}, type='{self.transaction_type}')>"
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Inventory cost models for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from database.db_setup import Base
+from datetime import datetime
+
+class CostLayer(Base):
+    """FIFO cost layer: one receipt of an item into a warehouse
+
+    Quantities are in the item's main unit and costs in USD per main unit.
+    """
+
+    __tablename__ = 'cost_layers'
+
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), index=True)  # Source purchase, if any
+    source_type = Column(String, nullable=False, default='purchase')  # purchase, transfer, return, opening, count
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    quantity = Column(Float, nullable=False)
+    remaining_quantity = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    item = relationship("Item")
+    warehouse = relationship("Warehouse")
+
+    __table_args__ = (
+        Index('ix_cost_layers_fifo', 'item_id', 'warehouse_id', 'received_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<CostLayer(item_id={self.item_id}, warehouse_id={self.warehouse_id}, remaining={self.remaining_quantity}, unit_cost={self.unit_cost})>"
+
+
+class ItemCost(Base):
+    """Running valuation of an item in a warehouse
+
+    Maintained at posting time, so valuations are single-row lookups.
+    """
+
+    __tablename__ = 'item_costs'
+
+    item_id = Column(Integer, ForeignKey('items.id'), primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), primary_key=True)
+    quantity = Column(Float, nullable=False, default=0.0)  # Quantity covered by cost layers
+    fifo_value = Column(Float, nullable=False, default=0.0)  # Sum of remaining layers at their cost
+    average_cost = Column(Float, nullable=False, default=0.0)  # Moving average cost per main unit
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_average_value(self):
+        """Value of the quantity on hand at moving average cost"""
+        return self.quantity * self.average_cost
+
+    def __repr__(self):
+        return f"<ItemCost(item_id={self.item_id}, warehouse_id={self.warehouse_id}, quantity={self.quantity}, average_cost={self.average_cost})>"
+
+
+class CostOfGoodsSold(Base):
+    """Cost of an issued invoice line under FIFO and moving average"""
+
+    __tablename__ = 'cogs_entries'
+
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=False, index=True)
+    invoice_item_id = Column(Integer, ForeignKey('invoice_items.id'), index=True)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False, index=True)
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    quantity = Column(Float, nullable=False)
+    fifo_cost = Column(Float, nullable=False)
+    average_cost = Column(Float, nullable=False)
+    issued_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_cogs_entries_issued', 'issued_at', 'item_id'),
+    )
+
+    def __repr__(self):
+        return f"<CostOfGoodsSold(invoice_id={self.invoice_id}, item_id={self.item_id}, quantity={self.quantity}, fifo_cost={self.fifo_cost})>"
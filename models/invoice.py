@@ -5,7 +5,7 @@
 Invoice model for ASSI Warehouse Management System
 """
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.db_setup import Base
@@ -28,6 +28,8 @@ class Invoice(Base):
     invoice_date = Column(DateTime, default=datetime.utcnow)
     due_date = Column(DateTime)  # For deferred payment
     status = Column(String, default='pending')  # pending, paid, partially_paid
+    cancelled_at = Column(DateTime)
+    cancelled_amount = Column(Float)  # Unpaid remainder reversed on cancellation
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -36,10 +38,20 @@ class Invoice(Base):
     entity = relationship("SupplierCustomer", back_populates="invoices")
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
     payments = relationship("Payment", back_populates="invoice")
+    allocations = relationship("PaymentAllocation", back_populates="invoice")
+    
+    # Open-invoice queues per entity, in FIFO and due-date order
+    __table_args__ = (
+        Index('ix_invoices_open_fifo', 'entity_id', 'type', 'status', 'invoice_date', 'id'),
+        Index('ix_invoices_open_due', 'entity_id', 'type', 'status', 'due_date', 'id'),
+        Index('ix_invoices_entity_date', 'entity_id', 'invoice_date', 'id'),
+        Index('ix_invoices_type_date', 'type', 'invoice_date'),
+    )
     
     def calculate_paid_amount(self):
-        """Calculate the total amount paid on this invoice"""
-        return sum(payment.amount for payment in self.payments)
+        """Calculate the total amount paid on this invoice (direct payments and allocations)"""
+        return (sum(payment.amount for payment in self.payments) +
+                sum(allocation.amount for allocation in self.allocations))
     
     def calculate_remaining_amount(self):
         """Calculate the remaining unpaid amount"""
@@ -55,7 +67,7 @@ class InvoiceItem(Base):
     __tablename__ = 'invoice_items'
     
     id = Column(Integer, primary_key=True)
-    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=False)
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=False, index=True)
     item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
     quantity = Column(Float, nullable=False)
     unit = Column(String, nullable=False)  # main_unit or sub_unit
@@ -69,3 +81,21 @@ class InvoiceItem(Base):
     
     def __repr__(self):
         return f"<InvoiceItem(invoice_id={self.invoice_id}, item_id={self.item_id}, quantity={self.quantity}, total_price={self.total_price})>"
+
+
+class InvoiceSequence(Base):
+    """Per-type, per-year counter for sequential invoice numbers
+    
+    next_value is the first number not yet handed out. Workers reserve
+    blocks of numbers by advancing it (see controllers.invoice_numbering).
+    """
+    
+    __tablename__ = 'invoice_sequences'
+    
+    invoice_type = Column(String, primary_key=True)  # purchase, sale
+    year = Column(Integer, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<InvoiceSequence(type='{self.invoice_type}', year={self.year}, next_value={self.next_value})>"
@@ -5,7 +5,7 @@
 Item model for ASSI Warehouse Management System
 """
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.db_setup import Base
@@ -19,6 +19,7 @@ class Item(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(String)
+    sku = Column(String)  # Stock keeping unit, unique when set
     main_unit = Column(String, nullable=False)  # Main unit (e.g., bag)
     sub_unit = Column(String, nullable=False)   # Sub unit (e.g., kg)
     conversion_rate = Column(Float, nullable=False)  # Relation (1 bag = 50 kg)
@@ -31,6 +32,11 @@ class Item(Base):
     # Relationships
     stocks = relationship("ItemStock", back_populates="item", cascade="all, delete-orphan")
     invoice_items = relationship("InvoiceItem", back_populates="item")
+    barcodes = relationship("ItemBarcode", back_populates="item", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index('ix_items_sku', 'sku', unique=True),
+    )
     
     def get_total_stock(self):
         """Calculate total stock across all warehouses"""
@@ -49,11 +55,45 @@ class ItemStock(Base):
     item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
     warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
     quantity = Column(Float, default=0.0)  # In main unit
+    reserved_quantity = Column(Float, nullable=False, default=0.0, server_default='0')  # Held by active reservations
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     item = relationship("Item", back_populates="stocks")
     warehouse = relationship("Warehouse", back_populates="stocks")
     
+    # Stock lookups by item and by warehouse
+    __table_args__ = (
+        Index('ix_item_stocks_item_warehouse', 'item_id', 'warehouse_id'),
+        Index('ix_item_stocks_warehouse_item', 'warehouse_id', 'item_id'),
+    )
+    
+    @property
+    def available_quantity(self):
+        """Quantity available to promise: on hand minus active reservations"""
+        return (self.quantity or 0.0) - (self.reserved_quantity or 0.0)
+    
     def __repr__(self):
         return f"<ItemStock(item_id={self.item_id}, warehouse_id={self.warehouse_id}, quantity={self.quantity})>"
+
+
+class ItemBarcode(Base):
+    """Barcode printed on an item's packaging (an item can have several)"""
+    
+    __tablename__ = 'item_barcodes'
+    
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    code = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    item = relationship("Item", back_populates="barcodes")
+    
+    __table_args__ = (
+        Index('ix_item_barcodes_code', 'code', unique=True),
+        Index('ix_item_barcodes_item', 'item_id'),
+    )
+    
+    def __repr__(self):
+        return f"<ItemBarcode(item_id={self.item_id}, code='{self.code}')>"
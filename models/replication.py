@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replication heartbeat model for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, DateTime
+from database.db_setup import Base
+
+class ReplicaHeartbeat(Base):
+    """Single-row timestamp written on the primary and read back from replicas
+
+    Used to measure replica lag on databases without a built-in lag view.
+    """
+
+    __tablename__ = 'replica_heartbeat'
+
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ReplicaHeartbeat(beat_at={self.beat_at})>"
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock reservation models for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from database.db_setup import Base
+from datetime import datetime
+
+class StockReservation(Base):
+    """Hold on a quantity of an item in a warehouse (main unit)
+
+    Active reservations are summed into ItemStock.reserved_quantity, so the
+    quantity available to promise is the stock's quantity minus its
+    reserved quantity. A reservation ends when a sales invoice fulfils it,
+    when it is released, or when it expires.
+    """
+
+    __tablename__ = 'stock_reservations'
+
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    quantity = Column(Float, nullable=False)
+    status = Column(String, nullable=False, default='active')  # active, fulfilled, released, expired
+    reference = Column(String)  # Quote or order number
+    entity_id = Column(Integer, ForeignKey('suppliers_customers.id'))
+    invoice_id = Column(Integer, ForeignKey('invoices.id'))  # Sales invoice that fulfilled it
+    expires_at = Column(DateTime, nullable=False)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    closed_at = Column(DateTime)
+
+    # Relationships
+    item = relationship("Item")
+    warehouse = relationship("Warehouse")
+
+    __table_args__ = (
+        # Expiry sweeps and per-stock lookups of active reservations
+        Index('ix_stock_reservations_status_expires', 'status', 'expires_at'),
+        Index('ix_stock_reservations_item_warehouse_status', 'item_id', 'warehouse_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f"<StockReservation(item_id={self.item_id}, warehouse_id={self.warehouse_id}, quantity={self.quantity}, status='{self.status}')>"
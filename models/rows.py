@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Read models for ASSI Warehouse Management System
+
+Lightweight, immutable rows for list and report queries. Unlike mapped
+instances they carry no change tracking, identity map entries or
+relationship state, so large result sets cost a fraction of the memory
+and load time. Controllers expose them through *_rows() methods next to
+the methods returning mapped objects.
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Optional
+
+@dataclass(slots=True, frozen=True)
+class ItemRow:
+    """Item with its total stock across warehouses"""
+    id: int
+    name: str
+    main_unit: str
+    sub_unit: str
+    conversion_rate: float
+    purchase_price: float
+    selling_price: float
+    is_active: bool
+    total_stock: float
+
+
+@dataclass(slots=True, frozen=True)
+class StockRow:
+    """Stock of an item in a warehouse"""
+    item_id: int
+    item_name: str
+    main_unit: str
+    purchase_price: float
+    selling_price: float
+    warehouse_id: int
+    warehouse_name: str
+    quantity: float
+    reserved_quantity: float
+    available_quantity: float
+
+
+@dataclass(slots=True, frozen=True)
+class StockMatrixRow:
+    """Stock of an item across warehouses (tuples follow the matrix's warehouse order)"""
+    item_id: int
+    item_name: str
+    sku: Optional[str]
+    main_unit: str
+    quantities: tuple
+    values: tuple
+    low_stock: tuple
+    total_quantity: float
+    total_value: float
+
+
+@dataclass(slots=True, frozen=True)
+class InvoiceRow:
+    """Invoice header with its supplier/customer name"""
+    id: int
+    invoice_number: str
+    type: str
+    entity_id: int
+    entity_name: str
+    total_amount: float
+    currency: str
+    exchange_rate: float
+    invoice_date: datetime
+    due_date: Optional[datetime]
+    status: str
+
+
+@dataclass(slots=True, frozen=True)
+class FundTransactionRow:
+    """Fund transaction with its fund's name and currency"""
+    id: int
+    fund_id: int
+    fund_name: str
+    currency: str
+    amount: float
+    transaction_type: str
+    description: Optional[str]
+    reference_id: Optional[int]
+    reference_type: Optional[str]
+    created_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class ExpenseRow:
+    """Expense with its category name"""
+    id: int
+    category_id: int
+    category_name: str
+    amount: float
+    currency: str
+    exchange_rate: float
+    expense_date: datetime
+    description: Optional[str]
+    fund_id: Optional[int]
+
+
+@dataclass(slots=True, frozen=True)
+class StockTransferRow:
+    """Stock transfer header with its warehouse names and line totals"""
+    id: int
+    transfer_number: str
+    from_warehouse_id: int
+    from_warehouse_name: str
+    to_warehouse_id: int
+    to_warehouse_name: str
+    status: str
+    line_count: int
+    total_quantity: float
+    created_at: datetime
+    dispatched_at: Optional[datetime]
+    received_at: Optional[datetime]
+
+
+@dataclass(slots=True, frozen=True)
+class StockCountRow:
+    """Stock count header with its warehouse name and progress"""
+    id: int
+    count_number: str
+    warehouse_id: int
+    warehouse_name: str
+    scope: str
+    status: str
+    line_count: int
+    counted_lines: int
+    created_at: datetime
+    posted_at: Optional[datetime]
+
+
+@dataclass(slots=True, frozen=True)
+class StockVarianceRow:
+    """Expected and counted quantity of an item in a stock count"""
+    item_id: int
+    item_name: str
+    main_unit: str
+    expected_quantity: float
+    counted_quantity: Optional[float]
+    variance: Optional[float]
+    unit_cost: float
+    variance_value: Optional[float]
+
+
+@dataclass(slots=True, frozen=True)
+class ReservationRow:
+    """Stock reservation with its item and warehouse names"""
+    id: int
+    item_id: int
+    item_name: str
+    main_unit: str
+    warehouse_id: int
+    warehouse_name: str
+    quantity: float
+    status: str
+    reference: Optional[str]
+    entity_id: Optional[int]
+    invoice_id: Optional[int]
+    expires_at: datetime
+    created_at: datetime
+    closed_at: Optional[datetime]
+
+
+@dataclass(slots=True, frozen=True)
+class AuditLogRow:
+    """Audit log entry with the name of its user"""
+    id: int
+    table_name: str
+    entity_id: Optional[str]
+    action: str
+    changes: str
+    user_id: Optional[int]
+    username: Optional[str]
+    created_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class ItemSnapshot:
+    """Item master data (database/identity_cache.py)"""
+    id: int
+    name: str
+    sku: Optional[str]
+    main_unit: str
+    sub_unit: str
+    conversion_rate: float
+    purchase_price: float
+    selling_price: float
+    is_active: bool
+
+
+@dataclass(slots=True, frozen=True)
+class WarehouseSnapshot:
+    """Warehouse master data (database/identity_cache.py)"""
+    id: int
+    name: str
+    location: Optional[str]
+    is_active: bool
+
+
+@dataclass(slots=True, frozen=True)
+class FundSnapshot:
+    """Fund master data without the balance (database/identity_cache.py)"""
+    id: int
+    name: str
+    currency: str
+    exchange_rate: float
+    is_active: bool
+
+
+def row_columns(row_type):
+    """Get the field names of a row type, in constructor order"""
+    return tuple(field.name for field in fields(row_type))
+
+def fetch_rows(row_type, result):
+    """Build row objects from a query result
+
+    The query must select one column per field, labelled with the field
+    names and in the same order.
+
+    Args:
+        row_type: Row dataclass to build
+        result: Result of session.execute() / connection.execute()
+
+    Raises:
+        ValueError: If the selected columns do not match the fields
+    """
+    expected = row_columns(row_type)
+    if tuple(result.keys()) != expected:
+        raise ValueError(f"Columns {tuple(result.keys())} do not match {row_type.__name__} fields {expected}")
+    return [row_type(*row) for row in result]
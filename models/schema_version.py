@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Schema version model for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime
+from database.db_setup import Base
+from datetime import datetime
+
+class SchemaVersion(Base):
+    """Single row recording the schema fingerprint the database was set up with
+
+    init_db() skips table creation and index setup while it matches.
+    """
+
+    __tablename__ = 'schema_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaVersion(version='{self.version}', applied_at={self.applied_at})>"
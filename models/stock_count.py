@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock count models for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+from database.db_setup import Base
+from datetime import datetime
+
+class StockCount(Base):
+    """Count session of a warehouse's stock
+
+    Expected quantities are frozen when the count starts; posting adds
+    each line's variance (counted minus expected) to the stock, so
+    movements made while counting are kept.
+    """
+
+    __tablename__ = 'stock_counts'
+
+    id = Column(Integer, primary_key=True)
+    count_number = Column(String, unique=True, nullable=False)
+    warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    scope = Column(String, nullable=False, default='full')  # full, partial (listed items only)
+    status = Column(String, nullable=False, default='open')  # open, posted, cancelled
+    notes = Column(Text)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    posted_at = Column(DateTime)
+
+    # Relationships
+    warehouse = relationship("Warehouse")
+
+    __table_args__ = (
+        Index('ix_stock_counts_warehouse_status', 'warehouse_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f"<StockCount(number='{self.count_number}', warehouse_id={self.warehouse_id}, status='{self.status}')>"
+
+
+class StockCountLine(Base):
+    """Expected and counted quantity of an item in a count (main unit)"""
+
+    __tablename__ = 'stock_count_lines'
+
+    id = Column(Integer, primary_key=True)
+    count_id = Column(Integer, ForeignKey('stock_counts.id'), nullable=False)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    expected_quantity = Column(Float, nullable=False, default=0.0)  # Stock when the count started
+    counted_quantity = Column(Float)  # None until counted
+    counted_at = Column(DateTime)
+    unit_cost = Column(Float)  # USD cost per main unit of the posted variance
+
+    __table_args__ = (
+        Index('ix_stock_count_lines_count_item', 'count_id', 'item_id', unique=True),
+    )
+
+    def __repr__(self):
+        return f"<StockCountLine(count_id={self.count_id}, item_id={self.item_id}, expected={self.expected_quantity}, counted={self.counted_quantity})>"
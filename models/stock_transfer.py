@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stock transfer models for ASSI Warehouse Management System
+"""
+
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+from database.db_setup import Base
+from datetime import datetime
+
+class StockTransfer(Base):
+    """Transfer document moving many items from one warehouse to another
+
+    Stock leaves the source warehouse when the transfer is dispatched and
+    is in transit until it is received at the destination.
+    """
+
+    __tablename__ = 'stock_transfers'
+
+    id = Column(Integer, primary_key=True)
+    transfer_number = Column(String, unique=True, nullable=False)
+    from_warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    to_warehouse_id = Column(Integer, ForeignKey('warehouses.id'), nullable=False)
+    status = Column(String, nullable=False, default='draft')  # draft, in_transit, received, cancelled
+    notes = Column(Text)
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    dispatched_at = Column(DateTime)
+    received_at = Column(DateTime)
+
+    # Relationships
+    from_warehouse = relationship("Warehouse", foreign_keys=[from_warehouse_id])
+    to_warehouse = relationship("Warehouse", foreign_keys=[to_warehouse_id])
+    lines = relationship("StockTransferLine", back_populates="transfer", cascade="all, delete-orphan",
+                         order_by="StockTransferLine.id")
+
+    __table_args__ = (
+        Index('ix_stock_transfers_status_created', 'status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<StockTransfer(number='{self.transfer_number}', status='{self.status}')>"
+
+
+class StockTransferLine(Base):
+    """Item line of a stock transfer (quantity in the item's main unit)"""
+
+    __tablename__ = 'stock_transfer_lines'
+
+    id = Column(Integer, primary_key=True)
+    transfer_id = Column(Integer, ForeignKey('stock_transfers.id'), nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    quantity = Column(Float, nullable=False)
+    unit_cost = Column(Float)  # USD FIFO cost per main unit, set on dispatch
+
+    # Relationships
+    transfer = relationship("StockTransfer", back_populates="lines")
+    item = relationship("Item")
+
+    def __repr__(self):
+        return f"<StockTransferLine(transfer_id={self.transfer_id}, item_id={self.item_id}, quantity={self.quantity})>"
+
+
+class StockTransferLayer(Base):
+    """Cost layer of a transfer line while the stock is in transit
+
+    Holds the part of a source cost layer taken on dispatch, so the
+    destination receives it with its original cost and age.
+    """
+
+    __tablename__ = 'stock_transfer_layers'
+
+    id = Column(Integer, primary_key=True)
+    line_id = Column(Integer, ForeignKey('stock_transfer_lines.id'), nullable=False, index=True)
+    quantity = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=False)
+    received_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<StockTransferLayer(line_id={self.line_id}, quantity={self.quantity}, unit_cost={self.unit_cost})>"
@@ -5,7 +5,7 @@
 Supplier and Customer models for ASSI Warehouse Management System
 """
 
-from sqlalchemy import Column, Integer, Float, String, DateTime, Enum, Text, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, Enum, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.db_setup import Base
@@ -33,6 +33,7 @@ class SupplierCustomer(Base):
     currency = Column(String, default='USD')
     exchange_rate = Column(Float, default=1.0)
     notes = Column(Text)
+    statement_version = Column(Integer, nullable=False, default=0, server_default='0')  # Bumped when balance snapshots are invalidated
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -58,12 +59,59 @@ class Payment(Base):
     payment_method = Column(String)  # cash, bank transfer, etc.
     fund_id = Column(Integer, ForeignKey('funds.id'))
     notes = Column(Text)
-    invoice_id = Column(Integer, ForeignKey('invoices.id'))  # Optional link to invoice
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), index=True)  # Optional link to invoice
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     entity = relationship("SupplierCustomer", back_populates="payments")
     invoice = relationship("Invoice", back_populates="payments")
+    allocations = relationship("PaymentAllocation", back_populates="payment", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index('ix_payments_entity_date', 'entity_id', 'payment_date', 'id'),
+    )
+    
+    def calculate_allocated_amount(self):
+        """Calculate the amount of this payment applied to invoices through allocations"""
+        return sum(allocation.amount for allocation in self.allocations)
     
     def __repr__(self):
         return f"<Payment(entity_id={self.entity_id}, amount={self.amount}, payment_date={self.payment_date})>"
+
+
+class PaymentAllocation(Base):
+    """Allocation of part of an on-account payment to an open invoice"""
+    
+    __tablename__ = 'payment_allocations'
+    
+    id = Column(Integer, primary_key=True)
+    payment_id = Column(Integer, ForeignKey('payments.id'), nullable=False, index=True)
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=False, index=True)
+    amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    payment = relationship("Payment", back_populates="allocations")
+    invoice = relationship("Invoice", back_populates="allocations")
+    
+    def __repr__(self):
+        return f"<PaymentAllocation(payment_id={self.payment_id}, invoice_id={self.invoice_id}, amount={self.amount})>"
+
+
+class EntityBalanceSnapshot(Base):
+    """Cached statement balance of an entity at the start of a month
+    
+    Holds the sum of all statement entries dated before snapshot_date, so an
+    opening balance only needs the entries of one partial month on top.
+    Snapshots after a back-dated change are deleted and rebuilt on demand.
+    """
+    
+    __tablename__ = 'entity_balance_snapshots'
+    
+    entity_id = Column(Integer, ForeignKey('suppliers_customers.id'), primary_key=True)
+    snapshot_date = Column(DateTime, primary_key=True)
+    balance = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<EntityBalanceSnapshot(entity_id={self.entity_id}, snapshot_date={self.snapshot_date}, balance={self.balance})>"
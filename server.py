@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Production web server for ASSI Warehouse Management System
+
+Runs the web application under gunicorn: the app is imported once in the
+master process and forked into workers, each of which drops the inherited
+database connections. Workers are recycled after a number of requests,
+and signals control the running server:
+
+    HUP   restart workers gracefully (reloads configuration)
+    TERM  graceful shutdown
+    TTIN / TTOU  add or remove a worker
+
+Code changes need a full restart because the app is preloaded.
+
+Started through `python manage.py serve`.
+"""
+
+import gc
+import os
+
+# Worker classes per server mode
+WORKER_CLASSES = {
+    'wsgi': 'sync',
+    'wsgi-threads': 'gthread',
+    'asgi': 'uvicorn.workers.UvicornWorker',
+}
+
+def default_workers():
+    """Get the default number of worker processes (WEB_WORKERS or the CPU count)"""
+    return int(os.environ.get('WEB_WORKERS', 0)) or os.cpu_count() or 1
+
+def _pre_fork(server, worker):
+    """Move the preloaded app's objects out of the garbage collector's reach
+
+    Collections in the workers would otherwise touch every inherited
+    object and copy the shared memory pages.
+    """
+    gc.freeze()
+
+def _post_fork(server, worker):
+    """Give each worker its own database connections"""
+    from database.db_setup import reset_after_fork
+    reset_after_fork()
+
+def build_options(bind='0.0.0.0:5000', workers=None, threads=1, asgi=False,
+                  max_requests=1000, max_requests_jitter=100, timeout=30,
+                  graceful_timeout=30, access_log=None):
+    """Build the gunicorn settings for the server
+
+    Args:
+        bind: Address to listen on
+        workers: Worker processes (default: default_workers())
+        threads: Threads per worker (WSGI only)
+        asgi: Serve async_api.application (async read API plus Flask)
+        max_requests: Requests after which a worker is replaced (0 disables)
+        max_requests_jitter: Random extra requests so workers do not restart together
+        timeout: Seconds a silent worker may take before it is killed
+        graceful_timeout: Seconds workers get to finish requests on reload or shutdown
+        access_log: Access log file ('-' for stdout, None to disable)
+
+    Returns:
+        Dictionary of gunicorn settings
+    """
+    if asgi:
+        mode = 'asgi'
+    elif threads > 1:
+        mode = 'wsgi-threads'
+    else:
+        mode = 'wsgi'
+
+    options = {
+        'bind': bind,
+        'workers': workers or default_workers(),
+        'worker_class': WORKER_CLASSES[mode],
+        'preload_app': True,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests_jitter if max_requests else 0,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'pre_fork': _pre_fork,
+        'post_fork': _post_fork,
+        'proc_name': 'assi-wms',
+    }
+    if mode == 'wsgi-threads':
+        options['threads'] = threads
+    if access_log:
+        options['accesslog'] = access_log
+    return options
+
+def run(options, asgi=False):
+    """Start gunicorn with the given settings (blocks until shutdown)
+
+    Args:
+        options: Settings from build_options()
+        asgi: Load the ASGI application instead of the Flask app
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class WMSApplication(BaseApplication):
+        """gunicorn application loading the WMS web app"""
+
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            if asgi:
+                from async_api import application
+                return application
+            from web_app import app
+            return app
+
+    WMSApplication().run()
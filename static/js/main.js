@@ -212,4 +212,57 @@ function calculateInvoiceTotal() {
     if (grandTotalElement) {
         grandTotalElement.textContent = grandTotal.toFixed(2);
     }
-}
\ No newline at end of file
+}
+// Typeahead search: fill a <select> with results from a search API endpoint
+function bindTypeahead(input, select, url, buildOption) {
+    var timer = null;
+    var lastQuery = null;
+    var placeholder = select.options.length ? select.options[0].cloneNode(true) : null;
+    
+    function load(query) {
+        if (query === lastQuery) {
+            return;
+        }
+        lastQuery = query;
+        
+        var separator = url.indexOf('?') === -1 ? '?' : '&';
+        fetch(url + separator + 'q=' + encodeURIComponent(query) + '&limit=20')
+            .then(response => response.json())
+            .then(results => {
+                // Ignore responses for outdated queries
+                if (query !== lastQuery) {
+                    return;
+                }
+                
+                var selected = select.value;
+                select.innerHTML = '';
+                if (placeholder) {
+                    select.appendChild(placeholder.cloneNode(true));
+                }
+                results.forEach(function(result) {
+                    var option = buildOption(result);
+                    if (String(result.id) === selected) {
+                        option.selected = true;
+                    }
+                    select.appendChild(option);
+                });
+                
+                // Select the best match while typing
+                if (query && results.length && !select.value) {
+                    select.selectedIndex = placeholder ? 1 : 0;
+                    select.dispatchEvent(new Event('change'));
+                }
+            })
+            .catch(error => console.error('Error searching:', error));
+    }
+    
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            load(input.value.trim());
+        }, 150);
+    });
+    
+    // Initial suggestions
+    load('');
+}
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-process caching utilities for ASSI Warehouse Management System
+
+TTLCache keeps computed values for a few seconds per process; LRUCache
+keeps a bounded number of values until they are invalidated. Values are
+shared between threads, so cache plain data (dicts, lists, numbers, frozen
+rows), never ORM objects bound to a session.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Thread-safe key/value cache whose entries expire after a fixed time"""
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 256):
+        """Create a cache
+
+        Args:
+            ttl: Seconds an entry stays valid
+            max_entries: Entries kept before expired ones are purged
+                         (the oldest entry is dropped if none has expired)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or default if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._purge()
+            self._entries[key] = (expires, value)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Get a cached value, computing and storing it on a miss
+
+        A value computed while the cache was invalidated is returned to the
+        caller but not stored, so a write never gets hidden by a slow read.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        generation = self._generation
+        value = factory()
+
+        with self._lock:
+            if generation == self._generation:
+                if len(self._entries) >= self.max_entries and key not in self._entries:
+                    self._purge()
+                self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or all entries when key is None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _purge(self) -> None:
+        """Remove expired entries, or the oldest one if none expired (lock held)"""
+        now = time.monotonic()
+        expired = [key for key, (expires, _value) in self._entries.items() if expires < now]
+        for key in expired:
+            del self._entries[key]
+        if not expired and self._entries:
+            del self._entries[min(self._entries, key=lambda key: self._entries[key][0])]
+
+class LRUCache:
+    """Thread-safe key/value cache holding the most recently used entries
+
+    Entries stay until they are invalidated or pushed out by newer ones.
+    Hits, misses and evictions are counted for stats().
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """Create a cache
+
+        Args:
+            max_entries: Entries kept before the least recently used is dropped
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Get a cached value, computing and storing it on a miss
+
+        A value computed while the cache was invalidated is returned to the
+        caller but not stored, so a write never gets hidden by a slow read.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self._generation
+
+        value = factory()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or all entries when key is None"""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get entries, hits, misses, hit_rate (0-1) and evictions"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+def invalidate_on_commit(cache: TTLCache, session_factory, models: tuple) -> None:
+    """Clear a cache whenever a session commit wrote any of the given models
+
+    Args:
+        cache: Cache to invalidate
+        session_factory: sessionmaker (or Session class) whose sessions are watched
+        models: Mapped classes whose inserts, updates or deletes make the cache stale
+    """
+    # Imported here so the cache class stays usable without SQLAlchemy
+    from sqlalchemy import event
+
+    flag = f'stale_cache_{id(cache)}'
+
+    @event.listens_for(session_factory, 'after_flush')
+    def _track_writes(db_session, flush_context):
+        if db_session.info.get(flag):
+            return
+        for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+            if isinstance(instance, models):
+                db_session.info[flag] = True
+                return
+
+    @event.listens_for(session_factory, 'after_commit')
+    def _invalidate_after_commit(db_session):
+        if db_session.info.pop(flag, False):
+            cache.invalidate()
+
+    @event.listens_for(session_factory, 'after_soft_rollback')
+    def _forget_rolled_back_writes(db_session, previous_transaction):
+        if previous_transaction.parent is None:
+            db_session.info.pop(flag, None)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-language template fragment cache for ASSI Warehouse Management System
+
+Adds a {% cache_fragment "name" %}...{% endcache_fragment %} tag to Jinja.
+The block is rendered once per process and language and then served from
+memory. Only wrap markup that depends on nothing but the language (menus,
+static labels); never per-user or per-request data.
+"""
+
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from utils.language import get_current_language
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension caching rendered fragments per language"""
+
+    tags = {'cache_fragment'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(
+            fragment_cache={},
+            fragment_cache_lock=threading.Lock()
+        )
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        body = parser.parse_statements(['name:endcache_fragment'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', args), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, name, caller):
+        """Return the cached fragment for the current language, rendering on a miss"""
+        key = (name, get_current_language())
+        cache = self.environment.fragment_cache
+
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            with self.environment.fragment_cache_lock:
+                cache.setdefault(key, fragment)
+
+        return fragment
+
+def clear_fragment_cache(environment):
+    """Drop all cached fragments (e.g. after translations change)"""
+    with environment.fragment_cache_lock:
+        environment.fragment_cache.clear()
@@ -3,22 +3,37 @@
 
 """
 Language utilities for ASSI Warehouse Management System
+
+Translation catalogs from translations/*/translations.json are compiled
+once at import into read-only lookup tables. The active language is
+resolved per request (web) through a context variable, falling back to
+the process default used by the desktop application.
 """
 
 import os
 import json
 import locale
-from typing import Any, Callable, Dict, Optional
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+DEFAULT_LANGUAGE = 'en_US'
+
+# Directory containing one sub-directory per language code
+TRANSLATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'translations')
 
-# Global variables to store current language
-_current_language = 'en_US'
+# Process-wide default language (desktop application)
+_current_language = DEFAULT_LANGUAGE
+
+# Language selected for the current web request, if any
+_request_language: ContextVar[Optional[str]] = ContextVar('request_language', default=None)
 
 # Define a dummy gettext class to handle missing gettext module
 class DummyGettextModule:
     """Dummy gettext module replacement when the real one is not available"""
     def gettext(self, message: str) -> str:
         return message
-    
+
     def install(self) -> None:
         pass
 
@@ -26,12 +41,12 @@ class DummyTranslation:
     """Dummy translation class"""
     def install(self) -> None:
         pass
-        
+
     class gettext:
         @staticmethod
         def translation(domain: str, localedir: Optional[str] = None, languages: Optional[list] = None, **kwargs: Any) -> 'DummyTranslation':
             return DummyTranslation()
-            
+
         @staticmethod
         def install(domain: str, localedir: Optional[str] = None, **kwargs: Any) -> None:
             pass
@@ -42,46 +57,97 @@ try:
 except ImportError:
     gettext = DummyGettextModule()
 
-# Dictionary to store translations
-_translations: Dict[str, Dict[str, str]] = {}
-
-def get_current_language() -> str:
-    """Get the currently set language code"""
-    return _current_language
-
 def _load_translation_file(lang_code: str) -> Dict[str, str]:
     """Load a translation file for the given language code
-    
+
     Args:
         lang_code: Language code (e.g., 'en_US', 'ar_SA')
-        
+
     Returns:
         Dictionary with translations or empty dict if file not found
     """
     try:
-        file_path = os.path.join('translations', lang_code, 'translations.json')
+        file_path = os.path.join(TRANSLATIONS_DIR, lang_code, 'translations.json')
         if os.path.exists(file_path):
             with open(file_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
     except Exception:
         return {}
-        
+
+def _compile_catalogs() -> Mapping[str, Mapping[str, str]]:
+    """Compile all available translation files into frozen lookup tables"""
+    catalogs = {DEFAULT_LANGUAGE: {}}
+
+    if os.path.isdir(TRANSLATIONS_DIR):
+        for lang_code in sorted(os.listdir(TRANSLATIONS_DIR)):
+            if os.path.isfile(os.path.join(TRANSLATIONS_DIR, lang_code, 'translations.json')):
+                catalogs[lang_code] = _load_translation_file(lang_code)
+
+    return MappingProxyType({
+        lang_code: MappingProxyType(dict(catalog))
+        for lang_code, catalog in catalogs.items()
+    })
+
+def _make_translator(catalog: Mapping[str, str]) -> Callable[[str], str]:
+    """Build a single-lookup translation function for a catalog"""
+    lookup = catalog.get
+
+    def translate(text: str) -> str:
+        return lookup(text, text)
+
+    return translate
+
+# Compiled once per process
+_catalogs = _compile_catalogs()
+_translators = MappingProxyType({
+    lang_code: _make_translator(catalog) for lang_code, catalog in _catalogs.items()
+})
+
+def get_available_languages() -> list:
+    """Get the language codes that have a translation catalog"""
+    return list(_catalogs)
+
+def is_supported_language(lang_code: str) -> bool:
+    """Check if a language code has a translation catalog"""
+    return lang_code in _catalogs
+
+def get_current_language() -> str:
+    """Get the language of the current request, or the process default"""
+    return _request_language.get() or _current_language
+
+def set_request_language(lang_code: Optional[str]) -> None:
+    """Set the language for the current request/thread context
+
+    Unsupported codes fall back to the process default language.
+
+    Args:
+        lang_code: Language code (e.g., 'en_US', 'ar_SA') or None
+    """
+    _request_language.set(lang_code if lang_code in _catalogs else None)
+
+def get_translator(lang_code: Optional[str] = None) -> Callable[[str], str]:
+    """Get the precompiled translation function for a language
+
+    Args:
+        lang_code: Language code, or None for the current language
+    """
+    return _translators.get(lang_code or get_current_language(), _translators[DEFAULT_LANGUAGE])
+
 def setup_language(lang_code: str) -> None:
-    """Setup language for the application
-    
+    """Setup the process default language (desktop application)
+
+    This also sets the process-wide locale, so the web application must
+    use set_request_language() instead.
+
     Args:
         lang_code: Language code (e.g., 'en_US', 'ar_SA')
     """
-    global _current_language, _translations
-    
+    global _current_language
+
     # Store the language code
-    _current_language = lang_code
-    
-    # Load the translation file if available
-    if lang_code not in _translations:
-        _translations[lang_code] = _load_translation_file(lang_code)
-    
+    _current_language = lang_code if lang_code in _catalogs else DEFAULT_LANGUAGE
+
     # Set locale if possible
     try:
         locale.setlocale(locale.LC_ALL, lang_code)
@@ -94,26 +160,21 @@ def setup_language(lang_code: str) -> None:
             locale.setlocale(locale.LC_ALL, '')
 
 def switch_language(lang_code: str) -> None:
-    """Switch to a different language
-    
+    """Switch the desktop application to a different language
+
     Args:
         lang_code: Language code to switch to
     """
     setup_language(lang_code)
 
-# Initialize with English by default
-setup_language('en_US')
-
 # Define translation function
 def _(text: str) -> str:
     """Translate text based on current language
-    
+
     Args:
         text: Text to translate
-        
+
     Returns:
         Translated text or original if no translation found
     """
-    if _current_language in _translations and text in _translations[_current_language]:
-        return _translations[_current_language][text]
-    return text
\ No newline at end of file
+    return get_translator()(text)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deferred imports of the analytics stack for ASSI Warehouse Management System
+
+pandas and matplotlib take over a second and tens of megabytes to import,
+so modules that only need them to build reports load them through these
+helpers on first use instead of at import time.
+"""
+
+def load_pandas():
+    """Import and return the pandas module"""
+    import pandas
+    return pandas
+
+def load_numpy():
+    """Import and return the numpy module"""
+    import numpy
+    return numpy
+
+def load_pyplot():
+    """Import and return matplotlib.pyplot configured with a non-GUI backend"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    return matplotlib.pyplot
+
+def is_dataframe(value):
+    """Check if a value is a pandas DataFrame without importing pandas
+
+    If pandas has never been imported, no DataFrame can exist yet.
+    """
+    import sys
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(value, pandas.DataFrame)
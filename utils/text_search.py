@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Text search utilities for ASSI Warehouse Management System
+
+Provides name normalization for Arabic and English text and a small
+in-process n-gram index used for typeahead search when the database
+does not offer trigram matching.
+"""
+
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Arabic letter variants folded to a single form
+_ARABIC_FOLD = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+    'ـ': None,  # Tatweel
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# Anything that is not a letter or digit separates tokens
+_SEPARATORS = re.compile(r'[\W_]+', re.UNICODE)
+
+def normalize_name(text: Optional[str]) -> str:
+    """Normalize a name for searching
+
+    Folds case, strips Latin accents and Arabic diacritics (harakat),
+    unifies Arabic letter variants (alef forms, taa marbuta, alef maqsura)
+    and Arabic-Indic digits, and collapses punctuation to single spaces.
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text (empty string for None)
+    """
+    if not text:
+        return ''
+
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold().translate(_ARABIC_FOLD)
+    return _SEPARATORS.sub(' ', text).strip()
+
+def _trigrams(normalized: str) -> Set[str]:
+    """Split normalized text into padded word trigrams (pg_trgm style)"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class NgramIndex:
+    """Thread-safe in-process trigram and prefix index
+
+    Documents are identified by an ID and carry an optional tag that
+    callers can filter on (e.g. active flag or entity type) without a
+    database round trip.
+    """
+
+    def __init__(self, min_similarity: float = 0.3):
+        self.min_similarity = min_similarity
+        self._lock = threading.RLock()
+        self._docs: Dict[Any, Tuple[str, Any]] = {}
+        self._grams: Dict[str, Set[Any]] = defaultdict(set)
+        self._tokens: List[Tuple[str, Any]] = []  # Sorted (token, doc_id) for prefix lookup
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def build(self, documents: Iterable[Tuple[Any, str, Any]]) -> None:
+        """Replace the index contents with (doc_id, text, tag) tuples"""
+        docs = {}
+        grams = defaultdict(set)
+        tokens = []
+
+        for doc_id, text, tag in documents:
+            normalized = normalize_name(text)
+            docs[doc_id] = (normalized, tag)
+            for gram in _trigrams(normalized):
+                grams[gram].add(doc_id)
+            tokens.extend((token, doc_id) for token in set(normalized.split()))
+
+        tokens.sort()
+
+        with self._lock:
+            self._docs, self._grams, self._tokens = docs, grams, tokens
+
+    def add(self, doc_id: Any, text: str, tag: Any = None) -> None:
+        """Add or replace a single document"""
+        with self._lock:
+            self.discard(doc_id)
+            normalized = normalize_name(text)
+            self._docs[doc_id] = (normalized, tag)
+            for gram in _trigrams(normalized):
+                self._grams[gram].add(doc_id)
+            for token in set(normalized.split()):
+                bisect.insort(self._tokens, (token, doc_id))
+
+    def discard(self, doc_id: Any) -> None:
+        """Remove a document if present"""
+        with self._lock:
+            entry = self._docs.pop(doc_id, None)
+            if entry is None:
+                return
+
+            normalized = entry[0]
+            for gram in _trigrams(normalized):
+                postings = self._grams.get(gram)
+                if postings is not None:
+                    postings.discard(doc_id)
+                    if not postings:
+                        del self._grams[gram]
+            for token in set(normalized.split()):
+                pos = bisect.bisect_left(self._tokens, (token, doc_id))
+                if pos < len(self._tokens) and self._tokens[pos] == (token, doc_id):
+                    del self._tokens[pos]
+
+    def _prefix_matches(self, prefix: str) -> Set[Any]:
+        """Return IDs of documents having a token that starts with prefix"""
+        matches = set()
+        pos = bisect.bisect_left(self._tokens, (prefix,))
+        while pos < len(self._tokens) and self._tokens[pos][0].startswith(prefix):
+            matches.add(self._tokens[pos][1])
+            pos += 1
+        return matches
+
+    def search(self, query: str, limit: int = 10,
+               accept: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """Search the index
+
+        Args:
+            query: Raw query text (normalized internally)
+            limit: Maximum number of IDs to return
+            accept: Optional predicate on the document tag
+
+        Returns:
+            Document IDs ordered by relevance
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+
+        query_tokens = normalized.split()
+        query_grams = _trigrams(normalized)
+
+        with self._lock:
+            # Prefix matches on the last (possibly incomplete) token
+            prefix_hits = self._prefix_matches(query_tokens[-1])
+
+            # Trigram overlap counts
+            overlap = Counter()
+            if len(normalized) >= 3:
+                for gram in query_grams:
+                    postings = self._grams.get(gram)
+                    if postings:
+                        overlap.update(postings)
+
+            scored = []
+            for doc_id in prefix_hits.union(overlap):
+                doc_text, tag = self._docs[doc_id]
+                if accept is not None and not accept(tag):
+                    continue
+
+                similarity = overlap[doc_id] / len(query_grams) if query_grams else 0.0
+                score = similarity
+                if doc_text.startswith(normalized):
+                    score += 2.0
+                elif doc_id in prefix_hits:
+                    score += 1.0
+                elif similarity < self.min_similarity:
+                    continue
+
+                # Prefer shorter names on ties (closer matches)
+                scored.append((score, -len(doc_text), doc_id))
+
+        return [doc_id for _, _, doc_id in heapq.nlargest(limit, scored, key=lambda s: (s[0], s[1]))]
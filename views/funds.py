@@ -583,6 +583,16 @@ class FundsView:
         scrollbar = ttk.Scrollbar(tab, orient="vertical", command=self.transactions_tree.yview)
         self.transactions_tree.configure(yscrollcommand=scrollbar.set)
         
+        # Load more button (pages through the feed)
+        self.load_more_button = ttk.Button(
+            tab,
+            text=self._("Load More"),
+            command=self.load_more_transactions,
+            bootstyle=SECONDARY,
+            width=15
+        )
+        self.load_more_button.pack(side="bottom", pady=(10, 0))
+        
         # Pack treeview and scrollbar
         self.transactions_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -609,52 +619,46 @@ class FundsView:
         # Get filter values
         fund_id = self.fund_filter_var.get()
         if fund_id == "all":
-            fund_id = None
+            self.transaction_fund_ids = None
         else:
             try:
-                fund_id = int(fund_id)
+                self.transaction_fund_ids = [int(fund_id)]
             except ValueError:
-                fund_id = None
-        
-        # Process date filters
-        start_date = None
-        if self.date_from_var.get():
-            try:
-                start_date = datetime.strptime(self.date_from_var.get(), "%Y-%m-%d")
-            except ValueError:
-                pass
+                self.transaction_fund_ids = None
+        
+        # Process date filters (invalid dates are ignored)
+        self.transaction_dates = []
+        for var in (self.date_from_var, self.date_to_var):
+            value = var.get() or None
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    value = None
+            self.transaction_dates.append(value)
+        
+        self.transactions_cursor = None
+        self.load_more_transactions()
+    
+    def load_more_transactions(self):
+        """Append the next page of the transaction feed to the list"""
+        start_date, end_date = self.transaction_dates
+        success, result = self.fund_controller.get_transaction_feed(
+            fund_ids=self.transaction_fund_ids,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=self.transactions_cursor
+        )
+        if not success:
+            show_notification(self._("Error"), result, category='danger')
+            return
         
-        end_date = None
-        if self.date_to_var.get():
-            try:
-                end_date = datetime.strptime(self.date_to_var.get(), "%Y-%m-%d")
-            except ValueError:
-                pass
-        
-        # Get transactions based on filters
-        if fund_id:
-            transactions = self.fund_controller.get_fund_transactions(
-                fund_id=fund_id,
-                start_date=start_date,
-                end_date=end_date
-            )
+        transactions = result['transactions']
+        self.transactions_cursor = result['next_cursor']
+        if self.transactions_cursor:
+            self.load_more_button.configure(state="normal")
         else:
-            # TODO: Get transactions for all funds (would need method in controller)
-            transactions = []
-            funds = self.fund_controller.get_all_funds()
-            for fund in funds:
-                fund_transactions = self.fund_controller.get_fund_transactions(
-                    fund_id=fund.id,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                transactions.extend(fund_transactions)
-            
-            # Sort by date (newest first)
-            transactions.sort(key=lambda x: x.created_at, reverse=True)
-        
-        # Add transactions to treeview
-        funds_dict = {fund.id: fund.name for fund in self.fund_controller.get_all_funds(active_only=False)}
+            self.load_more_button.configure(state="disabled")
         
         for transaction in transactions:
             # Determine the icon based on transaction type
@@ -666,9 +670,6 @@ class FundsView:
             else:
                 amount_str = f"-{transaction.amount:.2f}"
             
-            # Get fund name
-            fund_name = funds_dict.get(transaction.fund_id, str(transaction.fund_id))
-            
             # Format reference
             reference = ""
             if transaction.reference_type and transaction.reference_id:
@@ -680,7 +681,7 @@ class FundsView:
                 values=(
                     transaction.id,
                     transaction.created_at.strftime("%Y-%m-%d %H:%M"),
-                    fund_name,
+                    transaction.fund_name,
                     f"{icon} {transaction.transaction_type}",
                     amount_str,
                     transaction.description,
@@ -806,8 +807,8 @@ class FundsView:
             dest_id = int(self.dest_fund_var.get())
             
             # Get fund objects
-            source_fund = self.fund_controller.get_fund_by_id(source_id)
-            dest_fund = self.fund_controller.get_fund_by_id(dest_id)
+            source_fund = self.fund_controller.get_fund_snapshot(source_id)
+            dest_fund = self.fund_controller.get_fund_snapshot(dest_id)
             
             if source_fund and dest_fund:
                 if source_fund.currency != dest_fund.currency:
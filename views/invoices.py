@@ -14,6 +14,7 @@ from controllers.item_controller import ItemController
 from controllers.warehouse_controller import WarehouseController
 from controllers.supplier_customer_controller import SupplierCustomerController
 from controllers.fund_controller import FundController
+from controllers.search_controller import SearchController
 from utils.notifications import show_notification
 
 class InvoicesView:
@@ -33,6 +34,7 @@ class InvoicesView:
         self.warehouse_controller = WarehouseController()
         self.supplier_customer_controller = SupplierCustomerController()
         self.fund_controller = FundController()
+        self.search_controller = SearchController()
         
         # Setup translation
         self._ = gettext.gettext
@@ -509,7 +511,7 @@ class InvoicesView:
             # Get fund name if fund_id is set
             fund_name = ""
             if payment.fund_id:
-                fund = self.fund_controller.get_fund_by_id(payment.fund_id)
+                fund = self.fund_controller.get_fund_snapshot(payment.fund_id)
                 if fund:
                     fund_name = fund.name
             
@@ -1115,8 +1117,8 @@ class InvoicesView:
         # Item selection
         ttk.Label(add_item_frame, text=self._("Item:")).grid(row=0, column=0, sticky="w", pady=5)
         
-        # Get all items for combobox
-        items = self.item_controller.get_all_items()
+        # Get initial suggestions for combobox (narrowed by typing)
+        items = self.search_controller.search_items('', limit=50)
         item_choices = [(item.id, f"{item.name}") for item in items]
         
         if invoice_type == "purchase":
@@ -1124,8 +1126,9 @@ class InvoicesView:
             if item_choices:
                 self.purchase_item_var.set(str(item_choices[0][0]))
             
-            # Create a dictionary for quick lookup
-            self.purchase_items_dict = {str(item.id): item for item in items}
+            # Create a dictionary for quick lookup (by ID and by displayed name)
+            self.purchase_items_dict = {}
+            self.remember_item_choices(self.purchase_items_dict, items)
             
             item_combo = ttk.Combobox(
                 add_item_frame,
@@ -1135,6 +1138,11 @@ class InvoicesView:
             )
             item_combo.grid(row=0, column=1, columnspan=2, sticky="ew", pady=5)
             
+            # Narrow the choices as the user types
+            item_combo.bind("<KeyRelease>",
+                            lambda e, combo=item_combo: self.filter_item_choices(
+                                combo, self.purchase_item_var, self.purchase_items_dict))
+            
             # Update unit options when item changes
             item_combo.bind("<<ComboboxSelected>>", 
                             lambda e: self.update_unit_options(self.purchase_item_var.get(),
@@ -1146,8 +1154,9 @@ class InvoicesView:
             if item_choices:
                 self.sales_item_var.set(str(item_choices[0][0]))
             
-            # Create a dictionary for quick lookup
-            self.sales_items_dict = {str(item.id): item for item in items}
+            # Create a dictionary for quick lookup (by ID and by displayed name)
+            self.sales_items_dict = {}
+            self.remember_item_choices(self.sales_items_dict, items)
             
             item_combo = ttk.Combobox(
                 add_item_frame,
@@ -1157,6 +1166,11 @@ class InvoicesView:
             )
             item_combo.grid(row=0, column=1, columnspan=2, sticky="ew", pady=5)
             
+            # Narrow the choices as the user types
+            item_combo.bind("<KeyRelease>",
+                            lambda e, combo=item_combo: self.filter_item_choices(
+                                combo, self.sales_item_var, self.sales_items_dict))
+            
             # Update unit options when item changes
             item_combo.bind("<<ComboboxSelected>>", 
                             lambda e: self.update_unit_options(self.sales_item_var.get(),
@@ -1453,6 +1467,18 @@ class InvoicesView:
         tab_text = self._("New Purchase") if invoice_type == "purchase" else self._("New Sale")
         self.notebook.add(tab, text=tab_text)
     
+    def remember_item_choices(self, items_dict, items):
+        """Register items in a lookup dictionary by ID and by name"""
+        for item in items:
+            items_dict[str(item.id)] = item
+            items_dict[item.name] = item
+    
+    def filter_item_choices(self, combo, item_var, items_dict):
+        """Replace the combobox choices with search results for the typed text"""
+        items = self.search_controller.search_items(item_var.get(), limit=20)
+        self.remember_item_choices(items_dict, items)
+        combo.configure(values=[item.name for item in items])
+    
     def update_unit_options(self, item_id, unit_var, main_unit_radio, sub_unit_radio):
         """Update the unit options based on the selected item"""
         # Get the items dictionary based on current tab
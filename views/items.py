@@ -486,7 +486,7 @@ class ItemsView:
             self.items_tree.delete(item)
         
         # Get all items
-        items = self.item_controller.get_all_items(active_only=False)
+        items = self.item_controller.get_all_items(active_only=False, with_stock=True)
         
         # Add items to treeview
         for item in items:
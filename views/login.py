@@ -9,6 +9,7 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import gettext
 from controllers.auth import AuthController
+from database.audit import set_default_audit_user
 
 class LoginView:
     """Login view class"""
@@ -139,7 +140,8 @@ class LoginView:
         user = self.auth_controller.authenticate(username, password)
         
         if user:
-            # Authentication successful
+            # Authentication successful; later changes are audited as this user
+            set_default_audit_user(user.id)
             self.switch_to_main_menu()
         else:
             # Authentication failed
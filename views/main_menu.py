@@ -5,10 +5,31 @@
 Main menu view for ASSI Warehouse Management System
 """
 
+import os
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import gettext
 
+from database.db_setup import recycle_session, expire_idle_session
+
+# Milliseconds between expiring the idle desktop session (0 disables)
+SESSION_EXPIRE_INTERVAL_MS = int(os.environ.get('SESSION_EXPIRE_INTERVAL_MS', '300000'))
+
+def schedule_session_expiry(root):
+    """Periodically expire the desktop session so it does not hold stale data or a connection
+
+    Scheduled once per root window.
+    """
+    if SESSION_EXPIRE_INTERVAL_MS <= 0 or getattr(root, '_session_expiry_scheduled', False):
+        return
+    root._session_expiry_scheduled = True
+
+    def expire():
+        expire_idle_session()
+        root.after(SESSION_EXPIRE_INTERVAL_MS, expire)
+
+    root.after(SESSION_EXPIRE_INTERVAL_MS, expire)
+
 class MainMenuView:
     """Main menu view class"""
     
@@ -22,6 +43,10 @@ class MainMenuView:
         self.root = root
         self.callbacks = navigation_callbacks
         
+        # The previous module's view is gone, so its loaded objects can go too
+        recycle_session()
+        schedule_session_expiry(self.root)
+        
         # Setup translation
         self._ = gettext.gettext
         
@@ -198,4 +223,6 @@ class MainMenuView:
             destination: The destination key from navigation_callbacks
         """
         if destination in self.callbacks:
+            # Each module starts from a fresh session
+            recycle_session()
             self.callbacks[destination]()
@@ -10,13 +10,8 @@ from ttkbootstrap.constants import *
 import gettext
 from datetime import datetime, timedelta
 import os
-import matplotlib.pyplot as plt
-import matplotlib
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import pandas as pd
 import io
 import base64
-from PIL import Image, ImageTk
 
 from controllers.report_controller import ReportController
 from controllers.supplier_customer_controller import SupplierCustomerController
@@ -25,9 +20,6 @@ from controllers.fund_controller import FundController
 from utils.notifications import show_notification
 from utils.export import export_to_excel
 
-# Configure matplotlib to use a non-GUI backend for report generation
-matplotlib.use('Agg')
-
 class ReportsView:
     """Reports view class"""
     
@@ -237,18 +229,17 @@ class ReportsView:
             )
             
             if sales_report['summary']['Chart']:
-                # Decode the base64 chart image
-                chart_data = base64.b64decode(sales_report['summary']['Chart'])
-                chart_image = Image.open(io.BytesIO(chart_data))
-                
-                # Create PhotoImage and label
-                photo = ImageTk.PhotoImage(chart_image)
+                # Create PhotoImage from the base64 chart and label
+                photo = self.chart_photo(sales_report['summary']['Chart'])
                 chart_label = ttk.Label(chart_frame, image=photo)
                 chart_label.image = photo  # Keep a reference to prevent garbage collection
                 chart_label.pack(fill="both", expand=True)
             else:
                 # Create a simple matplotlib figure if no chart exists
-                figure = plt.Figure(figsize=(5, 4), dpi=100)
+                from matplotlib.figure import Figure
+                from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+                
+                figure = Figure(figsize=(5, 4), dpi=100)
                 ax = figure.add_subplot(111)
                 
                 # Create a dummy plot if no data is available
@@ -272,6 +263,14 @@ class ReportsView:
         # Add tab to notebook
         self.notebook.add(tab, text=self._("Dashboard"))
     
+    def chart_photo(self, chart_base64):
+        """Decode a base64 PNG chart into a Tk PhotoImage"""
+        # PIL is only needed once a chart is displayed
+        from PIL import Image, ImageTk
+        
+        chart_image = Image.open(io.BytesIO(base64.b64decode(chart_base64)))
+        return ImageTk.PhotoImage(chart_image)
+    
     def create_metric_widget(self, parent, row, col, title, value, unit, icon, bootstyle=None):
         """Create a metric display widget
         
@@ -581,10 +580,7 @@ class ReportsView:
             # Display chart if available
             if summary['Chart']:
                 try:
-                    chart_data = base64.b64decode(summary['Chart'])
-                    chart_image = Image.open(io.BytesIO(chart_data))
-                    
-                    photo = ImageTk.PhotoImage(chart_image)
+                    photo = self.chart_photo(summary['Chart'])
                     chart_label = ttk.Label(self.sales_chart_frame, image=photo)
                     chart_label.image = photo  # Keep a reference
                     chart_label.pack(fill="both", expand=True)
@@ -1105,10 +1101,7 @@ class ReportsView:
             # Display chart if available
             if summary['Chart']:
                 try:
-                    chart_data = base64.b64decode(summary['Chart'])
-                    chart_image = Image.open(io.BytesIO(chart_data))
-                    
-                    photo = ImageTk.PhotoImage(chart_image)
+                    photo = self.chart_photo(summary['Chart'])
                     chart_label = ttk.Label(self.financial_chart_frame, image=photo)
                     chart_label.image = photo  # Keep a reference
                     chart_label.pack(fill="both", expand=True)
@@ -471,7 +471,7 @@ class SuppliersCustomersView:
             
         # Create dialog
         dialog = ttk.Toplevel(self.root)
-        dialog.title(self._("Payment History - {0}").format(entity_name))
+        dialog.title(self._("Statement - {0}").format(entity_name))
         dialog.geometry("800x500")
         dialog.transient(self.root)
         
@@ -512,12 +512,12 @@ class SuppliersCustomersView:
                 text=" | ".join(contact_info)
             ).pack(anchor="w", pady=2)
         
-        # Create treeview for payments
+        # Create treeview for the statement (invoices and payments with running balance)
         columns = (
-            "id", "date", "amount", "currency", "method", "invoice", "fund", "notes"
+            "date", "type", "reference", "debit", "credit", "balance", "currency"
         )
         
-        payments_tree = ttk.Treeview(
+        statement_tree = ttk.Treeview(
             main_frame,
             columns=columns,
             show="headings",
@@ -525,62 +525,79 @@ class SuppliersCustomersView:
         )
         
         # Define column headings
-        payments_tree.heading("id", text=self._("ID"))
-        payments_tree.heading("date", text=self._("Date"))
-        payments_tree.heading("amount", text=self._("Amount"))
-        payments_tree.heading("currency", text=self._("Currency"))
-        payments_tree.heading("method", text=self._("Method"))
-        payments_tree.heading("invoice", text=self._("Invoice"))
-        payments_tree.heading("fund", text=self._("Fund"))
-        payments_tree.heading("notes", text=self._("Notes"))
+        statement_tree.heading("date", text=self._("Date"))
+        statement_tree.heading("type", text=self._("Type"))
+        statement_tree.heading("reference", text=self._("Reference"))
+        statement_tree.heading("debit", text=self._("Debit"))
+        statement_tree.heading("credit", text=self._("Credit"))
+        statement_tree.heading("balance", text=self._("Balance"))
+        statement_tree.heading("currency", text=self._("Currency"))
         
         # Define column widths
-        payments_tree.column("id", width=50, stretch=False)
-        payments_tree.column("date", width=100, stretch=False)
-        payments_tree.column("amount", width=100, stretch=False)
-        payments_tree.column("currency", width=80, stretch=False)
-        payments_tree.column("method", width=100, stretch=False)
-        payments_tree.column("invoice", width=120)
-        payments_tree.column("fund", width=120)
-        payments_tree.column("notes", width=200)
+        statement_tree.column("date", width=100, stretch=False)
+        statement_tree.column("type", width=100, stretch=False)
+        statement_tree.column("reference", width=160)
+        statement_tree.column("debit", width=100, stretch=False)
+        statement_tree.column("credit", width=100, stretch=False)
+        statement_tree.column("balance", width=110, stretch=False)
+        statement_tree.column("currency", width=80, stretch=False)
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=payments_tree.yview)
-        payments_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=statement_tree.yview)
+        statement_tree.configure(yscrollcommand=scrollbar.set)
         
         # Pack treeview and scrollbar
-        payments_tree.pack(side="left", fill="both", expand=True)
+        statement_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        # Get payment data
-        payments = self.sc_controller.get_entity_payments(entity_id)
+        entry_types = {
+            "purchase": self._("Purchase"),
+            "sale": self._("Sale"),
+            "payment": self._("Payment")
+        }
         
-        # Get funds for display
-        funds = self.fund_controller.get_all_funds(active_only=False)
-        fund_dict = {f.id: f.name for f in funds}
+        # Statement pages are loaded on demand, continuing from the last cursor
+        next_cursor = {"value": None}
         
-        # Add payments to treeview
-        for payment in payments:
-            # Get fund name if available
-            fund_name = fund_dict.get(payment.fund_id, "") if payment.fund_id else ""
-            
-            # Get invoice number if available
-            invoice_text = f"#{payment.invoice_id}" if payment.invoice_id else ""
+        def load_statement_page():
+            success, page = self.sc_controller.get_entity_statement(
+                entity_id,
+                cursor=next_cursor["value"],
+                limit=200
+            )
+            if not success:
+                show_notification(self._("Error"), page, category='danger')
+                return
             
-            payments_tree.insert(
-                "",
-                "end",
-                values=(
-                    payment.id,
-                    payment.payment_date.strftime("%Y-%m-%d"),
-                    f"{payment.amount:.2f}",
-                    payment.currency,
-                    payment.payment_method,
-                    invoice_text,
-                    fund_name,
-                    payment.notes or ""
+            for entry in page["entries"]:
+                statement_tree.insert(
+                    "",
+                    "end",
+                    values=(
+                        entry["entry_date"].strftime("%Y-%m-%d"),
+                        entry_types.get(entry["entry_type"], entry["entry_type"]),
+                        entry["reference"] or "",
+                        f"{entry['debit']:.2f}" if entry["debit"] else "",
+                        f"{entry['credit']:.2f}" if entry["credit"] else "",
+                        f"{entry['balance']:.2f}",
+                        entry["currency"]
+                    )
                 )
-            )
+            
+            next_cursor["value"] = page["next_cursor"]
+            if not page["next_cursor"]:
+                more_button.configure(state="disabled")
+        
+        more_button = ttk.Button(
+            dialog,
+            text=self._("Load More"),
+            command=load_statement_page,
+            bootstyle=INFO,
+            width=15
+        )
+        more_button.pack(pady=(10, 0))
+        
+        load_statement_page()
         
         # Add close button
         close_button = ttk.Button(
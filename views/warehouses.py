@@ -10,6 +10,7 @@ from ttkbootstrap.constants import *
 import gettext
 from controllers.warehouse_controller import WarehouseController
 from controllers.item_controller import ItemController
+from controllers.stock_transfer_controller import StockTransferController
 from utils.notifications import show_notification
 
 class WarehousesView:
@@ -26,6 +27,7 @@ class WarehousesView:
         self.back_to_main_menu = back_to_main_menu
         self.warehouse_controller = WarehouseController()
         self.item_controller = ItemController()
+        self.stock_transfer_controller = StockTransferController()
         
         # Setup translation
         self._ = gettext.gettext
@@ -45,6 +47,7 @@ class WarehousesView:
         self.create_warehouses_list_tab()
         self.create_add_warehouse_tab()
         self.create_inventory_tab()
+        self.create_transfers_tab()
         
         # Add back button
         back_button = ttk.Button(
@@ -307,13 +310,12 @@ class WarehousesView:
             self.warehouses_tree.delete(item)
         
         # Get all warehouses
-        warehouses = self.warehouse_controller.get_all_warehouses(active_only=False)
+        warehouses = self.warehouse_controller.get_all_warehouses(active_only=False, with_stock=True)
         
         # Add warehouses to treeview
         for warehouse in warehouses:
             # Get stock information
-            stocks = self.warehouse_controller.get_warehouse_stock(warehouse.id)
-            item_count = len(stocks)
+            item_count = len(warehouse.stocks)
             total_value = self.warehouse_controller.get_warehouse_inventory_value(warehouse.id)
             
             # Add status indicator
@@ -650,3 +652,309 @@ class WarehousesView:
                 self._("Export Complete"),
                 self._("Inventory exported to {0}").format(filename)
             )
+    
+    def create_transfers_tab(self):
+        """Create the stock transfers tab"""
+        tab = ttk.Frame(self.notebook, padding=10)
+        
+        # Transfer header: warehouses and options
+        header_frame = ttk.Frame(tab)
+        header_frame.pack(fill="x", pady=(0, 10))
+        
+        self.transfer_warehouses = self.warehouse_controller.get_all_warehouses()
+        warehouse_names = [w.name for w in self.transfer_warehouses]
+        
+        ttk.Label(header_frame, text=self._("From:")).pack(side="left", padx=(0, 5))
+        self.transfer_from_combo = ttk.Combobox(header_frame, values=warehouse_names, width=20, state="readonly")
+        self.transfer_from_combo.pack(side="left", padx=5)
+        
+        ttk.Label(header_frame, text=self._("To:")).pack(side="left", padx=(10, 5))
+        self.transfer_to_combo = ttk.Combobox(header_frame, values=warehouse_names, width=20, state="readonly")
+        self.transfer_to_combo.pack(side="left", padx=5)
+        
+        if len(warehouse_names) > 1:
+            self.transfer_from_combo.current(0)
+            self.transfer_to_combo.current(1)
+        
+        self.transfer_receive_var = ttk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            header_frame,
+            text=self._("Receive immediately"),
+            variable=self.transfer_receive_var
+        ).pack(side="left", padx=10)
+        
+        # Line entry
+        line_frame = ttk.Frame(tab)
+        line_frame.pack(fill="x", pady=(0, 10))
+        
+        self.transfer_items = self.item_controller.get_item_rows()
+        
+        ttk.Label(line_frame, text=self._("Item:")).pack(side="left", padx=(0, 5))
+        self.transfer_item_combo = ttk.Combobox(
+            line_frame,
+            values=[item.name for item in self.transfer_items],
+            width=30
+        )
+        self.transfer_item_combo.pack(side="left", padx=5)
+        self.transfer_item_combo.bind("<<ComboboxSelected>>", lambda e: self.update_transfer_units())
+        
+        ttk.Label(line_frame, text=self._("Quantity:")).pack(side="left", padx=(10, 5))
+        self.transfer_line_quantity_var = ttk.StringVar()
+        ttk.Entry(line_frame, textvariable=self.transfer_line_quantity_var, width=10).pack(side="left", padx=5)
+        
+        self.transfer_line_unit_combo = ttk.Combobox(line_frame, width=10, state="readonly")
+        self.transfer_line_unit_combo.pack(side="left", padx=5)
+        
+        ttk.Button(
+            line_frame,
+            text=self._("Add Line"),
+            command=self.add_transfer_line,
+            bootstyle=INFO,
+            width=12
+        ).pack(side="left", padx=10)
+        
+        ttk.Button(
+            line_frame,
+            text=self._("Remove Line"),
+            command=self.remove_transfer_line,
+            bootstyle=SECONDARY,
+            width=12
+        ).pack(side="left")
+        
+        # Lines of the transfer being prepared
+        self.transfer_lines_tree = ttk.Treeview(
+            tab,
+            columns=("item_id", "item_name", "quantity", "unit"),
+            show="headings",
+            height=8,
+            bootstyle=INFO
+        )
+        self.transfer_lines_tree.heading("item_id", text=self._("ID"))
+        self.transfer_lines_tree.heading("item_name", text=self._("Item Name"))
+        self.transfer_lines_tree.heading("quantity", text=self._("Quantity"))
+        self.transfer_lines_tree.heading("unit", text=self._("Unit"))
+        self.transfer_lines_tree.column("item_id", width=50, stretch=False)
+        self.transfer_lines_tree.column("item_name", width=250)
+        self.transfer_lines_tree.column("quantity", width=100, stretch=False)
+        self.transfer_lines_tree.column("unit", width=100, stretch=False)
+        self.transfer_lines_tree.pack(fill="x")
+        
+        # Notes and post button
+        post_frame = ttk.Frame(tab)
+        post_frame.pack(fill="x", pady=10)
+        
+        ttk.Label(post_frame, text=self._("Notes:")).pack(side="left", padx=(0, 5))
+        self.transfer_notes_entry_var = ttk.StringVar()
+        ttk.Entry(post_frame, textvariable=self.transfer_notes_entry_var, width=40).pack(side="left", padx=5)
+        
+        self.transfer_error_var = ttk.StringVar()
+        ttk.Label(post_frame, textvariable=self.transfer_error_var, bootstyle=DANGER).pack(side="left", padx=10)
+        
+        ttk.Button(
+            post_frame,
+            text=self._("Post Transfer"),
+            command=self.post_transfer,
+            bootstyle=SUCCESS,
+            width=15
+        ).pack(side="right")
+        
+        # Existing transfers
+        actions_frame = ttk.Frame(tab)
+        actions_frame.pack(fill="x", pady=(10, 5))
+        
+        ttk.Label(
+            actions_frame,
+            text=self._("Transfers"),
+            font=("TkDefaultFont", 12, "bold")
+        ).pack(side="left")
+        
+        for text, command, style in (
+            (self._("Refresh"), self.refresh_transfers, INFO),
+            (self._("Cancel Transfer"), self.cancel_selected_transfer, DANGER),
+            (self._("Receive"), self.receive_selected_transfer, SUCCESS),
+        ):
+            ttk.Button(actions_frame, text=text, command=command, bootstyle=style, width=15).pack(side="right", padx=5)
+        
+        columns = ("id", "number", "from", "to", "status", "lines", "quantity", "dispatched_at", "received_at")
+        self.transfers_tree = ttk.Treeview(tab, columns=columns, show="headings", bootstyle=INFO)
+        
+        self.transfers_tree.heading("id", text=self._("ID"))
+        self.transfers_tree.heading("number", text=self._("Transfer Number"))
+        self.transfers_tree.heading("from", text=self._("From"))
+        self.transfers_tree.heading("to", text=self._("To"))
+        self.transfers_tree.heading("status", text=self._("Status"))
+        self.transfers_tree.heading("lines", text=self._("Lines"))
+        self.transfers_tree.heading("quantity", text=self._("Quantity"))
+        self.transfers_tree.heading("dispatched_at", text=self._("Dispatched"))
+        self.transfers_tree.heading("received_at", text=self._("Received"))
+        
+        self.transfers_tree.column("id", width=50, stretch=False)
+        self.transfers_tree.column("number", width=130, stretch=False)
+        self.transfers_tree.column("from", width=150)
+        self.transfers_tree.column("to", width=150)
+        self.transfers_tree.column("status", width=100, stretch=False)
+        self.transfers_tree.column("lines", width=60, stretch=False)
+        self.transfers_tree.column("quantity", width=90, stretch=False)
+        self.transfers_tree.column("dispatched_at", width=130, stretch=False)
+        self.transfers_tree.column("received_at", width=130, stretch=False)
+        
+        scrollbar = ttk.Scrollbar(tab, orient="vertical", command=self.transfers_tree.yview)
+        self.transfers_tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.transfers_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Load initial data
+        self.refresh_transfers()
+        
+        # Add tab to notebook
+        self.notebook.add(tab, text=self._("Transfers"))
+    
+    def update_transfer_units(self):
+        """Offer the selected item's main and sub units"""
+        selected_index = self.transfer_item_combo.current()
+        if selected_index < 0:
+            return
+        
+        item = self.transfer_items[selected_index]
+        self.transfer_line_unit_combo.configure(values=[item.main_unit, item.sub_unit])
+        self.transfer_line_unit_combo.current(0)
+    
+    def add_transfer_line(self):
+        """Add the entered item and quantity to the transfer lines"""
+        self.transfer_error_var.set("")
+        
+        selected_index = self.transfer_item_combo.current()
+        if selected_index < 0:
+            self.transfer_error_var.set(self._("Please select an item"))
+            return
+        
+        try:
+            quantity = float(self.transfer_line_quantity_var.get())
+        except ValueError:
+            self.transfer_error_var.set(self._("Please enter valid numeric values"))
+            return
+        
+        if quantity <= 0:
+            self.transfer_error_var.set(self._("Quantity must be greater than zero"))
+            return
+        
+        item = self.transfer_items[selected_index]
+        unit = self.transfer_line_unit_combo.get() or item.main_unit
+        
+        self.transfer_lines_tree.insert("", "end", values=(item.id, item.name, quantity, unit))
+        self.transfer_line_quantity_var.set("")
+    
+    def remove_transfer_line(self):
+        """Remove the selected transfer lines"""
+        for line in self.transfer_lines_tree.selection():
+            self.transfer_lines_tree.delete(line)
+    
+    def post_transfer(self):
+        """Post the prepared lines as one stock transfer"""
+        self.transfer_error_var.set("")
+        
+        from_index = self.transfer_from_combo.current()
+        to_index = self.transfer_to_combo.current()
+        if from_index < 0 or to_index < 0:
+            self.transfer_error_var.set(self._("Please select both warehouses"))
+            return
+        
+        lines = []
+        for line in self.transfer_lines_tree.get_children():
+            item_id, _name, quantity, unit = self.transfer_lines_tree.item(line, "values")
+            lines.append({'item_id': int(item_id), 'quantity': float(quantity), 'unit': unit})
+        
+        if not lines:
+            self.transfer_error_var.set(self._("Add at least one line"))
+            return
+        
+        success, result = self.stock_transfer_controller.create_transfer(
+            self.transfer_warehouses[from_index].id,
+            self.transfer_warehouses[to_index].id,
+            lines,
+            notes=self.transfer_notes_entry_var.get().strip() or None,
+            receive=self.transfer_receive_var.get()
+        )
+        
+        if not success:
+            self.transfer_error_var.set(result)
+            return
+        
+        for line in self.transfer_lines_tree.get_children():
+            self.transfer_lines_tree.delete(line)
+        self.transfer_notes_entry_var.set("")
+        
+        show_notification(
+            self._("Success"),
+            self._("Transfer {0} posted with {1} lines").format(result.transfer_number, len(lines))
+        )
+        self.refresh_transfers()
+        self.refresh_inventory()
+    
+    def refresh_transfers(self):
+        """Refresh the stock transfers list"""
+        for item in self.transfers_tree.get_children():
+            self.transfers_tree.delete(item)
+        
+        statuses = {
+            'draft': self._("Draft"),
+            'in_transit': self._("In Transit"),
+            'received': self._("Received"),
+            'cancelled': self._("Cancelled")
+        }
+        
+        for transfer in self.stock_transfer_controller.get_transfer_rows():
+            self.transfers_tree.insert(
+                "",
+                "end",
+                values=(
+                    transfer.id,
+                    transfer.transfer_number,
+                    transfer.from_warehouse_name,
+                    transfer.to_warehouse_name,
+                    statuses.get(transfer.status, transfer.status),
+                    transfer.line_count,
+                    f"{transfer.total_quantity:.2f}",
+                    transfer.dispatched_at.strftime("%Y-%m-%d %H:%M") if transfer.dispatched_at else "",
+                    transfer.received_at.strftime("%Y-%m-%d %H:%M") if transfer.received_at else ""
+                )
+            )
+    
+    def receive_selected_transfer(self):
+        """Receive the selected in-transit transfer at its destination"""
+        self._apply_to_selected_transfer(
+            self.stock_transfer_controller.receive_transfer,
+            self._("Transfer received successfully")
+        )
+    
+    def cancel_selected_transfer(self):
+        """Cancel the selected transfer, returning in-transit stock to its source"""
+        confirm = ttk.Messagebox.yesno(
+            title=self._("Confirm Cancellation"),
+            message=self._("Are you sure you want to cancel this transfer?")
+        )
+        
+        if confirm == "No":
+            return
+        
+        self._apply_to_selected_transfer(
+            self.stock_transfer_controller.cancel_transfer,
+            self._("Transfer cancelled successfully")
+        )
+    
+    def _apply_to_selected_transfer(self, action, success_message):
+        """Run a transfer action on the selected transfer and refresh"""
+        selected_items = self.transfers_tree.selection()
+        if not selected_items:
+            return
+        
+        transfer_id = int(self.transfers_tree.item(selected_items[0], "values")[0])
+        success, result = action(transfer_id)
+        
+        if success:
+            show_notification(self._("Success"), success_message)
+            self.refresh_transfers()
+            self.refresh_inventory()
+        else:
+            show_notification(self._("Error"), result, category='danger')
@@ -6,18 +6,23 @@ ASSI Warehouse Management System - Web Interface
 Flask-based web interface for the Warehouse Management System
 """
 
+import io
 import os
 import sys
+import csv
 import json
+import time
 import datetime
 from datetime import timedelta
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort, g,
+                   Response, stream_with_context)
+from sqlalchemy.exc import SQLAlchemyError
 
 # Setup path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import database session
-from database.db_setup import session as db_session
+from database.db_setup import session as db_session, replica_engines, use_replica, QueryCounter, QUERY_BUDGET
 from models.user import User
 from models.fund import Fund
 from models.item import Item
@@ -34,6 +39,15 @@ from controllers.invoice_controller import InvoiceController
 from controllers.supplier_customer_controller import SupplierCustomerController
 from controllers.expense_controller import ExpenseController
 from controllers.report_controller import ReportController
+from controllers.search_controller import SearchController
+from controllers.payment_allocation_controller import PaymentAllocationController
+from controllers.dashboard_controller import DashboardController
+from controllers.stock_transfer_controller import StockTransferController
+from controllers.stock_count_controller import StockCountController
+from controllers.reservation_controller import ReservationController
+from controllers.audit_controller import AuditController
+from database.identity_cache import cache_stats as identity_cache_stats, item_code_index
+from database.audit import set_audit_user
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -48,6 +62,13 @@ invoice_controller = InvoiceController()
 supplier_customer_controller = SupplierCustomerController()
 expense_controller = ExpenseController()
 report_controller = ReportController()
+search_controller = SearchController()
+payment_allocation_controller = PaymentAllocationController()
+dashboard_controller = DashboardController()
+stock_transfer_controller = StockTransferController()
+stock_count_controller = StockCountController()
+reservation_controller = ReservationController()
+audit_controller = AuditController()
 
 # Login required decorator
 def login_required(view):
@@ -58,6 +79,61 @@ def login_required(view):
     wrapped_view.__name__ = view.__name__
     return wrapped_view
 
+# Replica reads decorator for report, export and read-only API routes
+def replica_reads(view):
+    def wrapped_view(*args, **kwargs):
+        # Users who just wrote keep reading from the primary until replicas catch up
+        with use_replica(session.get('primary_until', 0) <= time.time()):
+            return view(*args, **kwargs)
+    wrapped_view.__name__ = view.__name__
+    return wrapped_view
+
+@app.after_request
+def keep_reading_own_writes(response):
+    """Carry a write made during the request over to the user's later requests"""
+    primary_until = db_session.info.get('primary_until') if replica_engines else None
+    if primary_until and primary_until > time.time():
+        session['primary_until'] = primary_until
+    return response
+
+@app.before_request
+def attribute_changes_to_user():
+    """Record the logged-in user on the audit log entries of the request's writes"""
+    set_audit_user(session.get('user_id'))
+
+@app.before_request
+def start_query_budget():
+    """Count the request's queries when QUERY_BUDGET is set"""
+    if QUERY_BUDGET:
+        g.query_counter = QueryCounter().start()
+
+@app.after_request
+def check_query_budget(response):
+    """Fail requests that ran more than QUERY_BUDGET queries"""
+    counter = g.pop('query_counter', None)
+    if counter is not None:
+        counter.stop().check(QUERY_BUDGET, f"{request.method} {request.path}")
+    return response
+
+@app.teardown_request
+def stop_query_budget(exception=None):
+    """Stop counting for requests that failed before after_request"""
+    counter = g.pop('query_counter', None)
+    if counter is not None:
+        counter.stop()
+
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    """End the request's database session
+
+    Each request starts with an empty identity map and returns its
+    connection to the pool; uncommitted work of a failed request is
+    rolled back.
+    """
+    if exception is not None:
+        db_session.rollback()
+    db_session.remove()
+
 # Routes
 @app.route('/')
 def index():
@@ -98,39 +174,15 @@ def logout():
 @login_required
 def dashboard():
     """Dashboard route"""
-    # Get summary data for dashboard
-    total_items = len(item_controller.get_all_items())
-    total_warehouses = len(warehouse_controller.get_all_warehouses())
-    funds = fund_controller.get_all_funds()
-    
-    # Calculate total fund balances
-    total_usd = sum(fund.balance / fund.exchange_rate for fund in funds if fund.currency != 'USD')
-    total_usd += sum(fund.balance for fund in funds if fund.currency == 'USD')
-    
-    # Get recent transactions
-    recent_transactions = []
-    for fund in funds:
-        transactions = fund_controller.get_fund_transactions(fund.id, limit=5)
-        for transaction in transactions:
-            recent_transactions.append({
-                'fund': fund.name,
-                'amount': transaction.amount,
-                'currency': fund.currency,
-                'type': transaction.transaction_type,
-                'date': transaction.created_at,
-                'description': transaction.description
-            })
-    
-    # Sort transactions by date
-    recent_transactions.sort(key=lambda x: x['date'], reverse=True)
-    recent_transactions = recent_transactions[:10]  # Get top 10
+    # Counts, fund totals and latest transactions (cached for a few seconds)
+    summary = dashboard_controller.get_summary()
     
     return render_template('dashboard.html', 
-                          total_items=total_items,
-                          total_warehouses=total_warehouses,
-                          total_usd=total_usd,
-                          funds=funds,
-                          recent_transactions=recent_transactions)
+                          total_items=summary['total_items'],
+                          total_warehouses=summary['total_warehouses'],
+                          total_usd=summary['total_usd'],
+                          funds=summary['funds'],
+                          recent_transactions=summary['recent_transactions'])
 
 # Fund Management Routes
 @app.route('/funds')
@@ -182,7 +234,7 @@ def view_fund(fund_id):
 @login_required
 def list_items():
     """List all items"""
-    items = item_controller.get_all_items(active_only=False)
+    items = item_controller.get_all_items(active_only=False, with_stock=True)
     return render_template('items/list.html', items=items)
 
 @app.route('/items/add', methods=['GET', 'POST'])
@@ -197,6 +249,8 @@ def add_item():
         conversion_rate = request.form['conversion_rate']
         purchase_price = request.form['purchase_price']
         selling_price = request.form['selling_price']
+        sku = request.form.get('sku', '')
+        barcodes = request.form.get('barcodes', '').replace(',', ' ').split()
         
         success, result = item_controller.create_item(
             name=name,
@@ -205,7 +259,9 @@ def add_item():
             conversion_rate=conversion_rate,
             purchase_price=purchase_price,
             selling_price=selling_price,
-            description=description
+            description=description,
+            sku=sku,
+            barcodes=barcodes
         )
         
         if success:
@@ -221,7 +277,7 @@ def add_item():
 @login_required
 def list_warehouses():
     """List all warehouses"""
-    warehouses = warehouse_controller.get_all_warehouses(active_only=False)
+    warehouses = warehouse_controller.get_all_warehouses(active_only=False, with_stock=True)
     return render_template('warehouses/list.html', warehouses=warehouses)
 
 @app.route('/warehouses/add', methods=['GET', 'POST'])
@@ -420,16 +476,12 @@ def new_purchase_invoice():
         else:
             flash(f'Error creating invoice: {result}', 'danger')
     
-    # GET request - display form
-    suppliers = supplier_customer_controller.get_suppliers()
+    # GET request - display form (suppliers and items are loaded via the search API)
     warehouses = warehouse_controller.get_all_warehouses()
-    items = item_controller.get_all_items()
     funds = fund_controller.get_all_funds()
     
     return render_template('invoices/new_purchase.html',
-                          suppliers=suppliers,
                           warehouses=warehouses,
-                          items=items,
                           funds=funds)
 
 @app.route('/invoices/new-sale', methods=['GET', 'POST'])
@@ -464,7 +516,7 @@ def new_sales_invoice():
                 'price_per_unit': item_prices[i]
             })
         
-        # Create the invoice
+        # Create the invoice, fulfilling any reservations made for it
         success, result = invoice_controller.create_invoice(
             invoice_type='sale',
             entity_id=customer_id,
@@ -476,7 +528,8 @@ def new_sales_invoice():
             exchange_rate=exchange_rate,
             additional_costs=additional_costs,
             tax=tax,
-            notes=notes
+            notes=notes,
+            reservation_ids=request.form.getlist('reservation_ids[]')
         )
         
         if success:
@@ -500,16 +553,12 @@ def new_sales_invoice():
         else:
             flash(f'Error creating invoice: {result}', 'danger')
     
-    # GET request - display form
-    customers = supplier_customer_controller.get_customers()
+    # GET request - display form (customers and items are loaded via the search API)
     warehouses = warehouse_controller.get_all_warehouses()
-    items = item_controller.get_all_items()
     funds = fund_controller.get_all_funds()
     
     return render_template('invoices/new_sale.html',
-                          customers=customers,
                           warehouses=warehouses,
-                          items=items,
                           funds=funds)
 
 @app.route('/invoices/<int:invoice_id>')
@@ -578,12 +627,124 @@ def api_stock():
     for stock in stock_items:
         stock_data[stock.item_id] = {
             'quantity': stock.quantity,
+            'reserved': stock.reserved_quantity,
+            'available': stock.available_quantity,
             'item_name': stock.item.name,
             'main_unit': stock.item.main_unit
         }
     
     return jsonify(stock_data)
 
+@app.route('/api/stock/available')
+@login_required
+@replica_reads
+def api_stock_available():
+    """API endpoint for the quantities available to promise (on hand minus active reservations)
+    
+    Takes warehouse_id and optionally repeated item_id parameters.
+    """
+    try:
+        warehouse_id = int(request.args['warehouse_id'])
+        item_ids = [int(item_id) for item_id in request.args.getlist('item_id')] or None
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': 'An integer warehouse_id is required'}), 400
+    
+    stocks = warehouse_controller.get_stock_rows(warehouse_id, item_ids=item_ids)
+    
+    return jsonify([{
+        'item_id': stock.item_id,
+        'item_name': stock.item_name,
+        'main_unit': stock.main_unit,
+        'quantity': stock.quantity,
+        'reserved': stock.reserved_quantity,
+        'available': stock.available_quantity
+    } for stock in stocks])
+
+# Matrix rows written per chunk of a streamed response
+STOCK_MATRIX_CHUNK_ROWS = 500
+
+def _stock_matrix_jsonl(warehouses, rows, low_stock_threshold):
+    """Stream a stock matrix as JSON lines: a header line with the warehouse columns, then one line per item"""
+    yield json.dumps({
+        'warehouses': [{'id': warehouse_id, 'name': name} for warehouse_id, name in warehouses],
+        'low_stock_threshold': low_stock_threshold
+    }) + '\n'
+    
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({
+            'item_id': row.item_id,
+            'item_name': row.item_name,
+            'sku': row.sku,
+            'unit': row.main_unit,
+            'quantities': row.quantities,
+            'values': row.values,
+            'low_stock': row.low_stock,
+            'total_quantity': row.total_quantity,
+            'total_value': row.total_value
+        }))
+        if len(lines) >= STOCK_MATRIX_CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def _stock_matrix_csv(warehouses, rows):
+    """Stream a stock matrix as CSV with quantity, value and low stock columns per warehouse"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = ['item_id', 'item_name', 'sku', 'unit']
+    for _, name in warehouses:
+        header += [f"{name} quantity", f"{name} value", f"{name} low stock"]
+    writer.writerow(header + ['total_quantity', 'total_value'])
+    
+    for count, row in enumerate(rows, start=1):
+        cells = [row.item_id, row.item_name, row.sku or '', row.main_unit]
+        for quantity, value, low in zip(row.quantities, row.values, row.low_stock):
+            cells += [quantity, round(value, 2), int(low)]
+        writer.writerow(cells + [row.total_quantity, round(row.total_value, 2)])
+        if count % STOCK_MATRIX_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/api/stock/matrix')
+@login_required
+@replica_reads
+def api_stock_matrix():
+    """API endpoint streaming the stock of every item in every warehouse
+    
+    Takes format (jsonl or csv), repeated warehouse_id parameters, prefix
+    (item name or SKU) and threshold (low stock flag, default 10).
+    """
+    output = request.args.get('format', 'jsonl')
+    if output not in ('jsonl', 'csv'):
+        return jsonify({'success': False, 'message': 'format must be jsonl or csv'}), 400
+    
+    try:
+        warehouse_ids = [int(warehouse_id) for warehouse_id in request.args.getlist('warehouse_id')] or None
+        low_stock_threshold = float(request.args.get('threshold', 10))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Warehouse IDs and threshold must be numbers'}), 400
+    
+    warehouses, rows = warehouse_controller.get_stock_matrix(
+        warehouse_ids=warehouse_ids,
+        prefix=request.args.get('prefix') or None,
+        low_stock_threshold=low_stock_threshold
+    )
+    
+    if output == 'csv':
+        return Response(
+            stream_with_context(_stock_matrix_csv(warehouses, rows)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=stock_matrix.csv'}
+        )
+    return Response(
+        stream_with_context(_stock_matrix_jsonl(warehouses, rows, low_stock_threshold)),
+        mimetype='application/x-ndjson'
+    )
+
 # API endpoint for stock adjustment
 @app.route('/api/stock/adjust', methods=['POST'])
 @login_required
@@ -624,10 +785,11 @@ def api_adjust_stock():
 # Reports Routes
 @app.route('/reports')
 @login_required
+@replica_reads
 def reports_dashboard():
     """Reports dashboard"""
     # Get metrics for dashboard
-    now = datetime.now()
+    now = datetime.datetime.now()
     thirty_days_ago = now - timedelta(days=30)
     
     # Sales and purchases data for the chart
@@ -648,7 +810,7 @@ def reports_dashboard():
     # Main metrics
     metrics = {
         'total_sales': financial['total_revenue'],
-        'total_purchases': financial['cost_of_goods'],
+        'total_purchases': financial['total_purchases'],
         'inventory_value': inventory['total_value'],
         'net_profit': financial['net_profit']
     }
@@ -663,6 +825,7 @@ def reports_dashboard():
 
 @app.route('/reports/sales')
 @login_required
+@replica_reads
 def sales_report():
     """Sales report"""
     # Get filter parameters
@@ -702,6 +865,7 @@ def sales_report():
 
 @app.route('/reports/inventory')
 @login_required
+@replica_reads
 def inventory_report():
     """Inventory report"""
     # Get filter parameters
@@ -737,6 +901,7 @@ def inventory_report():
 
 @app.route('/reports/financial')
 @login_required
+@replica_reads
 def financial_report():
     """Financial report"""
     # Get filter parameters
@@ -776,6 +941,7 @@ def financial_report():
 
 @app.route('/reports/receivables-payables')
 @login_required
+@replica_reads
 def receivables_payables_report():
     """Receivables and payables report"""
     # Generate report data
@@ -784,9 +950,83 @@ def receivables_payables_report():
     return render_template('reports/receivables_payables.html',
                           report_data=report_data)
 
+def _aging_filters():
+    """Read aging report filters from the query string"""
+    invoice_type = request.args.get('invoice_type')
+    return {
+        'invoice_type': invoice_type if invoice_type in ('sale', 'purchase') else None,
+        'as_of': request.args.get('as_of') or None,
+        'currency': request.args.get('currency') or None
+    }
+
+def _page_args(default_per_page=50):
+    """Read page and per_page from the query string (per_page capped at 500)"""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = max(1, min(int(request.args.get('per_page', default_per_page)), 500))
+    except ValueError:
+        page, per_page = 1, default_per_page
+    return page, per_page
+
+@app.route('/reports/aging')
+@login_required
+@replica_reads
+def aging_report():
+    """Receivables/payables aging report"""
+    filters = _aging_filters()
+    page, per_page = _page_args()
+    
+    try:
+        report_data = report_controller.generate_aging_report(page=page, per_page=per_page, **filters)
+    except ValueError:
+        flash('Invalid date. Use YYYY-MM-DD', 'danger')
+        return redirect(url_for('aging_report'))
+    
+    return render_template('reports/aging.html',
+                          report_data=report_data,
+                          filters=filters)
+
+@app.route('/reports/aging/<int:entity_id>')
+@login_required
+@replica_reads
+def aging_report_detail(entity_id):
+    """Open invoices behind one entity's aging row"""
+    filters = _aging_filters()
+    page, per_page = _page_args()
+    
+    try:
+        detail = report_controller.get_entity_aging_detail(entity_id, page=page, per_page=per_page, **filters)
+    except ValueError:
+        flash('Invalid date. Use YYYY-MM-DD', 'danger')
+        return redirect(url_for('aging_report'))
+    
+    if not detail['entity']:
+        abort(404)
+    
+    return render_template('reports/aging_detail.html',
+                          detail=detail,
+                          filters=filters)
+
+@app.route('/reports/aging/export')
+@login_required
+@replica_reads
+def export_aging_report():
+    """Export aging report to CSV"""
+    try:
+        file_path = report_controller.export_aging_report(**_aging_filters())
+    except ValueError:
+        file_path = ''
+    
+    if not file_path:
+        flash('Nothing to export', 'warning')
+        return redirect(url_for('aging_report'))
+    
+    return send_file(os.path.abspath(file_path), as_attachment=True)
+
 # Export routes
 @app.route('/reports/sales/export')
 @login_required
+@replica_reads
 def export_sales_report():
     """Export sales report to Excel"""
     # Get filter parameters from request
@@ -811,6 +1051,7 @@ def export_sales_report():
 
 @app.route('/reports/inventory/export')
 @login_required
+@replica_reads
 def export_inventory_report():
     """Export inventory report to Excel"""
     # Get filter parameters
@@ -833,6 +1074,7 @@ def export_inventory_report():
 
 @app.route('/reports/financial/export')
 @login_required
+@replica_reads
 def export_financial_report():
     """Export financial report to Excel"""
     # Get filter parameters
@@ -870,10 +1112,464 @@ def api_funds():
         'exchange_rate': fund.exchange_rate
     } for fund in funds])
 
+@app.route('/api/funds/transactions')
+@login_required
+@replica_reads
+def api_fund_transactions():
+    """API endpoint for a keyset-paginated transaction feed across funds"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+    except ValueError:
+        limit = 100
+    
+    try:
+        fund_ids = [int(fund_id) for fund_id in request.args.getlist('fund_id')] or None
+        reference_id = int(request.args['reference_id']) if request.args.get('reference_id') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Fund and reference IDs must be integers'}), 400
+    
+    success, result = fund_controller.get_transaction_feed(
+        fund_ids=fund_ids,
+        transaction_type=request.args.get('type'),
+        reference_type=request.args.get('reference_type'),
+        reference_id=reference_id,
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        cursor=request.args.get('cursor'),
+        limit=limit
+    )
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    return jsonify({
+        'transactions': [{
+            'id': transaction.id,
+            'fund_id': transaction.fund_id,
+            'fund': transaction.fund_name,
+            'currency': transaction.currency,
+            'amount': transaction.amount,
+            'type': transaction.transaction_type,
+            'description': transaction.description,
+            'reference_type': transaction.reference_type,
+            'reference_id': transaction.reference_id,
+            'date': transaction.created_at.isoformat()
+        } for transaction in result['transactions']],
+        'next_cursor': result['next_cursor']
+    })
+
+def transfer_json(transfer, with_lines=False):
+    """Serialize a stock transfer (with its lines if loaded)"""
+    data = {
+        'id': transfer.id,
+        'transfer_number': transfer.transfer_number,
+        'from_warehouse_id': transfer.from_warehouse_id,
+        'to_warehouse_id': transfer.to_warehouse_id,
+        'status': transfer.status,
+        'notes': transfer.notes,
+        'created_at': transfer.created_at.isoformat() if transfer.created_at else None,
+        'dispatched_at': transfer.dispatched_at.isoformat() if transfer.dispatched_at else None,
+        'received_at': transfer.received_at.isoformat() if transfer.received_at else None
+    }
+    if with_lines:
+        data['lines'] = [{
+            'item_id': line.item_id,
+            'quantity': line.quantity,
+            'unit_cost': line.unit_cost
+        } for line in transfer.lines]
+    return data
+
+@app.route('/api/transfers', methods=['GET'])
+@login_required
+@replica_reads
+def api_transfers():
+    """API endpoint to list stock transfers, newest first"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+        warehouse_id = int(request.args['warehouse_id']) if request.args.get('warehouse_id') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Limit and warehouse ID must be integers'}), 400
+    
+    transfers = stock_transfer_controller.get_transfer_rows(
+        status=request.args.get('status'),
+        warehouse_id=warehouse_id,
+        limit=limit
+    )
+    
+    return jsonify([{
+        'id': transfer.id,
+        'transfer_number': transfer.transfer_number,
+        'from_warehouse_id': transfer.from_warehouse_id,
+        'from_warehouse': transfer.from_warehouse_name,
+        'to_warehouse_id': transfer.to_warehouse_id,
+        'to_warehouse': transfer.to_warehouse_name,
+        'status': transfer.status,
+        'line_count': transfer.line_count,
+        'total_quantity': transfer.total_quantity,
+        'created_at': transfer.created_at.isoformat() if transfer.created_at else None,
+        'dispatched_at': transfer.dispatched_at.isoformat() if transfer.dispatched_at else None,
+        'received_at': transfer.received_at.isoformat() if transfer.received_at else None
+    } for transfer in transfers])
+
+@app.route('/api/transfers', methods=['POST'])
+@login_required
+def api_create_transfer():
+    """API endpoint to post a multi-line stock transfer
+    
+    Expects a JSON body with from_warehouse_id, to_warehouse_id, lines
+    (item_id, quantity and optional unit), notes, and dispatch/receive
+    flags (dispatched and left in transit by default).
+    """
+    data = request.get_json(silent=True) or {}
+    lines = data.get('lines')
+    if not isinstance(lines, list):
+        return jsonify({'success': False, 'message': 'lines must be a list'}), 400
+    
+    success, result = stock_transfer_controller.create_transfer(
+        data.get('from_warehouse_id'),
+        data.get('to_warehouse_id'),
+        lines,
+        notes=data.get('notes'),
+        created_by=session.get('user_id'),
+        dispatch=bool(data.get('dispatch', True)),
+        receive=bool(data.get('receive', False))
+    )
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    return jsonify({'success': True, 'transfer': transfer_json(result)}), 201
+
+@app.route('/api/transfers/<int:transfer_id>')
+@login_required
+def api_transfer(transfer_id):
+    """API endpoint to get a stock transfer with its lines"""
+    transfer = stock_transfer_controller.get_transfer_by_id(transfer_id)
+    if not transfer:
+        return jsonify({'success': False, 'message': 'Transfer not found'}), 404
+    
+    return jsonify(transfer_json(transfer, with_lines=True))
+
+@app.route('/api/transfers/<int:transfer_id>/<action>', methods=['POST'])
+@login_required
+def api_transfer_action(transfer_id, action):
+    """API endpoint to dispatch, receive or cancel a stock transfer"""
+    actions = {
+        'dispatch': stock_transfer_controller.dispatch_transfer,
+        'receive': stock_transfer_controller.receive_transfer,
+        'cancel': stock_transfer_controller.cancel_transfer
+    }
+    if action not in actions:
+        abort(404)
+    
+    success, result = actions[action](transfer_id)
+    
+    if not success:
+        status = 404 if result == "Transfer not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, 'transfer': transfer_json(result)})
+
+@app.route('/api/counts', methods=['GET'])
+@login_required
+@replica_reads
+def api_counts():
+    """API endpoint to list stock count sessions, newest first"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+        warehouse_id = int(request.args['warehouse_id']) if request.args.get('warehouse_id') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Limit and warehouse ID must be integers'}), 400
+    
+    counts = stock_count_controller.get_count_rows(
+        warehouse_id=warehouse_id,
+        status=request.args.get('status'),
+        limit=limit
+    )
+    
+    return jsonify([{
+        'id': count.id,
+        'count_number': count.count_number,
+        'warehouse_id': count.warehouse_id,
+        'warehouse': count.warehouse_name,
+        'scope': count.scope,
+        'status': count.status,
+        'line_count': count.line_count,
+        'counted_lines': count.counted_lines,
+        'created_at': count.created_at.isoformat() if count.created_at else None,
+        'posted_at': count.posted_at.isoformat() if count.posted_at else None
+    } for count in counts])
+
+@app.route('/api/counts', methods=['POST'])
+@login_required
+def api_start_count():
+    """API endpoint to start a count session
+    
+    Expects a JSON body with warehouse_id and, for a partial count, item_ids.
+    """
+    data = request.get_json(silent=True) or {}
+    
+    success, result = stock_count_controller.start_count(
+        data.get('warehouse_id'),
+        item_ids=data.get('item_ids') or None,
+        notes=data.get('notes'),
+        created_by=session.get('user_id')
+    )
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    return jsonify({'success': True, 'id': result.id, 'count_number': result.count_number}), 201
+
+@app.route('/api/counts/<int:count_id>')
+@login_required
+def api_count(count_id):
+    """API endpoint for a count session's progress and variance totals"""
+    success, result = stock_count_controller.get_count_summary(count_id)
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 404
+    
+    for key in ('created_at', 'posted_at'):
+        result[key] = result[key].isoformat() if result[key] else None
+    return jsonify(result)
+
+@app.route('/api/counts/<int:count_id>/lines', methods=['POST'])
+@login_required
+def api_submit_counts(count_id):
+    """API endpoint for scanners to submit a batch of counted quantities
+    
+    Expects a JSON body with lines (item_id, quantity and optional unit)
+    and accumulate (add to earlier scans instead of replacing them).
+    """
+    data = request.get_json(silent=True) or {}
+    lines = data.get('lines')
+    if not isinstance(lines, list):
+        return jsonify({'success': False, 'message': 'lines must be a list'}), 400
+    
+    success, result = stock_count_controller.submit_counts(
+        count_id, lines, accumulate=bool(data.get('accumulate', False))
+    )
+    
+    if not success:
+        status = 404 if result == "Count not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/counts/<int:count_id>/variances')
+@login_required
+@replica_reads
+def api_count_variances(count_id):
+    """API endpoint for a keyset-paginated list of count variances"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        limit = 100
+    
+    success, result = stock_count_controller.get_variances(
+        count_id,
+        cursor=request.args.get('cursor'),
+        limit=limit,
+        differences_only=request.args.get('all') != '1'
+    )
+    
+    if not success:
+        status = 404 if result == "Count not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({
+        'lines': [{
+            'item_id': line.item_id,
+            'item': line.item_name,
+            'unit': line.main_unit,
+            'expected': line.expected_quantity,
+            'counted': line.counted_quantity,
+            'variance': line.variance,
+            'unit_cost': line.unit_cost,
+            'variance_value': line.variance_value
+        } for line in result['lines']],
+        'next_cursor': result['next_cursor']
+    })
+
+@app.route('/api/counts/<int:count_id>/post', methods=['POST'])
+@login_required
+def api_post_count(count_id):
+    """API endpoint to post all variances of a count as stock adjustments"""
+    data = request.get_json(silent=True) or {}
+    
+    success, result = stock_count_controller.post_count(
+        count_id, zero_uncounted=bool(data.get('zero_uncounted', False))
+    )
+    
+    if not success:
+        status = 404 if result == "Count not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/counts/<int:count_id>/cancel', methods=['POST'])
+@login_required
+def api_cancel_count(count_id):
+    """API endpoint to cancel an open count"""
+    success, result = stock_count_controller.cancel_count(count_id)
+    
+    if not success:
+        status = 404 if result == "Count not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, 'count_number': result.count_number})
+
+def reservation_json(reservation):
+    """Serialize a reservation row or StockReservation for the API"""
+    return {
+        'id': reservation.id,
+        'item_id': reservation.item_id,
+        'warehouse_id': reservation.warehouse_id,
+        'quantity': reservation.quantity,
+        'status': reservation.status,
+        'reference': reservation.reference,
+        'entity_id': reservation.entity_id,
+        'invoice_id': reservation.invoice_id,
+        'expires_at': reservation.expires_at.isoformat() if reservation.expires_at else None,
+        'created_at': reservation.created_at.isoformat() if reservation.created_at else None,
+        'closed_at': reservation.closed_at.isoformat() if reservation.closed_at else None
+    }
+
+@app.route('/api/reservations', methods=['GET'])
+@login_required
+@replica_reads
+def api_reservations():
+    """API endpoint to list stock reservations, newest first"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+        warehouse_id = int(request.args['warehouse_id']) if request.args.get('warehouse_id') else None
+        item_id = int(request.args['item_id']) if request.args.get('item_id') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Limit, warehouse ID and item ID must be integers'}), 400
+    
+    reservations = reservation_controller.get_reservation_rows(
+        status=request.args.get('status'),
+        warehouse_id=warehouse_id,
+        item_id=item_id,
+        reference=request.args.get('reference'),
+        limit=limit
+    )
+    
+    return jsonify([dict(reservation_json(reservation), item=reservation.item_name,
+                         unit=reservation.main_unit, warehouse=reservation.warehouse_name)
+                    for reservation in reservations])
+
+@app.route('/api/reservations', methods=['POST'])
+@login_required
+def api_reserve():
+    """API endpoint to reserve stock for a quote or order
+    
+    Expects a JSON body with warehouse_id, lines (item_id, quantity and
+    optional unit) and optionally hold_minutes or expires_at (ISO UTC),
+    reference and entity_id. All lines are reserved or none are.
+    """
+    data = request.get_json(silent=True) or {}
+    lines = data.get('lines')
+    if not isinstance(lines, list):
+        return jsonify({'success': False, 'message': 'lines must be a list'}), 400
+    
+    try:
+        expires_at = datetime.datetime.fromisoformat(data['expires_at']) if data.get('expires_at') else None
+        if expires_at and expires_at.tzinfo:
+            expires_at = expires_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        hold_minutes = int(data['hold_minutes']) if data.get('hold_minutes') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid expires_at or hold_minutes'}), 400
+    
+    success, result = reservation_controller.reserve(
+        data.get('warehouse_id'),
+        lines,
+        expires_at=expires_at,
+        hold_minutes=hold_minutes,
+        reference=data.get('reference'),
+        entity_id=data.get('entity_id'),
+        created_by=session.get('user_id')
+    )
+    
+    if not success:
+        status = 409 if result.startswith('Insufficient available stock') else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, 'reservations': [reservation_json(reservation) for reservation in result]}), 201
+
+@app.route('/api/reservations/<int:reservation_id>/release', methods=['POST'])
+@login_required
+def api_release_reservation(reservation_id):
+    """API endpoint to release an active reservation"""
+    success, result = reservation_controller.release_reservation(reservation_id)
+    
+    if not success:
+        status = 404 if result == "Reservation not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({'success': True, 'reservation': reservation_json(result)})
+
+@app.route('/api/cache/stats')
+@login_required
+def api_cache_stats():
+    """API endpoint for this worker's identity cache statistics"""
+    return jsonify(identity_cache_stats())
+
+@app.route('/api/audit')
+@login_required
+@replica_reads
+def api_audit():
+    """API endpoint for a keyset-paginated page of the audit log (admins only)"""
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Administrator access required'}), 403
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+    except ValueError:
+        limit = 100
+    
+    success, result = audit_controller.get_audit_rows(
+        table_name=request.args.get('table'),
+        entity_id=request.args.get('entity_id'),
+        user_id=request.args.get('user_id', type=int),
+        action=request.args.get('action'),
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        cursor=request.args.get('cursor'),
+        limit=limit
+    )
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    return jsonify({
+        'entries': [{
+            'id': entry.id,
+            'table': entry.table_name,
+            'entity_id': entry.entity_id,
+            'action': entry.action,
+            'changes': json.loads(entry.changes),
+            'user_id': entry.user_id,
+            'username': entry.username,
+            'date': entry.created_at.isoformat()
+        } for entry in result['entries']],
+        'next_cursor': result['next_cursor']
+    })
+
+@app.route('/api/audit/stats')
+@login_required
+def api_audit_stats():
+    """API endpoint for this worker's audit writer statistics (admins only)"""
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'Administrator access required'}), 403
+
+    return jsonify(audit_controller.get_writer_stats())
+
 @app.route('/api/items')
 def api_items():
     """API endpoint to get all items"""
-    items = item_controller.get_all_items()
+    items = item_controller.get_item_rows()
     return jsonify([{
         'id': item.id,
         'name': item.name,
@@ -882,9 +1578,229 @@ def api_items():
         'conversion_rate': item.conversion_rate,
         'purchase_price': item.purchase_price,
         'selling_price': item.selling_price,
-        'stock': item.get_total_stock()
+        'stock': item.total_stock
+    } for item in items])
+
+def item_snapshot_json(item):
+    """Serialize an item snapshot for the API"""
+    return {
+        'id': item.id,
+        'name': item.name,
+        'sku': item.sku,
+        'main_unit': item.main_unit,
+        'sub_unit': item.sub_unit,
+        'conversion_rate': item.conversion_rate,
+        'purchase_price': item.purchase_price,
+        'selling_price': item.selling_price,
+        'is_active': item.is_active
+    }
+
+@app.route('/api/items/by-barcode/<path:code>')
+@login_required
+def api_item_by_barcode(code):
+    """API endpoint for scanners: the item with a barcode or SKU
+    
+    Answered from the in-process code index and item cache, without a
+    database query once both are warm.
+    """
+    item = item_controller.get_item_by_code(code)
+    if not item:
+        return jsonify({'success': False, 'message': 'No item with this barcode'}), 404
+    
+    return jsonify(item_snapshot_json(item))
+
+@app.route('/api/items/<int:item_id>/barcodes', methods=['GET', 'POST'])
+@login_required
+def api_item_barcodes(item_id):
+    """API endpoint to list an item's barcodes or add one (JSON body with code)"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        success, result = item_controller.add_barcode(item_id, data.get('code'))
+        if not success:
+            status = 404 if result == "Item not found" else 400
+            return jsonify({'success': False, 'message': result}), status
+        return jsonify({'success': True, 'code': result.code}), 201
+    
+    return jsonify({'item_id': item_id, 'barcodes': item_controller.get_barcodes(item_id)})
+
+@app.route('/api/items/<int:item_id>/barcodes/<path:code>/delete', methods=['POST'])
+@login_required
+def api_remove_item_barcode(item_id, code):
+    """API endpoint to remove a barcode from an item"""
+    success, result = item_controller.remove_barcode(item_id, code)
+    if not success:
+        return jsonify({'success': False, 'message': result}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/items/barcodes/import', methods=['POST'])
+@login_required
+def api_import_barcodes():
+    """API endpoint to import barcodes in bulk
+    
+    Expects a JSON body with rows (code and item_id or sku) and replace
+    (move barcodes that belong to other items).
+    """
+    data = request.get_json(silent=True) or {}
+    rows = data.get('rows')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return jsonify({'success': False, 'message': 'rows must be a list of objects'}), 400
+    
+    success, result = item_controller.import_barcodes(rows, replace=bool(data.get('replace', False)))
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    result['errors'] = [{'row': number, 'message': message} for number, message in result['errors']]
+    return jsonify({'success': True, **result})
+
+def _search_limit():
+    """Read the result limit for search endpoints (capped at 50)"""
+    try:
+        return max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        return 10
+
+@app.route('/api/search/items')
+@login_required
+@replica_reads
+def api_search_items():
+    """API endpoint for item typeahead search"""
+    items = search_controller.search_items(request.args.get('q', ''), limit=_search_limit())
+    return jsonify([{
+        'id': item.id,
+        'name': item.name,
+        'main_unit': item.main_unit,
+        'sub_unit': item.sub_unit,
+        'conversion_rate': item.conversion_rate,
+        'purchase_price': item.purchase_price,
+        'selling_price': item.selling_price
     } for item in items])
 
+@app.route('/api/search/entities')
+@login_required
+@replica_reads
+def api_search_entities():
+    """API endpoint for supplier/customer typeahead search"""
+    entities = search_controller.search_entities(
+        request.args.get('q', ''),
+        entity_type=request.args.get('type'),
+        limit=_search_limit()
+    )
+    return jsonify([{
+        'id': entity.id,
+        'name': entity.name,
+        'type': entity.type,
+        'phone': entity.phone,
+        'currency': entity.currency,
+        'exchange_rate': entity.exchange_rate
+    } for entity in entities])
+
+@app.route('/api/payments/<int:payment_id>/allocate', methods=['POST'])
+@login_required
+def api_allocate_payment(payment_id):
+    """API endpoint to apply an on-account payment to open invoices"""
+    success, result = payment_allocation_controller.allocate_payment(
+        payment_id,
+        invoice_type=request.form.get('invoice_type') or None,
+        strategy=request.form.get('strategy', 'fifo')
+    )
+    
+    if not success:
+        return jsonify({'success': False, 'message': result}), 400
+    
+    return jsonify({'success': True, **result})
+
+@app.route('/api/entities/<int:entity_id>/statement')
+@login_required
+@replica_reads
+def api_entity_statement(entity_id):
+    """API endpoint for a keyset-paginated supplier/customer statement"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 500))
+    except ValueError:
+        limit = 100
+    
+    success, result = supplier_customer_controller.get_entity_statement(
+        entity_id,
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        cursor=request.args.get('cursor'),
+        limit=limit
+    )
+    
+    if not success:
+        status = 404 if result == "Entity not found" else 400
+        return jsonify({'success': False, 'message': result}), status
+    
+    return jsonify({
+        'entity': {'id': result['entity'].id, 'name': result['entity'].name},
+        'opening_balance': result['opening_balance'],
+        'closing_balance': result['closing_balance'],
+        'entries': [{
+            'date': entry['entry_date'].isoformat(),
+            'type': entry['entry_type'],
+            'id': entry['entry_id'],
+            'reference': entry['reference'],
+            'currency': entry['currency'],
+            'debit': entry['debit'],
+            'credit': entry['credit'],
+            'balance': entry['balance']
+        } for entry in result['entries']],
+        'next_cursor': result['next_cursor']
+    })
+
+def _aging_json(row):
+    """Convert an aging report row to JSON-friendly values"""
+    return {key: value.isoformat() if isinstance(value, datetime.datetime) else value
+            for key, value in row.items()}
+
+@app.route('/api/reports/aging')
+@login_required
+@replica_reads
+def api_aging_report():
+    """API endpoint for the paginated aging report"""
+    page, per_page = _page_args()
+    
+    try:
+        report_data = report_controller.generate_aging_report(page=page, per_page=per_page, **_aging_filters())
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date. Use YYYY-MM-DD'}), 400
+    
+    return jsonify({
+        'as_of': report_data['as_of'].date().isoformat(),
+        'buckets': [key for key, _label in report_data['buckets']],
+        'rows': report_data['rows'],
+        'totals': report_data['totals'],
+        'page': report_data['page'],
+        'per_page': report_data['per_page'],
+        'total_rows': report_data['total_rows'],
+        'pages': report_data['pages']
+    })
+
+@app.route('/api/reports/aging/<int:entity_id>')
+@login_required
+@replica_reads
+def api_aging_report_detail(entity_id):
+    """API endpoint for one entity's open invoices in the aging report"""
+    page, per_page = _page_args()
+    
+    try:
+        detail = report_controller.get_entity_aging_detail(entity_id, page=page, per_page=per_page, **_aging_filters())
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date. Use YYYY-MM-DD'}), 400
+    
+    if not detail['entity']:
+        return jsonify({'success': False, 'message': 'Entity not found'}), 404
+    
+    return jsonify({
+        'as_of': detail['as_of'].date().isoformat(),
+        'entity': {'id': detail['entity'].id, 'name': detail['entity'].name},
+        'invoices': [_aging_json(invoice) for invoice in detail['invoices']],
+        'page': detail['page'],
+        'per_page': detail['per_page'],
+        'total_rows': detail['total_rows'],
+        'pages': detail['pages']
+    })
+
 # Error handlers
 @app.errorhandler(404)
 def page_not_found(e):
@@ -895,24 +1811,46 @@ def server_error(e):
     return render_template('errors/500.html'), 500
 
 # Import language functions at the top level
-from utils.language import switch_language, get_current_language, _
+from utils.language import (DEFAULT_LANGUAGE, get_current_language, get_translator,
+                            is_supported_language, set_request_language)
+from utils.fragment_cache import FragmentCacheExtension
+
+@app.before_request
+def select_request_language():
+    """Use the language stored in the user's session for this request"""
+    set_request_language(session.get('language', DEFAULT_LANGUAGE))
 
 # Language switching route
 @app.route('/set_language/<lang_code>', methods=['POST'])
 def set_language(lang_code):
-    """Set the application language"""
-    switch_language(lang_code)
+    """Set the language for the current user's session"""
+    if not is_supported_language(lang_code):
+        return jsonify({'success': False, 'message': 'Unsupported language'}), 400
+    
+    session['language'] = lang_code
     return jsonify({'success': True})
 
-# Add language functions to Jinja environment
+@app.context_processor
+def inject_translator():
+    """Provide the precompiled translator for the request's language"""
+    return {'_': get_translator()}
+
+# Add language functions and per-language fragment caching to Jinja environment
 app.jinja_env.globals.update(get_current_language=get_current_language)
-app.jinja_env.globals.update(_=_)
+app.jinja_env.add_extension(FragmentCacheExtension)
 
 # Create static folders for uploads and exports
 # Create necessary folders
 os.makedirs(os.path.join('static', 'exports'), exist_ok=True)
 os.makedirs(os.path.join('static', 'uploads'), exist_ok=True)
 
+# Load the barcode/SKU index before workers fork, so no scan waits for it
+try:
+    item_code_index.warm()
+except SQLAlchemyError:
+    # Tables not created yet (init_db runs later); loaded on first scan
+    pass
+
 # Run the application
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file